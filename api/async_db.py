@@ -0,0 +1,66 @@
+"""
+Async Database - engine/session แบบ asyncio สำหรับ API service (api/server.py)
+ใช้ DATABASE_URL เดียวกับ database/db.py แต่เปลี่ยน driver เป็นตัวที่รองรับ asyncio:
+- SQLite → aiosqlite (เปิด WAL + busy_timeout ให้หลาย request เขียนพร้อมกันได้)
+- PostgreSQL → asyncpg (ผ่าน transaction pooler ต้องปิด prepared statement cache)
+- MySQL → aiomysql
+ขนาด connection pool ตั้งได้ด้วย API_DB_POOL_SIZE / API_DB_MAX_OVERFLOW
+"""
+
+import os
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from database.db import DATABASE_URL, is_sqlite, is_postgresql, is_mysql
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+POOL_SIZE = int(os.environ.get('API_DB_POOL_SIZE', '10'))
+MAX_OVERFLOW = int(os.environ.get('API_DB_MAX_OVERFLOW', '20'))
+SQLITE_BUSY_TIMEOUT_MS = 5000
+
+def async_database_url(url: str = DATABASE_URL) -> str:
+    """Same database, asyncio driver"""
+    if url.startswith('sqlite:///'):
+        return 'sqlite+aiosqlite:///' + url[len('sqlite:///'):]
+    if url.startswith('postgresql://'):
+        return 'postgresql+asyncpg://' + url[len('postgresql://'):]
+    if url.startswith('mysql+pymysql://'):
+        return 'mysql+aiomysql://' + url[len('mysql+pymysql://'):]
+    if url.startswith('mysql://'):
+        return 'mysql+aiomysql://' + url[len('mysql://'):]
+    return url
+
+def _create_engine():
+    url = async_database_url()
+    if is_sqlite:
+        async_engine = create_async_engine(url, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, echo=False)
+
+        @event.listens_for(async_engine.sync_engine, 'connect')
+        def _sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")  # อ่านได้ระหว่างมีคนเขียน
+            cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+            cursor.close()
+
+        return async_engine
+    if is_postgresql:
+        connect_args = {}
+        if '6543' in DATABASE_URL or os.environ.get('SUPABASE_POOLER_MODE', '') == 'transaction':
+            # Transaction mode pooler ไม่รองรับ prepared statements
+            connect_args = {'statement_cache_size': 0, 'prepared_statement_cache_size': 0}
+        return create_async_engine(
+            url, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_pre_ping=True,
+            connect_args=connect_args, echo=False
+        )
+    if is_mysql:
+        return create_async_engine(url, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_pre_ping=True, echo=False)
+    return create_async_engine(url, echo=False)
+
+async_engine = _create_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+async def get_async_session():
+    """FastAPI dependency: one AsyncSession per request"""
+    async with AsyncSessionLocal() as session:
+        yield session
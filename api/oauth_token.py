@@ -1,78 +1,79 @@
 """
 OAuth Token Endpoint
 สำหรับ exchange authorization code เป็น access token
+code/token เก็บในฐานข้อมูลผ่าน utils.oauth_store (ใช้ร่วมกันได้ทุก process)
+client ต้องลงทะเบียนใน secrets [oauth_clients] (ดู utils.oauth_store.registered_clients) - ไม่ได้ลงทะเบียน = invalid_client
 """
 
-from fastapi import FastAPI, Request, HTTPException
+from typing import Optional
 from pydantic import BaseModel
-import secrets
-from datetime import datetime, timedelta
-import streamlit as st
+from utils.oauth_store import exchange_code, refresh_access_token, verify_access_token, verify_client_secret
+from utils.logger import get_logger
 
-# Note: This is a placeholder for OAuth token endpoint
-# In production, you might want to use FastAPI or Flask for API endpoints
-# For Streamlit, you can create a separate API service or use Streamlit's API capabilities
+logger = get_logger(__name__)
 
 class TokenRequest(BaseModel):
     """OAuth token request model"""
     grant_type: str
-    code: str = None
+    code: Optional[str] = None
+    refresh_token: Optional[str] = None
     client_id: str
     client_secret: str
-    redirect_uri: str = None
+    redirect_uri: Optional[str] = None
+
+def verify_client(client_id: str, client_secret: str) -> bool:
+    """Check the client secret (unregistered clients are always rejected)"""
+    if verify_client_secret(client_id, client_secret):
+        return True
+    logger.warning("OAuth client authentication failed for %s", client_id)
+    return False
 
 def exchange_code_for_token(code: str, client_id: str, client_secret: str, redirect_uri: str) -> dict:
     """
     Exchange authorization code for access token
-    
+
     Args:
         code: Authorization code
         client_id: OAuth client ID
         client_secret: OAuth client secret
         redirect_uri: Redirect URI
-    
+
     Returns:
-        Token response dict
+        Token response dict, or {"error": ...} (RFC 6749 error codes)
     """
-    # TODO: In production:
-    # 1. Verify code exists and not expired
-    # 2. Verify client_id and client_secret
-    # 3. Verify redirect_uri matches
-    # 4. Generate access token
-    # 5. Store token in database
-    # 6. Return token
-    
-    # For now, this is a placeholder
-    # You'll need to implement:
-    # - Code validation
-    # - Client validation
-    # - Token generation
-    # - Token storage
-    
-    return {
-        "access_token": secrets.token_urlsafe(32),
-        "token_type": "Bearer",
-        "expires_in": 3600,
-        "refresh_token": secrets.token_urlsafe(32)
-    }
+    if not verify_client(client_id, client_secret):
+        return {"error": "invalid_client"}
+    token = exchange_code(code, client_id, redirect_uri)
+    if token is None:
+        return {"error": "invalid_grant"}
+    return token
 
-def verify_token(access_token: str) -> dict:
+def handle_token_request(request: TokenRequest) -> dict:
+    """Token endpoint: authorization_code and refresh_token grants"""
+    if request.grant_type == 'authorization_code' and request.code:
+        return exchange_code_for_token(request.code, request.client_id, request.client_secret, request.redirect_uri)
+    if request.grant_type == 'refresh_token' and request.refresh_token:
+        if not verify_client(request.client_id, request.client_secret):
+            return {"error": "invalid_client"}
+        return refresh_access_token(request.refresh_token, request.client_id) or {"error": "invalid_grant"}
+    return {"error": "unsupported_grant_type"}
+
+def verify_token(access_token: str) -> Optional[dict]:
     """
     Verify access token and return user info
-    
+
     Args:
         access_token: Access token
-    
+
     Returns:
-        User info dict
+        User info dict, or None when the token is unknown, expired or revoked
     """
-    # TODO: In production:
-    # 1. Verify token exists and not expired
-    # 2. Get user info from token
-    # 3. Return user info
-    
+    info = verify_access_token(access_token)
+    if info is None:
+        return None
     return {
-        "user_id": "xxx",
-        "email": "user@example.com"
+        "user_id": info.user_id,
+        "client_id": info.client_id,
+        "scope": info.scope,
+        "expires_at": info.expires_at.isoformat()
     }
-
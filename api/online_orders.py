@@ -1,132 +1,447 @@
 """
 Online Order API Endpoints
 สำหรับเชื่อมต่อกับแพลตฟอร์มออนไลน์ (LINE MAN, GrabFood, Foodpanda)
+- รับออเดอร์ทีละหลายรายการ (webhook batch) โดยไม่สร้างซ้ำเมื่อแพลตฟอร์มส่ง order_id เดิมมาอีก
+  (online_order_receipts เป็น idempotency key ต่อ platform + order_id)
+- รหัสสินค้าของแพลตฟอร์ม (sku) แปลงเป็นสินค้า/เมนูผ่าน platform_sku_mappings
+- บิล รายการ การตัดสต็อค และ idempotency key ของแต่ละออเดอร์อยู่ใน transaction เดียวกัน
+- บิลออนไลน์เก็บแพลตฟอร์มใน Sale.channel (index ร่วมกับ created_at สำหรับรายการแบบ keyset)
 """
 
+import hashlib
+import json
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import and_, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 from database.db import get_session
-from database.models import Sale, SaleItem, Product, Menu, Customer
+from database.models import Sale, SaleItem, Product, Menu, Customer, OnlineOrderReceipt, PlatformSkuMapping
 from utils.helpers import format_currency
+from utils.sale_reversal import apply_stock_movements, build_stock_movements, void_sale
+from utils.logger import get_logger, log_timing
+
+logger = get_logger(__name__)
+
+PLATFORMS = ('line_man', 'grabfood', 'foodpanda')
+ONLINE_CHANNELS = PLATFORMS + ('online',)  # 'online' = ออเดอร์ออนไลน์แบบเก่าที่ไม่รู้แพลตฟอร์ม
+CHANNEL_LABELS = {
+    'pos': 'หน้าร้าน',
+    'api': 'API / Kiosk',
+    'online': 'ออนไลน์ (ไม่ระบุ)',
+    'line_man': 'LINE MAN',
+    'grabfood': 'GrabFood',
+    'foodpanda': 'foodpanda',
+}
+MAX_BATCH_SIZE = 500
+
+# cursor = (created_at, id) ของแถวสุดท้ายในหน้าก่อนหน้า (เหมือน utils.sale_history)
+OrderCursor = Tuple[datetime, int]
+
+class OrderRejected(ValueError):
+    """Order cannot be accepted as sent (the platform should fix it, not retry it as-is)"""
+
+def payload_hash(order: Dict) -> str:
+    """SHA-256 of an order in canonical JSON (same order = same hash regardless of key order)"""
+    return hashlib.sha256(
+        json.dumps(order, sort_keys=True, default=str, ensure_ascii=False).encode('utf-8')
+    ).hexdigest()
+
+def set_sku_mapping(platform: str, external_sku: str, item_type: str, item_id: int) -> Dict:
+    """Map a platform SKU to a product or menu (creates or replaces the mapping)"""
+    if platform not in PLATFORMS:
+        return {'status': 'error', 'message': f'Unknown platform: {platform}'}
+    if item_type not in ('product', 'menu'):
+        return {'status': 'error', 'message': f'Unknown item type: {item_type}'}
+    session = get_session()
+    try:
+        mapping = session.query(PlatformSkuMapping).filter(
+            PlatformSkuMapping.platform == platform,
+            PlatformSkuMapping.external_sku == str(external_sku)
+        ).first()
+        if mapping is None:
+            mapping = PlatformSkuMapping(platform=platform, external_sku=str(external_sku))
+            session.add(mapping)
+        mapping.item_type = item_type
+        mapping.product_id = item_id if item_type == 'product' else None
+        mapping.menu_id = item_id if item_type == 'menu' else None
+        mapping.is_active = True
+        session.commit()
+        return {'status': 'success', 'mapping_id': mapping.id}
+    except Exception as e:
+        session.rollback()
+        logger.error("Error saving SKU mapping %s/%s: %s", platform, external_sku, e)
+        return {'status': 'error', 'message': str(e)}
+    finally:
+        session.close()
+
+def _load_sku_mappings(session, platform: str, orders: List[Dict]) -> Dict[str, Tuple[str, Optional[int], Optional[int]]]:
+    """{sku: (item_type, product_id, menu_id)} for every SKU in the batch (one query)"""
+    skus = {str(item['sku']) for order in orders for item in order.get('items') or [] if item.get('sku') is not None}
+    if not skus:
+        return {}
+    rows = session.query(
+        PlatformSkuMapping.external_sku, PlatformSkuMapping.item_type,
+        PlatformSkuMapping.product_id, PlatformSkuMapping.menu_id
+    ).filter(
+        PlatformSkuMapping.platform == platform,
+        PlatformSkuMapping.external_sku.in_(skus),
+        PlatformSkuMapping.is_active == True
+    ).all()
+    return {sku: (item_type, product_id, menu_id) for sku, item_type, product_id, menu_id in rows}
+
+def _order_lines(order: Dict, mappings: Dict) -> List[Dict]:
+    """Sale lines of a webhook order; items use 'sku' (mapped) or 'type' + 'id'"""
+    lines, unknown = [], []
+    for item in order.get('items') or []:
+        if item.get('sku') is not None:
+            mapping = mappings.get(str(item['sku']))
+            if mapping is None:
+                unknown.append(str(item['sku']))
+                continue
+            item_type, product_id, menu_id = mapping
+        elif item.get('type') in ('product', 'menu') and item.get('id'):
+            item_type = item['type']
+            product_id = item['id'] if item_type == 'product' else None
+            menu_id = item['id'] if item_type == 'menu' else None
+        else:
+            raise OrderRejected(f"Item without sku or type/id: {item}")
+        quantity = float(item.get('quantity', 1))
+        if quantity <= 0:
+            raise OrderRejected(f"Invalid quantity {quantity}")
+        lines.append({
+            'item_type': item_type,
+            'product_id': product_id,
+            'menu_id': menu_id,
+            'quantity': quantity,
+            'unit_price': float(item.get('price', 0.0))
+        })
+    if unknown:
+        raise OrderRejected(f"Unknown SKU: {', '.join(unknown)}")
+    if not lines:
+        raise OrderRejected("Order has no items")
+    return lines
+
+def _create_sale(session, platform: str, order_id: str, order: Dict, lines: List[Dict], customer_id: Optional[int]) -> int:
+    """Sale + items + stock deduction (caller commits)"""
+    subtotal = sum(line['unit_price'] * line['quantity'] for line in lines)
+    total = float(order.get('total', subtotal))
+    sale = Sale(
+        sale_date=datetime.now(),
+        total_amount=total,
+        discount_amount=0.0,
+        final_amount=total,
+        payment_method='transfer',  # Online orders usually paid online
+        payment_reference=order_id,
+        channel=platform,
+        customer_id=customer_id,
+        created_by=None  # System order
+    )
+    session.add(sale)
+    session.flush()
+
+    session.add_all([
+        SaleItem(
+            sale_id=sale.id,
+            product_id=line['product_id'],
+            menu_id=line['menu_id'],
+            item_type=line['item_type'],
+            quantity=line['quantity'],
+            unit_price=line['unit_price'],
+            discount_amount=0.0,
+            total_price=line['unit_price'] * line['quantity']
+        )
+        for line in lines
+    ])
+    movements = build_stock_movements(session, lines, sale.id, 'ขายออนไลน์', 'ขายเมนู {menu} (ออนไลน์)')
+    apply_stock_movements(session, movements, 'out', None)
+    return sale.id
+
+def ingest_online_orders(platform: str, orders: List[Dict]) -> Dict:
+    """Accept a batch of orders from a platform webhook (safe to retry)
+
+    Args:
+        platform: 'line_man' | 'grabfood' | 'foodpanda'
+        orders: [{
+            'order_id': str,
+            'customer_name': str, 'customer_phone': str,
+            'items': [{'sku': str, 'quantity': float, 'price': float}
+                      | {'type': 'product'|'menu', 'id': int, 'quantity': float, 'price': float}],
+            'total': float
+        }]
+    Returns:
+        {'status', 'accepted', 'duplicates', 'rejected',
+         'results': [{'order_id', 'status': 'accepted'|'duplicate'|'conflict'|'rejected'|'error', 'sale_id', 'message'}]}
+        'duplicate' = order_id seen before with the same content (sale_id of the first delivery),
+        'conflict' = seen before with different content (not applied again)
+    """
+    if platform not in PLATFORMS:
+        return {'status': 'error', 'message': f'Unknown platform: {platform}'}
+    if len(orders) > MAX_BATCH_SIZE:
+        return {'status': 'error', 'message': f'Batch too large ({len(orders)} > {MAX_BATCH_SIZE})'}
+
+    # ออเดอร์ที่ซ้ำกันในชุดเดียวกัน ทำครั้งเดียว
+    unique: Dict[str, Dict] = {}
+    for order in orders:
+        order_id = str(order.get('order_id') or '').strip()
+        if order_id and order_id not in unique:
+            unique[order_id] = order
+    hashes = {order_id: payload_hash(order) for order_id, order in unique.items()}
+    outcomes: Dict[str, Dict] = {}
+
+    session = get_session()
+    try:
+        with log_timing(logger, "Ingested online orders", platform=platform, orders=len(orders)):
+            # query เดียวต่อชุด: ออเดอร์ที่เคยรับแล้ว, SKU mapping, ลูกค้าตามเบอร์โทร
+            received = {
+                order_id: (sale_id, digest)
+                for order_id, sale_id, digest in session.query(
+                    OnlineOrderReceipt.external_order_id, OnlineOrderReceipt.sale_id, OnlineOrderReceipt.payload_hash
+                ).filter(
+                    OnlineOrderReceipt.platform == platform,
+                    OnlineOrderReceipt.external_order_id.in_(list(unique))
+                )
+            } if unique else {}
+            mappings = _load_sku_mappings(session, platform, [o for i, o in unique.items() if i not in received])
+            phones = {str(o['customer_phone']).strip() for o in unique.values() if o.get('customer_phone')}
+            customers = dict(session.query(Customer.phone, Customer.id).filter(Customer.phone.in_(phones)).all()) if phones else {}
+
+            for order_id, order in unique.items():
+                if order_id in received:
+                    sale_id, digest = received[order_id]
+                    outcomes[order_id] = _previous_outcome(order_id, sale_id, digest, hashes[order_id])
+                    continue
+                try:
+                    lines = _order_lines(order, mappings)
+                    phone = str(order.get('customer_phone') or '').strip()
+                    if phone and phone not in customers:
+                        customer = Customer(name=order.get('customer_name') or 'ลูกค้าออนไลน์', phone=phone, is_member=False)
+                        session.add(customer)
+                        session.flush()
+                        customer_id = customer.id
+                    else:
+                        customer_id = customers.get(phone)
+
+                    sale_id = _create_sale(session, platform, order_id, order, lines, customer_id)
+                    session.add(OnlineOrderReceipt(
+                        platform=platform, external_order_id=order_id,
+                        payload_hash=hashes[order_id], sale_id=sale_id
+                    ))
+                    session.commit()
+                    if phone:
+                        customers[phone] = customer_id
+                    outcomes[order_id] = {'order_id': order_id, 'status': 'accepted', 'sale_id': sale_id,
+                                          'message': 'Order created successfully'}
+                except OrderRejected as e:
+                    session.rollback()
+                    outcomes[order_id] = {'order_id': order_id, 'status': 'rejected', 'sale_id': None, 'message': str(e)}
+                except IntegrityError as e:
+                    # webhook เดียวกันที่ส่งพร้อมกันอีกเส้นทางรับไปก่อนแล้ว
+                    session.rollback()
+                    previous = session.query(OnlineOrderReceipt.sale_id, OnlineOrderReceipt.payload_hash).filter(
+                        OnlineOrderReceipt.platform == platform,
+                        OnlineOrderReceipt.external_order_id == order_id
+                    ).first()
+                    if previous:
+                        outcomes[order_id] = _previous_outcome(order_id, previous.sale_id, previous.payload_hash, hashes[order_id])
+                    else:
+                        logger.error("Error ingesting online order %s/%s: %s", platform, order_id, e)
+                        outcomes[order_id] = {'order_id': order_id, 'status': 'error', 'sale_id': None, 'message': str(e)}
+                except Exception as e:
+                    session.rollback()
+                    logger.error("Error ingesting online order %s/%s: %s", platform, order_id, e)
+                    outcomes[order_id] = {'order_id': order_id, 'status': 'error', 'sale_id': None, 'message': str(e)}
+    finally:
+        session.close()
+
+    results = []
+    first_seen = set()
+    for order in orders:
+        order_id = str(order.get('order_id') or '').strip()
+        if not order_id:
+            results.append({'order_id': None, 'status': 'rejected', 'sale_id': None, 'message': 'Missing order_id'})
+        elif order_id in first_seen:
+            outcome = outcomes[order_id]
+            results.append({'order_id': order_id, 'status': 'duplicate', 'sale_id': outcome['sale_id'],
+                            'message': 'Repeated in the same batch'})
+        else:
+            first_seen.add(order_id)
+            results.append(outcomes[order_id])
+
+    counts = {status: sum(1 for r in results if r['status'] == status)
+              for status in ('accepted', 'duplicate', 'conflict', 'rejected', 'error')}
+    logger.info("Online order batch", extra={'platform': platform, **counts})
+    return {
+        'status': 'success' if not counts['error'] else 'partial',
+        'accepted': counts['accepted'],
+        'duplicates': counts['duplicate'] + counts['conflict'],
+        'rejected': counts['rejected'] + counts['error'],
+        'results': results
+    }
+
+def _previous_outcome(order_id: str, sale_id: int, stored_hash: str, new_hash: str) -> Dict:
+    if stored_hash == new_hash:
+        return {'order_id': order_id, 'status': 'duplicate', 'sale_id': sale_id, 'message': 'Order already received'}
+    logger.warning("Online order %s re-sent with different content - kept sale %s", order_id, sale_id)
+    return {'order_id': order_id, 'status': 'conflict', 'sale_id': sale_id,
+            'message': 'Order already received with different content'}
 
 def create_online_order(order_data: Dict) -> Optional[Dict]:
-    """Create order from online platform
+    """Create order from online platform (single-order form of ingest_online_orders - safe to retry)
     Args:
         order_data: {
             'platform': 'line_man' | 'grabfood' | 'foodpanda',
             'order_id': str,
             'customer_name': str,
             'customer_phone': str,
-            'items': [{'type': 'product'|'menu', 'id': int, 'quantity': float, 'price': float}],
+            'items': [{'type': 'product'|'menu', 'id': int, 'quantity': float, 'price': float}
+                      or {'sku': str, 'quantity': float, 'price': float}],
             'total': float,
             'payment_method': str
         }
     Returns:
         Dict with sale_id and status
     """
+    order = {key: value for key, value in order_data.items() if key != 'platform'}
+    batch = ingest_online_orders(order_data.get('platform', ''), [order])
+    if batch['status'] == 'error':
+        return {'status': 'error', 'message': batch['message']}
+
+    result = batch['results'][0]
+    if result['status'] in ('accepted', 'duplicate', 'conflict'):
+        return {'sale_id': result['sale_id'], 'status': 'success', 'message': result['message']}
+    return {'status': 'error', 'message': result['message']}
+
+def cancel_online_order(platform: str, order_id: str, reason: str = None) -> Dict:
+    """Cancel an order from online platform (void its sale)
+    Args:
+        platform: 'line_man', 'grabfood' or 'foodpanda'
+        order_id: platform order id
+        reason: cancellation reason from the platform
+    Returns:
+        Dict with sale_id and status
+    """
+    if platform not in PLATFORMS:
+        return {'status': 'error', 'message': f'Unknown platform: {platform}'}
+
+    # หาการขายจาก receipt (platform, order_id) - order_id ของแต่ละแพลตฟอร์มอาจซ้ำกันได้
     session = get_session()
     try:
-        # Get or create customer
-        customer = None
-        if order_data.get('customer_phone'):
-            customer = session.query(Customer).filter(
-                Customer.phone == order_data['customer_phone']
-            ).first()
-            
-            if not customer:
-                customer = Customer(
-                    name=order_data.get('customer_name', 'ลูกค้าออนไลน์'),
-                    phone=order_data['customer_phone'],
-                    is_member=False
-                )
-                session.add(customer)
-                session.commit()
-                session.refresh(customer)
-        
-        # Create sale
-        sale = Sale(
-            sale_date=datetime.now(),
-            total_amount=order_data['total'],
-            discount_amount=0.0,
-            final_amount=order_data['total'],
-            payment_method='transfer',  # Online orders usually paid online
-            payment_reference=order_data.get('order_id'),
-            customer_id=customer.id if customer else None,
-            created_by=None  # System order
-        )
-        session.add(sale)
-        session.flush()
-        
-        # Create sale items
-        for item_data in order_data.get('items', []):
-            sale_item = SaleItem(
-                sale_id=sale.id,
-                product_id=item_data['id'] if item_data['type'] == 'product' else None,
-                menu_id=item_data['id'] if item_data['type'] == 'menu' else None,
-                item_type=item_data['type'],
-                quantity=item_data['quantity'],
-                unit_price=item_data['price'],
-                discount_amount=0.0,
-                total_price=item_data['price'] * item_data['quantity']
-            )
-            session.add(sale_item)
-        
-        session.commit()
-        
-        print(f"[DEBUG] Created online order - Platform: {order_data.get('platform')}, Order ID: {order_data.get('order_id')}, Sale ID: {sale.id}")
-        
-        return {
-            'sale_id': sale.id,
-            'status': 'success',
-            'message': 'Order created successfully'
-        }
-    except Exception as e:
-        session.rollback()
-        print(f"[DEBUG] Error creating online order: {str(e)}")
-        return {
-            'status': 'error',
-            'message': str(e)
-        }
+        sale = session.query(Sale.id, Sale.is_void).join(
+            OnlineOrderReceipt, OnlineOrderReceipt.sale_id == Sale.id
+        ).filter(
+            OnlineOrderReceipt.platform == platform,
+            OnlineOrderReceipt.external_order_id == str(order_id).strip()
+        ).first()
     finally:
         session.close()
 
-def get_online_orders(platform: str = None, status: str = None) -> List[Dict]:
-    """Get online orders
+    if not sale:
+        return {'status': 'error', 'message': 'Order not found'}
+    if sale.is_void:
+        return {'sale_id': sale.id, 'status': 'success', 'message': 'Order already cancelled'}
+
+    # คืนสต็อคเฉพาะเมื่อออเดอร์นี้เคยตัดสต็อคไว้
+    success, message = void_sale(sale.id, reason or 'ยกเลิกจากแพลตฟอร์มออนไลน์', None, restore_stock=None)
+    if not success:
+        return {'sale_id': sale.id, 'status': 'error', 'message': message}
+
+    logger.debug("Cancelled online order - Platform: %s, Order ID: %s, Sale ID: %s", platform, order_id, sale.id)
+    return {'sale_id': sale.id, 'status': 'success', 'message': 'Order cancelled successfully'}
+
+def get_online_orders_page(platform: Optional[str] = None, status: Optional[str] = None,
+                           start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                           after: Optional[OrderCursor] = None, limit: int = 50) -> Tuple[List[Dict], Optional[OrderCursor]]:
+    """One page of online orders, newest first (keyset on created_at, id)
+
     Args:
-        platform: Filter by platform ('line_man', 'grabfood', 'foodpanda')
-        status: Filter by status
+        platform: 'line_man' | 'grabfood' | 'foodpanda' | 'online' (None = every online channel)
+        status: 'completed' | 'voided' (None = not voided)
+        after: cursor returned for the previous page (None = first page)
     Returns:
-        List of order dictionaries
+        (orders, next_cursor) - next_cursor is None on the last page
     """
     session = get_session()
     try:
-        query = session.query(Sale).filter(
-            Sale.payment_reference.isnot(None),
-            Sale.is_void == False
-        )
-        
-        # Filter by platform (if payment_reference contains platform identifier)
-        if platform:
-            # This is simplified - in real implementation, need to store platform info
-            pass
-        
-        sales = query.order_by(Sale.sale_date.desc()).limit(100).all()
-        
-        orders = []
-        for sale in sales:
-            orders.append({
+        query = session.query(Sale).options(joinedload(Sale.customer))
+        query = query.filter(Sale.channel == platform) if platform else query.filter(Sale.channel.in_(ONLINE_CHANNELS))
+        query = query.filter(Sale.is_void == (status == 'voided'))
+        if start_date is not None:
+            query = query.filter(Sale.created_at >= start_date)
+        if end_date is not None:
+            query = query.filter(Sale.created_at <= end_date)
+        if after is not None:
+            created_at, sale_id = after
+            query = query.filter(or_(
+                Sale.created_at < created_at,
+                and_(Sale.created_at == created_at, Sale.id < sale_id)
+            ))
+
+        sales = query.order_by(Sale.created_at.desc(), Sale.id.desc()).limit(limit + 1).all()
+        next_cursor = None
+        if len(sales) > limit:
+            sales = sales[:limit]
+            next_cursor = (sales[-1].created_at, sales[-1].id)
+
+        orders = [
+            {
                 'sale_id': sale.id,
                 'order_id': sale.payment_reference,
+                'platform': sale.channel,
                 'customer': sale.customer.name if sale.customer else 'Unknown',
+                'customer_phone': sale.customer.phone if sale.customer else None,
                 'total': sale.final_amount,
                 'date': sale.sale_date.strftime('%Y-%m-%d %H:%M:%S'),
-                'status': 'completed'
-            })
-        
-        return orders
+                'status': 'voided' if sale.is_void else 'completed'
+            }
+            for sale in sales
+        ]
+        return orders, next_cursor
     finally:
         session.close()
 
+def get_online_orders(platform: str = None, status: str = None, limit: int = 100) -> List[Dict]:
+    """Get the latest online orders (first page of get_online_orders_page)
+    Args:
+        platform: Filter by platform ('line_man', 'grabfood', 'foodpanda')
+        status: Filter by status ('completed', 'voided')
+    Returns:
+        List of order dictionaries
+    """
+    orders, _ = get_online_orders_page(platform, status, limit=limit)
+    return orders
+
+def get_channel_summary(start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> List[Dict]:
+    """Sales per channel (one GROUP BY query) for the dashboard
+
+    Returns:
+        [{'channel', 'label', 'orders', 'revenue', 'average'}] - highest revenue first, voided sales excluded
+    """
+    session = get_session()
+    try:
+        query = session.query(
+            Sale.channel, func.count(Sale.id), func.coalesce(func.sum(Sale.final_amount), 0.0)
+        ).filter(Sale.is_void == False)
+        if start_date is not None:
+            query = query.filter(Sale.sale_date >= start_date)
+        if end_date is not None:
+            query = query.filter(Sale.sale_date <= end_date)
+        rows = query.group_by(Sale.channel).all()
+    finally:
+        session.close()
+
+    summary = [
+        {
+            'channel': channel or 'pos',
+            'label': CHANNEL_LABELS.get(channel or 'pos', channel),
+            'orders': count,
+            'revenue': float(revenue),
+            'average': float(revenue) / count if count else 0.0
+        }
+        for channel, count, revenue in rows
+    ]
+    return sorted(summary, key=lambda row: row['revenue'], reverse=True)
+
 def generate_qr_code_for_online_ordering() -> str:
     """Generate QR Code data for online ordering
     Returns:
@@ -0,0 +1,412 @@
+"""
+POS API Service - HTTP API แบบ asyncio (FastAPI) สำหรับเครื่องพกพา, kiosk และ webhook เดลิเวอรี่
+ใช้ database.models ชุดเดียวกับหน้า Streamlit แต่ไม่ต้องมี Streamlit session ต่อ client
+- catalog: สินค้า/เมนู (แบ่งหน้าแบบ keyset), ค้นหาจากบาร์โค๊ด
+- checkout: สร้างบิล + ตัดสต็อคใน transaction เดียว (ราคาจากฐานข้อมูล ไม่เชื่อราคาจาก client)
+- stock: ดู/ปรับสต็อค, สินค้าใกล้หมด
+- orders / kitchen: ออเดอร์โต๊ะและคิวครัว (จอครัวได้รับแจ้งผ่าน change_feed เหมือนเดิม)
+- webhooks: รับออเดอร์เดลิเวอรี่เป็นชุด (ingest_online_orders), รายการออเดอร์ออนไลน์และยอดขายตามช่องทาง
+
+ใช้งาน:
+    POS_API_KEY=... uvicorn api.server:app --host 0.0.0.0 --port 8000 --workers 2
+    POS_API_KEY=... python -m api.server --port 8000          # ฟังที่ 127.0.0.1 เว้นแต่ระบุ --host
+
+ทุก request ต้องส่ง header X-API-Key (POS_API_KEY) หรือ Authorization: Bearer <OAuth access token>
+ไม่ตั้ง POS_API_KEY แล้ว server จะไม่ยอมเริ่ม ยกเว้นตั้ง POS_API_ALLOW_ANONYMOUS=1 (ทดสอบบนเครื่องเท่านั้น)
+"""
+
+import argparse
+import asyncio
+import hmac
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Dict, List, Literal, Optional
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.db import init_db
+from database.models import (
+    Product, Menu, Sale, SaleItem, Table, CustomerOrder, OrderItem, KitchenQueue, OrderStatus
+)
+from api.async_db import async_engine, get_async_session
+from api.oauth_token import TokenRequest, handle_token_request
+from api.online_orders import PLATFORMS, get_channel_summary, get_online_orders_page, ingest_online_orders
+from utils import change_feed  # noqa: F401 - ลงทะเบียนตัวแจ้งเตือนจอครัวเมื่อออเดอร์/คิวเปลี่ยน
+from utils.order_utils import generate_order_number
+from utils.sale_reversal import apply_stock_movements, build_stock_movements
+from utils import oauth_store
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+API_KEY = os.environ.get('POS_API_KEY', '')
+ALLOW_ANONYMOUS = os.environ.get('POS_API_ALLOW_ANONYMOUS', '') == '1'  # ไม่ต้องใช้ key (ทดสอบบนเครื่องเท่านั้น)
+API_USER_ID = int(os.environ['POS_API_USER_ID']) if os.environ.get('POS_API_USER_ID') else None  # created_by ของบิลจาก API
+MAX_PAGE_SIZE = 200
+ORDER_STATUSES = tuple(status.value for status in OrderStatus)
+QUEUE_STATUSES = ('pending', 'preparing', 'ready', 'completed', 'cancelled')
+
+async def _purge_oauth_rows():
+    """Delete expired OAuth codes/tokens every PURGE_INTERVAL_SECONDS"""
+    while True:
+        await asyncio.sleep(oauth_store.PURGE_INTERVAL_SECONDS)
+        await asyncio.to_thread(oauth_store.maybe_purge_expired)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # init_db ใช้ engine แบบ sync - รันใน thread ไม่ให้ block event loop
+    if not API_KEY and not ALLOW_ANONYMOUS:
+        raise RuntimeError("POS_API_KEY is not set - refusing to start (set POS_API_ALLOW_ANONYMOUS=1 for local testing)")
+    if ALLOW_ANONYMOUS:
+        logger.warning("POS_API_ALLOW_ANONYMOUS=1 - API accepts requests without a key")
+    await asyncio.to_thread(init_db)
+    purge_task = asyncio.create_task(_purge_oauth_rows())
+    yield
+    purge_task.cancel()
+    await async_engine.dispose()
+
+app = FastAPI(title="POS API", lifespan=lifespan)
+
+async def require_api_key(request: Request, x_api_key: str = Header(default=''), authorization: str = Header(default='')):
+    """API key or OAuth bearer token (token checks hit the in-memory cache most of the time)
+
+    token ต้องมี scope 'read' สำหรับ GET และ 'write' สำหรับ request ที่แก้ไขข้อมูล
+    """
+    if ALLOW_ANONYMOUS:
+        return
+    if API_KEY and x_api_key and hmac.compare_digest(x_api_key, API_KEY):
+        return
+    scheme, _, token = authorization.partition(' ')
+    if scheme.lower() == 'bearer' and token:
+        info = oauth_store.cached_access_token(token)
+        if info is oauth_store.MISS:
+            info = await asyncio.to_thread(oauth_store.verify_access_token, token)
+        if info is not None:
+            needed = 'read' if request.method in ('GET', 'HEAD') else 'write'
+            if oauth_store.token_has_scope(info, needed):
+                return
+            raise HTTPException(status_code=403, detail=f"Token lacks '{needed}' scope")
+    raise HTTPException(status_code=401, detail="Invalid API key or token")
+
+# ---------------------------------------------------------------- request bodies
+
+class CheckoutItem(BaseModel):
+    type: Literal['product', 'menu']
+    id: int
+    quantity: float = Field(gt=0)
+
+class CheckoutRequest(BaseModel):
+    items: List[CheckoutItem] = Field(min_length=1)
+    payment_method: Literal['cash', 'qr_code', 'credit_card', 'transfer'] = 'cash'
+    payment_reference: Optional[str] = None
+    customer_id: Optional[int] = None
+    discount_amount: float = Field(default=0.0, ge=0)
+
+class StockMovementRequest(BaseModel):
+    product_id: int
+    transaction_type: Literal['in', 'out']
+    quantity: float = Field(gt=0)
+    reason: str = 'ปรับสต็อคผ่าน API'
+
+class OrderItemRequest(BaseModel):
+    menu_id: int
+    quantity: int = Field(default=1, gt=0)
+    special_instructions: Optional[str] = None
+
+class OrderRequest(BaseModel):
+    table_id: int
+    items: List[OrderItemRequest] = Field(min_length=1)
+    customer_name: Optional[str] = None
+    customer_phone: Optional[str] = None
+    notes: Optional[str] = None
+
+class StatusRequest(BaseModel):
+    status: str
+
+# ---------------------------------------------------------------- serializers
+
+def _product_dict(product: Product) -> Dict:
+    return {
+        'id': product.id, 'name': product.name, 'barcode': product.barcode, 'unit': product.unit,
+        'category_id': product.category_id, 'price': product.selling_price,
+        'stock_quantity': product.stock_quantity, 'min_stock': product.min_stock
+    }
+
+def _menu_dict(menu: Menu) -> Dict:
+    return {'id': menu.id, 'name': menu.name, 'description': menu.description, 'price': menu.price,
+            'is_active': menu.is_active}
+
+def _order_dict(order: CustomerOrder, items: List[OrderItem]) -> Dict:
+    return {
+        'id': order.id, 'order_number': order.order_number, 'table_id': order.table_id,
+        'status': order.status, 'total_amount': order.total_amount, 'notes': order.notes,
+        'created_at': order.created_at,
+        'items': [{'menu_id': i.menu_id, 'quantity': i.quantity, 'unit_price': i.unit_price,
+                   'subtotal': i.subtotal, 'special_instructions': i.special_instructions} for i in items]
+    }
+
+# ---------------------------------------------------------------- routes
+
+@app.post("/oauth/token")
+async def oauth_token(body: TokenRequest):
+    result = await asyncio.to_thread(handle_token_request, body)
+    if 'error' in result:
+        # RFC 6749: {"error": ...} กับ 400 (401 สำหรับ invalid_client)
+        return JSONResponse(result, status_code=401 if result['error'] == 'invalid_client' else 400)
+    return result
+
+@app.get("/health")
+async def health(session: AsyncSession = Depends(get_async_session)):
+    await session.execute(select(1))
+    return {'status': 'ok'}
+
+@app.get("/catalog/products", dependencies=[Depends(require_api_key)])
+async def list_products(q: Optional[str] = None, category_id: Optional[int] = None,
+                        after_id: int = 0, limit: int = Query(default=50, ge=1, le=MAX_PAGE_SIZE),
+                        session: AsyncSession = Depends(get_async_session)):
+    """Products in id order; pass the last id as after_id for the next page"""
+    query = select(Product).where(Product.id > after_id).order_by(Product.id).limit(limit)
+    if category_id is not None:
+        query = query.where(Product.category_id == category_id)
+    if q:
+        query = query.where(or_(Product.name.ilike(f"%{q}%"), Product.barcode == q))
+    products = (await session.execute(query)).scalars().all()
+    return {
+        'items': [_product_dict(p) for p in products],
+        'next_after_id': products[-1].id if len(products) == limit else None
+    }
+
+@app.get("/catalog/products/barcode/{barcode}", dependencies=[Depends(require_api_key)])
+async def product_by_barcode(barcode: str, session: AsyncSession = Depends(get_async_session)):
+    product = (await session.execute(select(Product).where(Product.barcode == barcode))).scalar_one_or_none()
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return _product_dict(product)
+
+@app.get("/catalog/menus", dependencies=[Depends(require_api_key)])
+async def list_menus(include_inactive: bool = False, session: AsyncSession = Depends(get_async_session)):
+    query = select(Menu).order_by(Menu.name)
+    if not include_inactive:
+        query = query.where(Menu.is_active == True)
+    return {'items': [_menu_dict(m) for m in (await session.execute(query)).scalars()]}
+
+@app.post("/checkout", dependencies=[Depends(require_api_key)])
+async def checkout(body: CheckoutRequest, session: AsyncSession = Depends(get_async_session)):
+    """Create a sale and deduct stock in one transaction (prices come from the database)"""
+    product_ids = {i.id for i in body.items if i.type == 'product'}
+    menu_ids = {i.id for i in body.items if i.type == 'menu'}
+    prices = {}
+    if product_ids:
+        rows = await session.execute(select(Product.id, Product.selling_price).where(Product.id.in_(product_ids)))
+        prices.update({('product', pid): price for pid, price in rows})
+    if menu_ids:
+        rows = await session.execute(select(Menu.id, Menu.price).where(Menu.id.in_(menu_ids), Menu.is_active == True))
+        prices.update({('menu', mid): price for mid, price in rows})
+    missing = [f"{i.type} {i.id}" for i in body.items if (i.type, i.id) not in prices]
+    if missing:
+        raise HTTPException(status_code=422, detail=f"Unknown items: {', '.join(missing)}")
+
+    total = sum(prices[(i.type, i.id)] * i.quantity for i in body.items)
+    discount = min(body.discount_amount, total)
+    ratio = discount / total if total > 0 else 0
+    sale = Sale(
+        sale_date=datetime.now(),
+        total_amount=total,
+        discount_amount=discount,
+        final_amount=total - discount,
+        payment_method=body.payment_method,
+        payment_reference=body.payment_reference,
+        channel='api',
+        customer_id=body.customer_id,
+        created_by=API_USER_ID
+    )
+    session.add(sale)
+    await session.flush()
+
+    lines = []
+    for item in body.items:
+        unit_price = prices[(item.type, item.id)]
+        line_total = unit_price * item.quantity
+        session.add(SaleItem(
+            sale_id=sale.id,
+            product_id=item.id if item.type == 'product' else None,
+            menu_id=item.id if item.type == 'menu' else None,
+            item_type=item.type,
+            quantity=item.quantity,
+            unit_price=unit_price,
+            discount_amount=line_total * ratio,
+            total_price=line_total * (1 - ratio)
+        ))
+        lines.append({'item_type': item.type, 'product_id': item.id if item.type == 'product' else None,
+                      'menu_id': item.id if item.type == 'menu' else None, 'quantity': item.quantity})
+
+    # เหตุผลเดียวกับ reduce_stock_for_sale (void_sale ตรวจจาก stock_transactions.sale_id)
+    await session.run_sync(lambda s: apply_stock_movements(
+        s, build_stock_movements(s, lines, sale.id, 'ขาย', 'ขายเมนู {menu}'), 'out', API_USER_ID
+    ))
+    await session.commit()
+    return {'sale_id': sale.id, 'total_amount': total, 'discount_amount': discount, 'final_amount': total - discount}
+
+@app.get("/stock/low", dependencies=[Depends(require_api_key)])
+async def low_stock(limit: int = Query(default=50, ge=1, le=MAX_PAGE_SIZE), session: AsyncSession = Depends(get_async_session)):
+    query = select(Product).where(Product.stock_quantity <= Product.min_stock).order_by(Product.stock_quantity).limit(limit)
+    return {'items': [_product_dict(p) for p in (await session.execute(query)).scalars()]}
+
+@app.get("/stock/{product_id}", dependencies=[Depends(require_api_key)])
+async def product_stock(product_id: int, session: AsyncSession = Depends(get_async_session)):
+    row = (await session.execute(
+        select(Product.id, Product.stock_quantity, Product.min_stock).where(Product.id == product_id)
+    )).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return {'product_id': row.id, 'stock_quantity': row.stock_quantity, 'min_stock': row.min_stock}
+
+@app.post("/stock/movements", dependencies=[Depends(require_api_key)])
+async def stock_movement(body: StockMovementRequest, session: AsyncSession = Depends(get_async_session)):
+    totals = await session.run_sync(lambda s: apply_stock_movements(
+        s, [{'product_id': body.product_id, 'quantity': body.quantity, 'reason': body.reason}],
+        body.transaction_type, API_USER_ID
+    ))
+    if not totals:
+        raise HTTPException(status_code=404, detail="Product not found")
+    await session.commit()
+    stock = (await session.execute(select(Product.stock_quantity).where(Product.id == body.product_id))).scalar_one()
+    return {'product_id': body.product_id, 'stock_quantity': stock}
+
+@app.post("/orders", dependencies=[Depends(require_api_key)])
+async def create_table_order(body: OrderRequest, session: AsyncSession = Depends(get_async_session)):
+    """Table order + kitchen queue rows (same as utils.order_utils.create_order, one menu query)"""
+    table = (await session.execute(
+        select(Table.id).where(Table.id == body.table_id, Table.is_active == True)
+    )).scalar_one_or_none()
+    if table is None:
+        raise HTTPException(status_code=404, detail="Table not found")
+    menus = {m.id: m for m in (await session.execute(
+        select(Menu).where(Menu.id.in_({i.menu_id for i in body.items}), Menu.is_active == True)
+    )).scalars()}
+    if not menus:
+        raise HTTPException(status_code=422, detail="No active menu in order")
+
+    order = CustomerOrder(
+        order_number=generate_order_number(),
+        table_id=body.table_id,
+        customer_name=body.customer_name,
+        customer_phone=body.customer_phone,
+        status='pending',
+        notes=body.notes
+    )
+    session.add(order)
+    await session.flush()
+
+    items, total_amount = [], 0.0
+    for item in body.items:
+        menu = menus.get(item.menu_id)
+        if menu is None:
+            continue
+        order_item = OrderItem(order_id=order.id, menu_id=menu.id, quantity=item.quantity, unit_price=menu.price,
+                               subtotal=menu.price * item.quantity, special_instructions=item.special_instructions)
+        items.append(order_item)
+        total_amount += order_item.subtotal
+        session.add(order_item)
+        session.add(KitchenQueue(order_id=order.id, menu_id=menu.id, quantity=item.quantity, status='pending',
+                                 priority=0, notes=item.special_instructions))
+    order.total_amount = total_amount
+    await session.commit()
+    return _order_dict(order, items)
+
+@app.get("/orders/{order_id}", dependencies=[Depends(require_api_key)])
+async def get_order(order_id: int, session: AsyncSession = Depends(get_async_session)):
+    order = await session.get(CustomerOrder, order_id)
+    if order is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+    items = (await session.execute(select(OrderItem).where(OrderItem.order_id == order_id))).scalars().all()
+    return _order_dict(order, items)
+
+@app.patch("/orders/{order_id}/status", dependencies=[Depends(require_api_key)])
+async def set_order_status(order_id: int, body: StatusRequest, session: AsyncSession = Depends(get_async_session)):
+    if body.status not in ORDER_STATUSES:
+        raise HTTPException(status_code=422, detail=f"Unknown status: {body.status}")
+    now = datetime.now()
+    values = {'status': body.status, 'updated_at': now}
+    if body.status == 'confirmed':
+        values['confirmed_at'] = now
+    elif body.status == 'completed':
+        values['completed_at'] = now
+    order = await session.get(CustomerOrder, order_id)
+    if order is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+    for key, value in values.items():
+        setattr(order, key, value)  # ผ่าน ORM เพื่อให้ change_feed แจ้งจอครัว
+    await session.commit()
+    return {'order_id': order_id, 'status': body.status}
+
+@app.get("/kitchen/queue", dependencies=[Depends(require_api_key)])
+async def kitchen_queue(status: str = 'pending,preparing,ready', session: AsyncSession = Depends(get_async_session)):
+    statuses = [s for s in status.split(',') if s]
+    rows = await session.execute(
+        select(KitchenQueue, Menu.name, CustomerOrder.order_number, CustomerOrder.table_id)
+        .join(Menu, Menu.id == KitchenQueue.menu_id)
+        .join(CustomerOrder, CustomerOrder.id == KitchenQueue.order_id)
+        .where(KitchenQueue.status.in_(statuses))
+        .order_by(KitchenQueue.priority.desc(), KitchenQueue.created_at)
+    )
+    return {'items': [
+        {'id': queue.id, 'order_id': queue.order_id, 'order_number': order_number, 'table_id': table_id,
+         'menu_id': queue.menu_id, 'menu_name': menu_name, 'quantity': queue.quantity, 'status': queue.status,
+         'priority': queue.priority, 'notes': queue.notes, 'created_at': queue.created_at}
+        for queue, menu_name, order_number, table_id in rows
+    ], 'change_token': await asyncio.to_thread(change_feed.get_change_token, change_feed.CHANNEL_KITCHEN)}
+
+@app.patch("/kitchen/queue/{queue_id}", dependencies=[Depends(require_api_key)])
+async def set_queue_status(queue_id: int, body: StatusRequest, session: AsyncSession = Depends(get_async_session)):
+    if body.status not in QUEUE_STATUSES:
+        raise HTTPException(status_code=422, detail=f"Unknown status: {body.status}")
+    queue = await session.get(KitchenQueue, queue_id)
+    if queue is None:
+        raise HTTPException(status_code=404, detail="Queue item not found")
+    queue.status = body.status
+    if body.status == 'preparing' and not queue.started_at:
+        queue.started_at = datetime.now()
+        queue.prepared_by = API_USER_ID
+    elif body.status == 'completed':
+        queue.completed_at = datetime.now()
+    await session.commit()
+    return {'queue_id': queue_id, 'status': body.status}
+
+@app.post("/webhooks/{platform}/orders", dependencies=[Depends(require_api_key)])
+async def delivery_webhook(platform: str, orders: List[Dict]):
+    """Batch of delivery-platform orders (safe to retry - see ingest_online_orders)"""
+    if platform not in PLATFORMS:
+        raise HTTPException(status_code=404, detail=f"Unknown platform: {platform}")
+    # ingest_online_orders ใช้ session แบบ sync - รันใน thread pool
+    result = await asyncio.to_thread(ingest_online_orders, platform, orders)
+    if result['status'] == 'error':
+        raise HTTPException(status_code=422, detail=result['message'])
+    return result
+
+@app.get("/online-orders", dependencies=[Depends(require_api_key)])
+async def online_orders(platform: Optional[str] = None, status: Optional[str] = None,
+                        after_created_at: Optional[datetime] = None, after_id: Optional[int] = None,
+                        limit: int = Query(default=50, ge=1, le=MAX_PAGE_SIZE)):
+    """Online orders newest first; pass next_cursor back as after_created_at/after_id"""
+    after = (after_created_at, after_id) if after_created_at is not None and after_id is not None else None
+    orders, next_cursor = await asyncio.to_thread(get_online_orders_page, platform, status, None, None, after, limit)
+    return {'items': orders,
+            'next_cursor': {'after_created_at': next_cursor[0], 'after_id': next_cursor[1]} if next_cursor else None}
+
+@app.get("/reports/channels", dependencies=[Depends(require_api_key)])
+async def channel_report(start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
+    return {'items': await asyncio.to_thread(get_channel_summary, start_date, end_date)}
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the POS API service")
+    parser.add_argument("--host", default="127.0.0.1", help="0.0.0.0 = รับจากทุกเครื่องในเครือข่าย")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="จำนวน process (SQLite ควรใช้ 1)")
+    args = parser.parse_args()
+    uvicorn.run("api.server:app", host=args.host, port=args.port, workers=args.workers)
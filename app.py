@@ -10,6 +10,10 @@ from utils.security import check_login_rate_limit, record_login_attempt
 from utils.validators import validate_username, validate_password
 import bcrypt
 from datetime import datetime
+from utils.perf_monitor import track_rerun
+from utils.logger import get_logger
+
+logger = get_logger("app")
 
 # ตั้งค่า page config
 st.set_page_config(
@@ -163,12 +167,12 @@ def create_default_admin():
             )
             session.add(admin)
             session.commit()
-            print(f"[DEBUG] สร้างผู้ใช้ admin เริ่มต้นสำเร็จ - {datetime.now()}")
+            logger.debug("สร้างผู้ใช้ admin เริ่มต้นสำเร็จ")
             st.info("✅ สร้างผู้ใช้ admin เริ่มต้นแล้ว (username: admin, password: admin)")
         else:
-            print(f"[DEBUG] พบผู้ใช้ admin อยู่แล้ว - {datetime.now()}")
+            logger.debug("พบผู้ใช้ admin อยู่แล้ว")
     except Exception as e:
-        print(f"[DEBUG] เกิดข้อผิดพลาดในการสร้างผู้ใช้เริ่มต้น: {str(e)} - {datetime.now()}")
+        logger.error("เกิดข้อผิดพลาดในการสร้างผู้ใช้เริ่มต้น: %s", e)
         st.error(f"❌ เกิดข้อผิดพลาดในการสร้างผู้ใช้เริ่มต้น: {str(e)}")
     finally:
         session.close()
@@ -284,5 +288,6 @@ def main():
     st.caption("ระบบ Point of Sale สำหรับร้านขายของชำและอาหารตามสั่ง")
 
 if __name__ == "__main__":
-    main()
+    with track_rerun(__file__):
+        main()
 
@@ -0,0 +1 @@
+# Performance benchmark suite
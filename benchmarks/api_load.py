@@ -0,0 +1,180 @@
+"""
+API Load Test - ยิง request พร้อมกันไปที่ api/server.py แล้ววัด throughput / latency ต่อ endpoint
+
+ใช้งาน:
+    POS_API_KEY=... python benchmarks/api_load.py                      # ในโปรเซสเดียวกัน (ASGI, ไม่ต้องเปิด server)
+    python benchmarks/api_load.py --url http://127.0.0.1:8000 --concurrency 64 --requests 5000
+    python benchmarks/api_load.py --mix catalog=6,checkout=2,kitchen=2 --output results/api.json
+
+ต้องมีสินค้า/เมนู/โต๊ะในฐานข้อมูล (scripts/generate_load_data.py)
+สัดส่วน request (--mix): catalog, barcode, stock, checkout, order, kitchen, webhook
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_MIX = "catalog=5,barcode=3,stock=2,checkout=3,order=1,kitchen=3,webhook=1"
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Load test the POS API service")
+    parser.add_argument("--url", help="URL ของ server ที่เปิดอยู่ (ไม่ระบุ = เรียก app ในโปรเซสนี้)")
+    parser.add_argument("--concurrency", type=int, default=32, help="จำนวน client พร้อมกัน")
+    parser.add_argument("--requests", type=int, default=2000, help="จำนวน request ทั้งหมด")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="สัดส่วน request ต่อประเภท")
+    parser.add_argument("--api-key", default=os.environ.get('POS_API_KEY', ''))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="ไฟล์ JSON สำหรับบันทึกผล")
+    return parser.parse_args()
+
+def load_fixtures() -> dict:
+    """Ids the requests can use (read once with the sync engine)"""
+    from database.db import get_session
+    from database.models import Product, Menu, Table
+
+    session = get_session()
+    try:
+        return {
+            'products': session.query(Product.id, Product.barcode).limit(500).all(),
+            'menus': [m for (m,) in session.query(Menu.id).filter(Menu.is_active == True).limit(200)],
+            'tables': [t for (t,) in session.query(Table.id).filter(Table.is_active == True).limit(50)],
+        }
+    finally:
+        session.close()
+
+def make_request(kind: str, fixtures: dict, rng: random.Random, counter: list):
+    """(method, path, json body) for one request of the given kind"""
+    products, menus, tables = fixtures['products'], fixtures['menus'], fixtures['tables']
+    if kind == 'catalog':
+        return 'GET', f"/catalog/products?after_id={rng.choice(products).id - 1}&limit=50", None
+    if kind == 'barcode':
+        barcodes = [p.barcode for p in products if p.barcode]
+        if barcodes:
+            return 'GET', f"/catalog/products/barcode/{rng.choice(barcodes)}", None
+        return 'GET', "/catalog/menus", None
+    if kind == 'stock':
+        return 'GET', f"/stock/{rng.choice(products).id}", None
+    if kind == 'checkout':
+        items = [{'type': 'product', 'id': p.id, 'quantity': rng.randint(1, 3)} for p in rng.sample(products, k=2)]
+        if menus:
+            items.append({'type': 'menu', 'id': rng.choice(menus), 'quantity': 1})
+        return 'POST', "/checkout", {'items': items, 'payment_method': 'cash'}
+    if kind == 'order' and tables and menus:
+        return 'POST', "/orders", {'table_id': rng.choice(tables),
+                                   'items': [{'menu_id': m, 'quantity': 1} for m in rng.sample(menus, k=min(2, len(menus)))]}
+    if kind == 'webhook':
+        counter[0] += 1
+        order_id = f"LOAD{counter[1]}-{counter[0]}"
+        product = rng.choice(products)
+        order = {'order_id': order_id, 'items': [{'type': 'product', 'id': product.id, 'quantity': 1, 'price': 10.0}],
+                 'total': 10.0}
+        return 'POST', "/webhooks/grabfood/orders", [order, order]  # ซ้ำในชุดเดียวกัน
+    return 'GET', "/kitchen/queue", None
+
+async def run(args) -> dict:
+    import httpx
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=30,
+                                   limits=httpx.Limits(max_connections=args.concurrency))
+    else:
+        from database.db import init_db
+        from api.server import app
+        init_db()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://pos.local", timeout=30)
+
+    fixtures = load_fixtures()
+    if not fixtures['products']:
+        raise SystemExit("❌ ไม่มีสินค้าในฐานข้อมูล - รัน scripts/generate_load_data.py ก่อน")
+
+    mix = [(kind, int(weight)) for kind, weight in (part.split('=') for part in args.mix.split(','))]
+    kinds = [kind for kind, _ in mix]
+    weights = [weight for _, weight in mix]
+    rng = random.Random(args.seed)
+    plan = rng.choices(kinds, weights=weights, k=args.requests)
+    counter = [0, int(time.time())]
+    requests = [(kind, *make_request(kind, fixtures, rng, counter)) for kind in plan]
+
+    headers = {'X-API-Key': args.api_key} if args.api_key else {}
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    queue: asyncio.Queue = asyncio.Queue()
+    for request in requests:
+        queue.put_nowait(request)
+
+    async def worker():
+        while True:
+            try:
+                kind, method, path, body = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body, headers=headers)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies[kind].append(time.perf_counter() - started)
+            if not ok:
+                errors[kind] += 1
+
+    started = time.perf_counter()
+    async with client:
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    def percentile(values, q):
+        values = sorted(values)
+        return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+    endpoints = {
+        kind: {
+            'requests': len(values),
+            'errors': errors[kind],
+            'p50_ms': statistics.median(values) * 1000,
+            'p95_ms': percentile(values, 0.95),
+            'p99_ms': percentile(values, 0.99),
+        }
+        for kind, values in sorted(latencies.items())
+    }
+    return {
+        'target': args.url or 'in-process',
+        'concurrency': args.concurrency,
+        'requests': len(requests),
+        'errors': sum(errors.values()),
+        'elapsed_s': elapsed,
+        'requests_per_second': len(requests) / elapsed if elapsed else 0.0,
+        'endpoints': endpoints
+    }
+
+def main():
+    args = parse_args()
+    result = asyncio.run(run(args))
+
+    print(f"🚀 {result['requests']} requests, concurrency {result['concurrency']} ({result['target']})")
+    print(f"{'endpoint':<10} {'requests':>9} {'errors':>7} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for kind, stats in result['endpoints'].items():
+        print(f"{kind:<10} {stats['requests']:>9} {stats['errors']:>7} {stats['p50_ms']:>7.1f}ms "
+              f"{stats['p95_ms']:>7.1f}ms {stats['p99_ms']:>7.1f}ms")
+    print(f"\n⚡ {result['requests_per_second']:.0f} requests/วินาที ใน {result['elapsed_s']:.2f}s, "
+          f"ผิดพลาด {result['errors']}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"💾 บันทึกผลที่ {args.output}")
+    return 0 if not result['errors'] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Barcode Decode Benchmark - วัดความเร็ว/อัตราอ่านสำเร็จของ utils.barcode_decoder บนโฟลเดอร์ภาพตัวอย่าง
+
+ใช้งาน:
+    python benchmarks/barcode_decode.py samples/barcodes                  # ภาพที่มีอยู่แล้ว
+    python benchmarks/barcode_decode.py /tmp/barcodes --generate 40       # สร้างภาพจำลองก่อน (EAN-13 / Code 128)
+    python benchmarks/barcode_decode.py samples/barcodes --workers 4 --output results/barcode.json
+
+ชื่อไฟล์ (ไม่รวมนามสกุล) ถือเป็นค่าที่ถูกต้องของบาร์โค๊ดในภาพ ถ้าต้องการตรวจความถูกต้อง
+เปรียบเทียบ:
+- baseline: decoder ตัวแรกบนภาพเต็มความละเอียด (แบบที่ component เดิมทำ)
+- pipeline: decode_image() (ย่อ + ROI + fallback)
+- pool: submit_frame() ทุกภาพพร้อมกันผ่าน worker pool และรอบที่สองที่ได้จาก cache
+"""
+
+import sys
+import os
+import argparse
+import json
+import random
+import statistics
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Benchmark barcode decoding on a folder of images")
+    parser.add_argument("folder", help="โฟลเดอร์ภาพบาร์โค๊ด")
+    parser.add_argument("--generate", type=int, default=0, help="สร้างภาพจำลองจำนวนนี้ลงในโฟลเดอร์ก่อน")
+    parser.add_argument("--repeat", type=int, default=3, help="จำนวนรอบที่วัดต่อภาพ")
+    parser.add_argument("--workers", type=int, help="จำนวน worker ของ pool (ค่าเริ่มต้นตาม DECODE_WORKERS)")
+    parser.add_argument("--seed", type=int, default=42, help="seed ของภาพจำลอง")
+    parser.add_argument("--output", help="ไฟล์ JSON สำหรับบันทึกผล")
+    return parser.parse_args()
+
+def generate_samples(folder: str, count: int, seed: int):
+    """Write camera-like frames (1920x1080 JPEG, barcode off-centre, slightly rotated and blurred)"""
+    import barcode
+    from barcode.writer import ImageWriter
+    from PIL import Image, ImageFilter
+
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    for index in range(count):
+        if index % 2 == 0:
+            code = barcode.get_barcode_class('ean13')(''.join(rng.choice('0123456789') for _ in range(12)), writer=ImageWriter())
+        else:
+            code = barcode.get_barcode_class('code128')(f"P{rng.randint(10000, 99999)}", writer=ImageWriter())
+        label = code.render({'module_width': rng.choice([0.2, 0.3, 0.4]), 'write_text': False, 'quiet_zone': 4}).convert('L')
+        label = label.rotate(rng.uniform(-6, 6), expand=True, fillcolor=255)
+
+        frame = Image.new('L', (1920, 1080), rng.randint(90, 160))
+        x = int(960 - label.width / 2 + rng.uniform(-0.25, 0.25) * 1920 * 0.5)
+        y = int(540 - label.height / 2 + rng.uniform(-0.2, 0.2) * 1080 * 0.5)
+        frame.paste(label, (max(0, x), max(0, y)))
+        frame = frame.filter(ImageFilter.GaussianBlur(rng.uniform(0.3, 1.2)))
+        frame.convert('RGB').save(os.path.join(folder, f"{code.get_fullcode()}.jpg"), quality=75)
+    print(f"🧪 สร้างภาพจำลอง {count} ภาพใน {folder}")
+
+def load_frames(folder: str) -> dict:
+    """{file name: encoded bytes}"""
+    frames = {}
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            with open(os.path.join(folder, name), 'rb') as f:
+                frames[name] = f.read()
+    return frames
+
+def time_decoder(decode, frames: dict, repeat: int) -> dict:
+    """Median time per image, found/correct counts"""
+    timings, found, correct = [], 0, 0
+    for name, data in frames.items():
+        per_image = []
+        value = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            value = decode(data)
+            per_image.append(time.perf_counter() - started)
+        timings.append(statistics.median(per_image))
+        if value:
+            found += 1
+            correct += value == os.path.splitext(name)[0]
+    return {
+        'images': len(frames),
+        'found': found,
+        'correct': correct,
+        'median_ms': statistics.median(timings) * 1000,
+        'mean_ms': statistics.mean(timings) * 1000,
+        'max_ms': max(timings) * 1000
+    }
+
+def main():
+    args = parse_args()
+    if args.generate:
+        generate_samples(args.folder, args.generate, args.seed)
+
+    from io import BytesIO
+    from PIL import Image
+    import utils.barcode_decoder as decoder
+
+    if not decoder.DECODER_AVAILABLE:
+        print("❌ ไม่มี decoder ติดตั้ง (pyzbar / zxing-cpp / opencv)")
+        return 1
+    frames = load_frames(args.folder)
+    if not frames:
+        print(f"❌ ไม่พบภาพใน {args.folder}")
+        return 1
+    if args.workers:
+        decoder.DECODE_WORKERS = args.workers
+
+    backend_name, backend = decoder.BACKENDS[0]
+    print(f"🚀 {len(frames)} ภาพ, decoder: {', '.join(decoder.decoder_backends())}, workers: {decoder.DECODE_WORKERS}")
+
+    def baseline(data):
+        found = backend(Image.open(BytesIO(data)).convert('L'))
+        return found[0][0] if found else None
+
+    def pipeline(data):
+        result = decoder.decode_image(data)
+        return result.data if result else None
+
+    results = {
+        f'baseline ({backend_name}, full frame)': time_decoder(baseline, frames, args.repeat),
+        'pipeline (decode_image)': time_decoder(pipeline, frames, args.repeat),
+    }
+
+    # Pool throughput: ทุกภาพพร้อมกัน แล้วรอบที่สองจาก cache
+    decoder.clear_decode_cache()
+    for label in ('pool (submit_frame)', 'pool, cached frames'):
+        started = time.perf_counter()
+        futures = [decoder.submit_frame(data, source="benchmark") for data in frames.values()]
+        values = [future.result() for future in futures]
+        elapsed = time.perf_counter() - started
+        results[label] = {
+            'images': len(frames),
+            'found': sum(1 for v in values if v),
+            'correct': sum(1 for name, v in zip(frames, values) if v and v.data == os.path.splitext(name)[0]),
+            'total_ms': elapsed * 1000,
+            'frames_per_second': len(frames) / elapsed if elapsed else 0.0
+        }
+
+    print()
+    print(f"{'method':<34} {'found':>7} {'correct':>8} {'median':>10} {'mean':>10} {'fps':>8}")
+    for label, result in results.items():
+        median = f"{result['median_ms']:.1f}ms" if 'median_ms' in result else '-'
+        mean = f"{result['mean_ms']:.1f}ms" if 'mean_ms' in result else '-'
+        fps = f"{result['frames_per_second']:.0f}" if 'frames_per_second' in result else '-'
+        print(f"{label:<34} {result['found']:>7} {result['correct']:>8} {median:>10} {mean:>10} {fps:>8}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'backends': decoder.decoder_backends(), 'workers': decoder.DECODE_WORKERS,
+                       'results': results}, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 บันทึกผลที่ {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Benchmark Cases - ฟังก์ชันหลักของระบบที่ต้องวัดความเร็ว
+แต่ละ case รับ context (ข้อมูลตัวอย่างที่เตรียมไว้) แล้วเรียกฟังก์ชันจริงหนึ่งครั้ง
+"""
+
+import importlib.util
+import os
+from datetime import datetime, timedelta
+from typing import Callable, Dict
+from sqlalchemy import func
+from database.db import get_session
+from database.models import Sale, SaleItem, Product, Menu, Customer, Membership, User
+from utils import helpers
+from utils.helpers import (
+    reduce_stock_for_sale, update_membership_after_sale, earn_points, calculate_points_earned,
+    get_today_sales, get_month_sales, get_today_profit, get_low_stock_products, get_top_selling_menus
+)
+from utils.frames import get_sale_item_profit_frame
+from utils.promotion import get_applicable_promotions
+from utils.receipt import generate_receipt_pdf, generate_receipt_text
+from utils.tax import get_tax_report
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pages")
+
+def _load_page(filename: str):
+    """Import a Streamlit page module (its functions are not in a package)"""
+    spec = importlib.util.spec_from_file_location(f"bench_page_{filename.split('_')[0]}", os.path.join(PAGES_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def build_context(output_dir: str) -> Dict:
+    """Pick sample rows from the generated dataset for the cases to use"""
+    session = get_session()
+    try:
+        end_date = session.query(func.max(Sale.sale_date)).scalar() or datetime.now()
+        products = session.query(Product).order_by(Product.id).limit(3).all()
+        menus = session.query(Menu).order_by(Menu.id).limit(3).all()
+        member = session.query(Customer).join(Membership, Membership.customer_id == Customer.id).first()
+        user = session.query(User).first()
+        receipt_sale_id = session.query(func.max(SaleItem.sale_id)).scalar()
+
+        cart = [
+            {'type': 'product', 'id': p.id, 'name': p.name, 'price': p.selling_price, 'quantity': 2.0,
+             'total': p.selling_price * 2.0}
+            for p in products
+        ] + [
+            {'type': 'menu', 'id': m.id, 'name': m.name, 'price': m.price, 'quantity': 1.0, 'total': m.price}
+            for m in menus
+        ]
+        if member:
+            session.expunge(member)
+
+        return {
+            'reports_page': _load_page("5_📈_รายงาน.py"),
+            'end_date': end_date,
+            'month_start': end_date - timedelta(days=30),
+            'year_start': end_date - timedelta(days=365),
+            'cart': cart,
+            'cart_total': sum(item['total'] for item in cart),
+            'member': member,
+            'user_id': user.id if user else None,
+            'receipt_sale_id': receipt_sale_id,
+            'output_dir': output_dir
+        }
+    finally:
+        session.close()
+
+def _create_sale(ctx: Dict) -> int:
+    """Insert a sale with the context cart the same way the POS page does"""
+    session = get_session()
+    try:
+        total = ctx['cart_total']
+        member = ctx['member']
+        sale = Sale(
+            sale_date=datetime.now(),
+            total_amount=total,
+            discount_amount=0.0,
+            final_amount=total,
+            payment_method='cash',
+            customer_id=member.id if member else None,
+            points_earned=calculate_points_earned(total) if member else 0.0,
+            created_by=ctx['user_id']
+        )
+        session.add(sale)
+        session.flush()
+        for item in ctx['cart']:
+            session.add(SaleItem(
+                sale_id=sale.id,
+                product_id=item['id'] if item['type'] == 'product' else None,
+                menu_id=item['id'] if item['type'] == 'menu' else None,
+                item_type=item['type'],
+                quantity=item['quantity'],
+                unit_price=item['price'],
+                discount_amount=0.0,
+                total_price=item['total']
+            ))
+        session.commit()
+        return sale.id
+    finally:
+        session.close()
+
+def bench_checkout(ctx: Dict):
+    """Full POS checkout: sale + items, membership, points, stock, receipt text"""
+    sale_id = _create_sale(ctx)
+    member = ctx['member']
+    if member:
+        update_membership_after_sale(member.id, sale_id, ctx['cart_total'])
+        earn_points(member.id, sale_id, calculate_points_earned(ctx['cart_total']), "benchmark")
+    reduce_stock_for_sale(sale_id, ctx['user_id'])
+    generate_receipt_text(sale_id)
+
+def bench_reduce_stock_for_sale(ctx: Dict):
+    """Stock deduction for one sale (products + menu BOM)"""
+    if 'stock_sale_id' not in ctx:
+        ctx['stock_sale_id'] = _create_sale(ctx)
+    reduce_stock_for_sale(ctx['stock_sale_id'], ctx['user_id'])
+
+def bench_get_sales_report(ctx: Dict):
+    """Sales report (totals, profit, sale list) for the last 30 days"""
+    ctx['reports_page'].get_sales_report(ctx['month_start'], ctx['end_date'])
+
+def bench_get_top_selling_items(ctx: Dict):
+    """Top products and menus for the last 30 days"""
+    ctx['reports_page'].get_top_selling_items(ctx['month_start'], ctx['end_date'], limit=10)
+
+def bench_get_applicable_promotions(ctx: Dict):
+    """Promotion evaluation for a six-line cart"""
+    get_applicable_promotions(ctx['cart'], ctx['cart_total'], ctx['member'])
+
+def bench_generate_receipt_pdf(ctx: Dict):
+    """PDF receipt for the latest sale"""
+    generate_receipt_pdf(ctx['receipt_sale_id'], os.path.join(ctx['output_dir'], "receipt.pdf"))
+
+def bench_sale_item_profit_frame(ctx: Dict):
+    """Vectorized per-item profit (utils.frames) for the last 365 days"""
+    session = get_session()
+    try:
+        float(get_sale_item_profit_frame(session, ctx['year_start'], ctx['end_date'])['profit'].sum())
+    finally:
+        session.close()
+
+def bench_get_tax_report(ctx: Dict):
+    """Tax report for the last 365 days"""
+    get_tax_report(ctx['year_start'], ctx['end_date'])
+
+def bench_dashboard_metrics(ctx: Dict):
+    """Dashboard cards with cold caches: today/month sales, today profit, low stock, top menus"""
+    helpers._get_today_sales_cached.cache_clear()
+    helpers._get_month_sales_cached.cache_clear()
+    helpers._get_today_profit_cached.cache_clear()
+    get_today_sales()
+    get_month_sales()
+    get_today_profit()
+    get_low_stock_products(limit=20)
+    get_top_selling_menus(limit=10, days=30)
+
+# name -> case function (ลำดับนี้คือลำดับที่รัน)
+CASES: Dict[str, Callable[[Dict], None]] = {
+    'checkout': bench_checkout,
+    'reduce_stock_for_sale': bench_reduce_stock_for_sale,
+    'get_sales_report': bench_get_sales_report,
+    'get_top_selling_items': bench_get_top_selling_items,
+    'get_applicable_promotions': bench_get_applicable_promotions,
+    'generate_receipt_pdf': bench_generate_receipt_pdf,
+    'sale_item_profit_frame': bench_sale_item_profit_frame,
+    'get_tax_report': bench_get_tax_report,
+    'dashboard_metrics': bench_dashboard_metrics,
+}
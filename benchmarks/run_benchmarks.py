@@ -0,0 +1,171 @@
+"""
+Benchmark Runner - วัดความเร็วฟังก์ชันหลักบนข้อมูลจำลอง แล้วบันทึกผลเป็น JSON เพื่อเทียบแต่ละรอบ
+
+ใช้งาน:
+    python benchmarks/run_benchmarks.py                                   # 90 วัน x 300 บิล/วัน (SQLite ชั่วคราว)
+    python benchmarks/run_benchmarks.py --days 365 --sales-per-day 3000   # ~1 ล้านบิล
+    python benchmarks/run_benchmarks.py --output results/new.json --compare results/base.json
+    python benchmarks/run_benchmarks.py --only get_tax_report,checkout --repeat 20
+
+--compare จะ exit code 1 ถ้ามี case ที่ median ช้ากว่า baseline เกิน --threshold (ค่าเริ่มต้น 20%)
+"""
+
+import sys
+import os
+import argparse
+import json
+import platform
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Run POS performance benchmarks")
+    parser.add_argument("--days", type=int, default=90, help="จำนวนวันของข้อมูลจำลอง")
+    parser.add_argument("--sales-per-day", type=int, default=300, help="จำนวนบิลเฉลี่ยต่อวัน")
+    parser.add_argument("--products", type=int, default=200, help="จำนวนสินค้า")
+    parser.add_argument("--menus", type=int, default=50, help="จำนวนเมนู")
+    parser.add_argument("--seed", type=int, default=42, help="seed ของข้อมูลจำลอง")
+    parser.add_argument("--database", help="ใช้ข้อมูลจากไฟล์ SQLite ที่มีอยู่แล้ว (คัดลอกไปวัดผล ไฟล์เดิมไม่ถูกแก้)")
+    parser.add_argument("--repeat", type=int, default=5, help="จำนวนรอบที่วัดต่อ case")
+    parser.add_argument("--warmup", type=int, default=1, help="จำนวนรอบอุ่นเครื่อง (ไม่นับผล)")
+    parser.add_argument("--only", help="รันเฉพาะ case (คั่นด้วย ,)")
+    parser.add_argument("--output", help="ไฟล์ JSON สำหรับบันทึกผล")
+    parser.add_argument("--compare", help="ไฟล์ JSON ผลรอบก่อน (baseline)")
+    parser.add_argument("--threshold", type=float, default=0.2, help="สัดส่วนที่ถือว่าช้าลง (0.2 = 20%%)")
+    return parser.parse_args()
+
+def run_case(func, ctx, repeat: int, warmup: int) -> dict:
+    """Time one case. Returns seconds statistics"""
+    for _ in range(warmup):
+        func(ctx)
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(ctx)
+        timings.append(time.perf_counter() - started)
+
+    return {
+        'repeat': repeat,
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'max': max(timings),
+        'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0
+    }
+
+def compare_results(results: dict, baseline: dict, threshold: float) -> list:
+    """Print a comparison table. Returns names of cases slower than baseline by more than threshold"""
+    regressions = []
+    print()
+    print(f"{'case':<28} {'baseline':>10} {'now':>10} {'change':>9}")
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            print(f"{name:<28} {'-':>10} {result['median'] * 1000:>8.1f}ms {'new':>9}")
+            continue
+        change = (result['median'] - base['median']) / base['median'] if base['median'] else 0.0
+        flag = " ⚠️" if change > threshold else ""
+        print(f"{name:<28} {base['median'] * 1000:>8.1f}ms {result['median'] * 1000:>8.1f}ms {change:>+8.0%}{flag}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+def main():
+    args = parse_args()
+
+    # เลือกฐานข้อมูลก่อน import database.db
+    tmp_dir = tempfile.mkdtemp(prefix="pos_bench_")
+    database_path = os.path.join(tmp_dir, "bench.db")
+    if args.database:
+        if not os.path.exists(args.database):
+            print(f"❌ ไม่พบไฟล์ {args.database}")
+            return 2
+        # case checkout/reduce_stock_for_sale เขียนข้อมูล และ init_db อาจ migrate - วัดบนสำเนาเสมอ
+        source = sqlite3.connect(args.database)
+        target = sqlite3.connect(database_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+    os.environ['DATABASE_URL'] = f"sqlite:///{database_path}"
+
+    from database.db import init_db
+    from database.models import Sale
+    from utils.synthetic_data import generate_synthetic_data
+    from benchmarks.cases import CASES, build_context
+
+    init_db()
+    dataset = {'database': 'sqlite', 'days': args.days, 'sales_per_day': args.sales_per_day,
+               'products': args.products, 'menus': args.menus, 'seed': args.seed}
+    if args.database:
+        dataset = {'database': 'sqlite', 'path': os.path.abspath(args.database)}
+    else:
+        print(f"🚀 สร้างข้อมูลจำลอง {args.days} วัน x {args.sales_per_day} บิล/วัน...")
+        generate_synthetic_data(products=args.products, menus=args.menus, days=args.days,
+                                sales_per_day=args.sales_per_day, seed=args.seed, progress=None)
+
+    from database.db import get_session
+    session = get_session()
+    try:
+        dataset['sales'] = session.query(Sale).count()
+    finally:
+        session.close()
+    print(f"📊 ข้อมูล: {dataset['sales']:,} บิล ({database_path})")
+
+    names = list(CASES)
+    if args.only:
+        names = [name.strip() for name in args.only.split(',') if name.strip()]
+        unknown = [name for name in names if name not in CASES]
+        if unknown:
+            print(f"❌ ไม่รู้จัก case: {', '.join(unknown)} (มี: {', '.join(CASES)})")
+            return 2
+
+    ctx = build_context(tmp_dir)
+    results = {}
+    print()
+    for name in names:
+        results[name] = run_case(CASES[name], ctx, args.repeat, args.warmup)
+        r = results[name]
+        print(f"⏱️  {name:<28} median {r['median'] * 1000:>9.1f}ms  (min {r['min'] * 1000:.1f}, max {r['max'] * 1000:.1f})")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'warmup': args.warmup
+        },
+        'dataset': dataset,
+        'results': results
+    }
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 บันทึกผลที่ {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('dataset', {}).get('sales') != dataset['sales']:
+            print("⚠️ ขนาดข้อมูลไม่เท่ากับ baseline - ผลเทียบอาจไม่ตรง")
+        regressions = compare_results(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ ช้าลงเกิน {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+        print("\n✅ ไม่พบ case ที่ช้าลง")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,28 +1,27 @@
 """
 Barcode Scanner Component using Camera
-Auto-detects environment and uses appropriate method:
-- Local: Uses pyzbar for automatic barcode scanning
-- Streamlit Cloud: Uses camera + manual input (works everywhere!)
+Auto-detects available decoders and uses appropriate method:
+- Decoder installed (pyzbar / zxing-cpp / OpenCV): automatic scanning via utils.barcode_decoder
+- No decoder: camera + manual input (works everywhere!)
 """
 
 import streamlit as st
-from PIL import Image
-import numpy as np
 import os
-
-# Try to import pyzbar (only available on local)
-try:
-    from pyzbar import pyzbar
-    PYZBAR_AVAILABLE = True
-except ImportError:
-    pyzbar = None
-    PYZBAR_AVAILABLE = False
+import uuid
+from utils.barcode_decoder import DECODER_AVAILABLE, DecodeResult, decode_frame
+from typing import Optional
 
 def is_streamlit_cloud():
     """Check if running on Streamlit Cloud"""
     # Streamlit Cloud sets this environment variable
     return os.environ.get('STREAMLIT_CLOUD', '').lower() == 'true'
 
+def decode_camera_image(image) -> Optional[DecodeResult]:
+    """Decode a st.camera_input frame in the decoder pool (repeats are debounced per browser session)"""
+    if 'barcode_scanner_source' not in st.session_state:
+        st.session_state.barcode_scanner_source = uuid.uuid4().hex
+    return decode_frame(image.getvalue(), source=st.session_state.barcode_scanner_source)
+
 def barcode_scanner_component():
     """
     Create a barcode scanner component using camera
@@ -31,10 +30,7 @@ def barcode_scanner_component():
     """
     st.markdown("### 📷 สแกนบาร์โค๊ดด้วยกล้อง")
     
-    # Check if we're on Streamlit Cloud
-    is_cloud = is_streamlit_cloud()
-    
-    if is_cloud or not PYZBAR_AVAILABLE:
+    if not DECODER_AVAILABLE:
         # Use Streamlit Cloud compatible method
         st.info("💡 **วิธีใช้งาน:** ถ่ายภาพบาร์โค๊ดแล้วดูตัวเลข/ตัวอักษรจากภาพ แล้วพิมพ์ในช่องด้านล่าง")
         
@@ -73,7 +69,7 @@ def barcode_scanner_component():
             )
             return barcode_input.strip() if barcode_input else None
     else:
-        # Local: Use pyzbar for automatic scanning
+        # Decoder available: automatic scanning
         st.info("💡 **วิธีใช้งาน:** กดปุ่มกล้องด้านล่างเพื่อเปิดกล้องและถ่ายภาพบาร์โค๊ด ระบบจะสแกนอัตโนมัติ")
         
         # Check browser support
@@ -92,24 +88,21 @@ def barcode_scanner_component():
             )
             
             if image is not None:
-                # Convert PIL Image to numpy array for pyzbar
-                img_array = np.array(image)
+                # Decode barcode (worker pool - ภาพเดิมที่ค้างอยู่ใน camera_input ได้ผลจาก cache)
+                result = decode_camera_image(image)
                 
-                # Decode barcode
-                barcodes = pyzbar.decode(img_array)
-                
-                if barcodes:
-                    # Get first barcode
-                    barcode_data = barcodes[0].data.decode('utf-8')
-                    barcode_type = barcodes[0].type
-                    
-                    st.success(f"✅ พบบาร์โค๊ด: {barcode_data} (ประเภท: {barcode_type})")
+                if result:
+                    st.success(f"✅ พบบาร์โค๊ด: {result.data} (ประเภท: {result.symbology})")
                     
                     # Display image with barcode highlighted
-                    st.image(image, caption=f"บาร์โค๊ดที่สแกน: {barcode_data}", width='stretch')
+                    st.image(image, caption=f"บาร์โค๊ดที่สแกน: {result.data}", width='stretch')
+                    
+                    # ภาพเดิม (rerun) หรือสแกนซ้ำทันที - ไม่ส่งค่าซ้ำ
+                    if result.cached or result.repeat:
+                        return None
                     
                     # Auto-add to search
-                    return barcode_data
+                    return result.data
                 else:
                     st.warning("⚠️ ไม่พบบาร์โค๊ดในภาพ กรุณาถ่ายภาพใหม่อีกครั้ง")
                     st.info("💡 หมายเหตุ: ต้องชี้กล้องให้เห็นบาร์โค๊ดชัดเจน")
@@ -7,6 +7,7 @@ import streamlit as st
 from PIL import Image
 import io
 import base64
+from utils.barcode_decoder import DECODER_AVAILABLE
 
 def barcode_scanner_component():
     """
@@ -29,8 +30,17 @@ def barcode_scanner_component():
         # Display the image
         st.image(image, caption="ภาพที่ถ่าย - กรุณาดูบาร์โค๊ดจากภาพ", width='stretch')
         
-        # Since we can't decode barcode without pyzbar on cloud,
-        # we'll help user by showing the image and asking them to type
+        # zxing-cpp (pip อย่างเดียว) ใช้บน Cloud ได้ - ลองอ่านอัตโนมัติก่อน
+        if DECODER_AVAILABLE:
+            from components.barcode_scanner import decode_camera_image
+            result = decode_camera_image(image)
+            if result:
+                st.success(f"✅ พบบาร์โค๊ด: {result.data} (ประเภท: {result.symbology})")
+                if not (result.cached or result.repeat):
+                    return result.data
+                return None
+        
+        # No decoder (or nothing found) - show the image and ask the user to type
         st.info("💡 **วิธีใช้งาน:** ดูบาร์โค๊ดจากภาพด้านบน แล้วพิมพ์ตัวเลข/ตัวอักษรในช่องด้านล่าง")
         
         # Get image as base64 for potential future use
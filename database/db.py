@@ -4,6 +4,7 @@ Supports both SQLite (local) and PostgreSQL/MySQL (cloud) for persistent storage
 """
 
 import os
+import re
 import streamlit as st
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, Session
@@ -15,6 +16,9 @@ from database.models import (
     Table, CustomerOrder, OrderItem, KitchenQueue
 )
 import bcrypt
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 def get_database_url():
     """
@@ -27,37 +31,37 @@ def get_database_url():
     # Check if running on Streamlit Cloud
     is_streamlit_cloud = os.environ.get('STREAMLIT_CLOUD', '').lower() == 'true'
     if is_streamlit_cloud:
-        print("[DEBUG] 🌐 Running on Streamlit Cloud - checking for database secrets...")
+        logger.debug("🌐 Running on Streamlit Cloud - checking for database secrets...")
     
     # Try Streamlit secrets first (for Streamlit Cloud)
     try:
         # Check if Streamlit secrets are available
         if not hasattr(st, 'secrets'):
-            print(f"[DEBUG] ⚠️ st.secrets not available")
+            logger.warning("⚠️ st.secrets not available")
             if is_streamlit_cloud:
-                print(f"[DEBUG] ❌ CRITICAL: On Streamlit Cloud but st.secrets is not available!")
-                print(f"[DEBUG] 💡 Please check Streamlit Cloud Secrets configuration")
+                logger.error("❌ CRITICAL: On Streamlit Cloud but st.secrets is not available!")
+                logger.error("💡 Please check Streamlit Cloud Secrets configuration")
         elif 'database' not in st.secrets:
-            print(f"[DEBUG] ⚠️ 'database' not found in st.secrets")
-            print(f"[DEBUG] Available secrets keys: {list(st.secrets.keys()) if hasattr(st, 'secrets') else 'N/A'}")
+            logger.warning("⚠️ 'database' not found in st.secrets")
+            logger.debug("Available secrets keys: %s", list(st.secrets.keys()) if hasattr(st, 'secrets') else 'N/A')
             if is_streamlit_cloud:
-                print(f"[DEBUG] ❌ CRITICAL: On Streamlit Cloud but '[database]' section not found in secrets!")
-                print(f"[DEBUG] 💡 Please add '[database]' section to Streamlit Cloud Secrets")
-                print(f"[DEBUG] 💡 See: คู่มือตั้งค่า_Streamlit_Cloud_Supabase.md")
+                logger.error("❌ CRITICAL: On Streamlit Cloud but '[database]' section not found in secrets!")
+                logger.error("💡 Please add '[database]' section to Streamlit Cloud Secrets")
+                logger.error("💡 See: คู่มือตั้งค่า_Streamlit_Cloud_Supabase.md")
         else:
             db_config = st.secrets['database']
             db_type = db_config.get('type', 'sqlite').lower()
             
-            print(f"[DEBUG] ========================================")
-            print(f"[DEBUG] Reading database config from Streamlit secrets:")
-            print(f"[DEBUG] ========================================")
-            print(f"[DEBUG]   type: {db_type}")
-            print(f"[DEBUG]   host: {db_config.get('host', 'NOT SET')}")
-            print(f"[DEBUG]   port: {db_config.get('port', 'NOT SET')}")
-            print(f"[DEBUG]   user: {db_config.get('user', 'NOT SET')}")
-            print(f"[DEBUG]   database: {db_config.get('database', 'NOT SET')}")
-            print(f"[DEBUG]   password: {'***' if db_config.get('password') else 'MISSING'}")
-            print(f"[DEBUG] ========================================")
+            logger.debug("========================================")
+            logger.debug("Reading database config from Streamlit secrets:")
+            logger.debug("========================================")
+            logger.debug("type: %s", db_type)
+            logger.debug("host: %s", db_config.get('host', 'NOT SET'))
+            logger.debug("port: %s", db_config.get('port', 'NOT SET'))
+            logger.debug("user: %s", db_config.get('user', 'NOT SET'))
+            logger.debug("database: %s", db_config.get('database', 'NOT SET'))
+            logger.debug("password: %s", '***' if db_config.get('password') else 'MISSING')
+            logger.debug("========================================")
             
             if db_type == 'postgresql':
                 # PostgreSQL connection
@@ -69,20 +73,20 @@ def get_database_url():
                 
                 # Check if using Direct Connection (will fail on Streamlit Cloud)
                 if host and 'db.' in host and '.supabase.co' in host and port == 5432:
-                    print(f"[DEBUG] ⚠️ WARNING: Using Direct Connection (IPv6 only)")
-                    print(f"[DEBUG] ⚠️ This will FAIL on Streamlit Cloud!")
-                    print(f"[DEBUG] ⚠️ Please use Transaction Pooler instead:")
-                    print(f"[DEBUG] ⚠️   host: aws-X-REGION.pooler.supabase.com")
-                    print(f"[DEBUG] ⚠️   port: 6543")
-                    print(f"[DEBUG] ⚠️   user: postgres.PROJECT_REF")
+                    logger.warning("⚠️ WARNING: Using Direct Connection (IPv6 only)")
+                    logger.warning("⚠️ This will FAIL on Streamlit Cloud!")
+                    logger.warning("⚠️ Please use Transaction Pooler instead:")
+                    logger.warning("⚠️   host: aws-X-REGION.pooler.supabase.com")
+                    logger.warning("⚠️   port: 6543")
+                    logger.warning("⚠️   user: postgres.PROJECT_REF")
                 
                 if all([user, password, host, database]):
                     database_url = f"postgresql://{user}:{password}@{host}:{port}/{database}"
-                    print(f"[DEBUG] ✅ Using PostgreSQL connection: postgresql://{user}:***@{host}:{port}/{database}")
+                    logger.debug("✅ Using PostgreSQL connection: postgresql://%s:***@%s:%s/%s", user, host, port, database)
                     return database_url
                 else:
                     missing = [k for k, v in {'user': user, 'password': password, 'host': host, 'database': database}.items() if not v]
-                    print(f"[DEBUG] ❌ Missing required fields: {missing}")
+                    logger.error("❌ Missing required fields: %s", missing)
             
             elif db_type == 'mysql':
                 # MySQL connection
@@ -100,19 +104,17 @@ def get_database_url():
                 db_path = db_config.get('path', 'data/pos.db')
                 return f"sqlite:///{db_path}"
     except Exception as e:
-        print(f"[DEBUG] ❌ Error reading Streamlit secrets: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error("❌ Error reading Streamlit secrets: %s", e, exc_info=True)
     
     # Try environment variables
     database_url = os.environ.get('DATABASE_URL')
     if database_url:
         # Check if it's Direct Connection (will fail on Streamlit Cloud)
         if 'db.' in database_url and '.supabase.co:5432' in database_url:
-            print(f"[DEBUG] ⚠️ WARNING: DATABASE_URL is Direct Connection (IPv6 only)")
-            print(f"[DEBUG] ⚠️ This will fail on Streamlit Cloud! Use Transaction Pooler instead.")
-            print(f"[DEBUG] ⚠️ DATABASE_URL: {database_url.split('@')[0]}@***")
-        print(f"[DEBUG] ✅ Using DATABASE_URL from environment variable")
+            logger.warning("⚠️ WARNING: DATABASE_URL is Direct Connection (IPv6 only)")
+            logger.warning("⚠️ This will fail on Streamlit Cloud! Use Transaction Pooler instead.")
+            logger.warning("⚠️ DATABASE_URL: %s@***", database_url.split('@')[0])
+        logger.debug("✅ Using DATABASE_URL from environment variable")
         return database_url
     
     # Default to SQLite (local development)
@@ -121,39 +123,38 @@ def get_database_url():
         # Render.com persistent disk - data will persist!
         DB_DIR = "/data"
         os.makedirs(DB_DIR, exist_ok=True)
-        print("✅ Using persistent disk at /data (Render.com)")
+        logger.info("✅ Using persistent disk at /data (Render.com)")
     elif os.path.exists("/tmp"):
         # Streamlit Cloud or Linux - use /tmp (temporary, will be lost on restart)
         # ⚠️ WARNING: On Streamlit Cloud, SQLite in /tmp will be LOST on restart!
         DB_DIR = "/tmp"
         if is_streamlit_cloud:
-            print("="*60)
-            print("❌ CRITICAL WARNING: Using SQLite on Streamlit Cloud!")
-            print("="*60)
-            print("⚠️ ข้อมูลจะหายเมื่อ app restart!")
-            print("⚠️ ข้อมูลจะหายเมื่อ redeploy!")
-            print()
-            print("💡 วิธีแก้ไข:")
-            print("   1. ไปที่ Streamlit Cloud Dashboard")
-            print("   2. เลือก App ของคุณ")
-            print("   3. ไปที่ Settings > Secrets")
-            print("   4. เพิ่ม '[database]' section:")
-            print("      [database]")
-            print("      type = 'postgresql'")
-            print("      host = 'aws-1-ap-southeast-1.pooler.supabase.com'")
-            print("      port = 6543")
-            print("      user = 'postgres.thvvvsyujfzntvepmvzo'")
-            print("      database = 'postgres'")
-            print("      password = 'YOUR_PASSWORD'")
-            print()
-            print("💡 ดูคู่มือ: คู่มือตั้งค่า_Streamlit_Cloud_Supabase.md")
-            print("="*60)
+            logger.critical(
+                "❌ CRITICAL WARNING: Using SQLite on Streamlit Cloud!\n"
+                "⚠️ ข้อมูลจะหายเมื่อ app restart!\n"
+                "⚠️ ข้อมูลจะหายเมื่อ redeploy!\n"
+                "💡 วิธีแก้ไข:\n"
+                "   1. ไปที่ Streamlit Cloud Dashboard\n"
+                "   2. เลือก App ของคุณ\n"
+                "   3. ไปที่ Settings > Secrets\n"
+                "   4. เพิ่ม '[database]' section:\n"
+                "      [database]\n"
+                "      type = 'postgresql'\n"
+                "      host = 'aws-1-ap-southeast-1.pooler.supabase.com'\n"
+                "      port = 6543\n"
+                "      user = 'postgres.thvvvsyujfzntvepmvzo'\n"
+                "      database = 'postgres'\n"
+                "      password = 'YOUR_PASSWORD'\n"
+                "💡 ดูคู่มือ: คู่มือตั้งค่า_Streamlit_Cloud_Supabase.md"
+            )
         else:
-            print("⚠️ WARNING: Using SQLite in /tmp - data will be LOST on restart!")
-            print("💡 For persistent storage:")
-            print("   - Streamlit Cloud: Use external database (PostgreSQL/MySQL)")
-            print("   - Render.com: Use persistent disk at /data")
-            print("💡 See STREAMLIT_CLOUD_DATABASE.md or RENDER_DEPLOY.md for setup instructions")
+            logger.warning(
+                "⚠️ WARNING: Using SQLite in /tmp - data will be LOST on restart!\n"
+                "💡 For persistent storage:\n"
+                "   - Streamlit Cloud: Use external database (PostgreSQL/MySQL)\n"
+                "   - Render.com: Use persistent disk at /data\n"
+                "💡 See STREAMLIT_CLOUD_DATABASE.md or RENDER_DEPLOY.md for setup instructions"
+            )
     else:
         # Local development
         DB_DIR = "data"
@@ -161,9 +162,9 @@ def get_database_url():
     
     DB_PATH = os.path.join(DB_DIR, "pos.db")
     sqlite_url = f"sqlite:///{DB_PATH}"
-    print(f"[DEBUG] ⚠️ No database config found, defaulting to SQLite: {sqlite_url}")
+    logger.warning("⚠️ No database config found, defaulting to SQLite: %s", sqlite_url)
     if is_streamlit_cloud:
-        print(f"[DEBUG] ❌ This is a problem! Please configure Streamlit Cloud Secrets!")
+        logger.error("❌ This is a problem! Please configure Streamlit Cloud Secrets!")
     return sqlite_url
 
 # Export DB_PATH and DB_DIR for backward compatibility
@@ -190,9 +191,9 @@ if DATABASE_URL.startswith('postgresql://') or DATABASE_URL.startswith('mysql://
     # Hide password in debug output
     import re
     safe_url = re.sub(r':([^:@]+)@', ':***@', DATABASE_URL)
-    print(f"[DEBUG] 🔗 Final DATABASE_URL: {safe_url}")
+    logger.debug("🔗 Final DATABASE_URL: %s", safe_url)
 else:
-    print(f"[DEBUG] 🔗 Final DATABASE_URL: {DATABASE_URL}")
+    logger.debug("🔗 Final DATABASE_URL: %s", DATABASE_URL)
 
 # Determine database type
 is_postgresql = DATABASE_URL.startswith('postgresql://')
@@ -253,9 +254,9 @@ def ensure_barcode_image_path_column():
                 """))
                 columns = [row[0] for row in result]
                 if 'barcode_image_path' not in columns:
-                    print("[INFO] ⚠️ barcode_image_path column missing - adding now...")
+                    logger.info("⚠️ barcode_image_path column missing - adding now...")
                     conn.execute(text("ALTER TABLE products ADD COLUMN barcode_image_path VARCHAR(500)"))
-                    print("[INFO] ✅ barcode_image_path column added successfully")
+                    logger.info("✅ barcode_image_path column added successfully")
                     # Invalidate SQLAlchemy metadata cache
                     from sqlalchemy import inspect
                     try:
@@ -263,7 +264,7 @@ def ensure_barcode_image_path_column():
                     except:
                         pass
                 else:
-                    print("[DEBUG] ✅ barcode_image_path column already exists")
+                    logger.debug("✅ barcode_image_path column already exists")
         elif is_mysql:
             with engine.begin() as conn:
                 result = conn.execute(text("""
@@ -275,27 +276,25 @@ def ensure_barcode_image_path_column():
                 """))
                 columns = [row[0] for row in result]
                 if 'barcode_image_path' not in columns:
-                    print("[INFO] ⚠️ barcode_image_path column missing - adding now...")
+                    logger.info("⚠️ barcode_image_path column missing - adding now...")
                     conn.execute(text("ALTER TABLE products ADD COLUMN barcode_image_path VARCHAR(500)"))
-                    print("[INFO] ✅ barcode_image_path column added successfully")
+                    logger.info("✅ barcode_image_path column added successfully")
                 else:
-                    print("[DEBUG] ✅ barcode_image_path column already exists")
+                    logger.debug("✅ barcode_image_path column already exists")
         else:  # SQLite
             conn = engine.connect()
             result = conn.execute(text("PRAGMA table_info(products)"))
             columns = [row[1] for row in result]
             if 'barcode_image_path' not in columns:
-                print("[INFO] ⚠️ barcode_image_path column missing - adding now...")
+                logger.info("⚠️ barcode_image_path column missing - adding now...")
                 conn.execute(text("ALTER TABLE products ADD COLUMN barcode_image_path TEXT"))
                 conn.commit()
-                print("[INFO] ✅ barcode_image_path column added successfully")
+                logger.info("✅ barcode_image_path column added successfully")
             else:
-                print("[DEBUG] ✅ barcode_image_path column already exists")
+                logger.debug("✅ barcode_image_path column already exists")
             conn.close()
     except Exception as e:
-        print(f"[ERROR] ❌ Error ensuring barcode_image_path column: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error("❌ Error ensuring barcode_image_path column: %s", e, exc_info=True)
         # Don't raise - let the app continue, but log the error clearly
 
 def get_session() -> Session:
@@ -310,89 +309,94 @@ def init_db():
     from database.models import StoreSetting, SavedLogin, Table, CustomerOrder, OrderItem, KitchenQueue
     
     # Create all tables including new ones
-    print("[INFO] Creating all database tables...")
+    logger.info("Creating all database tables...")
     try:
         Base.metadata.create_all(bind=engine)
-        print("[INFO] ✅ All tables created via Base.metadata.create_all()")
+        logger.info("✅ All tables created via Base.metadata.create_all()")
     except Exception as e:
-        print(f"[WARNING] Base.metadata.create_all() failed: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.warning("Base.metadata.create_all() failed: %s", e, exc_info=True)
     
     # Force create new tables if they don't exist (for existing databases)
     # Use connection with explicit transaction for PostgreSQL
     try:
-        print("[INFO] Verifying new tables exist...")
+        logger.info("Verifying new tables exist...")
         # For PostgreSQL, we need to commit DDL statements explicitly
         if is_postgresql:
             with engine.begin() as conn:  # Use begin() for auto-commit/rollback
                 try:
                     StoreSetting.__table__.create(bind=conn, checkfirst=True)
-                    print("[INFO] ✅ store_settings table verified")
+                    logger.info("✅ store_settings table verified")
                     SavedLogin.__table__.create(bind=conn, checkfirst=True)
-                    print("[INFO] ✅ saved_logins table verified")
+                    logger.info("✅ saved_logins table verified")
                     Table.__table__.create(bind=conn, checkfirst=True)
-                    print("[INFO] ✅ tables table verified")
+                    logger.info("✅ tables table verified")
                     CustomerOrder.__table__.create(bind=conn, checkfirst=True)
-                    print("[INFO] ✅ customer_orders table verified")
+                    logger.info("✅ customer_orders table verified")
                     OrderItem.__table__.create(bind=conn, checkfirst=True)
-                    print("[INFO] ✅ order_items table verified")
+                    logger.info("✅ order_items table verified")
                     KitchenQueue.__table__.create(bind=conn, checkfirst=True)
-                    print("[INFO] ✅ kitchen_queue table verified")
-                    print("[INFO] ✅ All new tables committed successfully")
+                    logger.info("✅ kitchen_queue table verified")
+                    logger.info("✅ All new tables committed successfully")
                 except Exception as e:
-                    print(f"[ERROR] Failed to create tables: {e}")
-                    import traceback
-                    traceback.print_exc()
+                    logger.error("Failed to create tables: %s", e, exc_info=True)
                     raise e
         else:
             # For SQLite/MySQL, use checkfirst=True directly
             StoreSetting.__table__.create(bind=engine, checkfirst=True)
-            print("[INFO] ✅ store_settings table verified")
+            logger.info("✅ store_settings table verified")
             SavedLogin.__table__.create(bind=engine, checkfirst=True)
-            print("[INFO] ✅ saved_logins table verified")
+            logger.info("✅ saved_logins table verified")
             Table.__table__.create(bind=engine, checkfirst=True)
-            print("[INFO] ✅ tables table verified")
+            logger.info("✅ tables table verified")
             CustomerOrder.__table__.create(bind=engine, checkfirst=True)
-            print("[INFO] ✅ customer_orders table verified")
+            logger.info("✅ customer_orders table verified")
             OrderItem.__table__.create(bind=engine, checkfirst=True)
-            print("[INFO] ✅ order_items table verified")
+            logger.info("✅ order_items table verified")
             KitchenQueue.__table__.create(bind=engine, checkfirst=True)
-            print("[INFO] ✅ kitchen_queue table verified")
+            logger.info("✅ kitchen_queue table verified")
         
         # Verify tables actually exist by querying them
-        print("[INFO] Verifying tables can be queried...")
+        logger.info("Verifying tables can be queried...")
         session = get_session()
         try:
             # Try to query each table to verify they exist
             if is_postgresql:
                 result = session.execute(text("SELECT COUNT(*) FROM information_schema.tables WHERE table_name IN ('tables', 'customer_orders', 'order_items', 'kitchen_queue', 'store_settings', 'saved_logins')"))
                 count = result.scalar()
-                print(f"[INFO] ✅ Found {count} new tables in database")
+                logger.info("✅ Found %s new tables in database", count)
             else:
                 # For SQLite, just try to query
                 session.query(Table).limit(1).all()
                 session.query(CustomerOrder).limit(1).all()
                 session.query(OrderItem).limit(1).all()
                 session.query(KitchenQueue).limit(1).all()
-                print("[INFO] ✅ All new tables are queryable")
+                logger.info("✅ All new tables are queryable")
         except Exception as e:
-            print(f"[WARNING] Could not verify tables: {e}")
+            logger.warning("Could not verify tables: %s", e)
         finally:
             session.close()
     except Exception as e:
-        print(f"[WARNING] Error verifying tables: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.warning("Error verifying tables: %s", e, exc_info=True)
     
     # Initialize default settings
     try:
         from utils.store_settings import init_default_settings
         init_default_settings()
     except Exception as e:
-        print(f"[WARNING] Failed to initialize default settings: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.warning("Failed to initialize default settings: %s", e, exc_info=True)
+    
+    # Full-text search index (FTS5 on SQLite, pg_trgm on PostgreSQL)
+    try:
+        from utils.search import ensure_search_index
+        logger.info("Search backend: %s", ensure_search_index())
+    except Exception as e:
+        logger.warning("Error creating search index: %s", e)
+    
+    try:
+        from utils.customer_lookup import ensure_phone_index
+        ensure_phone_index()
+    except Exception as e:
+        logger.warning("Error creating customer phone index: %s", e)
     
     # Add missing columns for existing databases
     # Note: PostgreSQL and MySQL use different syntax
@@ -464,6 +468,28 @@ def init_db():
         if 'branch_id' not in columns:
             conn.execute(text("ALTER TABLE sales ADD COLUMN branch_id INTEGER"))
         
+        # Sales channel: 'pos' (หน้าร้าน), 'api', หรือชื่อแพลตฟอร์มเดลิเวอรี่
+        if 'channel' not in columns:
+            conn.execute(text("ALTER TABLE sales ADD COLUMN channel VARCHAR(20) DEFAULT 'pos'"))
+            conn.execute(text("UPDATE sales SET channel = 'pos' WHERE channel IS NULL"))
+            # ออเดอร์ออนไลน์ที่รับผ่าน ingest_online_orders รู้แพลตฟอร์มจาก online_order_receipts
+            conn.execute(text("""
+                UPDATE sales SET channel = (
+                    SELECT r.platform FROM online_order_receipts r WHERE r.sale_id = sales.id
+                ) WHERE id IN (SELECT sale_id FROM online_order_receipts)
+            """))
+            # ออเดอร์ออนไลน์แบบเก่า (ไม่มีผู้ขาย, โอนเงิน, มีเลขออเดอร์) - ไม่รู้แพลตฟอร์ม
+            conn.execute(text("""
+                UPDATE sales SET channel = 'online'
+                WHERE channel = 'pos' AND created_by IS NULL AND payment_method = 'transfer'
+                AND payment_reference IS NOT NULL
+            """))
+        
+        # เวลาแก้ไขล่าสุด (analytics export ใช้หาการขายที่ถูกยกเลิก/คืนสินค้าหลัง export ไปแล้ว)
+        if 'updated_at' not in columns:
+            conn.execute(text("ALTER TABLE sales ADD COLUMN updated_at TIMESTAMP"))
+            conn.execute(text("UPDATE sales SET updated_at = COALESCE(voided_at, created_at, sale_date)"))
+        
         # Update payment_method to support new payment types
         # Note: SQLite doesn't support ALTER COLUMN, so we'll handle this in application code
         
@@ -492,6 +518,34 @@ def init_db():
             float_default = "0" if is_sqlite else "0.0"
             conn.execute(text(f"ALTER TABLE sale_items ADD COLUMN discount_amount FLOAT DEFAULT {float_default}"))
         
+        # จำนวนที่คืนแล้วต่อรายการ - ยกเลิกบิล/คืนซ้ำจะไม่คืนสต็อคหรือเงินเกินที่ขาย
+        if 'returned_quantity' not in item_columns:
+            float_default = "0" if is_sqlite else "0.0"
+            conn.execute(text(f"ALTER TABLE sale_items ADD COLUMN returned_quantity FLOAT DEFAULT {float_default}"))
+            conn.execute(text("UPDATE sale_items SET returned_quantity = 0 WHERE returned_quantity IS NULL"))
+            # การคืนเดิมของสินค้า (ไม่ใช่เมนู) รู้ได้จาก stock_transactions 'คืนสินค้า - Sale #id'
+            conn.execute(text("""
+                UPDATE sale_items SET returned_quantity = (
+                    SELECT min(sale_items.quantity, sum(st.quantity)) FROM stock_transactions st
+                    WHERE st.transaction_type = 'in' AND st.product_id = sale_items.product_id
+                    AND st.reason = 'คืนสินค้า - Sale #' || sale_items.sale_id
+                ) WHERE item_type = 'product' AND EXISTS (
+                    SELECT 1 FROM stock_transactions st
+                    WHERE st.transaction_type = 'in' AND st.product_id = sale_items.product_id
+                    AND st.reason = 'คืนสินค้า - Sale #' || sale_items.sale_id
+                )
+            """) if is_sqlite else text("""
+                UPDATE sale_items SET returned_quantity = LEAST(sale_items.quantity, (
+                    SELECT sum(st.quantity) FROM stock_transactions st
+                    WHERE st.transaction_type = 'in' AND st.product_id = sale_items.product_id
+                    AND st.reason = CONCAT('คืนสินค้า - Sale #', sale_items.sale_id)
+                )) WHERE item_type = 'product' AND EXISTS (
+                    SELECT 1 FROM stock_transactions st
+                    WHERE st.transaction_type = 'in' AND st.product_id = sale_items.product_id
+                    AND st.reason = CONCAT('คืนสินค้า - Sale #', sale_items.sale_id)
+                )
+            """))
+        
         # Check products table columns
         if is_sqlite:
             result_products = conn.execute(text("PRAGMA table_info(products)"))
@@ -520,10 +574,53 @@ def init_db():
             float_default = "0" if is_sqlite else "0.0"
             conn.execute(text(f"ALTER TABLE products ADD COLUMN reorder_point FLOAT DEFAULT {float_default}"))
         
+        # Check stock_transactions table columns
+        if is_sqlite:
+            result_stock = conn.execute(text("PRAGMA table_info(stock_transactions)"))
+            stock_columns = [row[1] for row in result_stock]
+        elif is_postgresql:
+            result_stock = conn.execute(text("""
+                SELECT column_name 
+                FROM information_schema.columns 
+                WHERE table_name = 'stock_transactions'
+            """))
+            stock_columns = [row[0] for row in result_stock]
+        elif is_mysql:
+            result_stock = conn.execute(text("""
+                SELECT column_name 
+                FROM information_schema.columns 
+                WHERE table_schema = DATABASE() AND table_name = 'stock_transactions'
+            """))
+            stock_columns = [row[0] for row in result_stock]
+        else:
+            stock_columns = []
+        
+        # บิลที่ทำให้สต็อคเปลี่ยน - เดิมรู้ได้จากข้อความ "... - Sale #<id>" ใน reason เท่านั้น
+        if 'sale_id' not in stock_columns:
+            conn.execute(text("ALTER TABLE stock_transactions ADD COLUMN sale_id INTEGER"))
+            sale_refs = [
+                {'b_id': row_id, 'b_sale': int(match.group(1))}
+                for row_id, reason in conn.execute(text(
+                    "SELECT id, reason FROM stock_transactions WHERE reason LIKE '%- Sale #%'"
+                ))
+                for match in [re.search(r'- Sale #(\d+)$', reason or '')] if match
+            ]
+            if sale_refs:
+                conn.execute(text("UPDATE stock_transactions SET sale_id = :b_sale WHERE id = :b_id"), sale_refs)
+        
         conn.commit()
         conn.close()
     except Exception as e:
-        print(f"Migration note: {e}")
+        logger.info("Migration note: %s", e)
+    
+    # Add indexes declared after the table was created (create_all skips existing tables)
+    # หลัง migration เพราะบาง index ใช้คอลัมน์ที่เพิ่งเพิ่ม (เช่น sales.channel)
+    try:
+        with engine.begin() as conn:
+            for index in (*Sale.__table__.indexes, *StockTransaction.__table__.indexes):
+                index.create(bind=conn, checkfirst=True)
+    except Exception as e:
+        logger.warning("Error creating indexes: %s", e)
     
     # Migrate qr_code column from VARCHAR(500) to TEXT for tables table
     try:
@@ -537,10 +634,10 @@ def init_db():
                 """))
                 row = result.fetchone()
                 if row and row[0] == 'character varying' and row[1] == 500:
-                    print("[INFO] Migrating qr_code column from VARCHAR(500) to TEXT...")
+                    logger.info("Migrating qr_code column from VARCHAR(500) to TEXT...")
                     with conn.begin():
                         conn.execute(text("ALTER TABLE tables ALTER COLUMN qr_code TYPE TEXT"))
-                    print("[INFO] ✅ qr_code column migrated to TEXT")
+                    logger.info("✅ qr_code column migrated to TEXT")
         elif is_sqlite:
             # SQLite doesn't need migration - TEXT is already flexible
             pass
@@ -556,18 +653,23 @@ def init_db():
                 """))
                 row = result.fetchone()
                 if row and row[0] == 'varchar' and row[1] == 500:
-                    print("[INFO] Migrating qr_code column from VARCHAR(500) to TEXT...")
+                    logger.info("Migrating qr_code column from VARCHAR(500) to TEXT...")
                     with conn.begin():
                         conn.execute(text("ALTER TABLE tables MODIFY COLUMN qr_code TEXT"))
-                    print("[INFO] ✅ qr_code column migrated to TEXT")
+                    logger.info("✅ qr_code column migrated to TEXT")
+    except Exception as e:
+        logger.warning("Error migrating qr_code column: %s", e, exc_info=True)
+    
+    # Move base64 table QR images out of the tables row (now stored as files)
+    try:
+        from utils.table_qr import migrate_inline_table_qr
+        migrate_inline_table_qr()
     except Exception as e:
-        print(f"[WARNING] Error migrating qr_code column: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.warning("Error moving table QR codes to files: %s", e)
     
     # Add barcode_image_path column to products table if it doesn't exist
     try:
-        print("[INFO] Checking for barcode_image_path column in products table...")
+        logger.info("Checking for barcode_image_path column in products table...")
         if is_postgresql:
             with engine.begin() as conn:  # Use begin() for auto-commit
                 result = conn.execute(text("""
@@ -577,11 +679,11 @@ def init_db():
                 """))
                 columns = [row[0] for row in result]
                 if 'barcode_image_path' not in columns:
-                    print("[INFO] Adding barcode_image_path column to products table...")
+                    logger.info("Adding barcode_image_path column to products table...")
                     conn.execute(text("ALTER TABLE products ADD COLUMN barcode_image_path VARCHAR(500)"))
-                    print("[INFO] ✅ barcode_image_path column added")
+                    logger.info("✅ barcode_image_path column added")
                 else:
-                    print("[INFO] ✅ barcode_image_path column already exists")
+                    logger.info("✅ barcode_image_path column already exists")
         elif is_mysql:
             with engine.begin() as conn:  # Use begin() for auto-commit
                 result = conn.execute(text("""
@@ -593,27 +695,25 @@ def init_db():
                 """))
                 columns = [row[0] for row in result]
                 if 'barcode_image_path' not in columns:
-                    print("[INFO] Adding barcode_image_path column to products table...")
+                    logger.info("Adding barcode_image_path column to products table...")
                     conn.execute(text("ALTER TABLE products ADD COLUMN barcode_image_path VARCHAR(500)"))
-                    print("[INFO] ✅ barcode_image_path column added")
+                    logger.info("✅ barcode_image_path column added")
                 else:
-                    print("[INFO] ✅ barcode_image_path column already exists")
+                    logger.info("✅ barcode_image_path column already exists")
         else:  # SQLite
             conn = engine.connect()
             result = conn.execute(text("PRAGMA table_info(products)"))
             columns = [row[1] for row in result]
             if 'barcode_image_path' not in columns:
-                print("[INFO] Adding barcode_image_path column to products table...")
+                logger.info("Adding barcode_image_path column to products table...")
                 conn.execute(text("ALTER TABLE products ADD COLUMN barcode_image_path TEXT"))
                 conn.commit()
-                print("[INFO] ✅ barcode_image_path column added")
+                logger.info("✅ barcode_image_path column added")
             else:
-                print("[INFO] ✅ barcode_image_path column already exists")
+                logger.info("✅ barcode_image_path column already exists")
             conn.close()
     except Exception as e:
-        print(f"[ERROR] Error adding barcode_image_path column: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error("Error adding barcode_image_path column: %s", e, exc_info=True)
         # Don't raise - let the app continue, but log the error
     
     # Create default data if needed
@@ -636,7 +736,7 @@ def init_db():
         session.commit()
     except Exception as e:
         session.rollback()
-        print(f"Error initializing default data: {e}")
+        logger.error("Error initializing default data: %s", e)
     finally:
         session.close()
 
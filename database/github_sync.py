@@ -17,6 +17,9 @@ import os
 import urllib.request
 import json
 from typing import Optional
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 def download_db_from_github(repo: str, branch: str = "main", db_path: str = "data/pos.db") -> Optional[str]:
     """
@@ -43,13 +46,12 @@ def download_db_from_github(repo: str, branch: str = "main", db_path: str = "dat
         os.makedirs("data", exist_ok=True)
     
     try:
-        print(f"Downloading database from GitHub: {url}")
+        logger.info("Downloading database from GitHub: %s", url)
         urllib.request.urlretrieve(url, local_path)
-        print(f"✅ Database downloaded to: {local_path}")
+        logger.info("✅ Database downloaded to: %s", local_path)
         return local_path
     except Exception as e:
-        print(f"❌ Error downloading database: {e}")
-        print("💡 Use external database (PostgreSQL/MySQL) instead!")
+        logger.error("❌ Error downloading database: %s - 💡 Use external database (PostgreSQL/MySQL) instead!", e)
         return None
 
 def upload_db_to_github(repo: str, token: str, db_path: str = "/tmp/pos.db") -> bool:
@@ -69,8 +71,7 @@ def upload_db_to_github(repo: str, token: str, db_path: str = "/tmp/pos.db") ->
     # This requires GitHub API and is complex
     # Not recommended - use external database instead!
     
-    print("⚠️ Uploading database to GitHub is not recommended!")
-    print("💡 Use external database (PostgreSQL/MySQL) instead!")
+    logger.warning("⚠️ Uploading database to GitHub is not recommended! 💡 Use external database (PostgreSQL/MySQL) instead!")
     return False
 
 # Example usage (NOT RECOMMENDED):
@@ -140,6 +140,9 @@ class MenuItem(Base):
 class StockTransaction(Base):
     """StockTransaction model - บันทึกสต็อคเข้าออก"""
     __tablename__ = 'stock_transactions'
+    __table_args__ = (
+        Index('idx_stock_tx_sale', 'sale_id', 'transaction_type'),  # การเคลื่อนไหวสต็อคของบิล (ยกเลิก/คืนสินค้า)
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey('products.id'), nullable=False)
@@ -148,6 +151,7 @@ class StockTransaction(Base):
     unit_price = Column(Float, nullable=False, default=0.0)
     total_cost = Column(Float, nullable=False, default=0.0)
     reason = Column(Text, nullable=True)  # เหตุผล เช่น 'ซื้อเข้า', 'ขาย', 'เสียหาย'
+    sale_id = Column(Integer, ForeignKey('sales.id'), nullable=True)  # บิลที่ทำให้สต็อคเปลี่ยน (ขาย/ยกเลิก/คืน)
     created_by = Column(Integer, ForeignKey('users.id'), nullable=True)
     created_at = Column(DateTime, default=datetime.now, index=True)
     
@@ -162,6 +166,9 @@ class Sale(Base):
         Index('idx_sale_date', 'sale_date'),
         Index('idx_sale_created_by', 'created_by'),
         Index('idx_sale_customer', 'customer_id'),
+        Index('idx_sale_created_id', 'created_at', 'id'),  # keyset pagination ของประวัติการขาย
+        Index('idx_sale_channel_created', 'channel', 'created_at', 'id'),  # รายการขายตามช่องทาง (ออนไลน์)
+        Index('idx_sale_updated', 'updated_at'),  # export แถวที่ถูกแก้ไข (ยกเลิก/คืนสินค้า)
     )
     
     id = Column(Integer, primary_key=True, index=True)
@@ -171,6 +178,7 @@ class Sale(Base):
     final_amount = Column(Float, nullable=False, default=0.0)  # ยอดสุดท้ายหลังหักส่วนลด
     payment_method = Column(String(20), nullable=False, default='cash')  # 'cash', 'transfer', 'qr_code', 'credit_card'
     payment_reference = Column(String(200), nullable=True)  # เลขที่อ้างอิงการโอน/บัตร
+    channel = Column(String(20), nullable=False, default='pos')  # 'pos', 'api', 'online' หรือแพลตฟอร์ม ('line_man', 'grabfood', 'foodpanda')
     customer_id = Column(Integer, ForeignKey('customers.id'), nullable=True)  # ลูกค้า
     points_earned = Column(Float, nullable=False, default=0.0)  # แต้มที่ได้รับ
     points_used = Column(Float, nullable=False, default=0.0)  # แต้มที่ใช้
@@ -183,6 +191,7 @@ class Sale(Base):
     voided_at = Column(DateTime, nullable=True)  # วันที่ยกเลิก
     created_by = Column(Integer, ForeignKey('users.id'), nullable=True)
     created_at = Column(DateTime, default=datetime.now, index=True)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)  # แก้ไขล่าสุด (ยกเลิก/คืนสินค้า)
     
     # Relationships
     creator = relationship("User", back_populates="sales", foreign_keys=[created_by])
@@ -208,6 +217,7 @@ class SaleItem(Base):
     unit_price = Column(Float, nullable=False)
     discount_amount = Column(Float, nullable=False, default=0.0)  # ส่วนลดต่อรายการ
     total_price = Column(Float, nullable=False)
+    returned_quantity = Column(Float, nullable=False, default=0.0)  # จำนวนที่คืนแล้ว (คืนสินค้า)
     
     # Relationships
     sale = relationship("Sale", back_populates="sale_items")
@@ -262,8 +272,8 @@ class LoyaltyTransaction(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, ForeignKey('customers.id'), nullable=False)
-    transaction_type = Column(String(20), nullable=False)  # 'earn' or 'redeem'
-    points = Column(Float, nullable=False)  # จำนวนแต้ม (บวกสำหรับ earn, ลบสำหรับ redeem)
+    transaction_type = Column(String(20), nullable=False)  # 'earn', 'redeem' or 'adjust' (ย้อนแต้มเมื่อยกเลิกการขาย)
+    points = Column(Float, nullable=False)  # จำนวนแต้ม (บวกสำหรับ earn, ลบสำหรับ redeem, adjust บวกหรือลบ)
     sale_id = Column(Integer, ForeignKey('sales.id'), nullable=True)  # อ้างอิงการขาย (ถ้ามี)
     description = Column(Text, nullable=True)  # คำอธิบาย
     transaction_date = Column(DateTime, default=datetime.now, index=True)
@@ -587,7 +597,7 @@ class Table(Base):
     table_number = Column(String(20), nullable=False, unique=True, index=True)  # หมายเลขโต๊ะ เช่น "T1", "T2"
     name = Column(String(100), nullable=True)  # ชื่อโต๊ะ (ถ้ามี)
     capacity = Column(Integer, nullable=False, default=4)  # จำนวนที่นั่ง
-    qr_code = Column(Text, nullable=True)  # QR Code base64 image สำหรับโต๊ะนี้ (ใช้ Text เพื่อรองรับข้อมูลยาว)
+    qr_code = Column(Text, nullable=True)  # path ของไฟล์ QR Code (utils.table_qr) - แถวเก่าอาจเป็น base64 จนกว่า init_db จะย้ายเป็นไฟล์
     is_active = Column(Boolean, default=True, nullable=False)  # เปิดใช้งานหรือไม่
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
@@ -676,3 +686,116 @@ class KitchenQueue(Base):
     preparer = relationship("User")
 
 
+
+class MonthlyTaxSummary(Base):
+    """MonthlyTaxSummary model - สรุปภาษีขายรายเดือน (ภ.พ.30) คำนวณไว้ล่วงหน้าต่ออัตราภาษี"""
+    __tablename__ = 'monthly_tax_summaries'
+    __table_args__ = (
+        Index('idx_tax_summary_month_rate', 'month', 'tax_rate', unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    month = Column(String(7), nullable=False)  # 'YYYY-MM'
+    tax_rate = Column(Float, nullable=False, default=0.0)  # อัตราภาษี (%)
+    subtotal = Column(Float, nullable=False, default=0.0)  # ยอดก่อนภาษี (ถ้าไม่มี subtotal ใช้ final - tax)
+    raw_subtotal = Column(Float, nullable=False, default=0.0)  # ผลรวม Sale.subtotal ที่บันทึกไว้ (> 0)
+    tax_amount = Column(Float, nullable=False, default=0.0)  # ภาษีขาย
+    total_amount = Column(Float, nullable=False, default=0.0)  # ยอดรวมภาษี
+    sales_count = Column(Integer, nullable=False, default=0)  # จำนวนใบกำกับ
+    computed_at = Column(DateTime, default=datetime.now)
+
+class ChangeSequence(Base):
+    """ChangeSequence model - ตัวนับการเปลี่ยนแปลงข้อมูลต่อช่องทาง (ใช้แจ้งจอครัวให้รีเฟรช)"""
+    __tablename__ = 'change_sequences'
+    
+    id = Column(Integer, primary_key=True, index=True)
+    channel = Column(String(50), unique=True, nullable=False, index=True)  # เช่น 'kitchen'
+    seq = Column(Integer, nullable=False, default=0)  # เพิ่มขึ้นทุกครั้งที่ข้อมูลในช่องทางนี้เปลี่ยน
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+class OnlineOrderReceipt(Base):
+    """OnlineOrderReceipt model - ออเดอร์ออนไลน์ที่รับแล้ว (idempotency key ของ webhook ที่ส่งซ้ำ)"""
+    __tablename__ = 'online_order_receipts'
+    __table_args__ = (
+        Index('idx_online_receipt_platform_order', 'platform', 'external_order_id', unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    platform = Column(String(20), nullable=False)  # 'line_man', 'grabfood', 'foodpanda'
+    external_order_id = Column(String(100), nullable=False)  # order_id ของแพลตฟอร์ม
+    payload_hash = Column(String(64), nullable=False)  # SHA-256 ของออเดอร์ (ตรวจว่าส่งซ้ำด้วยข้อมูลเดิมหรือไม่)
+    sale_id = Column(Integer, ForeignKey('sales.id'), nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+    
+    # Relationships
+    sale = relationship("Sale")
+
+class PlatformSkuMapping(Base):
+    """PlatformSkuMapping model - รหัสสินค้าของแพลตฟอร์มออนไลน์ → สินค้า/เมนูในร้าน"""
+    __tablename__ = 'platform_sku_mappings'
+    __table_args__ = (
+        Index('idx_platform_sku', 'platform', 'external_sku', unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    platform = Column(String(20), nullable=False)
+    external_sku = Column(String(100), nullable=False)
+    item_type = Column(String(20), nullable=False)  # 'product' or 'menu'
+    product_id = Column(Integer, ForeignKey('products.id'), nullable=True)  # null if menu
+    menu_id = Column(Integer, ForeignKey('menus.id'), nullable=True)  # null if product
+    is_active = Column(Boolean, default=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    
+    # Relationships
+    product = relationship("Product")
+    menu = relationship("Menu")
+
+class OAuthAuthorizationCode(Base):
+    """OAuthAuthorizationCode model - authorization code ของ OAuth (เก็บเฉพาะ hash, ใช้ได้ครั้งเดียว)"""
+    __tablename__ = 'oauth_authorization_codes'
+    __table_args__ = (
+        Index('idx_oauth_code_expires', 'expires_at'),  # ลบรายการหมดอายุ
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    code_hash = Column(String(64), nullable=False, unique=True)  # SHA-256 ของ code
+    client_id = Column(String(200), nullable=False)
+    user_id = Column(String(100), nullable=False)  # Supabase user id
+    redirect_uri = Column(Text, nullable=False)
+    scope = Column(String(200), nullable=True)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, nullable=True)  # แลกเป็น token แล้ว
+    created_at = Column(DateTime, default=datetime.now)
+
+class OAuthToken(Base):
+    """OAuthToken model - access/refresh token ของ OAuth (เก็บเฉพาะ hash)"""
+    __tablename__ = 'oauth_tokens'
+    __table_args__ = (
+        Index('idx_oauth_token_expires', 'expires_at'),  # ลบรายการหมดอายุ
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    access_token_hash = Column(String(64), nullable=False, unique=True)  # SHA-256 ของ access token
+    refresh_token_hash = Column(String(64), nullable=True, unique=True)  # SHA-256 ของ refresh token
+    client_id = Column(String(200), nullable=False)
+    user_id = Column(String(100), nullable=False)
+    scope = Column(String(200), nullable=True)
+    expires_at = Column(DateTime, nullable=False)  # หมดอายุของ access token
+    refresh_expires_at = Column(DateTime, nullable=True)  # หมดอายุของ refresh token (เก็บแถวไว้ถึงเวลานี้)
+    revoked_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+
+class RateLimitCounter(Base):
+    """RateLimitCounter model - ตัวนับของ rate limiter ต่อ key ต่อช่วงเวลา (ใช้ร่วมกันหลาย process)"""
+    __tablename__ = 'rate_limit_counters'
+    __table_args__ = (
+        Index('idx_rate_limit_key_window', 'key', 'window_start', unique=True),
+        Index('idx_rate_limit_expires', 'expires_at'),  # ลบช่วงเวลาที่เลยไปแล้ว
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(255), nullable=False)  # เช่น 'login:300:admin'
+    window_start = Column(Integer, nullable=False)  # epoch วินาทีที่ช่วงเวลาเริ่ม
+    count = Column(Integer, nullable=False, default=0)
+    expires_at = Column(Integer, nullable=False)  # epoch วินาที (หลังจากนี้ไม่ถูกใช้คำนวณแล้ว)
@@ -7,6 +7,7 @@ from datetime import datetime
 from database.db import get_session
 from database.models import Category, Product
 from utils.pagination import paginate_items
+from utils.perf_monitor import track_rerun
 
 st.set_page_config(page_title="จัดการหมวดหมู่", page_icon="📁", layout="wide")
 
@@ -182,7 +183,8 @@ def main():
             session.close()
 
 if __name__ == "__main__":
-    main()
+    with track_rerun(__file__):
+        main()
 
 
 
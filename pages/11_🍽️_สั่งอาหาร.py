@@ -9,7 +9,9 @@ from database.db import get_session
 from database.models import Table, Menu, CustomerOrder, OrderItem
 from utils.order_utils import get_table_by_qr, create_order, get_order_by_id
 from utils.helpers import format_currency
+from utils.thumbnails import get_thumbnail
 import json
+from utils.perf_monitor import track_rerun
 
 st.set_page_config(
     page_title="สั่งอาหาร",
@@ -124,12 +126,9 @@ def main():
                         # แสดงรูปภาพเมนู
                         if menu.image_path:
                             try:
-                                if menu.image_path.startswith(('http://', 'https://')):
-                                    st.image(menu.image_path, caption=menu.name, width='stretch', use_container_width=True)
-                                else:
-                                    import os
-                                    if os.path.exists(menu.image_path):
-                                        st.image(menu.image_path, caption=menu.name, width='stretch', use_container_width=True)
+                                thumbnail = get_thumbnail(menu.image_path)
+                                if thumbnail:
+                                    st.image(thumbnail, caption=menu.name, width='stretch', use_container_width=True)
                             except:
                                 pass
                         
@@ -291,5 +290,6 @@ def main():
         session.close()
 
 if __name__ == "__main__":
-    main()
+    with track_rerun(__file__):
+        main()
 
@@ -6,13 +6,54 @@ Kitchen Queue Management Page - จัดการคิวทำอาหาร
 import streamlit as st
 from datetime import datetime
 from database.db import get_session
-from database.models import KitchenQueue, CustomerOrder, Menu, Table, User, OrderStatus
+from database.models import KitchenQueue, CustomerOrder, Menu, OrderStatus
 from utils.order_utils import update_queue_status, update_order_status
 from utils.helpers import format_currency
+from utils.change_feed import get_change_token, CHANNEL_KITCHEN
 from sqlalchemy import or_
+from sqlalchemy.orm import contains_eager, joinedload
+from utils.pagination import paginate_query
+from utils.perf_monitor import track_rerun
 
 st.set_page_config(page_title="จัดการคิว", page_icon="👨‍🍳", layout="wide")
 
+# ความถี่ในการเช็คว่ามีคิวเปลี่ยนหรือไม่ (เช็คแค่ตัวนับ ไม่ได้ query คิวทั้งหมด)
+CHANGE_CHECK_SECONDS = 2
+
+# จำนวนคิวที่เสร็จแล้วต่อหน้า
+COMPLETED_PER_PAGE = 20
+
+@st.fragment(run_every=CHANGE_CHECK_SECONDS)
+def watch_kitchen_changes():
+    """Rerun the whole page only when kitchen queue/orders actually changed"""
+    token = get_change_token(CHANNEL_KITCHEN)
+    if st.session_state.get('kitchen_change_token') != token:
+        st.session_state.kitchen_change_token = token
+        st.rerun(scope="app")
+
+def build_queue_query(session, statuses, search_term=None):
+    """Query คิวตามสถานะ พร้อม eager load ข้อมูลที่ใช้แสดงผล (ไม่ต้อง query ซ้ำทีละรายการ)"""
+    query = session.query(KitchenQueue).join(
+        KitchenQueue.order
+    ).join(
+        KitchenQueue.menu
+    ).options(
+        contains_eager(KitchenQueue.order).joinedload(CustomerOrder.table),
+        contains_eager(KitchenQueue.menu),
+        joinedload(KitchenQueue.preparer)
+    ).filter(
+        KitchenQueue.status.in_(statuses)
+    )
+    
+    if search_term:
+        query = query.filter(
+            or_(
+                CustomerOrder.order_number.contains(search_term),
+                Menu.name.contains(search_term)
+            )
+        )
+    return query
+
 def main():
     # ต้องล็อคอิน
     from utils.auth import require_auth
@@ -33,35 +74,40 @@ def main():
         with col2:
             search_term = st.text_input("🔍 ค้นหา (เลขออเดอร์, ชื่อเมนู)", placeholder="ค้นหา...")
         with col3:
-            auto_refresh = st.checkbox("🔄 Auto Refresh", value=True, help="รีเฟรชอัตโนมัติทุก 5 วินาที")
+            auto_refresh = st.checkbox("🔄 Auto Refresh", value=True, help="รีเฟรชอัตโนมัติเมื่อมีออเดอร์หรือคิวเปลี่ยน")
         
-        # Auto refresh
+        # Auto refresh - จำ token ก่อน query เพื่อให้การเปลี่ยนแปลงระหว่างแสดงผลทำให้รีเฟรชอีกรอบ
         if auto_refresh:
-            import time
-            time.sleep(5)
-            st.rerun()
-        
-        # Query คิว
-        query = session.query(KitchenQueue).join(CustomerOrder).join(Menu)
+            st.session_state.kitchen_change_token = get_change_token(CHANNEL_KITCHEN)
+            watch_kitchen_changes()
         
+        # คิวที่ยังไม่เสร็จ - query เดียว พร้อมโหลด order/table/menu/preparer มาด้วย
+        active_statuses = ['pending', 'preparing', 'ready']
         if status_filter != "ทั้งหมด":
-            query = query.filter(KitchenQueue.status == status_filter)
+            active_statuses = [s for s in active_statuses if s == status_filter]
         
-        if search_term:
-            query = query.filter(
-                or_(
-                    CustomerOrder.order_number.contains(search_term),
-                    Menu.name.contains(search_term)
-                )
-            )
+        queue_items = []
+        if active_statuses:
+            queue_items = build_queue_query(session, active_statuses, search_term).order_by(
+                KitchenQueue.priority.desc(),
+                KitchenQueue.created_at.asc()
+            ).all()
         
-        # เรียงตาม priority และ created_at
-        queue_items = query.order_by(
-            KitchenQueue.priority.desc(),
-            KitchenQueue.created_at.asc()
-        ).all()
+        # คิวที่เสร็จแล้ว - แบ่งหน้าที่ฐานข้อมูล (ล่าสุดก่อน)
+        completed_items, completed_total, completed_pages, completed_page = [], 0, 1, 1
+        if status_filter in ("ทั้งหมด", "completed"):
+            if 'kitchen_completed_page' not in st.session_state:
+                st.session_state.kitchen_completed_page = 1
+            completed_items, completed_total, completed_pages, completed_page = paginate_query(
+                build_queue_query(session, ['completed'], search_term).order_by(
+                    KitchenQueue.completed_at.desc(),
+                    KitchenQueue.id.desc()
+                ),
+                st.session_state.kitchen_completed_page,
+                COMPLETED_PER_PAGE
+            )
         
-        if not queue_items:
+        if not queue_items and not completed_total:
             st.info("📭 ไม่มีคิว")
             return
         
@@ -69,8 +115,7 @@ def main():
         status_groups = {
             'pending': [],
             'preparing': [],
-            'ready': [],
-            'completed': []
+            'ready': []
         }
         
         for item in queue_items:
@@ -103,10 +148,23 @@ def main():
         
         with tabs[3]:
             st.subheader("✔️ เสร็จแล้ว")
-            # แสดงแค่ 20 รายการล่าสุด
-            completed_items = status_groups['completed'][:20]
             if completed_items:
+                st.caption(f"📊 {completed_total} รายการ (หน้า {completed_page}/{completed_pages})")
                 display_queue_items(completed_items, session, 'completed')
+                
+                # Pagination controls
+                if completed_pages > 1:
+                    col_prev, col_page, col_next = st.columns([1, 3, 1])
+                    with col_prev:
+                        if st.button("◀️ ก่อนหน้า", disabled=(completed_page == 1), width='stretch', key="completed_prev"):
+                            st.session_state.kitchen_completed_page = max(1, completed_page - 1)
+                            st.rerun()
+                    with col_page:
+                        st.write(f"หน้า {completed_page} / {completed_pages}")
+                    with col_next:
+                        if st.button("ถัดไป ▶️", disabled=(completed_page == completed_pages), width='stretch', key="completed_next"):
+                            st.session_state.kitchen_completed_page = min(completed_pages, completed_page + 1)
+                            st.rerun()
             else:
                 st.info("📭 ไม่มีคิวที่เสร็จแล้ว")
     
@@ -118,9 +176,9 @@ def display_queue_items(items, session, current_status):
     current_user_id = st.session_state.get('user_id')
     
     for item in items:
-        order = session.query(CustomerOrder).filter(CustomerOrder.id == item.order_id).first()
-        menu = session.query(Menu).filter(Menu.id == item.menu_id).first()
-        table = session.query(Table).filter(Table.id == order.table_id).first() if order and order.table_id else None
+        order = item.order
+        menu = item.menu
+        table = order.table if order else None
         
         if not order or not menu:
             continue
@@ -134,8 +192,6 @@ def display_queue_items(items, session, current_status):
                 st.caption(f"📋 {order.order_number} | 🪑 โต๊ะ: {table.table_number if table else 'N/A'}")
                 if item.notes:
                     st.caption(f"💬 {item.notes}")
-                if item.special_instructions:
-                    st.caption(f"📝 {item.special_instructions}")
             
             with col2:
                 if current_status == 'pending':
@@ -187,10 +243,8 @@ def display_queue_items(items, session, current_status):
                     st.write("✔️ เสร็จแล้ว")
                     if item.completed_at:
                         st.caption(f"เสร็จ: {item.completed_at.strftime('%H:%M')}")
-                    if item.prepared_by:
-                        preparer = session.query(User).filter(User.id == item.prepared_by).first()
-                        if preparer:
-                            st.caption(f"โดย: {preparer.username}")
+                    if item.preparer:
+                        st.caption(f"โดย: {item.preparer.username}")
             
             with col3:
                 st.caption(f"เวลา: {item.created_at.strftime('%H:%M')}")
@@ -201,5 +255,6 @@ def display_queue_items(items, session, current_status):
             st.divider()
 
 if __name__ == "__main__":
-    main()
+    with track_rerun(__file__):
+        main()
 
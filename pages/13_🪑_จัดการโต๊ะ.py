@@ -6,8 +6,9 @@ import streamlit as st
 from database.db import get_session
 from database.models import Table
 from utils.order_utils import generate_table_qr_code
-import base64
+from utils.table_qr import DEFAULT_BASE_URL, build_table_qr_sheet, generate_table_qr_codes, table_qr_source
 from datetime import datetime
+from utils.perf_monitor import track_rerun
 
 st.set_page_config(page_title="จัดการโต๊ะ", page_icon="🪑", layout="wide")
 
@@ -26,6 +27,36 @@ def main():
         with tab1:
             st.subheader("📋 รายการโต๊ะทั้งหมด")
             
+            # QR Code ทุกโต๊ะในครั้งเดียว
+            base_url = st.text_input("Base URL ของแอป (สำหรับ QR Code)", value=DEFAULT_BASE_URL, key="table_qr_base_url")
+            col_all, col_sheet, col_download = st.columns(3)
+            with col_all:
+                if st.button("📱 สร้าง QR Code ทุกโต๊ะ", width='stretch', disabled=not base_url):
+                    try:
+                        with st.spinner("⏳ กำลังสร้าง QR Code..."):
+                            paths = generate_table_qr_codes(base_url)
+                        st.session_state.pop('table_qr_sheet', None)
+                        st.success(f"✅ สร้าง QR Code {len(paths)} โต๊ะ")
+                    except Exception as e:
+                        st.error(f"❌ เกิดข้อผิดพลาด: {str(e)}")
+            with col_sheet:
+                if st.button("📄 สร้างแผ่นพิมพ์ QR (PDF)", width='stretch', disabled=not base_url):
+                    try:
+                        with st.spinner("⏳ กำลังสร้าง PDF..."):
+                            st.session_state.table_qr_sheet = build_table_qr_sheet(base_url)
+                    except Exception as e:
+                        st.error(f"❌ เกิดข้อผิดพลาด: {str(e)}")
+            with col_download:
+                if st.session_state.get('table_qr_sheet'):
+                    st.download_button(
+                        "⬇️ ดาวน์โหลด PDF",
+                        data=st.session_state.table_qr_sheet,
+                        file_name=f"table_qr_{datetime.now().strftime('%Y%m%d')}.pdf",
+                        mime="application/pdf",
+                        width='stretch'
+                    )
+            st.divider()
+            
             tables = session.query(Table).order_by(Table.table_number).all()
             
             if not tables:
@@ -43,9 +74,10 @@ def main():
                             st.caption(f"ที่นั่ง: {table.capacity} คน")
                             
                             # แสดง QR Code
-                            if table.qr_code:
+                            qr_source = table_qr_source(table.qr_code, table.id, base_url)
+                            if qr_source:
                                 st.image(
-                                    f"data:image/png;base64,{table.qr_code}",
+                                    qr_source,
                                     caption=f"QR Code สำหรับโต๊ะ {table.table_number}",
                                     width=200
                                 )
@@ -103,21 +135,15 @@ def main():
                             st.divider()
                             if st.button("📱 สร้าง QR Code", key=f"qr_{table.id}", width='stretch'):
                                 try:
-                                    # รับ base URL
-                                    base_url = st.text_input(
-                                        "Base URL ของแอป",
-                                        value="https://pos-ez.streamlit.app",
-                                        key=f"base_url_{table.id}"
-                                    )
-                                    
                                     if base_url:
                                         qr_img, qr_url = generate_table_qr_code(table.id, base_url)
                                         table.qr_code = qr_img
                                         session.commit()
+                                        st.session_state.pop('table_qr_sheet', None)
                                         
                                         st.success("✅ สร้าง QR Code สำเร็จ")
                                         st.image(
-                                            f"data:image/png;base64,{qr_img}",
+                                            qr_img,
                                             caption=f"QR Code สำหรับโต๊ะ {table.table_number}",
                                             width=300
                                         )
@@ -159,19 +185,13 @@ def main():
                             
                             # สร้าง QR Code อัตโนมัติ
                             try:
-                                base_url = st.text_input(
-                                    "Base URL ของแอป (สำหรับสร้าง QR Code)",
-                                    value="https://pos-ez.streamlit.app",
-                                    key="base_url_new"
-                                )
-                                
                                 if base_url:
                                     qr_img, qr_url = generate_table_qr_code(new_table.id, base_url)
                                     new_table.qr_code = qr_img
                                     session.commit()
                                     st.success("✅ สร้าง QR Code สำเร็จ")
                                     st.image(
-                                        f"data:image/png;base64,{qr_img}",
+                                        qr_img,
                                         caption=f"QR Code สำหรับโต๊ะ {new_table.table_number}",
                                         width=300
                                     )
@@ -184,5 +204,6 @@ def main():
         session.close()
 
 if __name__ == "__main__":
-    main()
+    with track_rerun(__file__):
+        main()
 
@@ -16,8 +16,10 @@ from utils.helpers import (
     get_sales_by_date, format_currency
 )
 from utils.notifications import get_all_notifications, Notification
+from api.online_orders import get_channel_summary
 from functools import lru_cache
 import time
+from utils.perf_monitor import track_rerun
 
 st.set_page_config(page_title="Dashboard", page_icon="📊", layout="wide")
 
@@ -175,6 +177,18 @@ def main():
     finally:
         session.close()
     
+    # Sales by channel (this month)
+    st.divider()
+    st.subheader("🛵 ยอดขายตามช่องทาง (เดือนนี้)")
+    channels = get_channel_summary(start_date=datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0))
+    if channels:
+        for col, channel in zip(st.columns(len(channels)), channels):
+            with col:
+                st.metric(channel['label'], format_currency(channel['revenue']),
+                          f"{channel['orders']:,} บิล · เฉลี่ย {format_currency(channel['average'])}", delta_color="off")
+    else:
+        st.info("ยังไม่มีข้อมูลการขายเดือนนี้")
+    
     # Summary statistics
     st.divider()
     st.subheader("📊 สรุปสถิติ")
@@ -210,5 +224,6 @@ def main():
             session.close()
 
 if __name__ == "__main__":
-    main()
+    with track_rerun(__file__):
+        main()
 
@@ -3,13 +3,12 @@ POS Page - ระบบขายสินค้าและเมนู
 """
 
 import streamlit as st
-import os
 from datetime import datetime
 from database.db import get_session
-from database.models import Product, Menu, Sale, SaleItem, Customer
+from database.models import Product, Menu, Sale, SaleItem
 from utils.helpers import (
     format_currency, reduce_stock_for_sale, get_or_create_customer,
-    get_customer_membership, create_membership, calculate_points_earned,
+    create_membership, calculate_points_earned,
     calculate_points_value, earn_points, redeem_points, update_membership_after_sale,
     validate_coupon, calculate_coupon_discount, use_coupon
 )
@@ -17,11 +16,21 @@ from utils.receipt import generate_receipt_text, generate_receipt_pdf
 from utils.validators import validate_stock_availability
 from utils.sound import play_beep_sound
 from utils.store_settings import get_promptpay_settings
-from utils.image_upload import image_uploader_widget, delete_image
+from utils.image_upload import image_uploader_widget, release_image
+from utils.thumbnails import get_thumbnail
+from utils.search import search, rank_order
+from utils.customer_lookup import lookup_customer
 import json
+from utils.perf_monitor import track_rerun
+from utils.logger import get_logger, log_timing
+
+logger = get_logger("pages.pos")
 
 st.set_page_config(page_title="POS - ขายของ", page_icon="💰", layout="wide")
 
+# จำนวนผลค้นหาสูงสุดในแท็บสินค้า/เมนู
+SEARCH_LIMIT = 60
+
 def init_cart():
     """Initialize cart in session state"""
     if 'cart' not in st.session_state:
@@ -57,6 +66,8 @@ def clear_cart():
     """Clear cart"""
     if 'cart' in st.session_state:
         st.session_state.cart = []
+    # บิลถัดไปได้เลขที่อ้างอิง PromptPay ใหม่
+    st.session_state.pop('promptpay_bill_ref', None)
 
 def get_cart_total() -> float:
     """Get cart total"""
@@ -239,7 +250,7 @@ def main():
                         # Play beep sound
                         play_beep_sound()
                         st.success(f"✅ พบสินค้า: {product.name} - เพิ่มลงตะกร้าแล้ว")
-                        print(f"[DEBUG] สแกนบาร์โค๊ดสำเร็จ - Barcode: {barcode_to_search}, Product: {product.name} - {datetime.now()}")
+                        logger.debug("สแกนบาร์โค๊ดสำเร็จ - Barcode: %s, Product: %s", barcode_to_search, product.name)
                         # Clear barcode search state
                         st.session_state['barcode_search'] = None
                         st.session_state['last_barcode'] = None
@@ -260,11 +271,15 @@ def main():
             from database.db import ensure_barcode_image_path_column
             ensure_barcode_image_path_column()
             
+            product_search = st.text_input("🔍 ค้นหาสินค้า", placeholder="ชื่อสินค้าหรือบาร์โค๊ด...", key="pos_product_search")
             session = get_session()
             try:
-                products = session.query(Product).filter(
-                    Product.stock_quantity > 0
-                ).order_by(Product.name).all()
+                query = session.query(Product).filter(Product.stock_quantity > 0)
+                if product_search:
+                    hits = search(product_search, 'product', limit=SEARCH_LIMIT, only='in_stock')
+                    products = rank_order(query.filter(Product.id.in_([hit.id for hit in hits])).all(), hits)
+                else:
+                    products = query.order_by(Product.name).all()
                 
                 if products:
                     # Display products in grid
@@ -275,16 +290,12 @@ def main():
                                 # Display product image if available
                                 if product.image_path:
                                     try:
-                                        # Check if it's a URL or file path
-                                        if product.image_path.startswith(('http://', 'https://')):
-                                            st.image(product.image_path, caption=product.name, width='stretch', use_container_width=True)
-                                        else:
-                                            # Try to load as file path
-                                            if os.path.exists(product.image_path):
-                                                st.image(product.image_path, caption=product.name, width='stretch', use_container_width=True)
+                                        thumbnail = get_thumbnail(product.image_path)
+                                        if thumbnail:
+                                            st.image(thumbnail, caption=product.name, width='stretch', use_container_width=True)
                                     except Exception as e:
                                         st.caption("🖼️ ไม่สามารถแสดงรูปภาพได้")
-                                        print(f"[DEBUG] Error loading product image: {e} - {datetime.now()}")
+                                        logger.error("Error loading product image: %s", e)
                                 
                                 st.write(f"**{product.name}**")
                                 st.caption(f"สต็อค: {product.stock_quantity:.2f} {product.unit}")
@@ -293,10 +304,9 @@ def main():
                                 # แสดงภาพบาร์โค๊ดถ้ามี
                                 if product.barcode_image_path:
                                     try:
-                                        if product.barcode_image_path.startswith(('http://', 'https://')):
-                                            st.image(product.barcode_image_path, caption="📷 ภาพบาร์โค๊ด", width=150)
-                                        elif os.path.exists(product.barcode_image_path):
-                                            st.image(product.barcode_image_path, caption="📷 ภาพบาร์โค๊ด", width=150)
+                                        thumbnail = get_thumbnail(product.barcode_image_path)
+                                        if thumbnail:
+                                            st.image(thumbnail, caption="📷 ภาพบาร์โค๊ด", width=150)
                                     except:
                                         pass
                                 
@@ -317,20 +327,17 @@ def main():
                                     
                                     if st.button("💾 บันทึกภาพบาร์โค๊ด", key=f"save_barcode_image_{product.id}"):
                                         try:
-                                            new_barcode_image_path = product.barcode_image_path
+                                            old_barcode_image_path = product.barcode_image_path
+                                            new_barcode_image_path = old_barcode_image_path
                                             if uploaded_barcode_image_path:
-                                                # ลบภาพเก่าถ้ามี
-                                                if product.barcode_image_path and not product.barcode_image_path.startswith(('http://', 'https://')):
-                                                    delete_image(product.barcode_image_path)
                                                 new_barcode_image_path = uploaded_barcode_image_path
                                             elif barcode_image_url and barcode_image_url.strip():
-                                                # ลบภาพเก่าถ้ามี
-                                                if product.barcode_image_path and not product.barcode_image_path.startswith(('http://', 'https://')):
-                                                    delete_image(product.barcode_image_path)
                                                 new_barcode_image_path = barcode_image_url.strip()
                                             
                                             product.barcode_image_path = new_barcode_image_path
                                             session.commit()
+                                            # ลบภาพเก่าหลังบันทึกสำเร็จ (ไม่ลบถ้าเป็นไฟล์เดิม)
+                                            release_image(old_barcode_image_path, new_barcode_image_path)
                                             st.success("✅ บันทึกภาพบาร์โค๊ดสำเร็จ")
                                             st.rerun()
                                         except Exception as e:
@@ -363,9 +370,15 @@ def main():
                 session.close()
         
         with tab2:
+            menu_search = st.text_input("🔍 ค้นหาเมนู", placeholder="ชื่อเมนู...", key="pos_menu_search")
             session = get_session()
             try:
-                menus = session.query(Menu).filter(Menu.is_active == True).order_by(Menu.name).all()
+                query = session.query(Menu).filter(Menu.is_active == True)
+                if menu_search:
+                    hits = search(menu_search, 'menu', limit=SEARCH_LIMIT, only='active')
+                    menus = rank_order(query.filter(Menu.id.in_([hit.id for hit in hits])).all(), hits)
+                else:
+                    menus = query.order_by(Menu.name).all()
                 
                 if menus:
                     # Display menus in grid
@@ -376,16 +389,12 @@ def main():
                                 # Display menu image if available
                                 if menu.image_path:
                                     try:
-                                        # Check if it's a URL or file path
-                                        if menu.image_path.startswith(('http://', 'https://')):
-                                            st.image(menu.image_path, caption=menu.name, width='stretch', use_container_width=True)
-                                        else:
-                                            # Try to load as file path
-                                            if os.path.exists(menu.image_path):
-                                                st.image(menu.image_path, caption=menu.name, width='stretch', use_container_width=True)
+                                        thumbnail = get_thumbnail(menu.image_path)
+                                        if thumbnail:
+                                            st.image(thumbnail, caption=menu.name, width='stretch', use_container_width=True)
                                     except Exception as e:
                                         st.caption("🖼️ ไม่สามารถแสดงรูปภาพได้")
-                                        print(f"[DEBUG] Error loading menu image: {e} - {datetime.now()}")
+                                        logger.error("Error loading menu image: %s", e)
                                 
                                 st.write(f"**{menu.name}**")
                                 if menu.description:
@@ -434,35 +443,27 @@ def main():
             st.divider()
             st.subheader("👤 ลูกค้า")
             
-            customer_search = st.text_input("🔍 ค้นหาลูกค้า (เบอร์โทรหรือชื่อ)", placeholder="พิมพ์เบอร์โทรหรือชื่อ...", key="customer_search")
+            customer_search = st.text_input("🔍 ค้นหาลูกค้า (เบอร์โทร, รหัสสมาชิก หรือชื่อ)", placeholder="พิมพ์เบอร์โทร, M000123 หรือชื่อ...", key="customer_search")
             selected_customer = None
             membership = None
             points_available = 0.0
             
             if customer_search:
-                session = get_session()
-                try:
-                    # Search by phone first
-                    customer = session.query(Customer).filter(Customer.phone.contains(customer_search)).first()
-                    if not customer:
-                        # Search by name
-                        customer = session.query(Customer).filter(Customer.name.contains(customer_search)).first()
-                    
-                    if customer:
-                        selected_customer = customer
-                        st.success(f"✅ พบลุกค้า: {customer.name}")
-                        if customer.is_member:
-                            membership = get_customer_membership(customer.id)
-                            if membership:
-                                points_available = membership.points
-                                st.info(f"⭐ สมาชิก - แต้มสะสม: {points_available:.2f} แต้ม")
-                    else:
-                        # Option to create new customer
-                        if st.button("➕ สร้างลูกค้าใหม่", key="create_customer_btn"):
-                            st.session_state['create_customer'] = True
-                            st.rerun()
-                finally:
-                    session.close()
+                # ลูกค้าพร้อมข้อมูลสมาชิกใน query เดียว (ผลล่าสุดอยู่ใน cache ระหว่าง rerun)
+                customer = lookup_customer(customer_search)
+                
+                if customer:
+                    selected_customer = customer
+                    st.success(f"✅ พบลุกค้า: {customer.name}")
+                    if customer.is_member and customer.membership:
+                        membership = customer.membership
+                        points_available = membership.points
+                        st.info(f"⭐ สมาชิก - แต้มสะสม: {points_available:.2f} แต้ม")
+                else:
+                    # Option to create new customer
+                    if st.button("➕ สร้างลูกค้าใหม่", key="create_customer_btn"):
+                        st.session_state['create_customer'] = True
+                        st.rerun()
             
             # Create new customer form
             if st.session_state.get('create_customer', False):
@@ -607,7 +608,7 @@ def main():
             elif payment_method == "📱 QR Code (PromptPay)":
                 # Generate QR Code for payment
                 try:
-                    from utils.promptpay import generate_promptpay_qr, validate_promptpay_settings
+                    from utils.promptpay import generate_promptpay_qr, new_bill_reference, validate_promptpay_settings
                     
                     # Get PromptPay settings from database
                     promptpay_settings = get_promptpay_settings()
@@ -626,11 +627,18 @@ def main():
                         st.info("📝 ไปที่: ตั้งค่า > ตั้งค่าร้าน > ตั้งค่าพร้อมเพย์ (PromptPay)")
                         payment_reference = st.text_input("เลขที่อ้างอิงการโอน (ถ้ามี)", placeholder="เลขที่อ้างอิง...", key="qr_payment_ref")
                     else:
-                        # Generate QR Code
+                        # เลขที่บิลของการขายนี้ (tag 62) - คงเดิมจนกว่าจะชำระเสร็จ/ล้างตะกร้า
+                        if 'promptpay_bill_ref' not in st.session_state:
+                            st.session_state.promptpay_bill_ref = new_bill_reference()
+                        bill_ref = st.session_state.promptpay_bill_ref
+                        
+                        # Generate QR Code (SVG - สร้างเร็วกว่า PNG, ยอดเดิมมาจาก cache)
                         qr_image = generate_promptpay_qr(
                             amount=final_total,
                             promptpay_type=promptpay_type,
-                            promptpay_id=promptpay_id
+                            promptpay_id=promptpay_id,
+                            reference=bill_ref,
+                            image_format="svg"
                         )
                         
                         if qr_image:
@@ -642,12 +650,13 @@ def main():
                             # Show account info
                             account_type_text = "เบอร์โทรศัพท์" if promptpay_type == "phone" else "เลขบัตรประชาชน"
                             st.caption(f"บัญชีพร้อมเพย์: {account_type_text} {promptpay_id}")
+                            st.caption(f"เลขที่บิล: {bill_ref}")
                         else:
                             st.error("⚠️ ไม่สามารถสร้าง QR Code ได้")
                             st.info("💡 กรุณาตรวจสอบการตั้งค่าพร้อมเพย์")
                         
-                        # Payment reference input
-                        payment_reference = st.text_input("เลขที่อ้างอิงการโอน (ถ้ามี)", placeholder="เลขที่อ้างอิง...", key="qr_payment_ref")
+                        # Payment reference input (ไม่กรอก = ใช้เลขที่บิลใน QR)
+                        payment_reference = st.text_input("เลขที่อ้างอิงการโอน (ถ้ามี)", placeholder=bill_ref, key="qr_payment_ref") or bill_ref
                     
                 except ImportError as e:
                     st.warning("⚠️ ต้องการ library qrcode สำหรับสร้าง QR Code")
@@ -709,7 +718,7 @@ def main():
                                 session.add(sale_item)
                             
                             session.commit()
-                            print(f"[DEBUG] สร้างการขายสำเร็จ - Sale ID: {sale.id}, Total: {total}, User: {st.session_state.user_id} - {datetime.now()}")
+                            logger.debug("สร้างการขายสำเร็จ - Sale ID: %s, Total: %s, User: %s", sale.id, total, st.session_state.user_id)
                             
                             # Handle customer and membership
                             if selected_customer:
@@ -745,11 +754,10 @@ def main():
                             
                             # Reduce stock
                             try:
-                                with st.spinner("⏳ กำลังลดสต็อค..."):
+                                with st.spinner("⏳ กำลังลดสต็อค..."), log_timing(logger, "ลดสต็อค", sale_id=sale.id):
                                     reduce_stock_for_sale(sale.id, st.session_state.user_id)
-                                    print(f"[DEBUG] ลดสต็อคสำเร็จ - Sale ID: {sale.id} - {datetime.now()}")
                             except Exception as e:
-                                print(f"[DEBUG] เกิดข้อผิดพลาดในการลดสต็อค: {str(e)} - {datetime.now()}")
+                                logger.error("เกิดข้อผิดพลาดในการลดสต็อค: %s", e)
                                 st.error(f"❌ เกิดข้อผิดพลาดในการลดสต็อค: {str(e)}")
                             
                             st.success(f"✅ ชำระเงินสำเร็จ! เลขที่: {sale.id:06d}")
@@ -807,5 +815,6 @@ def main():
             st.info("🛒 ตะกร้าว่างเปล่า")
 
 if __name__ == "__main__":
-    main()
+    with track_rerun(__file__):
+        main()
 
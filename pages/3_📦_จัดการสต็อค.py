@@ -3,17 +3,84 @@ Inventory Management Page - จัดการสต็อค
 """
 
 import streamlit as st
-import os
 from datetime import datetime
 from database.db import get_session
 from database.models import Product, Category, StockTransaction
 from utils.helpers import format_currency, format_date
 from utils.pagination import paginate_items
-from utils.image_upload import image_uploader_widget, delete_image
+from utils.search import search, rank_order
+from utils.image_upload import image_uploader_widget, release_image, import_product_images
+from utils.image_worker import is_processing
+from utils.thumbnails import get_thumbnail
+from utils.barcode_labels import build_label_sheet_pdf, build_label_sheet_svg, label_sheet_html, product_labels
 import pandas as pd
+from utils.perf_monitor import track_rerun
+from utils.logger import get_logger
+
+logger = get_logger("pages.stock")
 
 st.set_page_config(page_title="จัดการสต็อค", page_icon="📦", layout="wide")
 
+# จำนวนผลค้นหาสูงสุด (เรียงตามความเกี่ยวข้อง)
+SEARCH_LIMIT = 500
+
+def show_bulk_image_import():
+    """นำเข้ารูปสินค้าทั้งโฟลเดอร์ (ชื่อไฟล์ = บาร์โค๊ดหรือชื่อสินค้า)"""
+    with st.expander("📁 นำเข้ารูปสินค้าจากโฟลเดอร์"):
+        st.caption("ตั้งชื่อไฟล์เป็นบาร์โค๊ดหรือชื่อสินค้า เช่น 8850999000017.jpg - รูปจะถูกย่อและผูกกับสินค้าใน background")
+        folder = st.text_input("โฟลเดอร์บนเครื่องที่รันระบบ", placeholder="/home/shop/product-photos", key="bulk_image_folder")
+        overwrite = st.checkbox("แทนที่รูปเดิมของสินค้าที่มีรูปแล้ว", value=False, key="bulk_image_overwrite")
+        
+        if st.button("📥 นำเข้ารูปภาพ", key="bulk_image_import", disabled=not folder):
+            try:
+                st.session_state['bulk_image_result'] = import_product_images(folder.strip(), overwrite)
+            except Exception as e:
+                st.error(f"❌ เกิดข้อผิดพลาด: {str(e)}")
+        
+        result = st.session_state.get('bulk_image_result')
+        if result:
+            remaining = sum(1 for path in result['paths'] if is_processing(path))
+            if remaining:
+                st.info(f"⏳ กำลังประมวลผล {remaining} จาก {result['queued']} รูป")
+                if st.button("🔄 ตรวจสอบอีกครั้ง", key="bulk_image_refresh"):
+                    st.rerun()
+            else:
+                st.success(f"✅ นำเข้ารูปภาพ {result['queued']} รูป (ข้าม {result['skipped']} สินค้าที่มีรูปแล้ว)")
+            if result['unmatched']:
+                st.warning(f"⚠️ ไม่พบสินค้าสำหรับ {len(result['unmatched'])} ไฟล์: " + ", ".join(result['unmatched'][:20]))
+            if result['errors']:
+                st.error("❌ อ่านไฟล์ไม่ได้: " + ", ".join(result['errors'][:10]))
+
+def show_label_sheet(product_ids):
+    """พิมพ์ฉลากบาร์โค๊ดของสินค้าที่แสดงอยู่ (ตามคำค้น/หมวดหมู่)"""
+    with st.expander(f"🏷️ พิมพ์ฉลากบาร์โค๊ด ({len(product_ids)} สินค้าที่แสดง)"):
+        col_copies, col_format = st.columns(2)
+        with col_copies:
+            copies = st.number_input("จำนวนดวงต่อสินค้า", min_value=1, max_value=100, value=1, key="label_copies")
+        with col_format:
+            label_format = st.radio("รูปแบบ", ["PDF", "SVG (พิมพ์จาก browser)"], horizontal=True, key="label_format")
+        assign_missing = st.checkbox("สร้างบาร์โค๊ด EAN-13 ภายในร้านให้สินค้าที่ยังไม่มี", value=True, key="label_assign_missing")
+        
+        if st.button("🏷️ สร้างแผ่นฉลาก", key="build_label_sheet", disabled=not product_ids):
+            try:
+                with st.spinner("⏳ กำลังสร้างแผ่นฉลาก..."):
+                    labels, skipped = product_labels(product_ids, copies=copies, assign_missing=assign_missing)
+                    if label_format == "PDF":
+                        data, file_name, mime = build_label_sheet_pdf(labels), "labels.pdf", "application/pdf"
+                    else:
+                        data, file_name, mime = label_sheet_html(build_label_sheet_svg(labels)), "labels.html", "text/html"
+                st.session_state['label_sheet'] = (data, file_name, mime, len(labels), skipped)
+            except Exception as e:
+                st.error(f"❌ เกิดข้อผิดพลาด: {str(e)}")
+        
+        sheet = st.session_state.get('label_sheet')
+        if sheet:
+            data, file_name, mime, count, skipped = sheet
+            st.success(f"✅ สร้างฉลาก {count} ดวง")
+            if skipped:
+                st.warning(f"⚠️ ข้าม {len(skipped)} สินค้าที่บาร์โค๊ดพิมพ์เป็นฉลากไม่ได้: {', '.join(skipped)}")
+            st.download_button("⬇️ ดาวน์โหลดแผ่นฉลาก", data=data, file_name=file_name, mime=mime, key="download_label_sheet")
+
 def main():
     # Check authentication and redirect to login if not authenticated
     from utils.auth import require_auth
@@ -42,18 +109,27 @@ def main():
             
             # Query products
             query = session.query(Product)
+            hits = None
             
-            if barcode_search and barcode_search.strip():
-                query = query.filter(Product.barcode == barcode_search.strip())
-            elif search_term:
-                query = query.filter(Product.name.contains(search_term))
-            
+            category = None
             if selected_category != "ทั้งหมด":
                 category = session.query(Category).filter(Category.name == selected_category).first()
                 if category:
                     query = query.filter(Product.category_id == category.id)
             
+            if barcode_search and barcode_search.strip():
+                query = query.filter(Product.barcode == barcode_search.strip())
+            elif search_term:
+                # กรองหมวดหมู่ใน query ค้นหา ผลที่ได้จึงไม่ถูกตัดด้วยสินค้าหมวดอื่น
+                if category:
+                    hits = search(search_term, 'product', limit=SEARCH_LIMIT, only='category', only_value=category.id)
+                else:
+                    hits = search(search_term, 'product', limit=SEARCH_LIMIT)
+                query = query.filter(Product.id.in_([hit.id for hit in hits]))
+            
             all_products = query.order_by(Product.name).all()
+            if hits is not None:
+                all_products = rank_order(all_products, hits)
             
             # Pagination
             if 'product_page' not in st.session_state:
@@ -90,16 +166,12 @@ def main():
                         # Display product image if available
                         if product.image_path:
                             try:
-                                # Check if it's a URL or file path
-                                if product.image_path.startswith(('http://', 'https://')):
-                                    st.image(product.image_path, caption=product.name, width=200, use_container_width=False)
-                                else:
-                                    # Try to load as file path
-                                    if os.path.exists(product.image_path):
-                                        st.image(product.image_path, caption=product.name, width=200, use_container_width=False)
+                                thumbnail = get_thumbnail(product.image_path)
+                                if thumbnail:
+                                    st.image(thumbnail, caption=product.name, width=200, use_container_width=False)
                             except Exception as e:
                                 st.caption("🖼️ ไม่สามารถแสดงรูปภาพได้")
-                                print(f"[DEBUG] Error loading product image: {e}")
+                                logger.error("Error loading product image: %s", e)
                         
                         col1, col2, col3 = st.columns(3)
                         
@@ -172,10 +244,9 @@ def main():
                                     with col_barcode_curr:
                                         st.write("**ภาพบาร์โค๊ดปัจจุบัน:**")
                                         try:
-                                            if product.barcode_image_path.startswith(('http://', 'https://')):
-                                                st.image(product.barcode_image_path, width=200)
-                                            elif os.path.exists(product.barcode_image_path):
-                                                st.image(product.barcode_image_path, width=200)
+                                            thumbnail = get_thumbnail(product.barcode_image_path)
+                                            if thumbnail:
+                                                st.image(thumbnail, width=200)
                                         except:
                                             st.caption("ไม่สามารถแสดงภาพได้")
                                 
@@ -194,16 +265,11 @@ def main():
                                 )
                                 
                                 # กำหนด barcode_image_path
+                                # ภาพเก่าจะถูกลบหลังบันทึกสำเร็จเท่านั้น (release_image)
                                 new_barcode_image_path = product.barcode_image_path  # ค่าเดิม
                                 if uploaded_barcode_image_path:
-                                    # ลบภาพเก่าถ้ามี (ถ้าเป็นไฟล์ในเครื่อง)
-                                    if product.barcode_image_path and not product.barcode_image_path.startswith(('http://', 'https://')):
-                                        delete_image(product.barcode_image_path)
                                     new_barcode_image_path = uploaded_barcode_image_path
                                 elif barcode_image_url and barcode_image_url.strip():
-                                    # ลบภาพเก่าถ้ามี (ถ้าเป็นไฟล์ในเครื่อง)
-                                    if product.barcode_image_path and not product.barcode_image_path.startswith(('http://', 'https://')):
-                                        delete_image(product.barcode_image_path)
                                     new_barcode_image_path = barcode_image_url.strip()
                                 
                                 with col2:
@@ -222,10 +288,9 @@ def main():
                                     with col_img_curr:
                                         st.write("**รูปภาพปัจจุบัน:**")
                                         try:
-                                            if product.image_path.startswith(('http://', 'https://')):
-                                                st.image(product.image_path, width=150)
-                                            elif os.path.exists(product.image_path):
-                                                st.image(product.image_path, width=150)
+                                            thumbnail = get_thumbnail(product.image_path)
+                                            if thumbnail:
+                                                st.image(thumbnail, width=150)
                                         except:
                                             st.caption("ไม่สามารถแสดงรูปภาพได้")
                                 
@@ -248,15 +313,8 @@ def main():
                                 # กำหนด image_path
                                 new_image_path = product.image_path  # ค่าเดิม
                                 if uploaded_image_path:
-                                    # ลบรูปภาพเก่าถ้ามี (ถ้าเป็นไฟล์ในเครื่อง)
-                                    if product.image_path and not product.image_path.startswith(('http://', 'https://')):
-                                        from utils.image_upload import delete_image
-                                        delete_image(product.image_path)
                                     new_image_path = uploaded_image_path
                                 elif image_url and image_url.strip():
-                                    # ลบรูปภาพเก่าถ้ามี (ถ้าเป็นไฟล์ในเครื่อง)
-                                    if product.image_path and not product.image_path.startswith(('http://', 'https://')):
-                                        delete_image(product.image_path)
                                     new_image_path = image_url.strip()
                                 
                                 col_save, col_cancel = st.columns(2)
@@ -283,9 +341,14 @@ def main():
                                             product.selling_price = new_selling
                                             product.stock_quantity = new_stock
                                             product.min_stock = new_min_stock
+                                            old_image_path = product.image_path
+                                            old_barcode_image_path = product.barcode_image_path
+                                            product.image_path = new_image_path
                                             product.barcode_image_path = new_barcode_image_path
                                             product.updated_at = datetime.now()
                                             session.commit()
+                                            release_image(old_image_path, new_image_path)
+                                            release_image(old_barcode_image_path, new_barcode_image_path)
                                             st.session_state[f"editing_product_{product.id}"] = False
                                             st.success("✅ บันทึกสำเร็จ")
                                             st.rerun()
@@ -299,6 +362,8 @@ def main():
                                         st.rerun()
             else:
                 st.info("ไม่พบสินค้า")
+            
+            show_label_sheet([product.id for product in all_products])
         finally:
             session.close()
     
@@ -438,7 +503,7 @@ def main():
                                         )
                                         session.add(product)
                                         session.commit()
-                                        print(f"[DEBUG] เพิ่มสินค้าพร้อมบาร์โค๊ด - Product: {name}, Barcode: {barcode.strip()} - {datetime.now()}")
+                                        logger.debug("เพิ่มสินค้าพร้อมบาร์โค๊ด - Product: %s, Barcode: %s", name, barcode.strip())
                                         st.success(f"✅ เพิ่มสินค้า {name} สำเร็จ")
                                         # Clear barcode from session state
                                         st.session_state.add_product_barcode = ""
@@ -469,6 +534,8 @@ def main():
                         st.warning("⚠️ กรุณากรอกข้อมูลที่จำเป็น")
         finally:
             session.close()
+        
+        show_bulk_image_import()
     
     with tab3:
         st.subheader("📥 บันทึกสต็อคเข้า")
@@ -523,7 +590,7 @@ def main():
                                         product.cost_price = new_total / new_stock
                                 
                                 session.commit()
-                                print(f"[DEBUG] บันทึกสต็อคเข้า - Product: {product.name}, Qty: {quantity}, User: {st.session_state.user_id} - {datetime.now()}")
+                                logger.debug("บันทึกสต็อคเข้า - Product: %s, Qty: %s, User: %s", product.name, quantity, st.session_state.user_id)
                                 st.success("✅ บันทึกสต็อคเข้าสำเร็จ")
                                 st.rerun()
                         except Exception as e:
@@ -586,7 +653,7 @@ def main():
                                     product.stock_quantity = 0
                             
                             session.commit()
-                            print(f"[DEBUG] บันทึกสต็อคออก - Product: {product.name if product else 'N/A'}, Qty: {quantity}, Reason: {reason}, User: {st.session_state.user_id} - {datetime.now()}")
+                            logger.debug("บันทึกสต็อคออก - Product: %s, Qty: %s, Reason: %s, User: %s", product.name if product else 'N/A', quantity, reason, st.session_state.user_id)
                             st.success("✅ บันทึกสต็อคออกสำเร็จ")
                             st.rerun()
                         except Exception as e:
@@ -642,5 +709,6 @@ def main():
         session.close()
 
 if __name__ == "__main__":
-    main()
+    with track_rerun(__file__):
+        main()
 
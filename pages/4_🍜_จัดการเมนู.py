@@ -3,16 +3,24 @@ Menu Management Page - จัดการเมนูอาหาร
 """
 
 import streamlit as st
-import os
 from datetime import datetime
 from database.db import get_session
 from database.models import Menu, MenuItem, Product
 from utils.helpers import format_currency, calculate_menu_cost
 from utils.pagination import paginate_items
-from utils.image_upload import image_uploader_widget, delete_image
+from utils.search import search, rank_order
+from utils.image_upload import image_uploader_widget, release_image
+from utils.thumbnails import get_thumbnail
+from utils.perf_monitor import track_rerun
+from utils.logger import get_logger
+
+logger = get_logger("pages.menu")
 
 st.set_page_config(page_title="จัดการเมนู", page_icon="🍜", layout="wide")
 
+# จำนวนผลค้นหาสูงสุด (เรียงตามความเกี่ยวข้อง)
+SEARCH_LIMIT = 500
+
 def main():
     # Check authentication and redirect to login if not authenticated
     from utils.auth import require_auth
@@ -41,10 +49,14 @@ def main():
             if show_active:
                 query = query.filter(Menu.is_active == True)
             
+            hits = None
             if search_term:
-                query = query.filter(Menu.name.contains(search_term))
+                hits = search(search_term, 'menu', limit=SEARCH_LIMIT, only='active' if show_active else None)
+                query = query.filter(Menu.id.in_([hit.id for hit in hits]))
             
             all_menus = query.order_by(Menu.name).all()
+            if hits is not None:
+                all_menus = rank_order(all_menus, hits)
             
             # Pagination
             if 'menu_page' not in st.session_state:
@@ -86,16 +98,12 @@ def main():
                         # Display menu image if available
                         if menu.image_path:
                             try:
-                                # Check if it's a URL or file path
-                                if menu.image_path.startswith(('http://', 'https://')):
-                                    st.image(menu.image_path, caption=menu.name, width=200, use_container_width=False)
-                                else:
-                                    # Try to load as file path
-                                    if os.path.exists(menu.image_path):
-                                        st.image(menu.image_path, caption=menu.name, width=200, use_container_width=False)
+                                thumbnail = get_thumbnail(menu.image_path)
+                                if thumbnail:
+                                    st.image(thumbnail, caption=menu.name, width=200, use_container_width=False)
                             except Exception as e:
                                 st.caption("🖼️ ไม่สามารถแสดงรูปภาพได้")
-                                print(f"[DEBUG] Error loading menu image: {e}")
+                                logger.error("Error loading menu image: %s", e)
                         
                         col1, col2, col3 = st.columns(3)
                         
@@ -182,10 +190,9 @@ def main():
                                     with col_img_curr:
                                         st.write("**รูปภาพปัจจุบัน:**")
                                         try:
-                                            if menu.image_path.startswith(('http://', 'https://')):
-                                                st.image(menu.image_path, width=150)
-                                            elif os.path.exists(menu.image_path):
-                                                st.image(menu.image_path, width=150)
+                                            thumbnail = get_thumbnail(menu.image_path)
+                                            if thumbnail:
+                                                st.image(thumbnail, width=150)
                                         except:
                                             st.caption("ไม่สามารถแสดงรูปภาพได้")
                                 
@@ -206,17 +213,11 @@ def main():
                                     )
                                 
                                 # กำหนด image_path
+                                # รูปเก่าจะถูกลบหลังบันทึกสำเร็จเท่านั้น (release_image)
                                 new_image_path = menu.image_path  # ค่าเดิม
                                 if uploaded_image_path:
-                                    # ลบรูปภาพเก่าถ้ามี (ถ้าเป็นไฟล์ในเครื่อง)
-                                    if menu.image_path and not menu.image_path.startswith(('http://', 'https://')):
-                                        from utils.image_upload import delete_image
-                                        delete_image(menu.image_path)
                                     new_image_path = uploaded_image_path
                                 elif image_url and image_url.strip():
-                                    # ลบรูปภาพเก่าถ้ามี (ถ้าเป็นไฟล์ในเครื่อง)
-                                    if menu.image_path and not menu.image_path.startswith(('http://', 'https://')):
-                                        delete_image(menu.image_path)
                                     new_image_path = image_url.strip()
                                 
                                 # Edit BOM
@@ -288,6 +289,7 @@ def main():
                                 with col_save:
                                     if st.form_submit_button("💾 บันทึก", width='stretch'):
                                         try:
+                                            old_image_path = menu.image_path
                                             menu.name = new_name
                                             menu.description = new_description
                                             menu.price = new_price
@@ -300,6 +302,7 @@ def main():
                                                 item.quantity = st.session_state.get(f"bom_qty_{menu.id}_{item.id}", item.quantity)
                                             
                                             session.commit()
+                                            release_image(old_image_path, new_image_path)
                                             st.session_state[f"editing_menu_{menu.id}"] = False
                                             st.success("✅ บันทึกสำเร็จ")
                                             st.rerun()
@@ -459,7 +462,7 @@ def main():
                                     session.add(menu_item)
                                 
                                 session.commit()
-                                print(f"[DEBUG] เพิ่มเมนูสำเร็จ - Menu: {name}, Price: {price}, BOM Items: {len(st.session_state.bom_items)} - {datetime.now()}")
+                                logger.debug("เพิ่มเมนูสำเร็จ - Menu: %s, Price: %s, BOM Items: %s", name, price, len(st.session_state.bom_items))
                                 st.success(f"✅ เพิ่มเมนู {name} สำเร็จ")
                                 st.session_state.bom_items = []
                                 st.rerun()
@@ -472,5 +475,6 @@ def main():
             session.close()
 
 if __name__ == "__main__":
-    main()
+    with track_rerun(__file__):
+        main()
 
@@ -10,47 +10,48 @@ import pandas as pd
 from database.db import get_session
 from database.models import Sale, SaleItem, Product, Menu, Customer, Expense
 from utils.expense import get_expense_summary
-from sqlalchemy import func
+from sqlalchemy import func, select
 from sqlalchemy.orm import joinedload
-from utils.helpers import format_currency, calculate_menu_cost
-from utils.tax import get_tax_report, generate_tax_invoice
+from utils.helpers import format_currency
+from utils.frames import fetch_frame, get_sale_item_profit_frame
+from utils.time_buckets import day_of, hour_of, weekday_of, WEEKDAY_NAMES
+from utils.tax import get_tax_report, generate_tax_invoice, get_monthly_vat_summary, invalidate_monthly_tax_summary
 import io
+from utils.perf_monitor import track_rerun
 
 st.set_page_config(page_title="รายงาน", page_icon="📈", layout="wide")
 
-def get_sales_report(start_date: datetime, end_date: datetime):
-    """Get sales report data"""
+def get_sales_report(start_date: datetime, end_date: datetime, include_sales: bool = True):
+    """Get sales report data
+    include_sales=False skips loading the Sale objects (for summaries that only need totals)
+    """
     session = get_session()
     try:
-        sales = session.query(Sale).options(
-            joinedload(Sale.creator)
+        total_sales, total_count = session.query(
+            func.coalesce(func.sum(Sale.final_amount), 0),
+            func.count(Sale.id)
         ).filter(
             Sale.sale_date >= start_date,
             Sale.sale_date <= end_date,
             Sale.is_void == False
-        ).all()
+        ).one()
+        
+        sales = []
+        if include_sales:
+            sales = session.query(Sale).options(
+                joinedload(Sale.creator)
+            ).filter(
+                Sale.sale_date >= start_date,
+                Sale.sale_date <= end_date,
+                Sale.is_void == False
+            ).all()
         
-        total_sales = sum(s.final_amount for s in sales)
-        total_count = len(sales)
-        
-        # Calculate profit
-        total_profit = 0.0
-        for sale in sales:
-            for item in sale.sale_items:
-                if item.item_type == 'product':
-                    if item.product:
-                        cost = item.product.cost_price
-                        # Profit after discount
-                        item_profit = (item.unit_price - cost) * item.quantity - (item.discount_amount or 0)
-                        total_profit += item_profit
-                elif item.item_type == 'menu':
-                    menu_cost = calculate_menu_cost(item.menu_id)
-                    # Profit after discount
-                    item_profit = (item.unit_price - menu_cost) * item.quantity - (item.discount_amount or 0)
-                    total_profit += item_profit
+        # Calculate profit (after discount) - vectorized over all sale items
+        items = get_sale_item_profit_frame(session, start_date, end_date)
+        total_profit = float(items['profit'].sum())
         
         return {
-            'total_sales': total_sales,
+            'total_sales': float(total_sales),
             'total_count': total_count,
             'total_profit': total_profit,
             'sales': sales
@@ -58,6 +59,60 @@ def get_sales_report(start_date: datetime, end_date: datetime):
     finally:
         session.close()
 
+def get_daily_profit(start_date: datetime, end_date: datetime) -> pd.DataFrame:
+    """Get daily sales and profit in one pass
+    Returns: DataFrame with columns date, ยอดขาย, กำไร
+    """
+    session = get_session()
+    try:
+        sales = fetch_frame(session, select(
+            Sale.sale_date,
+            Sale.final_amount
+        ).where(
+            Sale.sale_date >= start_date,
+            Sale.sale_date <= end_date,
+            Sale.is_void == False
+        ))
+        if sales.empty:
+            return pd.DataFrame(columns=['date', 'ยอดขาย', 'กำไร'])
+        
+        items = get_sale_item_profit_frame(session, start_date, end_date)
+        daily_sales = sales['final_amount'].astype(float).groupby(
+            pd.to_datetime(sales['sale_date']).dt.normalize()
+        ).sum()
+        daily_profit = items['profit'].astype(float).groupby(
+            pd.to_datetime(items['sale_date']).dt.normalize()
+        ).sum()
+        
+        df = pd.DataFrame({'ยอดขาย': daily_sales, 'กำไร': daily_profit}).fillna(0.0)
+        df.index.name = 'date'
+        return df.reset_index()
+    finally:
+        session.close()
+
+def get_sales_by_time(start_date: datetime, end_date: datetime, **buckets):
+    """Group non-void sales by time buckets in one query
+    buckets: label -> expression from utils.time_buckets (e.g. hour=hour_of(Sale.sale_date))
+    Returns: rows with the bucket labels, total and count
+    """
+    session = get_session()
+    try:
+        return session.query(
+            *[expression.label(label) for label, expression in buckets.items()],
+            func.sum(Sale.final_amount).label('total'),
+            func.count(Sale.id).label('count')
+        ).filter(
+            Sale.sale_date >= start_date,
+            Sale.sale_date <= end_date,
+            Sale.is_void == False
+        ).group_by(
+            *buckets.values()
+        ).order_by(
+            *buckets.values()
+        ).all()
+    finally:
+        session.close()
+
 def get_top_selling_items(start_date: datetime, end_date: datetime, limit: int = 10):
     """Get top selling items"""
     session = get_session()
@@ -164,52 +219,35 @@ def main():
         st.divider()
         st.write("**กราฟยอดขายรายวัน**")
         
-        session = get_session()
-        try:
-            daily_sales = session.query(
-                func.date(Sale.sale_date).label('date'),
-                func.sum(Sale.final_amount).label('total'),
-                func.count(Sale.id).label('count')
-            ).filter(
-                Sale.sale_date >= start_datetime,
-                Sale.sale_date <= end_datetime,
-                Sale.is_void == False
-            ).group_by(
-                func.date(Sale.sale_date)
-            ).order_by(
-                func.date(Sale.sale_date).asc()
-            ).all()
+        daily_sales = get_sales_by_time(start_datetime, end_datetime, date=day_of(Sale.sale_date))
+        if daily_sales:
+            df_daily = pd.DataFrame([
+                {'date': d.date, 'ยอดขาย': d.total or 0.0, 'จำนวน': d.count or 0}
+                for d in daily_sales
+            ])
+            df_daily['date'] = pd.to_datetime(df_daily['date'])
             
-            if daily_sales:
-                df_daily = pd.DataFrame([
-                    {'date': d.date, 'ยอดขาย': d.total or 0.0, 'จำนวน': d.count or 0}
-                    for d in daily_sales
-                ])
-                df_daily['date'] = pd.to_datetime(df_daily['date'])
-                
-                fig = px.line(
-                    df_daily,
-                    x='date',
-                    y='ยอดขาย',
-                    labels={'date': 'วันที่', 'ยอดขาย': 'ยอดขาย (฿)'},
-                    title="ยอดขายรายวัน"
+            fig = px.line(
+                df_daily,
+                x='date',
+                y='ยอดขาย',
+                labels={'date': 'วันที่', 'ยอดขาย': 'ยอดขาย (฿)'},
+                title="ยอดขายรายวัน"
+            )
+            fig.update_layout(height=400, hovermode='x unified')
+            st.plotly_chart(fig, width='stretch')
+            
+            # Export button
+            if st.button("📥 Export เป็น Excel"):
+                excel_data = export_to_excel(df_daily, f"sales_report_{start_date}_{end_date}.xlsx")
+                st.download_button(
+                    "ดาวน์โหลด",
+                    excel_data,
+                    file_name=f"sales_report_{start_date}_{end_date}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                 )
-                fig.update_layout(height=400, hovermode='x unified')
-                st.plotly_chart(fig, width='stretch')
-                
-                # Export button
-                if st.button("📥 Export เป็น Excel"):
-                    excel_data = export_to_excel(df_daily, f"sales_report_{start_date}_{end_date}.xlsx")
-                    st.download_button(
-                        "ดาวน์โหลด",
-                        excel_data,
-                        file_name=f"sales_report_{start_date}_{end_date}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
-            else:
-                st.info("ไม่มีข้อมูลยอดขายในช่วงเวลานี้")
-        finally:
-            session.close()
+        else:
+            st.info("ไม่มีข้อมูลยอดขายในช่วงเวลานี้")
         
         # Sales table
         st.divider()
@@ -235,7 +273,7 @@ def main():
     elif report_type == "กำไร-ขาดทุน":
         st.subheader("💵 รายงานกำไร-ขาดทุน")
         
-        report_data = get_sales_report(start_datetime, end_datetime)
+        report_data = get_sales_report(start_datetime, end_datetime, include_sales=False)
         
         # Metrics
         col1, col2, col3 = st.columns(3)
@@ -251,58 +289,33 @@ def main():
         st.divider()
         st.write("**กราฟกำไรรายวัน**")
         
-        session = get_session()
-        try:
-            daily_profit = []
-            daily_sales = session.query(
-                func.date(Sale.sale_date).label('date')
-            ).filter(
-                Sale.sale_date >= start_datetime,
-                Sale.sale_date <= end_datetime,
-                Sale.is_void == False
-            ).group_by(
-                func.date(Sale.sale_date)
-            ).all()
+        df_profit = get_daily_profit(start_datetime, end_datetime)
+        if not df_profit.empty:
+            df_profit['date'] = pd.to_datetime(df_profit['date'])
             
-            for day in daily_sales:
-                day_start = datetime.combine(day.date, datetime.min.time())
-                day_end = datetime.combine(day.date, datetime.max.time())
-                day_report = get_sales_report(day_start, day_end)
-                daily_profit.append({
-                    'date': day.date,
-                    'ยอดขาย': day_report['total_sales'],
-                    'กำไร': day_report['total_profit']
-                })
-            
-            if daily_profit:
-                df_profit = pd.DataFrame(daily_profit)
-                df_profit['date'] = pd.to_datetime(df_profit['date'])
-                
-                fig = go.Figure()
-                fig.add_trace(go.Scatter(
-                    x=df_profit['date'],
-                    y=df_profit['ยอดขาย'],
-                    name='ยอดขาย',
-                    line=dict(color='blue')
-                ))
-                fig.add_trace(go.Scatter(
-                    x=df_profit['date'],
-                    y=df_profit['กำไร'],
-                    name='กำไร',
-                    line=dict(color='green')
-                ))
-                fig.update_layout(
-                    title="ยอดขายและกำไรรายวัน",
-                    xaxis_title="วันที่",
-                    yaxis_title="จำนวนเงิน (฿)",
-                    height=400,
-                    hovermode='x unified'
-                )
-                st.plotly_chart(fig, width='stretch')
-            else:
-                st.info("ไม่มีข้อมูลกำไร")
-        finally:
-            session.close()
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(
+                x=df_profit['date'],
+                y=df_profit['ยอดขาย'],
+                name='ยอดขาย',
+                line=dict(color='blue')
+            ))
+            fig.add_trace(go.Scatter(
+                x=df_profit['date'],
+                y=df_profit['กำไร'],
+                name='กำไร',
+                line=dict(color='green')
+            ))
+            fig.update_layout(
+                title="ยอดขายและกำไรรายวัน",
+                xaxis_title="วันที่",
+                yaxis_title="จำนวนเงิน (฿)",
+                height=400,
+                hovermode='x unified'
+            )
+            st.plotly_chart(fig, width='stretch')
+        else:
+            st.info("ไม่มีข้อมูลกำไร")
     
     elif report_type == "สินค้าขายดี":
         st.subheader("🏆 สินค้าขายดี")
@@ -360,7 +373,7 @@ def main():
     elif report_type == "สรุปภาพรวม":
         st.subheader("📊 สรุปภาพรวม")
         
-        report_data = get_sales_report(start_datetime, end_datetime)
+        report_data = get_sales_report(start_datetime, end_datetime, include_sales=False)
         
         # Summary metrics
         col1, col2, col3, col4 = st.columns(4)
@@ -398,50 +411,59 @@ def main():
     elif report_type == "รายงานรายชั่วโมง":
         st.subheader("⏰ รายงานรายชั่วโมง (Peak Hours Analysis)")
         
-        session = get_session()
-        try:
-            hourly_sales = session.query(
-                func.strftime('%H', Sale.sale_date).label('hour'),
-                func.sum(Sale.final_amount).label('total'),
-                func.count(Sale.id).label('count')
-            ).filter(
-                Sale.sale_date >= start_datetime,
-                Sale.sale_date <= end_datetime,
-                Sale.is_void == False
-            ).group_by(
-                func.strftime('%H', Sale.sale_date)
-            ).order_by(
-                func.strftime('%H', Sale.sale_date).asc()
-            ).all()
+        hourly_sales = get_sales_by_time(start_datetime, end_datetime, hour=hour_of(Sale.sale_date))
+        if hourly_sales:
+            df_hourly = pd.DataFrame([
+                {'ชั่วโมง': f"{int(h.hour):02d}:00", 'ยอดขาย': h.total or 0.0, 'จำนวน': h.count or 0}
+                for h in hourly_sales
+            ])
             
-            if hourly_sales:
-                df_hourly = pd.DataFrame([
-                    {'ชั่วโมง': f"{int(h.hour):02d}:00", 'ยอดขาย': h.total or 0.0, 'จำนวน': h.count or 0}
-                    for h in hourly_sales
-                ])
-                
-                # Chart
-                fig = px.bar(
-                    df_hourly,
-                    x='ชั่วโมง',
-                    y='ยอดขาย',
-                    labels={'ชั่วโมง': 'เวลา', 'ยอดขาย': 'ยอดขาย (฿)'},
-                    title="ยอดขายรายชั่วโมง"
-                )
-                fig.update_layout(height=400, xaxis_tickangle=-45)
-                st.plotly_chart(fig, width='stretch')
-                
-                # Table
-                df_hourly['ยอดขาย'] = df_hourly['ยอดขาย'].apply(lambda x: format_currency(x))
-                st.dataframe(df_hourly, width='stretch', hide_index=True)
-                
-                # Peak hours
-                peak_hour = df_hourly.loc[df_hourly['ยอดขาย'].str.replace('฿', '').str.replace(',', '').astype(float).idxmax()]
-                st.metric("⏰ ชั่วโมงที่ขายดีที่สุด", peak_hour['ชั่วโมง'])
-            else:
-                st.info("ไม่มีข้อมูลยอดขาย")
-        finally:
-            session.close()
+            # Chart
+            fig = px.bar(
+                df_hourly,
+                x='ชั่วโมง',
+                y='ยอดขาย',
+                labels={'ชั่วโมง': 'เวลา', 'ยอดขาย': 'ยอดขาย (฿)'},
+                title="ยอดขายรายชั่วโมง"
+            )
+            fig.update_layout(height=400, xaxis_tickangle=-45)
+            st.plotly_chart(fig, width='stretch')
+            
+            # Peak hours
+            peak_hour = df_hourly.loc[df_hourly['ยอดขาย'].idxmax()]
+            
+            # Table
+            df_hourly['ยอดขาย'] = df_hourly['ยอดขาย'].apply(lambda x: format_currency(x))
+            st.dataframe(df_hourly, width='stretch', hide_index=True)
+            
+            st.metric("⏰ ชั่วโมงที่ขายดีที่สุด", peak_hour['ชั่วโมง'])
+            
+            # Weekday x hour heatmap (one grouped query)
+            st.divider()
+            st.write("**🔥 ยอดขายตามวันในสัปดาห์ × ชั่วโมง**")
+            heatmap_sales = get_sales_by_time(
+                start_datetime, end_datetime,
+                weekday=weekday_of(Sale.sale_date),
+                hour=hour_of(Sale.sale_date)
+            )
+            df_heatmap = pd.DataFrame(
+                [(int(h.weekday), int(h.hour), h.total or 0.0) for h in heatmap_sales],
+                columns=['weekday', 'hour', 'total']
+            ).pivot(index='weekday', columns='hour', values='total').reindex(
+                index=range(7), columns=range(24)
+            ).fillna(0.0)
+            
+            fig = go.Figure(go.Heatmap(
+                z=df_heatmap.values,
+                x=[f"{hour:02d}:00" for hour in df_heatmap.columns],
+                y=WEEKDAY_NAMES,
+                colorscale='YlOrRd',
+                hovertemplate="%{y} %{x}<br>ยอดขาย: ฿%{z:,.2f}<extra></extra>"
+            ))
+            fig.update_layout(height=400, yaxis_autorange='reversed')
+            st.plotly_chart(fig, width='stretch')
+        else:
+            st.info("ไม่มีข้อมูลยอดขาย")
     
     elif report_type == "เปรียบเทียบ":
         st.subheader("📊 รายงานเปรียบเทียบ")
@@ -457,7 +479,7 @@ def main():
                     day = (datetime.now() - timedelta(days=i)).date()
                     day_start = datetime.combine(day, datetime.min.time())
                     day_end = datetime.combine(day, datetime.max.time())
-                    day_report = get_sales_report(day_start, day_end)
+                    day_report = get_sales_report(day_start, day_end, include_sales=False)
                     days_data.append({
                         'วันที่': day.strftime('%d/%m/%Y'),
                         'ยอดขาย': day_report['total_sales'],
@@ -498,7 +520,7 @@ def main():
                     else:
                         month_end = datetime(month_date.year, month_date.month + 1, 1) - timedelta(days=1)
                     
-                    month_report = get_sales_report(month_start, month_end)
+                    month_report = get_sales_report(month_start, month_end, include_sales=False)
                     months_data.append({
                         'เดือน': month_start.strftime('%m/%Y'),
                         'ยอดขาย': month_report['total_sales'],
@@ -577,7 +599,7 @@ def main():
     elif report_type == "กำไร-ขาดทุน (รวมค่าใช้จ่าย)":
         st.subheader("💵 รายงานกำไร-ขาดทุน (รวมค่าใช้จ่าย)")
         
-        report_data = get_sales_report(start_datetime, end_datetime)
+        report_data = get_sales_report(start_datetime, end_datetime, include_sales=False)
         expense_summary = get_expense_summary(start_datetime, end_datetime)
         
         # Calculate net profit
@@ -648,6 +670,31 @@ def main():
             df_tax = pd.DataFrame(tax_data)
             st.dataframe(df_tax, width='stretch', hide_index=True)
         
+        # Monthly VAT summary (ภ.พ.30)
+        st.divider()
+        st.write("**🗓️ สรุปภาษีขายรายเดือน (ภ.พ.30)**")
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            vat_year = st.number_input("ปี (ค.ศ.)", min_value=2000, max_value=datetime.now().year,
+                                       value=datetime.now().year, step=1, key="vat_summary_year")
+        with col2:
+            st.write("")
+            if st.button("🔄 คำนวณใหม่", key="refresh_vat_summary_btn", width='stretch'):
+                invalidate_monthly_tax_summary(year=int(vat_year))
+        
+        vat_summary = get_monthly_vat_summary(int(vat_year))
+        if any(month['count'] for month in vat_summary):
+            df_vat = pd.DataFrame(vat_summary)
+            df_vat = df_vat[['month', 'count', 'subtotal', 'tax', 'total']]
+            df_vat.columns = ['เดือน', 'จำนวนใบกำกับ', 'ยอดขาย (ก่อนภาษี)', 'ภาษีขาย', 'รวม']
+            totals = df_vat[['จำนวนใบกำกับ', 'ยอดขาย (ก่อนภาษี)', 'ภาษีขาย', 'รวม']].sum()
+            st.metric("ภาษีขายทั้งปี", format_currency(totals['ภาษีขาย']))
+            for column in ['ยอดขาย (ก่อนภาษี)', 'ภาษีขาย', 'รวม']:
+                df_vat[column] = df_vat[column].apply(lambda x: format_currency(x))
+            st.dataframe(df_vat, width='stretch', hide_index=True)
+        else:
+            st.info("ไม่มีข้อมูลภาษีในปีนี้")
+        
         # Generate tax invoice for specific sale
         st.divider()
         st.write("**🧾 สร้างใบกำกับภาษี**")
@@ -666,5 +713,6 @@ def main():
             )
 
 if __name__ == "__main__":
-    main()
+    with track_rerun(__file__):
+        main()
 
@@ -12,6 +12,8 @@ from utils.attendance import (
     get_employee_performance, create_shift, get_shifts_by_date_range
 )
 import bcrypt
+from utils.perf_monitor import track_rerun
+from utils.search import search, rank_order
 
 st.set_page_config(page_title="จัดการผู้ใช้", page_icon="👥", layout="wide")
 
@@ -313,19 +315,22 @@ def main():
             query = session.query(Customer)
             
             # Apply filters
-            if search_term:
-                query = query.filter(
-                    (Customer.name.contains(search_term)) |
-                    (Customer.phone.contains(search_term)) |
-                    (Customer.email.contains(search_term))
-                )
-            
+            member_filter = None
             if search_type == "สมาชิก":
+                member_filter = 'member'
                 query = query.filter(Customer.is_member == True)
             elif search_type == "ไม่ใช่สมาชิก":
+                member_filter = 'non_member'
                 query = query.filter(Customer.is_member == False)
             
-            customers = query.order_by(Customer.name).limit(50).all()
+            hits = None
+            if search_term:
+                hits = search(search_term, 'customer', limit=200, only=member_filter)
+                query = query.filter(Customer.id.in_([hit.id for hit in hits]))
+            
+            customers = query.order_by(Customer.name).limit(50 if hits is None else len(hits)).all()
+            if hits is not None:
+                customers = rank_order(customers, hits)[:50]
             
             if customers:
                 for customer in customers:
@@ -768,5 +773,6 @@ def main():
                     session.close()
 
 if __name__ == "__main__":
-    main()
+    with track_rerun(__file__):
+        main()
 
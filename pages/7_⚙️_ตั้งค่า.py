@@ -19,6 +19,10 @@ from utils.store_settings import (
 )
 import pandas as pd
 import plotly.express as px
+from utils.perf_monitor import (
+    track_rerun, get_perf_settings, save_perf_settings, get_recent_reruns, clear_recent_reruns,
+    PERF_LOG_PATH
+)
 
 st.set_page_config(page_title="ตั้งค่า", page_icon="⚙️", layout="wide")
 
@@ -35,9 +39,9 @@ def main():
         return
     
     # Tabs
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
         "🏪 ตั้งค่าร้าน", "🧾 ตั้งค่าใบเสร็จ", "💾 สำรองข้อมูล", 
-        "💰 จัดการค่าใช้จ่าย", "🎁 จัดการโปรโมชั่น", "📦 ข้อมูล Mockup"
+        "💰 จัดการค่าใช้จ่าย", "🎁 จัดการโปรโมชั่น", "📦 ข้อมูล Mockup", "⚡ ประสิทธิภาพ"
     ])
     
     with tab1:
@@ -877,6 +881,69 @@ def main():
                 st.session_state.confirm_delete_mockup = True
                 st.warning("⚠️ กรุณากดปุ่มอีกครั้งเพื่อยืนยันการลบ")
 
+    with tab7:
+        st.subheader("⚡ ประสิทธิภาพ")
+        st.caption("สถิติ SQL ต่อการโหลดหน้าแต่ละครั้ง (เก็บในหน่วยความจำล่าสุด และบันทึกลง log)")
+        
+        perf_settings = get_perf_settings()
+        with st.form("perf_settings_form"):
+            col1, col2 = st.columns(2)
+            with col1:
+                query_budget = st.number_input("งบ SQL ต่อการโหลดหน้า (ครั้ง)", min_value=1, value=int(perf_settings['query_budget']), step=10)
+            with col2:
+                slow_query_ms = st.number_input("SQL ที่ถือว่าช้า (ms)", min_value=1.0, value=float(perf_settings['slow_query_ms']), step=50.0)
+            
+            if st.form_submit_button("💾 บันทึก", type="primary", width='stretch'):
+                save_perf_settings(query_budget, slow_query_ms, st.session_state.get('user_id'))
+                st.success("✅ บันทึกการตั้งค่าสำเร็จ")
+                st.rerun()
+        
+        reruns = get_recent_reruns()
+        if reruns:
+            df_reruns = pd.DataFrame([
+                {
+                    'เวลา': r['started_at'],
+                    'หน้า': r['page'],
+                    'เวลารวม (ms)': r['duration_ms'],
+                    'SQL': r['queries'],
+                    'เวลา DB (ms)': r['db_ms'],
+                    'Session': r['sessions'],
+                    'เกินงบ': '⚠️' if r['over_budget'] else ''
+                }
+                for r in reruns
+            ])
+            
+            st.markdown("#### 📊 สรุปตามหน้า")
+            df_pages = df_reruns.groupby('หน้า').agg(
+                จำนวนครั้ง=('SQL', 'size'),
+                SQL_เฉลี่ย=('SQL', 'mean'),
+                SQL_สูงสุด=('SQL', 'max'),
+                DB_เฉลี่ย_ms=('เวลา DB (ms)', 'mean'),
+                เวลารวมเฉลี่ย_ms=('เวลารวม (ms)', 'mean')
+            ).round(1).sort_values('SQL_เฉลี่ย', ascending=False)
+            st.dataframe(df_pages, width='stretch')
+            
+            st.markdown("#### 🕒 การโหลดหน้าล่าสุด")
+            st.dataframe(df_reruns, width='stretch', hide_index=True)
+            
+            with st.expander("🐢 SQL ที่ช้าที่สุด"):
+                slowest = sorted(
+                    ({'ms': s['ms'], 'หน้า': r['page'], 'sql': s['sql']} for r in reruns for s in r['slowest']),
+                    key=lambda s: s['ms'], reverse=True
+                )[:20]
+                for s in slowest:
+                    st.write(f"**{s['ms']:.1f} ms** - {s['หน้า']}")
+                    st.code(s['sql'], language='sql')
+            
+            if st.button("🗑️ ล้างสถิติ", width='stretch'):
+                clear_recent_reruns()
+                st.rerun()
+        else:
+            st.info("ยังไม่มีสถิติ")
+        
+        st.caption(f"📄 Log: {PERF_LOG_PATH}")
+
 if __name__ == "__main__":
-    main()
+    with track_rerun(__file__):
+        main()
 
@@ -5,56 +5,16 @@ Void Sale Page - ยกเลิกการขาย
 import streamlit as st
 from datetime import datetime, timedelta
 from database.db import get_session
-from database.models import Sale, SaleItem, Product, Menu, User
 from utils.helpers import format_currency, format_date
-from utils.pagination import paginate_items
+from utils.sale_history import parse_receipt_number, get_sale_by_receipt, get_sale_history_page, count_sale_history
+from utils.sale_reversal import void_sale
 import pandas as pd
+from utils.perf_monitor import track_rerun
+from utils.logger import get_logger
 
-st.set_page_config(page_title="ยกเลิกการขาย", page_icon="🔄", layout="wide")
+logger = get_logger("pages.void_sale")
 
-def void_sale(sale_id: int, reason: str, user_id: int):
-    """Void a sale and restore stock"""
-    session = get_session()
-    try:
-        sale = session.query(Sale).filter(Sale.id == sale_id).first()
-        if not sale:
-            return False, "ไม่พบการขาย"
-        
-        if sale.is_void:
-            return False, "การขายนี้ถูกยกเลิกไปแล้ว"
-        
-        # Restore stock for each item
-        for item in sale.sale_items:
-            if item.item_type == 'product' and item.product_id:
-                product = session.query(Product).filter(Product.id == item.product_id).first()
-                if product:
-                    product.stock_quantity += item.quantity
-            
-            elif item.item_type == 'menu' and item.menu_id:
-                menu = session.query(Menu).filter(Menu.id == item.menu_id).first()
-                if menu:
-                    for menu_item in menu.menu_items:
-                        if menu_item.product:
-                            product = session.query(Product).filter(
-                                Product.id == menu_item.product.id
-                            ).first()
-                            if product:
-                                quantity_needed = menu_item.quantity * item.quantity
-                                product.stock_quantity += quantity_needed
-        
-        # Mark sale as void
-        sale.is_void = True
-        sale.void_reason = reason
-        sale.voided_by = user_id
-        sale.voided_at = datetime.now()
-        
-        session.commit()
-        return True, "ยกเลิกการขายสำเร็จ"
-    except Exception as e:
-        session.rollback()
-        return False, f"เกิดข้อผิดพลาด: {str(e)}"
-    finally:
-        session.close()
+st.set_page_config(page_title="ยกเลิกการขาย", page_icon="🔄", layout="wide")
 
 def main():
     # Check authentication and redirect to login if not authenticated
@@ -79,52 +39,49 @@ def main():
     
     session = get_session()
     try:
-        # Query sales
-        query = session.query(Sale)
+        start_date = datetime.now() - timedelta(days=days)
         
         if sale_id_search and sale_id_search.strip():
-            try:
-                sale_id = int(sale_id_search.strip())
-                query = query.filter(Sale.id == sale_id)
-            except ValueError:
+            # ค้นหาด้วยเลขที่ใบเสร็จ - ไม่ต้องแบ่งหน้า
+            if parse_receipt_number(sale_id_search) is None:
                 st.warning("⚠️ กรุณากรอกเลขที่การขายเป็นตัวเลข")
-                query = query.filter(Sale.id == -1)  # No results
-        
-        if not show_voided:
-            query = query.filter(Sale.is_void == False)
-        
-        start_date = datetime.now() - timedelta(days=days)
-        query = query.filter(Sale.created_at >= start_date)
-        
-        all_sales = query.order_by(Sale.created_at.desc()).all()
-        
-        # Pagination
-        if 'void_sale_page' not in st.session_state:
-            st.session_state.void_sale_page = 1
-        
-        items_per_page = st.selectbox("แสดงต่อหน้า", [10, 20, 50], index=0, key="void_sale_items_per_page")
-        
-        paginated_sales, total_items, total_pages, current_page = paginate_items(
-            all_sales,
-            st.session_state.void_sale_page,
-            items_per_page
-        )
-        
-        st.info(f"📊 แสดง {len(paginated_sales)} จาก {total_items} รายการ (หน้า {current_page}/{total_pages})")
-        
-        # Pagination controls
-        if total_pages > 1:
-            col_prev, col_page, col_next = st.columns([1, 3, 1])
-            with col_prev:
-                if st.button("◀️ ก่อนหน้า", disabled=(current_page == 1), width='stretch', key="void_prev"):
-                    st.session_state.void_sale_page = max(1, current_page - 1)
-                    st.rerun()
-            with col_page:
-                st.write(f"หน้า {current_page} / {total_pages}")
-            with col_next:
-                if st.button("ถัดไป ▶️", disabled=(current_page == total_pages), width='stretch', key="void_next"):
-                    st.session_state.void_sale_page = min(total_pages, current_page + 1)
-                    st.rerun()
+                paginated_sales = []
+            else:
+                sale = get_sale_by_receipt(session, sale_id_search)
+                paginated_sales = [sale] if sale and (show_voided or not sale.is_void) else []
+        else:
+            items_per_page = st.selectbox("แสดงต่อหน้า", [10, 20, 50], index=0, key="void_sale_items_per_page")
+            
+            # Keyset pagination - เก็บ cursor ของแต่ละหน้าไว้ (เริ่มใหม่เมื่อเปลี่ยนตัวกรอง)
+            filter_key = (days, show_voided, items_per_page)
+            if st.session_state.get('void_sale_filter') != filter_key:
+                st.session_state.void_sale_filter = filter_key
+                st.session_state.void_sale_cursors = [None]
+            cursors = st.session_state.void_sale_cursors
+            current_page = len(cursors)
+            
+            paginated_sales, next_cursor = get_sale_history_page(
+                session, start_date=start_date, include_void=show_voided,
+                after=cursors[-1], limit=items_per_page
+            )
+            total_items = count_sale_history(session, start_date=start_date, include_void=show_voided)
+            total_pages = max(1, (total_items + items_per_page - 1) // items_per_page)
+            
+            st.info(f"📊 แสดง {len(paginated_sales)} จาก {total_items} รายการ (หน้า {current_page}/{total_pages})")
+            
+            # Pagination controls
+            if total_pages > 1:
+                col_prev, col_page, col_next = st.columns([1, 3, 1])
+                with col_prev:
+                    if st.button("◀️ ก่อนหน้า", disabled=(current_page == 1), width='stretch', key="void_prev"):
+                        cursors.pop()
+                        st.rerun()
+                with col_page:
+                    st.write(f"หน้า {current_page} / {total_pages}")
+                with col_next:
+                    if st.button("ถัดไป ▶️", disabled=(next_cursor is None), width='stretch', key="void_next"):
+                        cursors.append(next_cursor)
+                        st.rerun()
         
         if paginated_sales:
             for sale in paginated_sales:
@@ -144,8 +101,7 @@ def main():
                         if sale.is_void:
                             st.write(f"**สถานะ:** 🔴 ยกเลิกแล้ว")
                             st.write(f"**เหตุผล:** {sale.void_reason or '-'}")
-                            voided_user = session.query(User).filter(User.id == sale.voided_by).first() if sale.voided_by else None
-                            st.write(f"**ยกเลิกโดย:** {voided_user.username if voided_user else '-'}")
+                            st.write(f"**ยกเลิกโดย:** {sale.voider.username if sale.voider else '-'}")
                             st.write(f"**วันที่ยกเลิก:** {format_date(sale.voided_at) if sale.voided_at else '-'}")
                         else:
                             st.write(f"**สถานะ:** 🟢 ปกติ")
@@ -179,7 +135,7 @@ def main():
                                                 if success:
                                                     st.session_state[f"voiding_sale_{sale.id}"] = False
                                                     st.success(f"✅ {message}")
-                                                    print(f"[DEBUG] ยกเลิกการขาย - Sale ID: {sale.id}, Reason: {reason}, User: {st.session_state.user_id} - {datetime.now()}")
+                                                    logger.debug("ยกเลิกการขาย - Sale ID: %s, Reason: %s, User: %s", sale.id, reason, st.session_state.user_id)
                                                     st.rerun()
                                                 else:
                                                     st.error(f"❌ {message}")
@@ -217,5 +173,6 @@ def main():
         session.close()
 
 if __name__ == "__main__":
-    main()
+    with track_rerun(__file__):
+        main()
 
@@ -5,97 +5,65 @@ Return/Refund Page - คืนสินค้า
 import streamlit as st
 from datetime import datetime, timedelta
 from database.db import get_session
-from database.models import Sale, SaleItem, Product, Menu, StockTransaction
 from utils.helpers import format_currency, format_date
-from utils.pagination import paginate_items
+from utils.sale_history import parse_receipt_number, get_sale_by_receipt, get_sale_history_page
+from utils.sale_reversal import return_sale_items
 import pandas as pd
+from utils.perf_monitor import track_rerun
+from utils.logger import get_logger
+
+logger = get_logger("pages.returns")
 
 st.set_page_config(page_title="คืนสินค้า", page_icon="↩️", layout="wide")
 
-def process_return(sale_id: int, return_items: list, reason: str, user_id: int):
-    """Process return/refund"""
-    session = get_session()
-    try:
-        sale = session.query(Sale).filter(Sale.id == sale_id).first()
-        if not sale:
-            return False, "ไม่พบการขาย"
-        
-        if sale.is_void:
-            return False, "ไม่สามารถคืนสินค้าจากการขายที่ถูกยกเลิกแล้ว"
-        
-        total_refund = 0.0
-        
-        # Process each return item
-        for return_item in return_items:
-            sale_item_id = return_item['sale_item_id']
-            return_quantity = return_item['quantity']
-            
-            sale_item = session.query(SaleItem).filter(SaleItem.id == sale_item_id).first()
-            if not sale_item:
-                continue
-            
-            if return_quantity > sale_item.quantity:
-                return False, f"จำนวนที่คืนเกินจำนวนที่ขาย (ขาย {sale_item.quantity:.2f})"
-            
-            # Calculate refund amount
-            refund_per_item = (sale_item.total_price / sale_item.quantity) * return_quantity
-            total_refund += refund_per_item
-            
-            # Restore stock
-            if sale_item.item_type == 'product' and sale_item.product_id:
-                product = session.query(Product).filter(Product.id == sale_item.product_id).first()
-                if product:
-                    product.stock_quantity += return_quantity
-                    
-                    # Create stock transaction
-                    transaction = StockTransaction(
-                        product_id=product.id,
-                        transaction_type='in',
-                        quantity=return_quantity,
-                        unit_price=product.cost_price,
-                        total_cost=product.cost_price * return_quantity,
-                        reason=f'คืนสินค้า - Sale #{sale_id}',
-                        created_by=user_id
-                    )
-                    session.add(transaction)
-            
-            elif sale_item.item_type == 'menu' and sale_item.menu_id:
-                menu = session.query(Menu).filter(Menu.id == sale_item.menu_id).first()
-                if menu:
-                    for menu_item in menu.menu_items:
-                        if menu_item.product:
-                            product = session.query(Product).filter(
-                                Product.id == menu_item.product.id
-                            ).first()
-                            if product:
-                                quantity_needed = menu_item.quantity * return_quantity
-                                product.stock_quantity += quantity_needed
-                                
-                                # Create stock transaction
-                                transaction = StockTransaction(
-                                    product_id=product.id,
-                                    transaction_type='in',
-                                    quantity=quantity_needed,
-                                    unit_price=product.cost_price,
-                                    total_cost=product.cost_price * quantity_needed,
-                                    reason=f'คืนเมนู {menu.name} - Sale #{sale_id}',
-                                    created_by=user_id
-                                )
-                                session.add(transaction)
-        
-        # Update sale total (reduce)
-        sale.total_amount -= total_refund
-        sale.final_amount -= total_refund
-        if sale.final_amount < 0:
-            sale.final_amount = 0
-        
-        session.commit()
-        return True, f"คืนสินค้าสำเร็จ จำนวนเงินคืน: {format_currency(total_refund)}"
-    except Exception as e:
-        session.rollback()
-        return False, f"เกิดข้อผิดพลาด: {str(e)}"
-    finally:
-        session.close()
+RECENT_SALES_PER_PAGE = 10
+
+def select_sale(sale_id: int):
+    """Put the chosen receipt number into the search box"""
+    st.session_state.return_sale_search = f"{sale_id:06d}"
+
+def show_recent_sales(session, days: int):
+    """List recent sales (keyset pagination) to pick one for return"""
+    st.subheader("🧾 การขายล่าสุด")
+    
+    # เริ่มหน้าแรกใหม่เมื่อเปลี่ยนจำนวนวัน
+    if st.session_state.get('return_sales_days') != days:
+        st.session_state.return_sales_days = days
+        st.session_state.return_sales_cursors = [None]
+    cursors = st.session_state.return_sales_cursors
+    
+    sales, next_cursor = get_sale_history_page(
+        session, start_date=datetime.now() - timedelta(days=days),
+        after=cursors[-1], limit=RECENT_SALES_PER_PAGE
+    )
+    if not sales:
+        st.info("ไม่พบการขาย")
+        return
+    
+    for sale in sales:
+        item_names = ", ".join(
+            (item.product.name if item.item_type == 'product' and item.product else
+             item.menu.name if item.item_type == 'menu' and item.menu else '-')
+            for item in sale.sale_items
+        )
+        col_info, col_select = st.columns([5, 1])
+        with col_info:
+            st.write(f"**{sale.id:06d}** - {format_date(sale.created_at)} - {format_currency(sale.final_amount)}")
+            st.caption(item_names)
+        with col_select:
+            st.button("เลือก", key=f"select_return_sale_{sale.id}", on_click=select_sale, args=(sale.id,), width='stretch')
+    
+    col_prev, col_page, col_next = st.columns([1, 3, 1])
+    with col_prev:
+        if st.button("◀️ ก่อนหน้า", disabled=(len(cursors) == 1), width='stretch', key="return_prev"):
+            cursors.pop()
+            st.rerun()
+    with col_page:
+        st.write(f"หน้า {len(cursors)}")
+    with col_next:
+        if st.button("ถัดไป ▶️", disabled=(next_cursor is None), width='stretch', key="return_next"):
+            cursors.append(next_cursor)
+            st.rerun()
 
 def main():
     # Check authentication and redirect to login if not authenticated
@@ -114,9 +82,10 @@ def main():
     session = get_session()
     try:
         if sale_id_search and sale_id_search.strip():
-            try:
-                sale_id = int(sale_id_search.strip())
-                sale = session.query(Sale).filter(Sale.id == sale_id).first()
+            if parse_receipt_number(sale_id_search) is None:
+                st.warning("⚠️ กรุณากรอกเลขที่การขายเป็นตัวเลข")
+            else:
+                sale = get_sale_by_receipt(session, sale_id_search)
                 
                 if sale:
                     if sale.is_void:
@@ -153,15 +122,16 @@ def main():
                             elif item.item_type == 'menu' and item.menu:
                                 item_name = item.menu.name
                             
+                            returned_qty = item.returned_quantity or 0.0
                             col_name, col_qty, col_return = st.columns([3, 1, 1])
                             with col_name:
                                 st.write(f"**{item_name}**")
-                                st.caption(f"ขาย: {item.quantity:.2f} | ราคา: {format_currency(item.unit_price)} | รวม: {format_currency(item.total_price)}")
+                                st.caption(f"ขาย: {item.quantity:.2f} | คืนแล้ว: {returned_qty:.2f} | ราคา: {format_currency(item.unit_price)} | รวม: {format_currency(item.total_price)}")
                             with col_qty:
                                 return_qty = st.number_input(
                                     "จำนวนคืน",
                                     min_value=0.0,
-                                    max_value=float(item.quantity),
+                                    max_value=max(float(item.quantity - returned_qty), 0.0),
                                     value=0.0,
                                     step=0.01,
                                     key=f"return_qty_{item.id}",
@@ -169,22 +139,19 @@ def main():
                                 )
                             with col_return:
                                 if return_qty > 0:
+                                    refund_amount = (item.total_price / item.quantity) * return_qty
                                     return_items.append({
                                         'sale_item_id': item.id,
                                         'quantity': return_qty,
-                                        'name': item_name
+                                        'name': item_name,
+                                        'refund': refund_amount
                                     })
-                                    refund_amount = (item.total_price / item.quantity) * return_qty
                                     st.write(f"คืน: {format_currency(refund_amount)}")
                             
                             st.divider()
                         
                         if return_items:
-                            total_refund = sum(
-                                (session.query(SaleItem).filter(SaleItem.id == item['sale_item_id']).first().total_price / 
-                                 session.query(SaleItem).filter(SaleItem.id == item['sale_item_id']).first().quantity) * item['quantity']
-                                for item in return_items
-                            )
+                            total_refund = sum(item['refund'] for item in return_items)
                             
                             st.info(f"💰 จำนวนเงินคืนรวม: {format_currency(total_refund)}")
                             
@@ -193,10 +160,10 @@ def main():
                             if st.button("↩️ คืนสินค้า", type="primary", width='stretch'):
                                 if reason:
                                     with st.spinner("⏳ กำลังประมวลผลการคืนสินค้า..."):
-                                        success, message = process_return(sale.id, return_items, reason, st.session_state.user_id)
+                                        success, message = return_sale_items(sale.id, return_items, reason, st.session_state.user_id)
                                         if success:
                                             st.success(f"✅ {message}")
-                                            print(f"[DEBUG] คืนสินค้า - Sale ID: {sale.id}, Items: {len(return_items)}, User: {st.session_state.user_id} - {datetime.now()}")
+                                            logger.debug("คืนสินค้า - Sale ID: %s, Items: %s, User: %s", sale.id, len(return_items), st.session_state.user_id)
                                             st.rerun()
                                         else:
                                             st.error(f"❌ {message}")
@@ -204,13 +171,14 @@ def main():
                                     st.warning("⚠️ กรุณากรอกเหตุผล")
                 else:
                     st.warning("⚠️ ไม่พบการขาย")
-            except ValueError:
-                st.warning("⚠️ กรุณากรอกเลขที่การขายเป็นตัวเลข")
+        else:
+            show_recent_sales(session, days)
     finally:
         session.close()
 
 if __name__ == "__main__":
-    main()
+    with track_rerun(__file__):
+        main()
 
 
 
@@ -5,8 +5,8 @@ OAuth Consent Screen
 
 import streamlit as st
 from utils.supabase_auth import get_supabase_client, require_supabase_auth
-import secrets
-from datetime import datetime, timedelta
+from utils.oauth_store import get_client, issue_authorization_code, redirect_uri_allowed, scope_allowed
+from utils.perf_monitor import track_rerun
 
 st.set_page_config(
     page_title="OAuth Consent",
@@ -14,7 +14,7 @@ st.set_page_config(
     layout="centered"
 )
 
-def generate_authorization_code(client_id: str, user_id: str, redirect_uri: str) -> str:
+def generate_authorization_code(client_id: str, user_id: str, redirect_uri: str, scope: str = None) -> str:
     """
     Generate OAuth authorization code
     
@@ -22,26 +22,12 @@ def generate_authorization_code(client_id: str, user_id: str, redirect_uri: str)
         client_id: OAuth client ID
         user_id: User ID
         redirect_uri: Redirect URI
+        scope: Requested scope
     
     Returns:
-        Authorization code
+        Authorization code (stored hashed in the database, valid 10 minutes, single use)
     """
-    # Generate random code
-    code = secrets.token_urlsafe(32)
-    
-    # Store in session state (in production, store in database)
-    if 'oauth_codes' not in st.session_state:
-        st.session_state.oauth_codes = {}
-    
-    # Store code with expiration (10 minutes)
-    st.session_state.oauth_codes[code] = {
-        'client_id': client_id,
-        'user_id': user_id,
-        'redirect_uri': redirect_uri,
-        'expires_at': datetime.now() + timedelta(minutes=10)
-    }
-    
-    return code
+    return issue_authorization_code(client_id, user_id, redirect_uri, scope)
 
 def main():
     """OAuth consent screen"""
@@ -164,6 +150,20 @@ def main():
         st.info("💡 Only 'code' response type is supported")
         return
     
+    # Validate against the registered client (ไม่ redirect ไปยัง URI ที่ไม่ได้ลงทะเบียน)
+    client = get_client(client_id)
+    if client is None:
+        st.error("❌ Unknown client_id")
+        st.info("💡 ลงทะเบียน client ใน secrets [oauth_clients.<client_id>] ก่อน")
+        return
+    if not redirect_uri_allowed(client, redirect_uri):
+        st.error("❌ redirect_uri ไม่ตรงกับที่ลงทะเบียนไว้สำหรับ client นี้")
+        return
+    if not scope_allowed(client, scope):
+        st.error(f"❌ Scope ไม่ได้รับอนุญาตสำหรับ client นี้: {scope}")
+        st.info(f"💡 Scope ที่ใช้ได้: {' '.join(client.scopes)}")
+        return
+    
     # Check if user is authenticated
     supabase = get_supabase_client()
     if not supabase:
@@ -212,7 +212,7 @@ def main():
     with col1:
         if st.button("✅ อนุญาต", type="primary", width='stretch'):
             # Generate authorization code
-            code = generate_authorization_code(client_id, user.id, redirect_uri)
+            code = generate_authorization_code(client_id, user.id, redirect_uri, scope)
             
             # Build redirect URL
             redirect_url = f"{redirect_uri}?code={code}"
@@ -234,5 +234,6 @@ def main():
             st.markdown(f'<meta http-equiv="refresh" content="1; url={error_url}">', unsafe_allow_html=True)
 
 if __name__ == "__main__":
-    main()
+    with track_rerun(__file__):
+        main()
 
@@ -0,0 +1,43 @@
+"""
+Script สำหรับ export ข้อมูลการขายเป็น Parquet (แบ่งตามเดือน) สำหรับ BI/นักบัญชี
+Export เฉพาะข้อมูลใหม่ตั้งแต่ครั้งล่าสุด (watermark) และเขียนไฟล์ของการขายที่ถูกยกเลิก/คืนสินค้าใหม่ - ตั้งเป็น cron job ได้
+
+ใช้งาน:
+    python scripts/export_analytics.py              # export ครั้งเดียว
+    python scripts/export_analytics.py --loop 60    # export ทุก 60 นาที
+"""
+
+import sys
+import os
+import argparse
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.db import init_db
+from utils.analytics_export import run_analytics_export, EXPORT_DIR
+
+def print_result(result: dict):
+    """Print export summary"""
+    if not result['success']:
+        print(f"❌ Export ไม่สำเร็จ: {result['error']}")
+        return
+
+    for table in result['tables']:
+        print(f"✅ {table['table']:<22} {table['rows']:>10,} แถว  {table['updated']:>6,} แก้ไข  {table['files']:>4} ไฟล์  (watermark: {table['watermark']})")
+    print(f"📁 ไฟล์อยู่ที่: {os.path.abspath(EXPORT_DIR)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export sales data to partitioned Parquet")
+    parser.add_argument("--loop", type=int, default=0, help="export ซ้ำทุก N นาที (0 = ครั้งเดียว)")
+    args = parser.parse_args()
+
+    init_db()
+
+    while True:
+        print("🚀 เริ่ม export ข้อมูล...")
+        print_result(run_analytics_export())
+        if args.loop <= 0:
+            break
+        time.sleep(args.loop * 60)
@@ -0,0 +1,122 @@
+"""
+Script จำลอง webhook ของแพลตฟอร์มเดลิเวอรี่ (ส่งออเดอร์เป็นชุด + ส่งซ้ำ) เพื่อตรวจว่า
+ingest_online_orders ไม่สร้างบิลซ้ำและตัดสต็อคครั้งเดียวต่อออเดอร์
+
+ใช้งาน:
+    python scripts/fake_webhook_sender.py                                # 200 ออเดอร์, ชุดละ 50
+    python scripts/fake_webhook_sender.py --orders 1000 --batch 100 --threads 4
+    python scripts/fake_webhook_sender.py --platform grabfood --seed 7
+
+สินค้า/เมนูที่มีอยู่ได้ SKU mapping อัตโนมัติ (SKU-P<id>, SKU-M<id>)
+"""
+
+import sys
+import os
+import argparse
+import random
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+from database.db import init_db, get_session
+from database.models import Product, Menu, Sale, StockTransaction, OnlineOrderReceipt
+from api.online_orders import PLATFORMS, ingest_online_orders, set_sku_mapping
+
+def ensure_mappings(platform: str, limit: int = 50) -> list:
+    """SKU mappings for the first products/menus -> [(sku, price)]"""
+    session = get_session()
+    try:
+        products = session.query(Product.id, Product.selling_price).order_by(Product.id).limit(limit).all()
+        menus = session.query(Menu.id, Menu.price).order_by(Menu.id).limit(limit).all()
+    finally:
+        session.close()
+
+    skus = []
+    for product_id, price in products:
+        set_sku_mapping(platform, f"SKU-P{product_id}", 'product', product_id)
+        skus.append((f"SKU-P{product_id}", float(price or 0)))
+    for menu_id, price in menus:
+        set_sku_mapping(platform, f"SKU-M{menu_id}", 'menu', menu_id)
+        skus.append((f"SKU-M{menu_id}", float(price or 0)))
+    return skus
+
+def make_orders(count: int, skus: list, rng: random.Random, run_id: str) -> list:
+    orders = []
+    for index in range(count):
+        items = []
+        for sku, price in rng.sample(skus, k=min(len(skus), rng.randint(1, 4))):
+            items.append({'sku': sku, 'quantity': rng.randint(1, 3), 'price': price})
+        orders.append({
+            'order_id': f"{run_id}-{index:06d}",
+            'customer_name': f"ลูกค้า {index % 300}",
+            'customer_phone': f"08{rng.randint(0, 99999999):08d}" if rng.random() < 0.7 else None,
+            'items': items,
+            'total': round(sum(i['price'] * i['quantity'] for i in items), 2)
+        })
+    return orders
+
+def check_run(run_id: str, since: datetime) -> tuple:
+    """(sales created by this run, stock-out rows written twice for the same sale line)"""
+    session = get_session()
+    try:
+        sale_ids = session.query(OnlineOrderReceipt.sale_id).filter(
+            OnlineOrderReceipt.external_order_id.like(f"{run_id}-%")
+        )
+        sales = session.query(func.count(Sale.id)).filter(Sale.id.in_(sale_ids)).scalar()
+        repeated = session.query(StockTransaction.product_id, StockTransaction.reason).filter(
+            StockTransaction.transaction_type == 'out',
+            StockTransaction.created_at >= since
+        ).group_by(StockTransaction.product_id, StockTransaction.reason).having(func.count() > 1).count()
+        return sales, repeated
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send fake delivery-platform webhooks (with retries)")
+    parser.add_argument("--platform", choices=PLATFORMS, default=PLATFORMS[0])
+    parser.add_argument("--orders", type=int, default=200, help="จำนวนออเดอร์ที่ไม่ซ้ำ")
+    parser.add_argument("--batch", type=int, default=50, help="จำนวนออเดอร์ต่อ webhook")
+    parser.add_argument("--threads", type=int, default=4, help="จำนวน webhook ที่ส่งพร้อมกันในรอบส่งซ้ำ")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    init_db()
+    rng = random.Random(args.seed)
+    run_id = f"FAKE{int(time.time())}"
+    started_at = datetime.now()
+
+    skus = ensure_mappings(args.platform)
+    if not skus:
+        print("❌ ไม่มีสินค้า/เมนูในฐานข้อมูล")
+        sys.exit(1)
+    orders = make_orders(args.orders, skus, rng, run_id)
+    batches = [orders[i:i + args.batch] for i in range(0, len(orders), args.batch)]
+
+    # รอบแรก: ส่งตามปกติ (เว้นชุดสุดท้ายไว้ทดสอบการส่งพร้อมกันครั้งแรก)
+    started = time.perf_counter()
+    first = [ingest_online_orders(args.platform, batch) for batch in batches[:-1]]
+    elapsed = time.perf_counter() - started
+    sent = sum(len(batch) for batch in batches[:-1])
+    accepted = sum(r['accepted'] for r in first)
+    if sent:
+        print(f"🚀 รอบแรก: รับ {accepted}/{sent} ออเดอร์ใน {elapsed:.2f}s ({sent / elapsed:.0f} ออเดอร์/วินาที)")
+
+    # รอบส่งซ้ำ: ทุกชุดซ้ำ 2 ครั้งพร้อมกันหลาย thread (ชุดสุดท้ายยังไม่เคยรับ) + ชุดที่มีออเดอร์ซ้ำในตัวเอง
+    resend = batches * 2 + [batches[0] + batches[0]]
+    rng.shuffle(resend)
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        retries = list(pool.map(lambda batch: ingest_online_orders(args.platform, batch), resend))
+    duplicates = sum(r['duplicates'] for r in retries)
+    accepted += sum(r['accepted'] for r in retries)
+    errors = sum(r['rejected'] for r in first + retries)
+    print(f"🔁 ส่งซ้ำ {sum(len(b) for b in resend)} ออเดอร์: duplicate {duplicates}, ผิดพลาด {errors}")
+
+    sales, repeated = check_run(run_id, started_at)
+    ok = sales == accepted == len(orders) and repeated == 0
+    print(f"{'✅' if ok else '❌'} บิล {sales}, รับ {accepted} (ออเดอร์ไม่ซ้ำ {len(orders)}), "
+          f"ตัดสต็อคซ้ำ {repeated} รายการ")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,63 @@
+"""
+Script สำหรับสร้างข้อมูลจำลองปริมาณมาก (สินค้า, เมนู, ลูกค้า, คูปอง, ค่าใช้จ่าย, ประวัติการขาย)
+สำหรับทดสอบความเร็วรายงาน/Dashboard - ใช้ได้ทั้ง SQLite และ PostgreSQL (ตาม DATABASE_URL)
+
+ใช้งาน:
+    python scripts/generate_load_data.py                                  # 1 ปี x 300 บิล/วัน
+    python scripts/generate_load_data.py --days 365 --sales-per-day 3000  # ~1 ล้านบิล
+    python scripts/generate_load_data.py --seed 7 --no-stock              # seed อื่น, ไม่สร้าง stock transactions
+"""
+
+import sys
+import os
+import argparse
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.db import init_db, DATABASE_URL
+from utils.synthetic_data import generate_synthetic_data, DEFAULT_CHUNK_SIZE
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic POS history for load testing")
+    parser.add_argument("--products", type=int, default=200, help="จำนวนสินค้า")
+    parser.add_argument("--menus", type=int, default=50, help="จำนวนเมนู (พร้อม BOM)")
+    parser.add_argument("--days", type=int, default=365, help="จำนวนวันย้อนหลัง")
+    parser.add_argument("--sales-per-day", type=int, default=300, help="จำนวนบิลเฉลี่ยต่อวัน")
+    parser.add_argument("--customers", type=int, default=2000, help="จำนวนลูกค้า")
+    parser.add_argument("--coupons", type=int, default=20, help="จำนวนคูปอง")
+    parser.add_argument("--promotions", type=int, default=8, help="จำนวนโปรโมชั่น")
+    parser.add_argument("--expenses-per-day", type=int, default=3, help="จำนวนรายการค่าใช้จ่ายต่อวัน")
+    parser.add_argument("--tax-rate", type=float, default=7.0, help="อัตราภาษี (%%)")
+    parser.add_argument("--no-stock", action="store_true", help="ไม่สร้าง stock transactions")
+    parser.add_argument("--seed", type=int, default=42, help="seed (ค่าเดิมได้ข้อมูลเดิม)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="จำนวนแถวต่อการ insert")
+    args = parser.parse_args()
+
+    safe_url = DATABASE_URL.split('@')[-1] if '@' in DATABASE_URL else DATABASE_URL
+    print(f"🗄️  Database: {safe_url}")
+    init_db()
+
+    started = time.perf_counter()
+    counts = generate_synthetic_data(
+        products=args.products,
+        menus=args.menus,
+        days=args.days,
+        sales_per_day=args.sales_per_day,
+        customers=args.customers,
+        coupons=args.coupons,
+        promotions=args.promotions,
+        expenses_per_day=args.expenses_per_day,
+        tax_rate=args.tax_rate,
+        stock_transactions=not args.no_stock,
+        seed=args.seed,
+        chunk_size=args.chunk_size,
+        progress=print
+    )
+    elapsed = time.perf_counter() - started
+
+    print()
+    for name, count in counts.items():
+        print(f"   {name:<22} {count:>12,}")
+    print(f"⏱️  ใช้เวลา {elapsed:.1f} วินาที ({counts['sales'] / elapsed if elapsed else 0:,.0f} บิล/วินาที)")
@@ -0,0 +1,40 @@
+"""
+Script สำหรับนำเข้ารูปสินค้าทั้งโฟลเดอร์
+ชื่อไฟล์ (ไม่รวมนามสกุล) ต้องตรงกับบาร์โค๊ดหรือชื่อสินค้า เช่น 8850999000017.jpg, น้ำดื่ม 600ml.png
+
+ใช้งาน:
+    python scripts/import_product_images.py ~/product-photos
+    python scripts/import_product_images.py ~/product-photos --overwrite
+"""
+
+import sys
+import os
+import argparse
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.db import init_db
+from utils.image_upload import import_product_images
+from utils.image_worker import wait_for_images, get_image_error
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a folder of product photos")
+    parser.add_argument("folder", help="โฟลเดอร์รูปภาพ")
+    parser.add_argument("--overwrite", action="store_true", help="แทนที่รูปเดิมของสินค้าที่มีรูปแล้ว")
+    args = parser.parse_args()
+
+    init_db()
+
+    print(f"🚀 นำเข้ารูปภาพจาก {args.folder} ...")
+    result = import_product_images(os.path.expanduser(args.folder), args.overwrite)
+    wait_for_images(result['paths'])
+
+    failed = [path for path in result['paths'] if get_image_error(path)]
+    print(f"✅ นำเข้า {result['queued'] - len(failed)} รูป, ข้าม {result['skipped']} สินค้าที่มีรูปแล้ว")
+    for path in failed:
+        print(f"❌ {path}: {get_image_error(path)}")
+    for filename in result['unmatched']:
+        print(f"⚠️ ไม่พบสินค้า: {filename}")
+    for error in result['errors']:
+        print(f"❌ {error}")
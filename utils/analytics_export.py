@@ -0,0 +1,217 @@
+"""
+Analytics Export - ส่งออกข้อมูลเป็นไฟล์ Parquet สำหรับ BI/นักบัญชี
+Incrementally export transactional tables to month-partitioned Parquet files
+so heavy analytics can run off the OLTP database
+- แถวใหม่: keyset ตาม id ทีละ chunk (watermark = id ล่าสุด)
+- แถวที่แก้ไขภายหลัง (sales.updated_at เช่น ยกเลิก/คืนสินค้า): เขียนไฟล์ part ที่มีแถวนั้นใหม่ทั้งไฟล์
+- รันเป็นระยะด้วย scripts/export_analytics.py (--loop หรือ cron)
+"""
+
+import bisect
+import glob
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import pandas as pd
+from sqlalchemy import select
+from database.db import engine
+from database.models import Sale, SaleItem, StockTransaction, Expense, LoyaltyTransaction
+from utils.store_settings import get_setting, set_setting
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# pyarrow is required by pandas.to_parquet (installed together with streamlit)
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# โฟลเดอร์สำหรับเก็บไฟล์ Parquet (แบ่ง partition ตามเดือน: <table>/month=YYYY-MM/)
+EXPORT_DIR = os.path.join("data", "analytics")
+CHUNK_SIZE = 50000
+WATERMARK_KEY_PREFIX = "analytics_export_watermark_"
+CHANGED_KEY_PREFIX = "analytics_export_changed_"
+# ดูย้อนหลังเผื่อ transaction ที่ commit ช้ากว่าเวลาใน updated_at (export ซ้ำได้ ไฟล์ถูกเขียนทับ)
+CHANGE_OVERLAP = timedelta(minutes=5)
+PART_FILE_PATTERN = re.compile(r"part-(\d+)-(\d+)\.parquet$")
+
+# table name -> (model, column used for month partition, column that changes when a row is edited)
+EXPORT_TABLES = {
+    'sales': (Sale, Sale.sale_date, Sale.updated_at),  # ยกเลิก/คืนสินค้าแก้ is_void, final_amount
+    'sale_items': (SaleItem, Sale.sale_date, None),
+    'stock_transactions': (StockTransaction, StockTransaction.created_at, None),
+    'expenses': (Expense, Expense.expense_date, None),
+    'loyalty_transactions': (LoyaltyTransaction, LoyaltyTransaction.transaction_date, None),
+}
+
+_export_lock = threading.Lock()
+
+def get_export_watermark(table_name: str) -> int:
+    """Get last exported row id for a table (0 = never exported)"""
+    try:
+        return int(get_setting(f"{WATERMARK_KEY_PREFIX}{table_name}", "0") or 0)
+    except ValueError:
+        return 0
+
+def get_change_watermark(table_name: str) -> Optional[datetime]:
+    """Start time of the last export that re-checked edited rows (None = never)"""
+    value = get_setting(f"{CHANGED_KEY_PREFIX}{table_name}", "")
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+def _build_export_query(table_name: str):
+    """Select rows with a `partition_date` column for partitioning"""
+    model, partition_column, _ = EXPORT_TABLES[table_name]
+    query = select(model.__table__, partition_column.label('partition_date'))
+    if table_name == 'sale_items':
+        # sale_items has no timestamp of its own - partition by the parent sale date
+        query = query.join(Sale, SaleItem.sale_id == Sale.id)
+    return query
+
+def _read(query) -> pd.DataFrame:
+    """Run one bounded query and close the connection before the caller writes anything
+    (SQLite: cursor ที่เปิดค้างระหว่าง set_setting ทำให้ database is locked)"""
+    with engine.connect() as conn:
+        return pd.read_sql(query, conn)
+
+def _partition_months(df: pd.DataFrame) -> pd.Series:
+    return pd.to_datetime(df['partition_date']).dt.strftime('%Y-%m').fillna('unknown')
+
+def _write_file(file_path: str, df: pd.DataFrame):
+    # เขียนไฟล์ชั่วคราวก่อนแล้วค่อย rename เพื่อไม่ให้ BI อ่านไฟล์ที่เขียนไม่เสร็จ
+    tmp_path = file_path + ".tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, file_path)
+
+def _write_partitions(table_name: str, df: pd.DataFrame) -> int:
+    """Write one chunk of rows into month partitions, returns number of files written"""
+    months = _partition_months(df)
+    df = df.drop(columns=['partition_date'])
+
+    files_written = 0
+    for month, month_df in df.groupby(months, sort=True):
+        partition_dir = os.path.join(EXPORT_DIR, table_name, f"month={month}")
+        os.makedirs(partition_dir, exist_ok=True)
+
+        first_id = int(month_df['id'].min())
+        last_id = int(month_df['id'].max())
+        _write_file(os.path.join(partition_dir, f"part-{first_id:010d}-{last_id:010d}.parquet"), month_df)
+        files_written += 1
+
+    return files_written
+
+def _rewrite_parts(table_name: str, ids: List[int]) -> int:
+    """Re-export the part files that contain any of `ids` with the rows' current values
+    Returns: number of files rewritten
+    """
+    model = EXPORT_TABLES[table_name][0]
+    ids = sorted(ids)
+    rewritten = 0
+    for file_path in glob.glob(os.path.join(EXPORT_DIR, table_name, "month=*", "part-*.parquet")):
+        match = PART_FILE_PATTERN.search(os.path.basename(file_path))
+        if not match:
+            continue
+        first_id, last_id = int(match.group(1)), int(match.group(2))
+        position = bisect.bisect_left(ids, first_id)
+        if position == len(ids) or ids[position] > last_id:
+            continue
+
+        # ไฟล์หนึ่งคือแถวของเดือนเดียวจาก chunk ที่ id ต่อเนื่องกัน - query ช่วง id เดิมแล้วกรองเดือน
+        month = os.path.basename(os.path.dirname(file_path))[len("month="):]
+        df = _read(_build_export_query(table_name).where(model.id.between(first_id, last_id)).order_by(model.id.asc()))
+        df = df[_partition_months(df) == month].drop(columns=['partition_date'])
+        if df.empty:
+            continue
+        _write_file(file_path, df)
+        rewritten += 1
+    return rewritten
+
+def _export_changed(table_name: str, watermark: int) -> Dict:
+    """Re-export already exported rows edited since the last export (e.g. voided sales)"""
+    model, _, change_column = EXPORT_TABLES[table_name]
+    since = get_change_watermark(table_name)
+    query = select(model.id).where(model.id <= watermark)
+    if since is not None:
+        query = query.where(change_column > since - CHANGE_OVERLAP)
+    with engine.connect() as conn:
+        ids = [row_id for (row_id,) in conn.execute(query)]
+    return {'rows': len(ids), 'files': _rewrite_parts(table_name, ids) if ids else 0}
+
+def export_table(table_name: str) -> Dict:
+    """Export rows added since the last watermark for one table, and re-export edited rows
+    Returns: {'table', 'rows', 'updated', 'files', 'watermark'}
+    """
+    if table_name not in EXPORT_TABLES:
+        raise ValueError(f"Unknown export table: {table_name}")
+
+    model, _, change_column = EXPORT_TABLES[table_name]
+    started_at = datetime.now()
+    watermark = get_export_watermark(table_name)
+    result = {'table': table_name, 'rows': 0, 'updated': 0, 'files': 0, 'watermark': watermark}
+
+    if change_column is not None and watermark:
+        changed = _export_changed(table_name, watermark)
+        result['updated'] = changed['rows']
+        result['files'] += changed['files']
+
+    base_query = _build_export_query(table_name)
+    while True:
+        # keyset query ปิดต่อ chunk: ไม่มี cursor ค้างระหว่างเขียนไฟล์/บันทึก watermark
+        chunk = _read(base_query.where(model.id > watermark).order_by(model.id.asc()).limit(CHUNK_SIZE))
+        if chunk.empty:
+            break
+        result['files'] += _write_partitions(table_name, chunk)
+        result['rows'] += len(chunk)
+
+        # บันทึก watermark ทุก chunk เพื่อให้ทำต่อได้ถ้า job ถูกหยุดกลางทาง
+        watermark = int(chunk['id'].max())
+        set_setting(
+            f"{WATERMARK_KEY_PREFIX}{table_name}",
+            str(watermark),
+            description=f"Analytics export watermark ({table_name})"
+        )
+        if len(chunk) < CHUNK_SIZE:
+            break
+
+    if change_column is not None:
+        # แถวที่แก้ไขหลังเวลานี้จะถูก export ซ้ำในรอบถัดไป
+        set_setting(
+            f"{CHANGED_KEY_PREFIX}{table_name}",
+            started_at.isoformat(),
+            description=f"Analytics export changed-row watermark ({table_name})"
+        )
+
+    result['watermark'] = watermark
+    return result
+
+def run_analytics_export() -> Dict:
+    """Export all analytics tables incrementally
+    Returns: Dict with per-table results and 'success'/'error'
+    """
+    if not PYARROW_AVAILABLE:
+        return {'success': False, 'error': "ต้องการ library pyarrow สำหรับ export Parquet", 'tables': []}
+
+    # Only one export at a time per process (e.g. two script threads / manual trigger)
+    if not _export_lock.acquire(blocking=False):
+        return {'success': False, 'error': "กำลัง export อยู่แล้ว", 'tables': []}
+
+    try:
+        started_at = datetime.now()
+        tables = []
+        for table_name in EXPORT_TABLES:
+            tables.append(export_table(table_name))
+
+        total_rows = sum(t['rows'] for t in tables)
+        logger.info("Analytics export finished - %s rows in %.1fs", total_rows, (datetime.now() - started_at).total_seconds())
+        return {'success': True, 'error': None, 'tables': tables}
+    except Exception as e:
+        logger.error("Analytics export failed: %s", e, exc_info=True)
+        return {'success': False, 'error': str(e), 'tables': []}
+    finally:
+        _export_lock.release()
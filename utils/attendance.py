@@ -7,8 +7,12 @@ from datetime import datetime, timedelta
 from typing import Optional, List, Dict
 from database.db import get_session
 from database.models import Attendance, EmployeeShift, User, Sale
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, select
 from utils.helpers import format_currency
+from utils.frames import fetch_frame
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 def clock_in(user_id: int, shift_id: int = None, notes: str = None) -> Optional[Attendance]:
     """บันทึกเวลาเข้างาน"""
@@ -41,11 +45,11 @@ def clock_in(user_id: int, shift_id: int = None, notes: str = None) -> Optional[
         session.commit()
         session.refresh(attendance)
         
-        print(f"[DEBUG] Clock in successful - User ID: {user_id}, Time: {attendance.clock_in}")
+        logger.debug("Clock in successful - User ID: %s, Time: %s", user_id, attendance.clock_in)
         return attendance
     except Exception as e:
         session.rollback()
-        print(f"[DEBUG] Error in clock_in: {str(e)}")
+        logger.error("Error in clock_in: %s", e)
         return None
     finally:
         session.close()
@@ -81,11 +85,11 @@ def clock_out(user_id: int, notes: str = None) -> Optional[Attendance]:
         session.commit()
         session.refresh(attendance)
         
-        print(f"[DEBUG] Clock out successful - User ID: {user_id}, Total Hours: {attendance.total_hours:.2f}")
+        logger.debug("Clock out successful - User ID: %s, Total Hours: %.2f", user_id, attendance.total_hours)
         return attendance
     except Exception as e:
         session.rollback()
-        print(f"[DEBUG] Error in clock_out: {str(e)}")
+        logger.error("Error in clock_out: %s", e)
         return None
     finally:
         session.close()
@@ -119,26 +123,30 @@ def get_employee_performance(user_id: int, start_date: datetime, end_date: datet
     session = get_session()
     try:
         # Attendance stats
-        attendances = session.query(Attendance).filter(
+        attendances = fetch_frame(session, select(
+            Attendance.total_hours,
+            Attendance.is_late,
+            Attendance.is_absent
+        ).where(
             Attendance.user_id == user_id,
             Attendance.attendance_date >= start_date,
             Attendance.attendance_date <= end_date
-        ).all()
+        ))
         
         total_days = len(attendances)
-        total_hours = sum(a.total_hours for a in attendances if a.total_hours)
-        late_count = sum(1 for a in attendances if a.is_late)
-        absent_count = sum(1 for a in attendances if a.is_absent)
+        total_hours = float(attendances['total_hours'].astype(float).fillna(0.0).sum()) if total_days else 0
+        late_count = int(attendances['is_late'].fillna(False).astype(bool).sum()) if total_days else 0
+        absent_count = int(attendances['is_absent'].fillna(False).astype(bool).sum()) if total_days else 0
         
         # Sales stats
-        sales = session.query(Sale).filter(
+        sales = fetch_frame(session, select(Sale.final_amount).where(
             Sale.created_by == user_id,
             Sale.sale_date >= start_date,
             Sale.sale_date <= end_date,
             Sale.is_void == False
-        ).all()
+        ))
         
-        total_sales = sum(s.final_amount for s in sales)
+        total_sales = float(sales['final_amount'].astype(float).sum()) if len(sales) else 0
         sales_count = len(sales)
         avg_sale = total_sales / sales_count if sales_count > 0 else 0.0
         
@@ -173,7 +181,7 @@ def create_shift(user_id: int, shift_date: datetime, shift_start: datetime = Non
         return shift
     except Exception as e:
         session.rollback()
-        print(f"[DEBUG] Error in create_shift: {str(e)}")
+        logger.error("Error in create_shift: %s", e)
         return None
     finally:
         session.close()
@@ -0,0 +1,221 @@
+"""
+Barcode Decoder - อ่านบาร์โค๊ดจากภาพกล้องใน worker pool (ไม่ทำใน script ของ Streamlit)
+- ย่อภาพและตัดเฉพาะกลางภาพ (ROI) ก่อน ถ้าไม่เจอจึงลองทั้งภาพ / ความละเอียดเต็ม / เพิ่มความคมชัด
+- ใช้ decoder ที่ติดตั้งไว้ตามลำดับ: pyzbar (ต้องมี libzbar) → zxing-cpp (pip อย่างเดียว ใช้บน Cloud ได้) → OpenCV
+- ภาพเดิมซ้ำ (rerun ของ st.camera_input) ได้ผลจาก cache ทันที
+- บาร์โค๊ดเดิมที่สแกนซ้ำภายใน DEBOUNCE_SECONDS ถูกทำเครื่องหมาย repeat
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, replace
+from io import BytesIO
+from typing import Callable, Iterator, List, Optional, Tuple
+from PIL import Image, ImageFilter, ImageOps
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    from pyzbar import pyzbar
+    PYZBAR_AVAILABLE = True
+except ImportError:
+    pyzbar = None
+    PYZBAR_AVAILABLE = False
+
+try:
+    import zxingcpp
+    ZXING_AVAILABLE = True
+except ImportError:
+    zxingcpp = None
+    ZXING_AVAILABLE = False
+
+try:
+    import cv2
+    import numpy as np
+    CV2_BARCODE_AVAILABLE = hasattr(cv2, 'barcode')
+except ImportError:
+    cv2 = None
+    np = None
+    CV2_BARCODE_AVAILABLE = False
+
+DECODE_WORKERS = 2
+DECODE_TIMEOUT_SECONDS = 5
+MAX_DECODE_SIDE = 1024        # ด้านยาวสุดของภาพที่ส่งให้ decoder
+ROI_BOX = (0.1, 0.2, 0.9, 0.8)  # กลางภาพ (left, top, right, bottom เป็นสัดส่วน)
+FRAME_CACHE_SIZE = 128
+DEBOUNCE_SECONDS = 1.5
+
+@dataclass(frozen=True)
+class DecodeResult:
+    """One decoded barcode"""
+    data: str
+    symbology: str
+    backend: str
+    strategy: str          # 'roi', 'full', 'roi_full_res', 'enhanced'
+    elapsed_ms: float
+    cached: bool = False   # ภาพเดียวกับที่อ่านไปแล้ว
+    repeat: bool = False   # บาร์โค๊ดเดิมภายใน DEBOUNCE_SECONDS
+
+# ---------------------------------------------------------------- backends
+
+def _decode_pyzbar(image: Image.Image) -> List[Tuple[str, str]]:
+    return [(b.data.decode('utf-8', 'replace'), b.type) for b in pyzbar.decode(image)]
+
+def _decode_zxing(image: Image.Image) -> List[Tuple[str, str]]:
+    return [(r.text, r.format.name) for r in zxingcpp.read_barcodes(image) if r.valid]
+
+def _decode_cv2(image: Image.Image) -> List[Tuple[str, str]]:
+    ok, infos, types, _ = cv2.barcode.BarcodeDetector().detectAndDecodeWithType(np.asarray(image))
+    if not ok:
+        return []
+    return [(info, kind) for info, kind in zip(infos, types) if info]
+
+def _available_backends() -> List[Tuple[str, Callable[[Image.Image], List[Tuple[str, str]]]]]:
+    backends = []
+    if PYZBAR_AVAILABLE:
+        backends.append(('pyzbar', _decode_pyzbar))
+    if ZXING_AVAILABLE:
+        backends.append(('zxing', _decode_zxing))
+    if CV2_BARCODE_AVAILABLE:
+        backends.append(('opencv', _decode_cv2))
+    return backends
+
+BACKENDS = _available_backends()
+DECODER_AVAILABLE = bool(BACKENDS)
+
+def decoder_backends() -> List[str]:
+    """Names of the installed decoders, in the order they are tried"""
+    return [name for name, _ in BACKENDS]
+
+# ---------------------------------------------------------------- pipeline
+
+def _shrink(image: Image.Image, max_side: int) -> Image.Image:
+    if max(image.size) <= max_side:
+        return image
+    image = image.copy()
+    image.thumbnail((max_side, max_side), Image.Resampling.BILINEAR)
+    return image
+
+def _crop(image: Image.Image, box: Tuple[float, float, float, float]) -> Image.Image:
+    width, height = image.size
+    return image.crop((int(box[0] * width), int(box[1] * height), int(box[2] * width), int(box[3] * height)))
+
+def _strategies(image: Image.Image, max_side: int, roi: Tuple[float, float, float, float]) -> Iterator[Tuple[str, Image.Image]]:
+    """Images to try, cheapest first (created lazily - most frames stop at the first one)"""
+    small = _shrink(image, max_side)
+    small_roi = _crop(small, roi)
+    yield 'roi', small_roi
+    yield 'full', small
+    if small is not image:
+        # บาร์โค๊ดเล็ก/อยู่ไกล: ROI ที่ความละเอียดเต็ม
+        yield 'roi_full_res', _crop(image, roi)
+    yield 'enhanced', ImageOps.autocontrast(small_roi, cutoff=2).filter(ImageFilter.SHARPEN)
+
+def decode_image(image, max_side: int = MAX_DECODE_SIDE,
+                 roi: Tuple[float, float, float, float] = ROI_BOX) -> Optional[DecodeResult]:
+    """Decode the first barcode in a PIL image or encoded image bytes (no cache, runs in the caller's thread)"""
+    if not BACKENDS:
+        return None
+    started = time.perf_counter()
+    if isinstance(image, (bytes, bytearray)):
+        image = Image.open(BytesIO(image))
+        # JPEG: decode ที่ความละเอียดต่ำลงได้เลย (ยังใหญ่กว่า max_side อย่างน้อย 2 เท่าสำหรับ roi_full_res)
+        image.draft('L', (max_side * 2, max_side * 2))
+    gray = image.convert('L')
+
+    for strategy, candidate in _strategies(gray, max_side, roi):
+        for backend, decode in BACKENDS:
+            try:
+                found = decode(candidate)
+            except Exception as e:
+                logger.debug("Barcode backend %s failed: %s", backend, e)
+                continue
+            if found:
+                data, symbology = found[0]
+                return DecodeResult(data, symbology, backend, strategy, (time.perf_counter() - started) * 1000)
+    return None
+
+# ---------------------------------------------------------------- service
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_frames: 'OrderedDict[str, Optional[DecodeResult]]' = OrderedDict()
+_recent: 'OrderedDict[Tuple[str, str], float]' = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="barcode-decoder")
+        return _executor
+
+def _mark_repeat(result: DecodeResult, source: str) -> DecodeResult:
+    now = time.monotonic()
+    key = (source, result.data)
+    with _cache_lock:
+        last = _recent.get(key)
+        _recent[key] = now
+        _recent.move_to_end(key)
+        while len(_recent) > FRAME_CACHE_SIZE:
+            _recent.popitem(last=False)
+    if last is not None and now - last < DEBOUNCE_SECONDS:
+        return replace(result, repeat=True)
+    return result
+
+def _decode_job(data: bytes, digest: str, source: str) -> Optional[DecodeResult]:
+    try:
+        result = decode_image(data)
+    except Exception as e:
+        # ไฟล์ที่ไม่ใช่ภาพ/ภาพเสีย - ถือว่าไม่พบบาร์โค๊ด (cache ไว้ด้วย ภาพเดิมจะไม่ถูกอ่านซ้ำ)
+        logger.warning("Cannot decode camera frame: %s", e)
+        result = None
+    with _cache_lock:
+        _frames[digest] = result
+        _frames.move_to_end(digest)
+        while len(_frames) > FRAME_CACHE_SIZE:
+            _frames.popitem(last=False)
+    if result is not None:
+        logger.debug("Decoded barcode", extra={'backend': result.backend, 'strategy': result.strategy,
+                                               'elapsed_ms': round(result.elapsed_ms, 1)})
+        result = _mark_repeat(result, source)
+    return result
+
+def submit_frame(data: bytes, source: str = "default") -> 'Future[Optional[DecodeResult]]':
+    """Queue a camera frame (encoded image bytes) for decoding
+
+    Args:
+        source: scanner identity (e.g. page/session) - repeats are debounced per source
+    Returns:
+        Future of DecodeResult (None = no barcode found); a frame seen before resolves at once with cached=True
+    """
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    with _cache_lock:
+        hit = digest in _frames
+        cached = _frames.get(digest)
+        if hit:
+            _frames.move_to_end(digest)
+    if hit:
+        future: Future = Future()
+        future.set_result(replace(cached, cached=True) if cached is not None else None)
+        return future
+    return _get_executor().submit(_decode_job, data, digest, source)
+
+def decode_frame(data: bytes, source: str = "default",
+                 timeout: Optional[float] = DECODE_TIMEOUT_SECONDS) -> Optional[DecodeResult]:
+    """submit_frame() and wait for the result (None on timeout or when nothing was found)"""
+    try:
+        return submit_frame(data, source).result(timeout=timeout)
+    except FutureTimeoutError:
+        logger.warning("Barcode decoding timed out after %ss", timeout)
+        return None
+
+def clear_decode_cache():
+    """Forget cached frames and recent scans"""
+    with _cache_lock:
+        _frames.clear()
+        _recent.clear()
@@ -0,0 +1,285 @@
+"""
+Barcode Labels - แผ่นฉลากบาร์โค๊ดสินค้า (หลายดวงต่อหน้า) เป็น PDF หรือ SVG
+- วาดแท่งบาร์โค๊ดเป็น vector จาก pattern ที่ cache ไว้ตาม (ค่า, ชนิด) - ไม่ต้อง render PNG ทีละดวง
+- สินค้าที่ยังไม่มีบาร์โค๊ดได้ EAN-13 ภายในร้าน (ขึ้นต้น 200-299) ที่มี check digit ถูกต้อง
+- ภาษาไทยใน PDF ต้องมีฟอนต์ไทย (LABEL_FONT_PATHS) ถ้าไม่มีใช้ Helvetica; SVG ใช้ฟอนต์ของ browser
+"""
+
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from io import BytesIO
+from typing import Dict, Iterable, List, Optional, Tuple
+from xml.sax.saxutils import escape
+from barcode.errors import BarcodeError
+from sqlalchemy import bindparam, or_, select
+from database.db import engine
+from database.models import Product
+from utils.barcode import barcode_modules, detect_symbology, ean13_check_digit
+from utils.logger import get_logger, log_timing
+
+logger = get_logger(__name__)
+
+# GS1: prefix 200-299 ใช้ภายในร้าน (ไม่ชนกับบาร์โค๊ดของผู้ผลิต)
+STORE_EAN_PREFIXES = tuple(str(prefix) for prefix in range(200, 300))
+
+# ฟอนต์ไทยสำหรับ PDF (ใช้ตัวแรกที่มี)
+LABEL_FONT_PATHS = (
+    os.path.join("data", "fonts", "Sarabun-Regular.ttf"),
+    "/usr/share/fonts/truetype/tlwg/Garuda.ttf",
+    "/usr/share/fonts/truetype/tlwg/Loma.ttf",
+    "/usr/share/fonts/truetype/noto/NotoSansThai-Regular.ttf",
+    "C:/Windows/Fonts/tahoma.ttf",
+    "/System/Library/Fonts/Supplemental/Tahoma.ttf",
+)
+SVG_FONT_FAMILY = "Sarabun, Tahoma, 'Noto Sans Thai', sans-serif"
+
+_products = Product.__table__
+
+@dataclass(frozen=True)
+class LabelLayout:
+    """Sheet geometry in millimetres (default: A4, 3 x 8 labels of 63.5 x 33.9 mm)"""
+    columns: int = 3
+    rows: int = 8
+    label_width: float = 63.5
+    label_height: float = 33.9
+    margin_left: float = 7.2
+    margin_top: float = 13.1
+    gap_x: float = 2.5
+    gap_y: float = 0.0
+    page_width: float = 210.0
+    page_height: float = 297.0
+
+    @property
+    def per_page(self) -> int:
+        return self.columns * self.rows
+
+    def origin(self, slot: int) -> Tuple[float, float]:
+        """Top-left corner of a label slot on its page"""
+        column, row = slot % self.columns, slot // self.columns
+        return (self.margin_left + column * (self.label_width + self.gap_x),
+                self.margin_top + row * (self.label_height + self.gap_y))
+
+@dataclass(frozen=True)
+class LabelItem:
+    """One label"""
+    name: str
+    barcode: str
+    price: Optional[float] = None
+
+# ---------------------------------------------------------------- EAN-13 ภายในร้าน
+
+def store_ean13(product_id: int, prefix: str = STORE_EAN_PREFIXES[0]) -> str:
+    """In-store EAN-13 for a product: prefix + 9-digit product id + check digit"""
+    digits = f"{prefix}{product_id:09d}"
+    if len(digits) != 12:
+        raise ValueError(f"product id {product_id} too large for an EAN-13")
+    return digits + str(ean13_check_digit(digits))
+
+def assign_missing_barcodes(product_ids: Optional[Iterable[int]] = None) -> Dict[int, str]:
+    """Give products without a barcode an in-store EAN-13 (one UPDATE for all)
+
+    Returns:
+        {product_id: new barcode}
+    """
+    query = select(_products.c.id).where(or_(_products.c.barcode.is_(None), _products.c.barcode == ''))
+    if product_ids is not None:
+        query = query.where(_products.c.id.in_(list(product_ids)))
+    with engine.begin() as conn:
+        ids = list(conn.execute(query).scalars())
+        if not ids:
+            return {}
+
+        assigned: Dict[int, str] = {}
+        pending = ids
+        for prefix in STORE_EAN_PREFIXES:
+            candidates = {store_ean13(product_id, prefix): product_id for product_id in pending}
+            taken = set(conn.execute(
+                select(_products.c.barcode).where(_products.c.barcode.in_(list(candidates)))
+            ).scalars())
+            pending = []
+            for code, product_id in candidates.items():
+                if code in taken:
+                    pending.append(product_id)
+                else:
+                    assigned[product_id] = code
+            if not pending:
+                break
+        if pending:
+            logger.warning("No free in-store barcode for products %s", pending)
+
+        now = datetime.now()
+        conn.execute(
+            _products.update().where(_products.c.id == bindparam('b_id')).values(
+                barcode=bindparam('b_barcode'), updated_at=now
+            ),
+            [{'b_id': product_id, 'b_barcode': code} for product_id, code in assigned.items()]
+        )
+    logger.info("Assigned in-store barcodes to %s products", len(assigned))
+    return assigned
+
+def product_labels(product_ids: Optional[Iterable[int]] = None, category_id: Optional[int] = None,
+                   copies: int = 1, assign_missing: bool = True) -> Tuple[List[LabelItem], List[str]]:
+    """Labels for a filtered product set, in name order
+
+    Args:
+        product_ids: only these products (e.g. the current search result)
+        copies: labels per product
+        assign_missing: give products without a barcode an in-store EAN-13 first
+    Returns:
+        (labels, skipped) - skipped: "name (barcode)" of products whose barcode cannot be encoded
+        (เช่น ตัวอักษรไทยใน Code 128) ไม่ทำให้ทั้งแผ่นล้ม
+    """
+    ids = list(product_ids) if product_ids is not None else None
+    if assign_missing:
+        assign_missing_barcodes(ids)
+
+    query = select(_products.c.name, _products.c.barcode, _products.c.selling_price).order_by(_products.c.name)
+    if ids is not None:
+        query = query.where(_products.c.id.in_(ids))
+    if category_id is not None:
+        query = query.where(_products.c.category_id == category_id)
+    with engine.connect() as conn:
+        rows = conn.execute(query).all()
+
+    labels, skipped = [], []
+    for name, code, price in rows:
+        if not code:
+            continue
+        try:
+            _barcode_shape(code)
+        except BarcodeError as e:
+            logger.warning("Skipped label of %s: cannot encode barcode %r (%s)", name, code, e)
+            skipped.append(f"{name} ({code})")
+            continue
+        labels.extend([LabelItem(name, code, price)] * max(1, copies))
+    return labels, skipped
+
+# ---------------------------------------------------------------- drawing
+
+def _bar_runs(modules: str) -> List[Tuple[int, int]]:
+    """(start, width) of each dark bar in module units"""
+    runs, start = [], None
+    for index, module in enumerate(modules + '0'):
+        if module == '1' and start is None:
+            start = index
+        elif module != '1' and start is not None:
+            runs.append((start, index - start))
+            start = None
+    return runs
+
+@lru_cache(maxsize=8192)
+def _barcode_shape(value: str) -> Tuple[Tuple[Tuple[int, int], ...], int, str]:
+    """(bar runs, module count, printed text) - cached per value"""
+    modules, text = barcode_modules(value, detect_symbology(value))
+    return tuple(_bar_runs(modules)), len(modules), text
+
+def _fit(text: str, max_chars: int) -> str:
+    return text if len(text) <= max_chars else text[:max_chars - 1] + "…"
+
+def _pdf_font() -> str:
+    """Register the first Thai font found (once); falls back to Helvetica"""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    if 'LabelFont' in pdfmetrics.getRegisteredFontNames():
+        return 'LabelFont'
+    for path in LABEL_FONT_PATHS:
+        if os.path.exists(path):
+            try:
+                pdfmetrics.registerFont(TTFont('LabelFont', path))
+                return 'LabelFont'
+            except Exception as e:
+                logger.warning("Cannot load label font %s: %s", path, e)
+    return 'Helvetica'
+
+def build_label_sheet_pdf(labels: List[LabelItem], layout: LabelLayout = LabelLayout()) -> bytes:
+    """Multi-up label sheet as PDF bytes"""
+    from reportlab.lib.units import mm
+    from reportlab.pdfgen import canvas
+
+    buf = BytesIO()
+    pdf = canvas.Canvas(buf, pagesize=(layout.page_width * mm, layout.page_height * mm))
+    pdf.setTitle("Barcode labels")
+    font = _pdf_font()
+    currency = "฿" if font == 'LabelFont' else ""  # Helvetica ไม่มีตัว ฿
+    padding = 3.0
+    bar_height = layout.label_height * 0.45
+    bar_width = layout.label_width - 2 * padding
+
+    with log_timing(logger, "Built barcode label PDF", labels=len(labels)):
+        for index, label in enumerate(labels):
+            slot = index % layout.per_page
+            if index and slot == 0:
+                pdf.showPage()
+            left, top = layout.origin(slot)
+            # reportlab: จุดเริ่มอยู่มุมล่างซ้าย
+            x = left * mm
+            y_top = (layout.page_height - top) * mm
+
+            pdf.setFont(font, 8)
+            pdf.drawString(x + padding * mm, y_top - 5 * mm, _fit(label.name, 36))
+
+            runs, module_count, text = _barcode_shape(label.barcode)
+            module = bar_width / module_count
+            bars_bottom = y_top - (6.5 + bar_height) * mm
+            path = pdf.beginPath()
+            for start, width in runs:
+                path.rect(x + (padding + start * module) * mm, bars_bottom, width * module * mm, bar_height * mm)
+            pdf.drawPath(path, stroke=0, fill=1)
+
+            pdf.setFont(font, 7)
+            pdf.drawString(x + padding * mm, bars_bottom - 3.5 * mm, text)
+            if label.price is not None:
+                pdf.setFont(font, 10)
+                pdf.drawRightString(x + (layout.label_width - padding) * mm, bars_bottom - 4 * mm, f"{currency}{label.price:,.2f}")
+        pdf.save()
+    return buf.getvalue()
+
+def build_label_sheet_svg(labels: List[LabelItem], layout: LabelLayout = LabelLayout()) -> List[str]:
+    """Multi-up label sheet as SVG documents (one per page, millimetre units)
+
+    Each barcode's bars are one <path>, defined once per page and reused for copies.
+    """
+    padding = 3.0
+    bar_height = layout.label_height * 0.45
+    bar_width = layout.label_width - 2 * padding
+    pages = []
+    with log_timing(logger, "Built barcode label SVG", labels=len(labels)):
+        for page_start in range(0, len(labels), layout.per_page):
+            page_labels = labels[page_start:page_start + layout.per_page]
+            symbol_ids: Dict[str, str] = {}
+            defs, body = [], []
+            for slot, label in enumerate(page_labels):
+                runs, module_count, text = _barcode_shape(label.barcode)
+                symbol_id = symbol_ids.get(label.barcode)
+                if symbol_id is None:
+                    symbol_id = symbol_ids[label.barcode] = f"b{len(symbol_ids)}"
+                    module = bar_width / module_count
+                    d = ''.join(f"M{start * module:.3f} 0h{width * module:.3f}v{bar_height:.2f}h{-width * module:.3f}z"
+                                for start, width in runs)
+                    defs.append(f'<path id="{symbol_id}" d="{d}"/>')
+                left, top = layout.origin(slot)
+                price = (f'<text x="{layout.label_width - padding}" y="{6.5 + bar_height + 4}" font-size="3.5" '
+                         f'text-anchor="end" font-weight="bold">฿{label.price:,.2f}</text>') if label.price is not None else ''
+                body.append(
+                    f'<g transform="translate({left:.2f} {top:.2f})">'
+                    f'<text x="{padding}" y="5" font-size="2.8">{escape(_fit(label.name, 36))}</text>'
+                    f'<use href="#{symbol_id}" x="{padding}" y="6.5"/>'
+                    f'<text x="{padding}" y="{6.5 + bar_height + 3.5}" font-size="2.5">{escape(text)}</text>'
+                    f'{price}</g>'
+                )
+            pages.append(
+                f'<svg xmlns="http://www.w3.org/2000/svg" width="{layout.page_width}mm" height="{layout.page_height}mm" '
+                f'viewBox="0 0 {layout.page_width} {layout.page_height}" font-family="{SVG_FONT_FAMILY}">'
+                f'<defs>{"".join(defs)}</defs>{"".join(body)}</svg>'
+            )
+    return pages
+
+def label_sheet_html(pages: List[str]) -> str:
+    """Printable HTML wrapping the SVG pages (one page per sheet)"""
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Barcode labels</title>'
+        '<style>@page{size:A4;margin:0}body{margin:0}svg{display:block;page-break-after:always}</style>'
+        f'</head><body>{"".join(pages)}</body></html>'
+    )
@@ -0,0 +1,154 @@
+"""
+Change Feed - แจ้งเตือนเมื่อข้อมูลเปลี่ยน
+ทุกครั้งที่ KitchenQueue/CustomerOrder/OrderItem ถูกเขียนผ่าน ORM จะเพิ่มตัวนับใน change_sequences
+(ใน transaction เดียวกัน) หน้าจอครัวจึงเช็คแค่ตัวนับตัวเดียวแทนการ query คิวทั้งหมดทุกรอบ
+บน PostgreSQL (ที่ไม่ใช่ transaction pooler) จะใช้ LISTEN/NOTIFY ทำให้จอที่ว่างไม่ต้องแตะฐานข้อมูลเลย
+
+ข้อควรรู้: ตัวนับของช่องทางหนึ่งเป็นแถวเดียว transaction ที่เขียนครัว/ออเดอร์จึงล็อกแถวนี้ตั้งแต่ flush
+จนถึง commit/rollback - การเขียนครัว/ออเดอร์พร้อมกันจะต่อคิวกันที่แถวนี้ (ควรให้ transaction เหล่านี้สั้น)
+"""
+
+import os
+import select
+import threading
+from datetime import datetime
+from itertools import chain
+from typing import Dict, Optional
+from sqlalchemy import event, insert, update, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from database.db import engine, DATABASE_URL, is_postgresql
+from database.models import ChangeSequence, KitchenQueue, CustomerOrder, OrderItem
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CHANNEL_KITCHEN = 'kitchen'
+
+# model -> channel ที่ต้องแจ้งเมื่อ model นี้เปลี่ยน
+WATCHED_MODELS = {
+    KitchenQueue: CHANNEL_KITCHEN,
+    CustomerOrder: CHANNEL_KITCHEN,
+    OrderItem: CHANNEL_KITCHEN,
+}
+
+# Transaction pooler (pgbouncer, Supabase :6543) ไม่ส่ง NOTIFY ต่อให้ - ต้อง poll ตาราง
+LISTEN_SUPPORTED = is_postgresql and not (
+    '6543' in DATABASE_URL or os.environ.get('SUPABASE_POOLER_MODE', '') == 'transaction'
+)
+
+_change_table = ChangeSequence.__table__
+_listener_lock = threading.Lock()
+_listener_thread: Optional[threading.Thread] = None
+_notify_counts: Dict[str, int] = {}
+
+_UPSERTS = {'postgresql': postgresql_insert, 'sqlite': sqlite_insert}
+
+def _bump(connection, channel: str):
+    """Increment the channel counter on the given connection (inside the caller's transaction)
+    The row lock is held until the caller commits, so writers of one channel serialize here
+    """
+    dialect_insert = _UPSERTS.get(connection.dialect.name)
+    if dialect_insert is not None:
+        # upsert ครั้งเดียว - writer แรกสองรายพร้อมกันจะไม่ชน unique(channel)
+        statement = dialect_insert(_change_table).values(channel=channel, seq=1, updated_at=datetime.now())
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[_change_table.c.channel],
+            set_={'seq': _change_table.c.seq + 1, 'updated_at': statement.excluded.updated_at}
+        ))
+        if connection.dialect.name == 'postgresql':
+            # ส่งจริงตอน commit - ถ้า rollback จะไม่มีการแจ้ง
+            connection.execute(text("SELECT pg_notify(:channel, '')"), {'channel': channel})
+        return
+
+    result = connection.execute(
+        update(_change_table).where(
+            _change_table.c.channel == channel
+        ).values(
+            seq=_change_table.c.seq + 1,
+            updated_at=datetime.now()
+        )
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(_change_table).values(channel=channel, seq=1, updated_at=datetime.now()))
+
+@event.listens_for(Session, 'after_flush')
+def _record_changes(session, flush_context):
+    """Bump counters for every watched model touched by this flush"""
+    channels = {
+        WATCHED_MODELS[type(obj)]
+        for obj in chain(session.new, session.dirty, session.deleted)
+        if type(obj) in WATCHED_MODELS
+    }
+    if not channels:
+        return
+    connection = session.connection()
+    for channel in sorted(channels):
+        _bump(connection, channel)
+
+def bump_change_sequence(channel: str):
+    """Mark a channel as changed - for writes that bypass the ORM flush (bulk update/Core)"""
+    with engine.begin() as connection:
+        _bump(connection, channel)
+
+def _listen_loop(channels):
+    """Background LISTEN loop - counts NOTIFY per channel in memory"""
+    global _listener_thread
+    try:
+        raw = engine.raw_connection()
+        try:
+            dbapi_connection = raw.driver_connection
+            dbapi_connection.autocommit = True
+            cursor = dbapi_connection.cursor()
+            for channel in channels:
+                cursor.execute(f'LISTEN "{channel}"')
+
+            while True:
+                if select.select([dbapi_connection], [], [], 60) == ([], [], []):
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    notify = dbapi_connection.notifies.pop(0)
+                    with _listener_lock:
+                        _notify_counts[notify.channel] = _notify_counts.get(notify.channel, 0) + 1
+        finally:
+            raw.close()
+    except Exception as e:
+        # ถ้า LISTEN ใช้ไม่ได้/หลุด ให้กลับไป poll ตาราง change_sequences
+        logger.debug("Change feed listener stopped: %s", e)
+        with _listener_lock:
+            _listener_thread = None
+            _notify_counts.clear()
+
+def _ensure_listener() -> bool:
+    """Start the process-wide LISTEN thread once. Returns True if it is running"""
+    global _listener_thread
+    if not LISTEN_SUPPORTED:
+        return False
+    with _listener_lock:
+        if _listener_thread is None:
+            _listener_thread = threading.Thread(
+                target=_listen_loop,
+                args=(sorted(set(WATCHED_MODELS.values())),),
+                name="change-feed-listener",
+                daemon=True
+            )
+            _listener_thread.start()
+        return True
+
+def get_change_token(channel: str) -> str:
+    """Get an opaque token that changes whenever the channel's data changes
+    Compare with a previously stored token to know whether a refresh is needed
+    """
+    if _ensure_listener():
+        with _listener_lock:
+            if _listener_thread is not None:
+                return f"notify:{_notify_counts.get(channel, 0)}"
+
+    # Cheap primary lookup - engine.connect() avoids the per-session setup of get_session()
+    with engine.connect() as connection:
+        seq = connection.execute(
+            _change_table.select().with_only_columns(_change_table.c.seq).where(_change_table.c.channel == channel)
+        ).scalar()
+    return f"seq:{seq or 0}"
@@ -0,0 +1,206 @@
+"""
+Customer Lookup - ค้นหาลูกค้าที่หน้าขายด้วยเบอร์โทรหรือรหัสสมาชิก
+- เบอร์โทรค้นผ่าน expression index ของเบอร์ที่ตัด - และช่องว่างแล้ว (ตรงทั้งเบอร์หรือขึ้นต้นด้วย)
+  SQLite: ช่วง [digits, digits + 1) (เรียงแบบ binary), PostgreSQL/MySQL: LIKE 'digits%'
+  (PostgreSQL ใช้ index แบบ text_pattern_ops ซึ่งไม่ขึ้นกับ collation ของฐานข้อมูล)
+- รหัสสมาชิก (M000123) ค้นผ่าน unique index ของ member_code
+- ได้ลูกค้าพร้อมข้อมูลสมาชิกใน query เดียว และเก็บผลล่าสุดไว้ใน LRU
+  (ล้างอัตโนมัติเมื่อ Customer/Membership ถูกแก้ผ่าน ORM และหมดอายุใน 30 วินาที)
+- คำค้นที่ไม่ใช่เบอร์/รหัส (ชื่อ) ใช้ utils.search
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import chain
+from typing import List, Optional
+from sqlalchemy import and_, event, literal_column, text
+from sqlalchemy.orm import Session
+from database.db import engine, SessionLocal, is_mysql, is_postgresql, is_sqlite
+from database.models import Customer, Membership
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_SIZE = 256
+CACHE_TTL_SECONDS = 30
+PHONE_INDEX = "idx_customer_phone_digits"
+PHONE_PATTERN_INDEX = "idx_customer_phone_digits_pattern"  # PostgreSQL: text_pattern_ops สำหรับ LIKE 'prefix%'
+
+# ต้องตรงกับนิยามของ index ทุกตัวอักษร database จึงจะใช้ index ได้
+PHONE_DIGITS_SQL = "replace(replace(phone, '-', ''), ' ', '')"
+_phone_digits = literal_column(PHONE_DIGITS_SQL)
+
+_PHONE_INPUT = re.compile(r'^\+?[\d\-\s]+$')
+_MEMBER_CODE_INPUT = re.compile(r'^[A-Z]+[\d\-]+$')
+_SHORT_MEMBER_CODE = re.compile(r'^M\d{1,6}$')
+
+_cache: 'OrderedDict[str, tuple]' = OrderedDict()
+_cache_lock = threading.Lock()
+
+@dataclass(frozen=True)
+class MemberInfo:
+    """Membership snapshot of a looked-up customer"""
+    member_code: Optional[str]
+    points: float
+    total_spent: float
+    total_visits: int
+
+@dataclass(frozen=True)
+class CustomerMatch:
+    """Customer snapshot (safe to keep across reruns - not bound to a session)"""
+    id: int
+    name: str
+    phone: Optional[str]
+    email: Optional[str]
+    is_member: bool
+    membership: Optional[MemberInfo]
+
+def normalize_phone(value: str) -> str:
+    """Digits only, +66 / 66 prefix turned into a leading 0"""
+    digits = re.sub(r'\D', '', value or '')
+    if digits.startswith('66') and (len(digits) == 11 or (value or '').strip().startswith('+')):
+        digits = '0' + digits[2:]
+    return digits
+
+def member_code_candidates(value: str) -> List[str]:
+    """Codes to try for a search entry: as typed (upper case) and, for 'm123', the create_membership
+    format 'M000123'. Empty if the entry does not look like a member code (letters then digits)."""
+    code = (value or '').strip().upper()
+    if not _MEMBER_CODE_INPUT.match(code):
+        return []
+    candidates = [code]
+    if _SHORT_MEMBER_CODE.match(code) and f"M{int(code[1:]):06d}" != code:
+        candidates.append(f"M{int(code[1:]):06d}")
+    return candidates
+
+def ensure_phone_index():
+    """Create the expression index used by phone lookups (called from init_db)"""
+    if is_mysql:
+        # MySQL ไม่มี CREATE INDEX IF NOT EXISTS - ใช้ index ของ phone เดิม (เบอร์ที่บันทึกโดยไม่มี -)
+        return
+    with engine.begin() as conn:
+        if is_postgresql:
+            # index ปกติใช้ collation ของฐานข้อมูล (เช่น th_TH) จึงใช้กับ LIKE 'prefix%' ไม่ได้
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {PHONE_PATTERN_INDEX} ON customers (({PHONE_DIGITS_SQL}) text_pattern_ops)"
+            ))
+            conn.execute(text(f"DROP INDEX IF EXISTS {PHONE_INDEX}"))
+        else:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {PHONE_INDEX} ON customers (({PHONE_DIGITS_SQL}))"))
+
+def _to_match(customer: Customer, membership: Optional[Membership]) -> CustomerMatch:
+    member = None
+    if membership is not None:
+        member = MemberInfo(
+            member_code=membership.member_code,
+            points=membership.points or 0.0,
+            total_spent=membership.total_spent or 0.0,
+            total_visits=membership.total_visits or 0
+        )
+    return CustomerMatch(
+        id=customer.id,
+        name=customer.name,
+        phone=customer.phone,
+        email=customer.email,
+        is_member=bool(customer.is_member),
+        membership=member
+    )
+
+def _customer_query(session):
+    """Customer with its active membership (one SELECT)"""
+    return session.query(Customer, Membership).outerjoin(
+        Membership, and_(Membership.customer_id == Customer.id, Membership.is_active == True)
+    )
+
+def _lookup(session, query: str) -> Optional[CustomerMatch]:
+    member_codes = member_code_candidates(query)
+    if member_codes:
+        row = _customer_query(session).filter(Membership.member_code.in_(member_codes)).first()
+    elif _PHONE_INPUT.match(query):
+        digits = normalize_phone(query)
+        if not digits:
+            return None
+        if is_sqlite:
+            # ช่วง [digits, digits + 1) = เบอร์ที่ขึ้นต้นด้วย digits (SQLite เรียงแบบ binary: '9' + 1 = ':')
+            upper = digits[:-1] + chr(ord(digits[-1]) + 1)
+            prefix_filter = and_(_phone_digits >= digits, _phone_digits < upper)
+        else:
+            # digits เป็นตัวเลขล้วน ไม่มี % หรือ _ ให้ต้อง escape
+            prefix_filter = _phone_digits.like(digits + '%')
+        # เบอร์ที่ตรงทั้งหมดสั้นที่สุดจึงมาก่อน
+        row = _customer_query(session).filter(prefix_filter).order_by(literal_column(f"length({PHONE_DIGITS_SQL})"), Customer.id).first()
+    else:
+        from utils.search import search
+        hits = search(query, 'customer', limit=1)
+        if not hits:
+            return None
+        row = _customer_query(session).filter(Customer.id == hits[0].id).first()
+    return _to_match(*row) if row else None
+
+def lookup_customer(query: str) -> Optional[CustomerMatch]:
+    """Find the customer for a POS search box entry
+
+    Args:
+        query: phone number (full or leading digits, any format), member code or name
+    Returns:
+        CustomerMatch with membership, or None
+    """
+    key = ' '.join((query or '').split()).upper()
+    if not key:
+        return None
+
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and now - cached[0] < CACHE_TTL_SECONDS:
+            _cache.move_to_end(key)
+            return cached[1]
+
+    session = SessionLocal()
+    try:
+        match = _lookup(session, key)
+    finally:
+        session.close()
+
+    # ไม่เก็บผล "ไม่พบ" - อาจเพิ่งสร้างลูกค้าใหม่
+    if match is not None:
+        with _cache_lock:
+            _cache[key] = (now, match)
+            _cache.move_to_end(key)
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return match
+
+def invalidate_customer(customer_id: int):
+    """Drop cached lookups of one customer - for writes that bypass the ORM flush (bulk update/Core)"""
+    with _cache_lock:
+        for key in [key for key, (_, match) in _cache.items() if match.id == customer_id]:
+            del _cache[key]
+
+def clear_customer_cache():
+    """Drop every cached lookup"""
+    with _cache_lock:
+        _cache.clear()
+
+@event.listens_for(Session, 'after_flush')
+def _record_customer_changes(session, flush_context):
+    """Remember customers whose row or membership was written in this transaction"""
+    customer_ids = {
+        obj.id if isinstance(obj, Customer) else obj.customer_id
+        for obj in chain(session.new, session.dirty, session.deleted)
+        if isinstance(obj, (Customer, Membership))
+    }
+    if customer_ids:
+        session.info.setdefault('customer_lookup_changed', set()).update(customer_ids)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session):
+    for customer_id in session.info.pop('customer_lookup_changed', ()):
+        invalidate_customer(customer_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back(session):
+    session.info.pop('customer_lookup_changed', None)
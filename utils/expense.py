@@ -9,6 +9,9 @@ from database.db import get_session
 from database.models import Expense, ExpenseCategory
 from sqlalchemy import func
 from utils.helpers import format_currency
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 def get_expenses_by_date_range(start_date: datetime, end_date: datetime, category_id: int = None) -> List[Expense]:
     """Get expenses by date range"""
@@ -108,7 +111,7 @@ def create_expense_category(name: str, description: str = None) -> Optional[Expe
         return category
     except Exception as e:
         session.rollback()
-        print(f"[DEBUG] Error in create_expense_category: {str(e)}")
+        logger.error("Error in create_expense_category: %s", e)
         return None
     finally:
         session.close()
@@ -0,0 +1,82 @@
+"""
+Columnar Report Helpers
+ดึงข้อมูลเฉพาะคอลัมน์ที่ต้องใช้เป็น DataFrame แล้วคำนวณแบบ vectorized (pandas/NumPy)
+แทนการวนลูปผ่าน ORM objects ทีละแถว
+"""
+
+from datetime import datetime
+from typing import Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from database.models import Sale, SaleItem, Product, Menu, MenuItem
+
+def fetch_frame(session: Session, stmt) -> pd.DataFrame:
+    """Execute a select() of plain columns and return the rows as a DataFrame
+    Column names follow the labels of the selected columns
+    """
+    result = session.execute(stmt)
+    return pd.DataFrame.from_records(result.fetchall(), columns=list(result.keys()), coerce_float=True)
+
+def get_menu_cost_series(session: Session) -> pd.Series:
+    """Get BOM cost of every menu as a Series indexed by menu_id"""
+    bom = fetch_frame(session, select(
+        MenuItem.menu_id,
+        MenuItem.quantity,
+        Product.cost_price
+    ).join(
+        Product, MenuItem.product_id == Product.id
+    ))
+
+    if bom.empty:
+        return pd.Series(dtype=float)
+
+    costs = bom['quantity'].astype(float) * bom['cost_price'].astype(float)
+    return costs.groupby(bom['menu_id']).sum()
+
+def get_sale_item_profit_frame(session: Session, start_date: datetime, end_date: datetime,
+                               created_by: Optional[int] = None,
+                               subtract_discount: bool = True) -> pd.DataFrame:
+    """Get profit of every item of non-void sales in a date range
+    Returns: DataFrame with columns sale_id, sale_date, revenue, profit
+    """
+    stmt = select(
+        SaleItem.sale_id,
+        Sale.sale_date,
+        SaleItem.item_type,
+        SaleItem.menu_id,
+        SaleItem.quantity,
+        SaleItem.unit_price,
+        SaleItem.discount_amount,
+        SaleItem.total_price.label('revenue'),
+        Product.cost_price.label('product_cost')
+    ).join(
+        Sale, SaleItem.sale_id == Sale.id
+    ).outerjoin(
+        Product, SaleItem.product_id == Product.id
+    ).where(
+        Sale.sale_date >= start_date,
+        Sale.sale_date <= end_date,
+        Sale.is_void == False
+    )
+    if created_by is not None:
+        stmt = stmt.where(Sale.created_by == created_by)
+
+    items = fetch_frame(session, stmt)
+    if items.empty:
+        return pd.DataFrame(columns=['sale_id', 'sale_date', 'revenue', 'profit'])
+
+    menu_costs = get_menu_cost_series(session)
+    product_cost = items['product_cost'].astype(float)
+    is_product = (items['item_type'] == 'product') & product_cost.notna()
+    is_menu = items['item_type'] == 'menu'
+
+    # สินค้า: ต้นทุนจาก products, เมนู: ต้นทุนจาก BOM (menu_items)
+    cost = np.where(is_product, product_cost, items['menu_id'].map(menu_costs).astype(float).fillna(0.0))
+    profit = (items['unit_price'].astype(float) - cost) * items['quantity'].astype(float)
+    if subtract_discount:
+        profit = profit - items['discount_amount'].astype(float).fillna(0.0)
+
+    items['profit'] = np.where(is_product | is_menu, profit, 0.0)
+    return items[['sale_id', 'sale_date', 'revenue', 'profit']]
@@ -11,7 +11,11 @@ from database.models import (
 )
 from sqlalchemy import func, and_
 from functools import lru_cache
+from utils.frames import get_sale_item_profit_frame
 import time
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 def format_currency(amount: float) -> str:
     """Format number as currency"""
@@ -66,29 +70,15 @@ def _get_today_profit_cached(date_str: str) -> float:
     """Cached version of get_today_profit"""
     session = get_session()
     try:
-        today = datetime.strptime(date_str, "%Y-%m-%d").date()
-        sales = session.query(Sale).filter(
-            func.date(Sale.sale_date) == today,
-            Sale.is_void == False
-        ).all()
-        
-        total_profit = 0.0
-        for sale in sales:
-            for item in sale.sale_items:
-                if item.item_type == 'product':
-                    # Profit = (selling_price - cost_price) * quantity
-                    if item.product:
-                        cost = item.product.cost_price
-                        profit = (item.unit_price - cost) * item.quantity
-                        total_profit += profit
-                elif item.item_type == 'menu':
-                    # Calculate menu cost from BOM
-                    if item.menu:
-                        menu_cost = calculate_menu_cost(item.menu_id)
-                        profit = (item.unit_price - menu_cost) * item.quantity
-                        total_profit += profit
-        
-        return total_profit
+        today = datetime.strptime(date_str, "%Y-%m-%d")
+        # Profit = (selling_price - cost_price) * quantity (product cost or menu BOM cost)
+        items = get_sale_item_profit_frame(
+            session,
+            today,
+            today + timedelta(days=1) - timedelta(microseconds=1),
+            subtract_discount=False
+        )
+        return float(items['profit'].sum())
     finally:
         session.close()
 
@@ -213,6 +203,7 @@ def reduce_stock_for_sale(sale_id: int, user_id: int):
                         unit_price=product.cost_price,
                         total_cost=product.cost_price * item.quantity,
                         reason=f'ขาย - Sale #{sale_id}',
+                        sale_id=sale_id,
                         created_by=user_id
                     )
                     session.add(transaction)
@@ -243,6 +234,7 @@ def reduce_stock_for_sale(sale_id: int, user_id: int):
                                     unit_price=product.cost_price,
                                     total_cost=product.cost_price * quantity_needed,
                                     reason=f'ขายเมนู {menu.name} - Sale #{sale_id}',
+                                    sale_id=sale_id,
                                     created_by=user_id
                                 )
                                 session.add(transaction)
@@ -293,7 +285,7 @@ def get_or_create_customer(phone: str = None, name: str = None, email: str = Non
         return customer
     except Exception as e:
         session.rollback()
-        print(f"[DEBUG] Error in get_or_create_customer: {str(e)}")
+        logger.error("Error in get_or_create_customer: %s", e)
         return None
     finally:
         session.close()
@@ -334,7 +326,7 @@ def create_membership(customer_id: int, member_code: str = None) -> Optional[Mem
         return membership
     except Exception as e:
         session.rollback()
-        print(f"[DEBUG] Error in create_membership: {str(e)}")
+        logger.error("Error in create_membership: %s", e)
         return None
     finally:
         session.close()
@@ -365,11 +357,11 @@ def earn_points(customer_id: int, sale_id: int, points: float, description: str
         session.add(transaction)
         session.commit()
         
-        print(f"[DEBUG] Earned {points} points for customer {customer_id} from sale {sale_id}")
+        logger.debug("Earned %s points for customer %s from sale %s", points, customer_id, sale_id)
         return True
     except Exception as e:
         session.rollback()
-        print(f"[DEBUG] Error in earn_points: {str(e)}")
+        logger.error("Error in earn_points: %s", e)
         return False
     finally:
         session.close()
@@ -400,11 +392,11 @@ def redeem_points(customer_id: int, sale_id: int, points: float, description: st
         session.add(transaction)
         session.commit()
         
-        print(f"[DEBUG] Redeemed {points} points for customer {customer_id} in sale {sale_id}")
+        logger.debug("Redeemed %s points for customer %s in sale %s", points, customer_id, sale_id)
         return True
     except Exception as e:
         session.rollback()
-        print(f"[DEBUG] Error in redeem_points: {str(e)}")
+        logger.error("Error in redeem_points: %s", e)
         return False
     finally:
         session.close()
@@ -423,10 +415,10 @@ def update_membership_after_sale(customer_id: int, sale_id: int, amount: float):
             membership.total_visits += 1
             membership.last_visit = datetime.now()
             session.commit()
-            print(f"[DEBUG] Updated membership stats for customer {customer_id}")
+            logger.debug("Updated membership stats for customer %s", customer_id)
     except Exception as e:
         session.rollback()
-        print(f"[DEBUG] Error in update_membership_after_sale: {str(e)}")
+        logger.error("Error in update_membership_after_sale: %s", e)
     finally:
         session.close()
 
@@ -514,11 +506,11 @@ def use_coupon(coupon_id: int, sale_id: int, customer_id: int = None, discount_a
         session.add(usage)
         session.commit()
         
-        print(f"[DEBUG] Used coupon {coupon.code} in sale {sale_id}")
+        logger.debug("Used coupon %s in sale %s", coupon.code, sale_id)
         return True
     except Exception as e:
         session.rollback()
-        print(f"[DEBUG] Error in use_coupon: {str(e)}")
+        logger.error("Error in use_coupon: %s", e)
         return False
     finally:
         session.close()
@@ -6,9 +6,15 @@ import os
 import streamlit as st
 from PIL import Image
 from io import BytesIO
-from datetime import datetime
-import uuid
 import base64
+import functools
+from datetime import datetime
+from sqlalchemy import select, text, update
+from utils.logger import get_logger
+from utils.thumbnails import THUMBNAIL_DIR, REMOTE_CACHE_DIR, content_hash, remove_thumbnails
+from utils.image_worker import submit_image, is_processing, get_image_error
+
+logger = get_logger(__name__)
 
 # โฟลเดอร์สำหรับเก็บรูปภาพ
 IMAGE_DIR = "data/images"
@@ -16,24 +22,43 @@ PRODUCT_IMAGE_DIR = os.path.join(IMAGE_DIR, "products")
 MENU_IMAGE_DIR = os.path.join(IMAGE_DIR, "menus")
 BARCODE_IMAGE_DIR = os.path.join(IMAGE_DIR, "barcodes")
 
+# นามสกุลไฟล์ที่ import ทั้งโฟลเดอร์ได้
+IMPORT_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
 def ensure_image_directories():
     """สร้างโฟลเดอร์สำหรับเก็บรูปภาพถ้ายังไม่มี"""
     os.makedirs(PRODUCT_IMAGE_DIR, exist_ok=True)
     os.makedirs(MENU_IMAGE_DIR, exist_ok=True)
     os.makedirs(BARCODE_IMAGE_DIR, exist_ok=True)
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    os.makedirs(REMOTE_CACHE_DIR, exist_ok=True)
 
-def save_uploaded_image(uploaded_file, image_type="product", max_size=(800, 800), quality=85):
+def _image_target(image_type, data):
+    """Folder, final path and max size of an upload (the file name is the hash of its content)"""
+    if image_type == "product":
+        save_dir = PRODUCT_IMAGE_DIR
+    elif image_type == "menu":
+        save_dir = MENU_IMAGE_DIR
+    elif image_type == "barcode":
+        save_dir = BARCODE_IMAGE_DIR
+    else:
+        save_dir = IMAGE_DIR
+    return os.path.join(save_dir, f"{content_hash(data)}.jpg")
+
+def save_uploaded_image(uploaded_file, image_type="product", max_size=(800, 800), quality=85, on_done=None):
     """
-    บันทึกรูปภาพที่อัพโหลด
+    บันทึกรูปภาพที่อัพโหลด (ย่อรูปและทำรูปย่อ WebP ใน background - ดู utils.image_worker)
+    ชื่อไฟล์คือ hash ของไฟล์ต้นฉบับ - อัพโหลดรูปเดิมซ้ำจะได้ไฟล์เดิมโดยไม่ต้องประมวลผลใหม่
     
     Args:
-        uploaded_file: Streamlit UploadedFile object
-        image_type: ประเภทรูปภาพ ("product" หรือ "menu")
+        uploaded_file: Streamlit UploadedFile object (หรือ file object ที่มี .type และ .getvalue())
+        image_type: ประเภทรูปภาพ ("product", "menu" หรือ "barcode")
         max_size: ขนาดสูงสุด (width, height) สำหรับ resize
         quality: คุณภาพ JPEG (1-100)
+        on_done: เรียกด้วย path เมื่อไฟล์พร้อมใช้งาน
     
     Returns:
-        str: Path ของไฟล์ที่บันทึก หรือ None ถ้าเกิดข้อผิดพลาด
+        str: Path ของไฟล์ (คืนทันที ไฟล์อาจยังประมวลผลอยู่) หรือ None ถ้าเกิดข้อผิดพลาด
     """
     try:
         ensure_image_directories()
@@ -43,57 +68,105 @@ def save_uploaded_image(uploaded_file, image_type="product", max_size=(800, 800)
             st.error("❌ รองรับเฉพาะไฟล์รูปภาพ: JPG, PNG, WebP")
             return None
         
-        # อ่านรูปภาพ
-        image = Image.open(uploaded_file)
+        data = uploaded_file.getvalue()
+        # อ่านแค่ header เพื่อแจ้งไฟล์เสียทันที (การ decode จริงทำใน worker)
+        Image.open(BytesIO(data))
         
-        # แปลงเป็น RGB ถ้าเป็น RGBA (สำหรับ PNG)
-        if image.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'P':
-                image = image.convert('RGBA')
-            background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-            image = background
-        
-        # Resize ถ้าใหญ่เกินไป (สำหรับ barcode ใช้ขนาดที่เหมาะสม)
+        # Barcode image ควรเป็นแนวนอนและมีความละเอียดสูง
         if image_type == "barcode":
-            # Barcode image ควรเป็นแนวนอนและมีความละเอียดสูง
-            barcode_max_size = (1200, 400)
-            if image.size[0] > barcode_max_size[0] or image.size[1] > barcode_max_size[1]:
-                image.thumbnail(barcode_max_size, Image.Resampling.LANCZOS)
-        elif image.size[0] > max_size[0] or image.size[1] > max_size[1]:
-            image.thumbnail(max_size, Image.Resampling.LANCZOS)
-        
-        # สร้างชื่อไฟล์
-        file_ext = "jpg"  # ใช้ JPG เสมอเพื่อประหยัดพื้นที่
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_id = str(uuid.uuid4())[:8]
-        filename = f"{timestamp}_{unique_id}.{file_ext}"
+            max_size = (1200, 400)
         
-        # กำหนดโฟลเดอร์ตามประเภท
-        if image_type == "product":
-            save_dir = PRODUCT_IMAGE_DIR
-        elif image_type == "menu":
-            save_dir = MENU_IMAGE_DIR
-        elif image_type == "barcode":
-            save_dir = BARCODE_IMAGE_DIR
-        else:
-            save_dir = IMAGE_DIR
-        
-        # บันทึกไฟล์
-        file_path = os.path.join(save_dir, filename)
-        image.save(file_path, "JPEG", quality=quality, optimize=True)
-        
-        print(f"[DEBUG] บันทึกรูปภาพสำเร็จ: {file_path} - {datetime.now()}")
+        file_path = submit_image(data, _image_target(image_type, data), max_size, quality, on_done)
+        logger.debug("ส่งรูปภาพเข้าคิวประมวลผล: %s", file_path)
         return file_path
     
     except Exception as e:
         st.error(f"❌ เกิดข้อผิดพลาดในการบันทึกรูปภาพ: {str(e)}")
-        print(f"[DEBUG] Error saving image: {e}")
+        logger.error("Error saving image: %s", e)
         return None
 
+def _attach_product_image(product_id, image_path):
+    """ผูกรูปที่ประมวลผลเสร็จกับสินค้า แล้วลบรูปเดิมที่ถูกแทนที่ (เรียกจาก image worker)"""
+    from database.db import engine
+    from database.models import Product
+    products = Product.__table__
+    with engine.begin() as conn:
+        old_path = conn.execute(select(products.c.image_path).where(products.c.id == product_id)).scalar()
+        conn.execute(update(products).where(products.c.id == product_id).values(
+            image_path=image_path, updated_at=datetime.now()
+        ))
+    logger.debug("ผูกรูปภาพกับสินค้า %s: %s", product_id, image_path)
+    release_image(old_path, image_path)
+
+def import_product_images(folder, overwrite=False):
+    """
+    นำเข้ารูปสินค้าทั้งโฟลเดอร์ - จับคู่ชื่อไฟล์ (ไม่รวมนามสกุล) กับบาร์โค๊ด แล้วจึงชื่อสินค้า
+    เช่น 8850999000017.jpg หรือ น้ำดื่ม 600ml.png
+    รูปถูกย่อใน background และผูกกับสินค้าเมื่อเสร็จ (รอด้วย utils.image_worker.wait_for_images)
+    
+    Args:
+        folder: โฟลเดอร์บนเครื่องที่รันแอป
+        overwrite: แทนที่รูปเดิมของสินค้าที่มีรูปอยู่แล้ว
+    
+    Returns:
+        dict: queued (จำนวนที่ส่งเข้าคิว), skipped (มีรูปอยู่แล้ว), unmatched (ชื่อไฟล์ที่ไม่พบสินค้า),
+              errors (ไฟล์ที่อ่านไม่ได้), paths (path ที่ส่งเข้าคิว)
+    """
+    from database.db import engine
+    from database.models import Product
+    
+    if not os.path.isdir(folder):
+        raise FileNotFoundError(f"ไม่พบโฟลเดอร์: {folder}")
+    ensure_image_directories()
+    
+    with engine.connect() as conn:
+        rows = conn.execute(select(Product.id, Product.name, Product.barcode, Product.image_path)).all()
+    by_barcode = {row.barcode.strip(): row for row in rows if row.barcode}
+    by_name = {row.name.strip().casefold(): row for row in rows if row.name}
+    
+    result = {'queued': 0, 'skipped': 0, 'unmatched': [], 'errors': [], 'paths': []}
+    for filename in sorted(os.listdir(folder)):
+        stem, ext = os.path.splitext(filename)
+        if ext.lower() not in IMPORT_EXTENSIONS:
+            continue
+        product = by_barcode.get(stem.strip()) or by_name.get(stem.strip().casefold())
+        if product is None:
+            result['unmatched'].append(filename)
+            continue
+        if product.image_path and not overwrite:
+            result['skipped'] += 1
+            continue
+        try:
+            with open(os.path.join(folder, filename), 'rb') as f:
+                data = f.read()
+            Image.open(BytesIO(data))
+        except Exception as e:
+            result['errors'].append(f"{filename}: {e}")
+            continue
+        path = submit_image(data, _image_target("product", data),
+                            on_done=functools.partial(_attach_product_image, product.id))
+        result['queued'] += 1
+        result['paths'].append(path)
+    
+    logger.info("Queued product images from %s", folder, extra={
+        'queued': result['queued'], 'skipped': result['skipped'], 'unmatched': len(result['unmatched'])
+    })
+    return result
+
+def count_image_references(image_path):
+    """จำนวนสินค้า/เมนูที่ใช้ไฟล์รูปภาพนี้อยู่"""
+    from database.db import engine
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT (SELECT count(*) FROM products WHERE image_path = :path OR barcode_image_path = :path)"
+            " + (SELECT count(*) FROM menus WHERE image_path = :path)"
+        ), {'path': image_path}).scalar() or 0
+
 def delete_image(image_path):
     """
-    ลบไฟล์รูปภาพ
+    ลบไฟล์รูปภาพและรูปย่อ
+    ไฟล์ที่ตั้งชื่อด้วย hash อาจใช้ร่วมกันหลายรายการ - จะลบเมื่อไม่มีสินค้า/เมนูใดใช้อยู่แล้ว
+    (เรียกหลังบันทึก path ใหม่สำเร็จ - ใช้ release_image() จากหน้าแก้ไข)
     
     Args:
         image_path: Path ของไฟล์รูปภาพ
@@ -105,14 +178,30 @@ def delete_image(image_path):
         if image_path and os.path.exists(image_path):
             # ตรวจสอบว่าเป็นไฟล์ในโฟลเดอร์ images เท่านั้น (เพื่อความปลอดภัย)
             if IMAGE_DIR in os.path.abspath(image_path):
+                if count_image_references(image_path) > 0:
+                    logger.debug("รูปภาพยังถูกใช้โดยรายการอื่น: %s", image_path)
+                    return False
+                remove_thumbnails(image_path)
                 os.remove(image_path)
-                print(f"[DEBUG] ลบรูปภาพสำเร็จ: {image_path}")
+                logger.debug("ลบรูปภาพสำเร็จ: %s", image_path)
                 return True
         return False
     except Exception as e:
-        print(f"[DEBUG] Error deleting image: {e}")
+        logger.error("Error deleting image: %s", e)
         return False
 
+def release_image(old_path, new_path):
+    """
+    ลบรูปเดิมหลังบันทึกรูปใหม่ของรายการสำเร็จแล้ว
+    ไม่ลบถ้าเป็น URL หรือเป็นไฟล์เดียวกัน (อัพโหลดไฟล์เดิมซ้ำได้ path เดิมเพราะตั้งชื่อด้วย hash)
+    
+    Returns:
+        bool: True ถ้าลบไฟล์เดิม
+    """
+    if not old_path or old_path == new_path or old_path.startswith(('http://', 'https://')):
+        return False
+    return delete_image(old_path)
+
 def get_image_path_for_display(image_path):
     """
     ตรวจสอบและคืนค่า path ที่ใช้แสดงรูปภาพได้
@@ -157,14 +246,29 @@ def image_uploader_widget(label, key, image_type="product", help_text=None):
     )
     
     if uploaded_file is not None:
-        # แสดงตัวอย่างรูปภาพ
-        image = Image.open(uploaded_file)
-        st.image(image, caption="ตัวอย่างรูปภาพ", width=200)
+        # แสดงตัวอย่างรูปภาพ (ส่งไฟล์ให้ browser ตรงๆ ไม่ต้อง decode)
+        st.image(uploaded_file, caption="ตัวอย่างรูปภาพ", width=200)
+        
+        # บันทึกไฟล์ครั้งเดียวต่อไฟล์ที่อัพโหลด - rerun ถัดไปใช้ path เดิม
+        processed_key = f"{key}_saved_image"
+        saved = st.session_state.get(processed_key)
+        if saved and saved[0] == uploaded_file.file_id:
+            file_path = saved[1]
+        else:
+            file_path = save_uploaded_image(uploaded_file, image_type)
+            if file_path:
+                st.session_state[processed_key] = (uploaded_file.file_id, file_path)
         
-        # บันทึกไฟล์
-        file_path = save_uploaded_image(uploaded_file, image_type)
         if file_path:
-            st.success("✅ อัพโหลดรูปภาพสำเร็จ")
+            error = get_image_error(file_path)
+            if error:
+                st.error(f"❌ เกิดข้อผิดพลาดในการบันทึกรูปภาพ: {error}")
+                st.session_state.pop(processed_key, None)
+                return None
+            if is_processing(file_path):
+                st.info("⏳ อัพโหลดแล้ว กำลังย่อรูปภาพ...")
+            else:
+                st.success("✅ อัพโหลดรูปภาพสำเร็จ")
             return file_path
         else:
             return None
@@ -190,6 +294,6 @@ def convert_image_to_base64(image_path):
             img_base64 = base64.b64encode(img_data).decode()
             return f"data:image/jpeg;base64,{img_base64}"
     except Exception as e:
-        print(f"[DEBUG] Error converting image to base64: {e}")
+        logger.error("Error converting image to base64: %s", e)
         return None
 
@@ -0,0 +1,123 @@
+"""
+Image Worker - ย่อ/แปลงรูปที่อัพโหลดใน thread แยก ไม่ให้หน้าเว็บต้องรอ
+- path ปลายทางรู้ล่วงหน้า (ชื่อไฟล์คือ hash ของเนื้อหา) จึงบันทึกลงฐานข้อมูลได้ทันที
+  ระหว่างประมวลผล get_thumbnail() คืน None หน้าเว็บแสดง placeholder แทน
+- รูปเดียวกันที่ส่งซ้ำ (อยู่ในคิวหรือมีไฟล์แล้ว) ไม่ถูกประมวลผลซ้ำ
+- on_done ถูกเรียกเมื่อไฟล์พร้อม (เช่น ผูกรูปกับสินค้าตอน import ทั้งโฟลเดอร์)
+
+ใช้ thread pool เพราะ Pillow ปล่อย GIL ระหว่าง decode/resize/encode และไม่ต้อง fork โปรเซส Streamlit
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from io import BytesIO
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from PIL import Image
+from utils.logger import get_logger, log_timing
+from utils.thumbnails import generate_thumbnails
+
+logger = get_logger(__name__)
+
+IMAGE_WORKERS = 2
+FAILED_HISTORY = 100
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+_pending: Dict[str, Future] = {}
+_failed: Dict[str, str] = {}
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image-worker")
+    return _executor
+
+def process_image(data: bytes, target_path: str, max_size: Tuple[int, int], quality: int) -> str:
+    """Convert to RGB JPEG, shrink to max_size, save to target_path and write the thumbnails"""
+    with log_timing(logger, "Processed image", path=target_path, bytes=len(data)):
+        image = Image.open(BytesIO(data))
+        image.draft('RGB', max_size)  # JPEG: decode ที่ความละเอียดต่ำลงได้เลย
+
+        # แปลงเป็น RGB ถ้าเป็น RGBA (สำหรับ PNG)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            image = image.convert('RGBA')
+            background.paste(image, mask=image.split()[-1])
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
+            image.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+        # เขียนไฟล์ชั่วคราวก่อนแล้วค่อย rename - ไม่มีใครเห็นไฟล์ครึ่งๆ กลางๆ
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        temp_path = f"{target_path}.{threading.get_ident()}.tmp"
+        image.save(temp_path, "JPEG", quality=quality, optimize=True)
+        os.replace(temp_path, target_path)
+        generate_thumbnails(image, os.path.splitext(os.path.basename(target_path))[0])
+    return target_path
+
+def _run(data: bytes, target_path: str, max_size: Tuple[int, int], quality: int) -> str:
+    try:
+        return process_image(data, target_path, max_size, quality)
+    except Exception as e:
+        with _lock:
+            _failed[target_path] = str(e)
+            while len(_failed) > FAILED_HISTORY:
+                _failed.pop(next(iter(_failed)))
+        logger.error("Error processing image %s: %s", target_path, e)
+        raise
+    finally:
+        with _lock:
+            _pending.pop(target_path, None)
+
+def _attach_callback(future: Future, target_path: str, on_done: Callable[[str], None]):
+    def callback(done: Future):
+        if done.cancelled() or done.exception() is not None:
+            return
+        try:
+            on_done(target_path)
+        except Exception as e:
+            logger.error("Image callback failed for %s: %s", target_path, e)
+    future.add_done_callback(callback)
+
+def submit_image(data: bytes, target_path: str, max_size: Tuple[int, int] = (800, 800), quality: int = 85,
+                 on_done: Optional[Callable[[str], None]] = None) -> str:
+    """Queue an image for processing and return its final path immediately
+
+    If the file already exists, on_done runs right away; if the same file is already queued,
+    on_done is attached to that job.
+    """
+    with _lock:
+        _failed.pop(target_path, None)
+        future = _pending.get(target_path)
+        if future is None and not os.path.exists(target_path):
+            future = _get_executor().submit(_run, data, target_path, max_size, quality)
+            _pending[target_path] = future
+    if future is None:
+        if on_done:
+            on_done(target_path)
+    elif on_done:
+        _attach_callback(future, target_path, on_done)
+    return target_path
+
+def is_processing(image_path: Optional[str]) -> bool:
+    """Whether the image is still queued or being processed"""
+    with _lock:
+        return bool(image_path) and image_path in _pending
+
+def get_image_error(image_path: Optional[str]) -> Optional[str]:
+    """Error message of a failed job (None if it succeeded or is still running)"""
+    with _lock:
+        return _failed.get(image_path) if image_path else None
+
+def wait_for_images(paths: Optional[Iterable[str]] = None, timeout: Optional[float] = None) -> bool:
+    """Block until the given (or all) queued images are done; returns False on timeout"""
+    with _lock:
+        futures = list(_pending.values()) if paths is None else [_pending[p] for p in paths if p in _pending]
+    if not futures:
+        return True
+    _, not_done = wait(futures, timeout=timeout)
+    return not not_done
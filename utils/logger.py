@@ -0,0 +1,215 @@
+"""
+Logger - ระบบ log กลางของแอป (แทน print("[DEBUG] ..."))
+ทุกโมดูลเขียนผ่าน logger ตระกูล "pos.*" ซึ่งส่งเข้า queue แล้วมี thread แยกเขียนออก stderr/ไฟล์
+หน้าเว็บจึงไม่ต้องรอ I/O และ DEBUG ถูกตัดทิ้งตั้งแต่ต้นทางเมื่อปิดไว้ (ค่าเริ่มต้นของ production)
+
+ตั้งค่าผ่าน environment variables:
+    POS_LOG_LEVEL   ระดับเริ่มต้น เช่น DEBUG, INFO, WARNING (ค่าเริ่มต้น WARNING)
+    POS_LOG_LEVELS  ระดับรายโมดูล เช่น "database.db=INFO,utils.helpers=DEBUG"
+    POS_LOG_FORMAT  text หรือ json (ค่าเริ่มต้น text)
+    POS_LOG_FILE    เขียนลงไฟล์ (หมุนไฟล์ที่ 5MB) แทน stderr
+
+ใช้งาน:
+    from utils.logger import get_logger, log_timing
+    logger = get_logger(__name__)
+    logger.debug("Earned %s points for customer %s", points, customer_id)
+    with log_timing(logger, "Generate receipt", sale_id=sale_id):
+        ...
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+ROOT_LOGGER = "pos"
+DEFAULT_LEVEL = "WARNING"
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 5
+
+# attribute มาตรฐานของ LogRecord - ที่เหลือคือ field ที่ส่งมาทาง extra=
+_RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_configure_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_file_listeners: Dict[str, logging.handlers.QueueListener] = {}
+
+def _extra_fields(record: logging.LogRecord) -> Dict:
+    """Fields passed through extra= (timing, ids, ...)"""
+    return {k: v for k, v in record.__dict__.items() if k not in _RESERVED_ATTRS and not k.startswith('_')}
+
+class TextFormatter(logging.Formatter):
+    """Human readable line: time LEVEL module: message key=value ..."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        record.message = record.getMessage()
+        record.asctime = self.formatTime(record)
+        line = self.formatMessage(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line (for log collectors)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps the traceback separate from the message (for JsonFormatter)"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+def _parse_module_levels(spec: str) -> Dict[str, str]:
+    """Parse "database.db=INFO,utils.helpers=DEBUG" into a dict"""
+    levels = {}
+    for part in (spec or '').split(','):
+        if '=' in part:
+            name, level = part.split('=', 1)
+            if name.strip() and level.strip():
+                levels[name.strip()] = level.strip().upper()
+    return levels
+
+def _logger_name(name: str) -> str:
+    """Map a module name (utils.helpers) to its logger (pos.utils.helpers)"""
+    if name == ROOT_LOGGER or name.startswith(ROOT_LOGGER + '.'):
+        return name
+    return f"{ROOT_LOGGER}.{name}"
+
+def configure_logging(level: str = None, module_levels: Dict[str, str] = None, fmt: str = None,
+                      log_file: str = None, force: bool = False):
+    """Set up the pos logger tree with a non-blocking queue handler
+
+    Arguments override the POS_LOG_* environment variables. Called automatically by get_logger();
+    call again with force=True to change the configuration at runtime.
+    """
+    global _listener
+
+    with _configure_lock:
+        root = logging.getLogger(ROOT_LOGGER)
+        if _listener is not None and not force:
+            return root
+
+        level = (level or os.environ.get('POS_LOG_LEVEL') or DEFAULT_LEVEL).upper()
+        if module_levels is None:
+            module_levels = _parse_module_levels(os.environ.get('POS_LOG_LEVELS', ''))
+        fmt = (fmt or os.environ.get('POS_LOG_FORMAT') or 'text').lower()
+        log_file = log_file or os.environ.get('POS_LOG_FILE')
+
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+
+        if log_file:
+            os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+            target = logging.handlers.RotatingFileHandler(log_file, maxBytes=LOG_FILE_MAX_BYTES,
+                                                          backupCount=LOG_FILE_BACKUPS, encoding='utf-8')
+        else:
+            target = logging.StreamHandler(sys.stderr)
+        target.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+
+        log_queue = queue.SimpleQueue()
+        root.addHandler(_QueueHandler(log_queue))
+        root.setLevel(level)
+        root.propagate = False
+
+        for name, module_level in module_levels.items():
+            logging.getLogger(_logger_name(name)).setLevel(module_level)
+
+        _listener = logging.handlers.QueueListener(log_queue, target)
+        _listener.start()
+        return root
+
+def get_file_logger(name: str, path: str, max_bytes: int = LOG_FILE_MAX_BYTES, backups: int = LOG_FILE_BACKUPS,
+                    level: str = "INFO", formatter: logging.Formatter = None) -> logging.Logger:
+    """Get a logger that writes only to its own rotating file (through a queue, like the main log)"""
+    logger = logging.getLogger(_logger_name(name))
+    with _configure_lock:
+        if logger.name not in _file_listeners:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            target = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+            target.setFormatter(formatter or logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+            log_queue = queue.SimpleQueue()
+            logger.addHandler(_QueueHandler(log_queue))
+            logger.setLevel(level)
+            logger.propagate = False
+            listener = logging.handlers.QueueListener(log_queue, target)
+            listener.start()
+            _file_listeners[logger.name] = listener
+    return logger
+
+def shutdown_logging():
+    """Flush queued records and stop the writer threads"""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        for listener in _file_listeners.values():
+            listener.stop()
+        _file_listeners.clear()
+
+atexit.register(shutdown_logging)
+
+def get_logger(name: str) -> logging.Logger:
+    """Get the logger for a module (pass __name__, or a short name for pages)"""
+    configure_logging()
+    return logging.getLogger(_logger_name(name))
+
+def set_level(name: str, level: str):
+    """Change the level of one module (or "pos" for all) at runtime"""
+    logging.getLogger(_logger_name(name)).setLevel(level.upper())
+
+@contextmanager
+def log_timing(logger: logging.Logger, message: str, level: int = logging.DEBUG, **fields):
+    """Log message with duration_ms (and the given fields) when the block finishes
+
+    If the block raises, the record also gets error=<exception> and the exception propagates.
+    """
+    started = time.perf_counter()
+    try:
+        yield fields
+    except Exception as e:
+        fields['error'] = repr(e)
+        raise
+    finally:
+        if logger.isEnabledFor(level):
+            fields['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            logger.log(level, message, extra=fields)
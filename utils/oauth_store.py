@@ -0,0 +1,329 @@
+"""
+OAuth Store - เก็บ authorization code และ access/refresh token ของ OAuth ในฐานข้อมูล
+- เก็บเฉพาะ SHA-256 ของ code/token (ฐานข้อมูลรั่วก็เอา token ไปใช้ไม่ได้)
+- code ใช้ได้ครั้งเดียว: ทำเครื่องหมายใช้แล้วด้วย UPDATE เดียว (สอง request แลกพร้อมกันได้ token แค่ชุดเดียว)
+- verify_access_token() ดูจาก cache ในหน่วยความจำก่อน (TTL สั้น) จึงแทบไม่แตะฐานข้อมูลต่อ request
+  token ที่ถูก revoke จาก process อื่นอาจยังผ่านได้นานสุด VERIFY_CACHE_SECONDS
+- แถวที่หมดอายุถูกลบเป็นระยะ (maybe_purge_expired) ใช้ index บน expires_at
+- client ต้องลงทะเบียนใน secrets [oauth_clients.<client_id>] (secret, redirect_uris, scopes)
+  client ที่ไม่ได้ลงทะเบียน / redirect_uri หรือ scope ที่ไม่ได้ลงทะเบียนถูกปฏิเสธเสมอ
+"""
+
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import and_, delete, or_, select, update
+from database.db import engine
+from database.models import OAuthAuthorizationCode, OAuthToken
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CODE_TTL = timedelta(minutes=10)
+ACCESS_TOKEN_TTL = timedelta(hours=1)
+REFRESH_TOKEN_TTL = timedelta(days=30)
+VERIFY_CACHE_SECONDS = 60       # token ที่ตรวจแล้วใช้ผลจาก cache ได้นานเท่านี้
+NEGATIVE_CACHE_SECONDS = 5      # token ที่ไม่ถูกต้อง (กันการยิงซ้ำไปที่ฐานข้อมูล)
+VERIFY_CACHE_SIZE = 10000
+PURGE_INTERVAL_SECONDS = 600
+DEFAULT_SCOPES = ('read',)      # scope ของ client ที่ไม่ได้ระบุ scopes
+API_SCOPES = ('read', 'write')  # read = GET, write = สร้าง/แก้ไข (write รวม read)
+
+_codes = OAuthAuthorizationCode.__table__
+_tokens = OAuthToken.__table__
+
+@dataclass(frozen=True)
+class TokenInfo:
+    """A valid access token"""
+    user_id: str
+    client_id: str
+    scope: Optional[str]
+    expires_at: datetime
+
+def hash_token(token: str) -> str:
+    """SHA-256 hex of a code/token (what the database stores)"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+# ---------------------------------------------------------------- clients
+
+@dataclass(frozen=True)
+class OAuthClient:
+    """A client registered in secrets [oauth_clients]"""
+    client_id: str
+    secret: str
+    redirect_uris: Tuple[str, ...]
+    scopes: Tuple[str, ...]
+
+def registered_clients() -> Dict[str, OAuthClient]:
+    """Clients from Streamlit secrets:
+
+        [oauth_clients.my-app]
+        secret = "..."
+        redirect_uris = ["https://my-app.example/callback"]
+        scopes = ["read", "write"]   # ไม่ระบุ = read
+
+    รูปแบบเดิม `my-app = "secret"` ยังใช้ได้ แต่ไม่มี redirect_uri จึงขอ code ผ่านหน้า consent ไม่ได้
+    """
+    try:
+        import streamlit as st
+        if 'oauth_clients' not in st.secrets:
+            return {}
+        configured = dict(st.secrets['oauth_clients'])
+    except Exception:
+        return {}
+    clients = {}
+    for client_id, value in configured.items():
+        if isinstance(value, str):
+            clients[client_id] = OAuthClient(client_id, value, (), DEFAULT_SCOPES)
+            continue
+        value = dict(value)
+        if not value.get('secret'):
+            logger.warning("OAuth client %s has no secret - ignored", client_id)
+            continue
+        uris = value.get('redirect_uris') or ()
+        scopes = value.get('scopes') or DEFAULT_SCOPES
+        clients[client_id] = OAuthClient(
+            client_id, str(value['secret']),
+            (uris,) if isinstance(uris, str) else tuple(uris),
+            tuple(scopes.split()) if isinstance(scopes, str) else tuple(scopes)
+        )
+    return clients
+
+def get_client(client_id: str) -> Optional[OAuthClient]:
+    """Registered client, None when client_id is not registered"""
+    return registered_clients().get(client_id) if client_id else None
+
+def verify_client_secret(client_id: str, client_secret: str) -> bool:
+    """True only for a registered client with the matching secret"""
+    client = get_client(client_id)
+    return client is not None and hmac.compare_digest(client.secret, client_secret or '')
+
+def redirect_uri_allowed(client: OAuthClient, redirect_uri: Optional[str]) -> bool:
+    """Exact match against the client's registered redirect URIs"""
+    return bool(redirect_uri) and redirect_uri in client.redirect_uris
+
+def scope_allowed(client: OAuthClient, scope: Optional[str]) -> bool:
+    """Every requested scope is a known API scope the client is registered for"""
+    requested = (scope or '').split()
+    return bool(requested) and all(s in API_SCOPES and s in client.scopes for s in requested)
+
+def token_has_scope(info: 'TokenInfo', needed: str) -> bool:
+    """Token scope covers `needed` ('write' also grants 'read')"""
+    granted = (info.scope or '').split()
+    return needed in granted or (needed == 'read' and 'write' in granted)
+
+# ---------------------------------------------------------------- verification cache
+
+_cache: 'OrderedDict[str, Tuple[Optional[TokenInfo], float]]' = OrderedDict()
+_cache_lock = threading.Lock()
+MISS = object()  # cached_access_token(): ยังไม่มีใน cache ต้องถามฐานข้อมูล
+
+def _cache_get(token_hash: str):
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(token_hash)
+        if entry is None:
+            return MISS
+        info, valid_until = entry
+        if now >= valid_until:
+            del _cache[token_hash]
+            return MISS
+        _cache.move_to_end(token_hash)
+    return info
+
+def _cache_put(token_hash: str, info: Optional[TokenInfo]):
+    seconds = VERIFY_CACHE_SECONDS if info is not None else NEGATIVE_CACHE_SECONDS
+    if info is not None:
+        # ไม่เก็บเกินเวลาหมดอายุของ token
+        seconds = min(seconds, (info.expires_at - datetime.now()).total_seconds())
+        if seconds <= 0:
+            return
+    with _cache_lock:
+        _cache[token_hash] = (info, time.monotonic() + seconds)
+        _cache.move_to_end(token_hash)
+        while len(_cache) > VERIFY_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def _cache_drop(token_hash: str):
+    with _cache_lock:
+        _cache.pop(token_hash, None)
+
+def clear_verify_cache():
+    """Forget every cached verification"""
+    with _cache_lock:
+        _cache.clear()
+
+# ---------------------------------------------------------------- codes
+
+def issue_authorization_code(client_id: str, user_id: str, redirect_uri: str, scope: Optional[str] = None) -> str:
+    """Create a single-use authorization code (valid CODE_TTL)
+
+    Raises:
+        ValueError: client, redirect_uri or scope is not registered
+    """
+    client = get_client(client_id)
+    if client is None:
+        raise ValueError(f"OAuth client {client_id!r} is not registered")
+    if not redirect_uri_allowed(client, redirect_uri):
+        raise ValueError(f"redirect_uri is not registered for client {client_id!r}")
+    if not scope_allowed(client, scope):
+        raise ValueError(f"scope {scope!r} is not allowed for client {client_id!r}")
+    code = secrets.token_urlsafe(32)
+    with engine.begin() as conn:
+        conn.execute(_codes.insert().values(
+            code_hash=hash_token(code), client_id=client_id, user_id=str(user_id),
+            redirect_uri=redirect_uri, scope=scope,
+            expires_at=datetime.now() + CODE_TTL, created_at=datetime.now()
+        ))
+    maybe_purge_expired()
+    return code
+
+def exchange_code(code: str, client_id: str, redirect_uri: Optional[str]) -> Optional[Dict]:
+    """Trade an authorization code for tokens
+
+    Returns:
+        token response dict, or None when the code is unknown, expired, already used,
+        or was issued to another client / redirect URI
+    """
+    now = datetime.now()
+    code_hash = hash_token(code)
+    with engine.begin() as conn:
+        row = conn.execute(
+            select(_codes.c.client_id, _codes.c.user_id, _codes.c.redirect_uri, _codes.c.scope).where(
+                _codes.c.code_hash == code_hash, _codes.c.used_at.is_(None), _codes.c.expires_at > now
+            )
+        ).first()
+        # code ที่ออกพร้อม redirect_uri ต้องส่ง redirect_uri เดิมมาตอนแลกเสมอ (RFC 6749 4.1.3)
+        if row is None or row.client_id != client_id or (row.redirect_uri is not None and row.redirect_uri != redirect_uri):
+            return None
+        # ใช้ได้ครั้งเดียว: ผู้ที่ UPDATE ได้ก่อนเท่านั้นที่ได้ token
+        claimed = conn.execute(
+            update(_codes).where(_codes.c.code_hash == code_hash, _codes.c.used_at.is_(None)).values(used_at=now)
+        ).rowcount
+        if claimed != 1:
+            return None
+        return _insert_token(conn, row.client_id, row.user_id, row.scope)
+
+# ---------------------------------------------------------------- tokens
+
+def _insert_token(conn, client_id: str, user_id: str, scope: Optional[str]) -> Dict:
+    access_token = secrets.token_urlsafe(32)
+    refresh_token = secrets.token_urlsafe(32)
+    now = datetime.now()
+    conn.execute(_tokens.insert().values(
+        access_token_hash=hash_token(access_token), refresh_token_hash=hash_token(refresh_token),
+        client_id=client_id, user_id=user_id, scope=scope,
+        expires_at=now + ACCESS_TOKEN_TTL, refresh_expires_at=now + REFRESH_TOKEN_TTL, created_at=now
+    ))
+    return {
+        "access_token": access_token,
+        "token_type": "Bearer",
+        "expires_in": int(ACCESS_TOKEN_TTL.total_seconds()),
+        "refresh_token": refresh_token,
+        "scope": scope
+    }
+
+def issue_token(client_id: str, user_id: str, scope: Optional[str] = None) -> Dict:
+    """Create an access/refresh token pair directly (e.g. for a trusted first-party client)"""
+    with engine.begin() as conn:
+        return _insert_token(conn, client_id, str(user_id), scope)
+
+def refresh_access_token(refresh_token: str, client_id: str) -> Optional[Dict]:
+    """Rotate a refresh token: the old pair is revoked, a new pair is returned (None if invalid)"""
+    now = datetime.now()
+    with engine.begin() as conn:
+        row = conn.execute(
+            select(_tokens.c.id, _tokens.c.access_token_hash, _tokens.c.client_id, _tokens.c.user_id, _tokens.c.scope).where(
+                _tokens.c.refresh_token_hash == hash_token(refresh_token),
+                _tokens.c.revoked_at.is_(None),
+                _tokens.c.refresh_expires_at > now
+            )
+        ).first()
+        if row is None or row.client_id != client_id:
+            return None
+        revoked = conn.execute(
+            update(_tokens).where(_tokens.c.id == row.id, _tokens.c.revoked_at.is_(None)).values(revoked_at=now)
+        ).rowcount
+        if revoked != 1:
+            return None
+        _cache_drop(row.access_token_hash)
+        return _insert_token(conn, row.client_id, row.user_id, row.scope)
+
+def verify_access_token(access_token: str) -> Optional[TokenInfo]:
+    """TokenInfo for a valid access token, None otherwise (memory lookup when recently verified)"""
+    if not access_token:
+        return None
+    token_hash = hash_token(access_token)
+    cached = _cache_get(token_hash)
+    if cached is not MISS:
+        return cached
+
+    with engine.connect() as conn:
+        row = conn.execute(
+            select(_tokens.c.user_id, _tokens.c.client_id, _tokens.c.scope, _tokens.c.expires_at).where(
+                _tokens.c.access_token_hash == token_hash,
+                _tokens.c.revoked_at.is_(None),
+                _tokens.c.expires_at > datetime.now()
+            )
+        ).first()
+    info = TokenInfo(row.user_id, row.client_id, row.scope, row.expires_at) if row else None
+    _cache_put(token_hash, info)
+    return info
+
+def cached_access_token(access_token: str):
+    """Cache-only lookup: TokenInfo / None when known, MISS when verify_access_token() must ask the database"""
+    return _cache_get(hash_token(access_token)) if access_token else None
+
+def revoke_token(token: str) -> bool:
+    """Revoke the pair an access or refresh token belongs to"""
+    token_hash = hash_token(token)
+    with engine.begin() as conn:
+        row = conn.execute(
+            select(_tokens.c.id, _tokens.c.access_token_hash).where(
+                or_(_tokens.c.access_token_hash == token_hash, _tokens.c.refresh_token_hash == token_hash)
+            )
+        ).first()
+        if row is None:
+            return False
+        conn.execute(update(_tokens).where(_tokens.c.id == row.id).values(revoked_at=datetime.now()))
+    _cache_drop(row.access_token_hash)
+    return True
+
+# ---------------------------------------------------------------- purge
+
+_purge_lock = threading.Lock()
+_last_purge = 0.0
+
+def purge_expired() -> Dict[str, int]:
+    """Delete expired/used codes and expired or revoked tokens"""
+    now = datetime.now()
+    with engine.begin() as conn:
+        codes = conn.execute(delete(_codes).where(_codes.c.expires_at < now)).rowcount
+        tokens = conn.execute(delete(_tokens).where(or_(
+            and_(_tokens.c.expires_at < now,
+                 or_(_tokens.c.refresh_expires_at.is_(None), _tokens.c.refresh_expires_at < now)),
+            _tokens.c.revoked_at.isnot(None)
+        ))).rowcount
+    if codes or tokens:
+        logger.info("Purged expired OAuth rows", extra={'codes': codes, 'tokens': tokens})
+    return {'codes': codes, 'tokens': tokens}
+
+def maybe_purge_expired() -> Optional[Dict[str, int]]:
+    """purge_expired() at most once per PURGE_INTERVAL_SECONDS per process"""
+    global _last_purge
+    with _purge_lock:
+        now = time.monotonic()
+        if now - _last_purge < PURGE_INTERVAL_SECONDS:
+            return None
+        _last_purge = now
+    try:
+        return purge_expired()
+    except Exception as e:
+        logger.warning("Cannot purge OAuth rows: %s", e)
+        return None
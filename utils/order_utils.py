@@ -5,10 +5,8 @@ Order Utilities - ฟังก์ชันช่วยเหลือสำห
 from datetime import datetime
 from database.db import get_session
 from database.models import Table, CustomerOrder, OrderItem, KitchenQueue, Menu, OrderStatus
+from utils import change_feed  # noqa: F401 - ลงทะเบียนตัวแจ้งเตือนจอครัวเมื่อออเดอร์/คิวเปลี่ยน
 import uuid
-import qrcode
-from io import BytesIO
-import base64
 
 def generate_order_number():
     """สร้างเลขที่ออเดอร์"""
@@ -168,35 +166,15 @@ def update_queue_status(queue_id, status, user_id=None):
 
 def generate_table_qr_code(table_id, base_url):
     """
-    สร้าง QR Code สำหรับโต๊ะ
+    สร้าง QR Code สำหรับโต๊ะ (บันทึกเป็นไฟล์ใน data/images/tables)
     
     Args:
         table_id: ID ของโต๊ะ
         base_url: Base URL ของแอป (เช่น https://pos-ez.streamlit.app)
     
     Returns:
-        base64 encoded image string
+        (path ของไฟล์ PNG, URL สำหรับสั่งอาหาร) - path คือค่าที่เก็บใน Table.qr_code
     """
-    # สร้าง URL สำหรับสั่งอาหาร
-    order_url = f"{base_url}/?table_id={table_id}"
-    
-    # สร้าง QR Code
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(order_url)
-    qr.make(fit=True)
-    
-    # สร้างภาพ
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # แปลงเป็น base64
-    buffered = BytesIO()
-    img.save(buffered, format="PNG")
-    img_str = base64.b64encode(buffered.getvalue()).decode()
-    
-    return img_str, order_url
+    from utils.table_qr import make_table_qr
+    return make_table_qr(table_id, base_url)
 
@@ -32,3 +32,25 @@ def paginate_items(items: List[Any], page: int = 1, items_per_page: int = 10) ->
 
 
 
+
+def paginate_query(query, page: int = 1, items_per_page: int = 10) -> Tuple[List[Any], int, int, int]:
+    """
+    Paginate a SQLAlchemy query on the database side (COUNT + LIMIT/OFFSET)
+    
+    Args:
+        query: SQLAlchemy Query (already filtered and ordered)
+        page: Current page number (1-indexed)
+        items_per_page: Number of items per page
+    
+    Returns:
+        Tuple of (paginated_items, total_items, total_pages, current_page)
+    """
+    total_items = query.order_by(None).count()
+    total_pages = (total_items + items_per_page - 1) // items_per_page if total_items > 0 else 1
+    
+    # Ensure page is within valid range
+    page = max(1, min(page, total_pages))
+    
+    paginated_items = query.offset((page - 1) * items_per_page).limit(items_per_page).all()
+    
+    return paginated_items, total_items, total_pages, page
@@ -0,0 +1,189 @@
+"""
+Performance Monitor - นับจำนวน SQL, เวลา DB และ session ที่เปิดต่อการ rerun หนึ่งครั้งของหน้า Streamlit
+ใช้ SQLAlchemy engine events เก็บสถิติเฉพาะ thread ที่กำลังรันหน้านั้น
+บันทึกลง log แบบหมุนไฟล์ และแจ้งเตือนเมื่อหน้าใดใช้ query เกินงบที่ตั้งไว้
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from database.db import engine
+from utils.logger import get_logger, get_file_logger
+
+# ไฟล์ log (หมุนไฟล์เมื่อถึง 1MB เก็บย้อนหลัง 5 ไฟล์)
+PERF_LOG_PATH = os.path.join("data", "logs", "perf.log")
+PERF_LOG_MAX_BYTES = 1024 * 1024
+PERF_LOG_BACKUPS = 5
+
+# จำนวน rerun ล่าสุดที่เก็บไว้ในหน่วยความจำสำหรับหน้าแสดงผล
+RECENT_RERUNS = 200
+SLOWEST_STATEMENTS = 5
+STATEMENT_PREVIEW = 300
+
+DEFAULT_QUERY_BUDGET = 100
+DEFAULT_SLOW_QUERY_MS = 200
+SETTINGS_TTL_SECONDS = 60
+
+_local = threading.local()
+_recent = deque(maxlen=RECENT_RERUNS)
+_recent_lock = threading.Lock()
+_settings_cache = {'loaded_at': 0.0, 'query_budget': DEFAULT_QUERY_BUDGET, 'slow_query_ms': DEFAULT_SLOW_QUERY_MS}
+
+logger = get_logger(__name__)
+
+def _get_perf_log():
+    """Rerun log (separate rotating file, opened on first use)"""
+    try:
+        return get_file_logger("perf", PERF_LOG_PATH, PERF_LOG_MAX_BYTES, PERF_LOG_BACKUPS)
+    except OSError as e:
+        logger.error("Cannot open performance log: %s", e)
+        return logger
+
+def get_perf_settings() -> Dict:
+    """Get query budget and slow query threshold (cached, re-read every minute)"""
+    now = time.monotonic()
+    if now - _settings_cache['loaded_at'] > SETTINGS_TTL_SECONDS:
+        _settings_cache['loaded_at'] = now
+        # อ่านค่าโดยไม่ให้นับเป็น query ของหน้า
+        collector = getattr(_local, 'collector', None)
+        _local.collector = None
+        try:
+            from utils.store_settings import get_setting
+            _settings_cache['query_budget'] = int(get_setting('perf_query_budget', str(DEFAULT_QUERY_BUDGET)) or DEFAULT_QUERY_BUDGET)
+            _settings_cache['slow_query_ms'] = float(get_setting('perf_slow_query_ms', str(DEFAULT_SLOW_QUERY_MS)) or DEFAULT_SLOW_QUERY_MS)
+        except Exception as e:
+            logger.warning("Cannot read performance settings: %s", e)
+        finally:
+            _local.collector = collector
+    return {'query_budget': _settings_cache['query_budget'], 'slow_query_ms': _settings_cache['slow_query_ms']}
+
+def save_perf_settings(query_budget: int, slow_query_ms: float, updated_by: int = None):
+    """Save query budget and slow query threshold"""
+    from utils.store_settings import set_setting
+    set_setting('perf_query_budget', str(int(query_budget)), "จำนวน SQL สูงสุดต่อการ rerun หนึ่งครั้ง", updated_by)
+    set_setting('perf_slow_query_ms', str(float(slow_query_ms)), "SQL ที่ช้ากว่านี้ (ms) จะถูกบันทึกใน log", updated_by)
+    _settings_cache['loaded_at'] = 0.0
+
+@event.listens_for(engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_local, 'collector', None) is not None:
+        conn.info.setdefault('perf_query_start', []).append(time.perf_counter())
+
+@event.listens_for(engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    collector = getattr(_local, 'collector', None)
+    starts = conn.info.get('perf_query_start')
+    if collector is None or not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+    collector['queries'] += 1
+    collector['db_ms'] += elapsed_ms
+    collector['statements'].append((elapsed_ms, statement[:STATEMENT_PREVIEW]))
+
+@event.listens_for(engine, 'handle_error')
+def _handle_error(exception_context):
+    # statement ที่ error ไม่ผ่าน after_cursor_execute - เอาเวลาเริ่มออก ไม่ให้ค้างใน conn.info ของ pool
+    conn = exception_context.connection
+    starts = conn.info.get('perf_query_start') if conn is not None else None
+    if starts:
+        starts.pop()
+
+@event.listens_for(Session, 'after_begin')
+def _after_session_begin(session, transaction, connection):
+    collector = getattr(_local, 'collector', None)
+    if collector is not None:
+        collector['sessions'] += 1
+
+def _finish(collector: Dict, page: str, started_at: datetime, duration_ms: float) -> Dict:
+    """Build the rerun record, log it and raise the budget alarm"""
+    settings = get_perf_settings()
+    slowest = sorted(collector['statements'], key=lambda s: s[0], reverse=True)[:SLOWEST_STATEMENTS]
+    record = {
+        'page': page,
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'duration_ms': round(duration_ms, 1),
+        'queries': collector['queries'],
+        'db_ms': round(collector['db_ms'], 1),
+        'sessions': collector['sessions'],
+        'slowest': [{'ms': round(ms, 1), 'sql': sql} for ms, sql in slowest],
+        'query_budget': settings['query_budget'],
+        'over_budget': collector['queries'] > settings['query_budget']
+    }
+
+    with _recent_lock:
+        _recent.append(record)
+
+    log = _get_perf_log()
+    log.info(json.dumps({k: v for k, v in record.items() if k != 'slowest'}, ensure_ascii=False))
+    for ms, sql in slowest:
+        if ms >= settings['slow_query_ms']:
+            log.warning("slow query %.1fms on %s: %s", ms, page, ' '.join(sql.split()))
+    if record['over_budget']:
+        log.warning("query budget exceeded on %s: %s > %s", page, record['queries'], settings['query_budget'])
+    return record
+
+@contextmanager
+def track_rerun(page: str):
+    """Collect SQL statistics for one page rerun
+
+    Usage (at the bottom of a page):
+        with track_rerun(__file__):
+            main()
+    """
+    page = os.path.splitext(os.path.basename(page))[0]
+    _show_previous_alarm()
+
+    collector = {'queries': 0, 'db_ms': 0.0, 'sessions': 0, 'statements': []}
+    previous = getattr(_local, 'collector', None)
+    _local.collector = collector
+    started_at = datetime.now()
+    started = time.perf_counter()
+    try:
+        yield collector
+    finally:
+        # st.rerun()/st.stop() ยกเลิกสคริปต์ด้วย exception - ยังบันทึกผลตามปกติ
+        _local.collector = previous
+        try:
+            record = _finish(collector, page, started_at, (time.perf_counter() - started) * 1000)
+            if record['over_budget']:
+                _remember_alarm(record)
+        except Exception as e:
+            logger.error("Performance tracking failed: %s", e)
+
+def _remember_alarm(record: Dict):
+    """Keep the alarm in session state to show on the next rerun (the page is already drawn)"""
+    try:
+        import streamlit as st
+        st.session_state['perf_budget_alarm'] = record
+    except Exception:
+        pass
+
+def _show_previous_alarm():
+    """Show the budget alarm of the previous rerun to admins"""
+    try:
+        import streamlit as st
+        record = st.session_state.pop('perf_budget_alarm', None)
+        if record and st.session_state.get('role') == 'admin':
+            st.toast(f"⚠️ {record['page']} ใช้ SQL {record['queries']} ครั้ง (งบ {record['query_budget']})", icon="🐢")
+    except Exception:
+        pass
+
+def get_recent_reruns(page: Optional[str] = None) -> List[Dict]:
+    """Get recent rerun records (newest first), optionally for one page"""
+    with _recent_lock:
+        records = list(_recent)
+    if page:
+        records = [r for r in records if r['page'] == page]
+    return list(reversed(records))
+
+def clear_recent_reruns():
+    """Clear in-memory rerun records"""
+    with _recent_lock:
+        _recent.clear()
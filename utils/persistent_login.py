@@ -8,6 +8,9 @@ from database.models import User, SavedLogin
 from datetime import datetime, timedelta
 import secrets
 import hashlib
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 def ensure_saved_logins_table():
     """
@@ -24,16 +27,14 @@ def ensure_saved_logins_table():
             session.close()
             error_msg = str(e).lower()
             if 'does not exist' in error_msg or 'no such table' in error_msg or 'relation' in error_msg or 'undefinedtable' in error_msg:
-                print(f"[INFO] Creating saved_logins table...")
+                logger.info("Creating saved_logins table...")
                 SavedLogin.__table__.create(bind=engine, checkfirst=True)
-                print(f"[INFO] ✅ saved_logins table created successfully")
+                logger.info("✅ saved_logins table created successfully")
                 return True
             else:
                 raise
     except Exception as e:
-        print(f"[ERROR] Failed to ensure saved_logins table: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error("Failed to ensure saved_logins table: %s", e, exc_info=True)
         return False
 
 def generate_remember_token() -> str:
@@ -90,7 +91,7 @@ def save_login(user_id: int, username: str, remember_forever: bool = True) -> st
         return remember_token
     except Exception as e:
         session.rollback()
-        print(f"[ERROR] Failed to save login: {e}")
+        logger.error("Failed to save login: %s", e)
         return None
     finally:
         session.close()
@@ -142,7 +143,7 @@ def get_user_from_token(remember_token: str) -> dict:
             'role': user.role
         }
     except Exception as e:
-        print(f"[ERROR] Failed to get user from token: {e}")
+        logger.error("Failed to get user from token: %s", e)
         return None
     finally:
         session.close()
@@ -174,7 +175,7 @@ def clear_saved_login(user_id: int = None, remember_token: str = None):
         session.commit()
     except Exception as e:
         session.rollback()
-        print(f"[ERROR] Failed to clear saved login: {e}")
+        logger.error("Failed to clear saved login: %s", e)
     finally:
         session.close()
 
@@ -192,7 +193,7 @@ def get_saved_username() -> str:
         ensure_store_settings_table()
         return get_setting('last_login_username', '')
     except Exception as e:
-        print(f"[ERROR] Failed to get saved username: {e}")
+        logger.error("Failed to get saved username: %s", e)
         return ""
 
 def set_saved_username(username: str):
@@ -208,5 +209,5 @@ def set_saved_username(username: str):
         ensure_store_settings_table()
         set_setting('last_login_username', username, 'Username ที่ล็อคอินล่าสุด')
     except Exception as e:
-        print(f"[ERROR] Failed to set saved username: {e}")
+        logger.error("Failed to set saved username: %s", e)
 
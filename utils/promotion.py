@@ -9,6 +9,9 @@ from database.db import get_session
 from database.models import Promotion, PromotionRule, Product, Menu, Category, Customer
 from sqlalchemy import and_, or_
 from utils.helpers import format_currency
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 def get_active_promotions(current_time: datetime = None) -> List[Promotion]:
     """Get all active promotions"""
@@ -167,11 +170,11 @@ def use_promotion(promotion_id: int, sale_id: int, customer_id: int = None,
         session.add(usage)
         session.commit()
         
-        print(f"[DEBUG] Used promotion {promotion_id} in sale {sale_id}")
+        logger.debug("Used promotion %s in sale %s", promotion_id, sale_id)
         return True
     except Exception as e:
         session.rollback()
-        print(f"[DEBUG] Error in use_promotion: {str(e)}")
+        logger.error("Error in use_promotion: %s", e)
         return False
     finally:
         session.close()
@@ -1,169 +1,189 @@
 """
 PromptPay QR Code Generator
 สร้าง QR Code สำหรับชำระเงินผ่าน PromptPay ตามมาตรฐาน EMV
+- payload รองรับเลขที่บิล (tag 62) ต่อการขาย
+- รูป QR ที่สร้างแล้วเก็บใน LRU ตาม (บัญชี, ยอดเงิน, เลขที่บิล) - rerun หน้าขายไม่ต้องสร้างใหม่
+- SVG สร้างเร็วกว่า PNG มาก (ไม่ต้อง rasterize/encode) และคมทุกขนาด
 """
 
-import qrcode
+import re
+import secrets
+import string
+from datetime import datetime
+from functools import lru_cache
 from io import BytesIO
-from typing import Optional
+from typing import Optional, Union
+from utils.logger import get_logger
 
-def generate_promptpay_qr(
+logger = get_logger(__name__)
+
+PROMPTPAY_GUID = "A000000677010111"
+QR_CACHE_SIZE = 128
+MAX_REFERENCE_LENGTH = 25  # EMV: Bill Number (62.01) ยาวได้ไม่เกิน 25 ตัวอักษร
+REFERENCE_SUFFIX_LENGTH = 5  # ตัวสุ่ม 0-9A-Z ต่อท้าย (36^5 แบบ) - หลายเครื่องขายในวินาทีเดียวกันไม่ซ้ำกัน
+_REFERENCE_ALPHABET = string.digits + string.ascii_uppercase
+
+# ตาราง CRC-16/CCITT-FALSE (polynomial 0x1021) - คำนวณครั้งเดียวตอน import
+def _make_crc16_table(polynomial: int = 0x1021) -> tuple:
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ polynomial) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xFFFF)
+    return tuple(table)
+
+_CRC16_TABLE = _make_crc16_table()
+
+def calculate_crc16(data: str) -> int:
+    """
+    คำนวณ CRC-16/CCITT-FALSE สำหรับ EMV QR Code (ใช้ตาราง 1 ครั้งต่อ byte)
+    
+    Args:
+        data: ข้อมูลที่ต้องการคำนวณ CRC (string)
+    
+    Returns:
+        CRC-16 value (integer)
+    """
+    crc = 0xFFFF
+    table = _CRC16_TABLE
+    for byte in data.encode('utf-8'):
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ byte]
+    return crc
+
+def _tlv(tag: str, value: str) -> str:
+    """EMV field: [ID][Length][Value]"""
+    return f"{tag}{len(value):02d}{value}"
+
+def _clean_account(promptpay_type: str, promptpay_id: str) -> Optional[str]:
+    """Account value of the merchant template, or None if the id is invalid"""
+    promptpay_id = (promptpay_id or "").replace("-", "").replace(" ", "")
+    if not promptpay_id.isdigit():
+        return None
+    if promptpay_type == "phone":
+        # เบอร์โทร 0812345678 → 0066812345678
+        if promptpay_id.startswith("0"):
+            promptpay_id = promptpay_id[1:]
+        if len(promptpay_id) != 9:
+            return None
+        return "0066" + promptpay_id
+    if promptpay_type == "citizen_id":
+        return promptpay_id if len(promptpay_id) == 13 else None
+    return None
+
+def clean_reference(reference: Optional[str]) -> str:
+    """Bill reference usable in tag 62: letters/digits only, at most 25 characters"""
+    return re.sub(r'[^0-9A-Za-z]', '', reference or '')[:MAX_REFERENCE_LENGTH].upper()
+
+def new_bill_reference(prefix: str = "POS") -> str:
+    """Reference for one checkout (e.g. POS251019143005K7Q2M) - shown in the QR and saved on the sale
+
+    เวลาถึงวินาที + ตัวสุ่ม REFERENCE_SUFFIX_LENGTH ตัว (prefix ถูกตัดให้ทั้งหมดไม่เกิน 25 ตัวอักษร)
+    """
+    suffix = ''.join(secrets.choice(_REFERENCE_ALPHABET) for _ in range(REFERENCE_SUFFIX_LENGTH))
+    body = f"{datetime.now():%y%m%d%H%M%S}{suffix}"
+    return clean_reference(prefix)[:MAX_REFERENCE_LENGTH - len(body)] + body
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def _build_payload(account_tag: str, account: str, amount: str, reference: str, currency: str) -> str:
+    # Payload Format Indicator (00), Point of Initiation (01): 11 = static, 12 = มียอดเงิน
+    payload = _tlv("00", "01") + _tlv("01", "12" if amount else "11")
+    # Merchant Account Information (29): GUID + เบอร์โทร (01) / เลขบัตรประชาชน (02)
+    payload += _tlv("29", _tlv("00", PROMPTPAY_GUID) + _tlv(account_tag, account))
+    payload += _tlv("53", currency)
+    if amount:
+        payload += _tlv("54", amount)
+    payload += _tlv("58", "TH")
+    if reference:
+        # Additional Data Field Template (62): Bill Number (01)
+        payload += _tlv("62", _tlv("01", reference))
+    payload += "6304"
+    return payload + f"{calculate_crc16(payload):04X}"
+
+def build_promptpay_payload(
     amount: float,
     promptpay_type: str = "phone",
     promptpay_id: str = "",
+    reference: Optional[str] = None,
     currency: str = "764"  # THB
-) -> Optional[BytesIO]:
+) -> Optional[str]:
     """
-    สร้าง QR Code สำหรับ PromptPay
+    สร้าง EMV payload ของ PromptPay
     
     Args:
-        amount: จำนวนเงิน (บาท)
+        amount: จำนวนเงิน (บาท) - 0 = ให้ผู้จ่ายกรอกเอง
         promptpay_type: ประเภทบัญชี ("phone" หรือ "citizen_id")
         promptpay_id: หมายเลขบัญชี (เบอร์โทรหรือเลขบัตรประชาชน)
+        reference: เลขที่บิล (tag 62) - ตัวอักษร/ตัวเลขเท่านั้น
         currency: รหัสสกุลเงิน (default: 764 = THB)
     
     Returns:
-        BytesIO object ของ QR Code image หรือ None ถ้าเกิดข้อผิดพลาด
+        payload string หรือ None ถ้าบัญชีไม่ถูกต้อง
     """
-    try:
-        # Validate inputs
-        if not promptpay_id:
-            return None
-        
-        # Clean promptpay_id (remove dashes, spaces)
-        promptpay_id = promptpay_id.replace("-", "").replace(" ", "")
-        
-        # Validate format
-        if promptpay_type == "phone":
-            # Phone number should be 10 digits (remove leading 0 if exists)
-            if promptpay_id.startswith("0"):
-                promptpay_id = promptpay_id[1:]
-            if len(promptpay_id) != 9:
-                return None
-        elif promptpay_type == "citizen_id":
-            # Citizen ID should be 13 digits
-            if len(promptpay_id) != 13:
-                return None
-        else:
-            return None
-        
-        # Build EMV QR Code payload
-        # Format: [ID][Length][Value]
-        
-        # Payload Format Indicator (00)
-        payload = "000201"
-        
-        # Point of Initiation Method (01) - 11 = Static, 12 = Dynamic
-        # Use 12 for dynamic amount
-        payload += "010212"
-        
-        # Merchant Account Information (29-51)
-        # Tag 29: Merchant Account Information Template
-        #   - Tag 00: GUID (A000000677010111 for PromptPay)
-        #   - Tag 01-02: Account ID (phone or citizen ID)
-        
-        # Determine account type
-        if promptpay_type == "phone":
-            # Phone number: 01 = mobile number
-            account_type = "01"
-            # Format: 01 + length + phone number
-            account_info = f"01{len(promptpay_id):02d}{promptpay_id}"
-        else:
-            # Citizen ID: 02 = national ID
-            account_type = "02"
-            # Format: 02 + length + citizen ID
-            account_info = f"02{len(promptpay_id):02d}{promptpay_id}"
-        
-        # GUID for PromptPay
-        guid = "A000000677010111"
-        guid_length = len(guid)
-        
-        # Account info length
-        account_info_length = len(account_info)
-        
-        # Merchant Account Information Template
-        # Format: 00 (GUID) + 01-02 (Account Info)
-        merchant_account = f"00{guid_length:02d}{guid}01{account_info_length:02d}{account_info}"
-        merchant_account_length = len(merchant_account)
-        
-        # Tag 29: Merchant Account Information
-        payload += f"29{merchant_account_length:02d}{merchant_account}"
-        
-        # Transaction Currency (53) - 764 = THB
-        payload += f"5303{currency}"
-        
-        # Transaction Amount (54) - Format: XX.XX
-        if amount > 0:
-            amount_str = f"{amount:.2f}"
-            payload += f"54{len(amount_str):02d}{amount_str}"
-        
-        # Country Code (58) - TH = Thailand
-        payload += "5802TH"
-        
-        # Additional Data Field Template (62) - Optional
-        # Can include bill number, reference number, etc.
-        
-        # CRC (63) - Will be calculated
-        # For now, use placeholder (will be calculated properly in production)
-        crc_placeholder = "6304"
-        payload_without_crc = payload + crc_placeholder
-        
-        # Simple CRC calculation (CRC-16/CCITT-FALSE)
-        # In production, use proper CRC-16/CCITT-FALSE algorithm
-        crc = calculate_crc16(payload_without_crc)
-        payload = payload + f"6304{crc:04X}"
-        
-        # Generate QR Code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_M,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(payload)
-        qr.make(fit=True)
-        
-        # Create image
-        img = qr.make_image(fill_color="black", back_color="white")
-        buf = BytesIO()
-        img.save(buf, format="PNG")
-        buf.seek(0)
-        
-        return buf
-        
-    except Exception as e:
-        print(f"[ERROR] เกิดข้อผิดพลาดในการสร้าง PromptPay QR Code: {str(e)}")
+    account = _clean_account(promptpay_type, promptpay_id)
+    if account is None:
         return None
+    account_tag = "01" if promptpay_type == "phone" else "02"
+    amount_str = f"{amount:.2f}" if amount and amount > 0 else ""
+    return _build_payload(account_tag, account, amount_str, clean_reference(reference), currency)
 
-def calculate_crc16(data: str) -> int:
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def _render_qr(payload: str, image_format: str) -> Union[bytes, str]:
+    import qrcode
+    qr = qrcode.QRCode(
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+
+    if image_format == "svg":
+        from qrcode.image.svg import SvgPathImage
+        return qr.make_image(image_factory=SvgPathImage).to_string(encoding='unicode')
+
+    img = qr.make_image(fill_color="black", back_color="white")
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+def generate_promptpay_qr(
+    amount: float,
+    promptpay_type: str = "phone",
+    promptpay_id: str = "",
+    currency: str = "764",  # THB
+    reference: Optional[str] = None,
+    image_format: str = "png"
+) -> Optional[Union[BytesIO, str]]:
     """
-    คำนวณ CRC-16/CCITT-FALSE สำหรับ EMV QR Code
+    สร้าง QR Code สำหรับ PromptPay (รูปที่เคยสร้างแล้วมาจาก cache)
     
     Args:
-        data: ข้อมูลที่ต้องการคำนวณ CRC (string)
+        amount: จำนวนเงิน (บาท)
+        promptpay_type: ประเภทบัญชี ("phone" หรือ "citizen_id")
+        promptpay_id: หมายเลขบัญชี (เบอร์โทรหรือเลขบัตรประชาชน)
+        currency: รหัสสกุลเงิน (default: 764 = THB)
+        reference: เลขที่บิลของการขายนี้ (tag 62)
+        image_format: "png" หรือ "svg"
     
     Returns:
-        CRC-16 value (integer)
+        PNG: BytesIO object ของ QR Code image, SVG: SVG markup (str)
+        หรือ None ถ้าเกิดข้อผิดพลาด
     """
-    # CRC-16/CCITT-FALSE parameters
-    crc = 0xFFFF
-    polynomial = 0x1021
-    
-    # Convert string to bytes
-    data_bytes = data.encode('utf-8')
-    
-    for byte in data_bytes:
-        # XOR with byte
-        crc ^= (byte << 8)
-        
-        # Process 8 bits
-        for _ in range(8):
-            if crc & 0x8000:
-                crc = ((crc << 1) ^ polynomial) & 0xFFFF
-            else:
-                crc = (crc << 1) & 0xFFFF
-    
-    return crc
+    try:
+        if image_format not in ("png", "svg"):
+            raise ValueError(f"unsupported image format: {image_format}")
+        payload = build_promptpay_payload(amount, promptpay_type, promptpay_id, reference, currency)
+        if payload is None:
+            return None
+        image = _render_qr(payload, image_format)
+        # PNG: BytesIO ใหม่ทุกครั้ง - ตัวที่อยู่ใน cache ไม่ถูกอ่านจนหมดโดยผู้เรียก
+        return BytesIO(image) if image_format == "png" else image
+    except ImportError:
+        raise
+    except Exception as e:
+        logger.error("เกิดข้อผิดพลาดในการสร้าง PromptPay QR Code: %s", e)
+        return None
 
 def validate_promptpay_settings(promptpay_type: str, promptpay_id: str) -> tuple[bool, str]:
     """
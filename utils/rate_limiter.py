@@ -0,0 +1,223 @@
+"""
+Rate Limiter - จำกัดจำนวนครั้งต่อ key ในช่วงเวลา (ใช้กับการล็อคอิน)
+- sliding window counter: เก็บแค่ตัวนับของช่วงเวลาปัจจุบันกับช่วงก่อนหน้าต่อ key
+  ประมาณจำนวนในหน้าต่างเลื่อน = ก่อนหน้า × ส่วนที่ยังซ้อนทับ + ปัจจุบัน (ไม่ต้องเก็บเวลาทุกครั้ง)
+- backend เลือกด้วย RATE_LIMIT_BACKEND:
+  'database' (ค่าเริ่มต้น) ตาราง rate_limit_counters - ทุก process/replica ที่ใช้ฐานข้อมูลเดียวกันเห็นตัวนับเดียวกัน
+  'redis' (ต้องมี redis และ REDIS_URL), 'memory' ต่อ process จำกัดจำนวน key แบบ LRU
+- ถ้า backend ที่ใช้ร่วมกันล้มเหลว จะใช้ตัวนับในหน่วยความจำแทน (ไม่ปล่อยให้ล็อคอินได้ไม่จำกัด)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis = None
+    REDIS_AVAILABLE = False
+
+MEMORY_MAX_KEYS = 10000
+PURGE_INTERVAL_SECONDS = 300
+
+class MemoryBackend:
+    """Per-process counters, at most max_keys keys (least recently used dropped first)"""
+
+    def __init__(self, max_keys: int = MEMORY_MAX_KEYS):
+        self.max_keys = max_keys
+        self._counters: 'OrderedDict[str, Tuple[int, int, int]]' = OrderedDict()  # key -> (window_start, count, previous)
+        self._lock = threading.Lock()
+
+    def _current(self, key: str, window_start: int, window: int) -> Tuple[int, int]:
+        entry = self._counters.get(key)
+        if entry is None:
+            return 0, 0
+        start, count, previous = entry
+        if start == window_start:
+            return count, previous
+        if start == window_start - window:
+            return 0, count
+        return 0, 0
+
+    def increment(self, key: str, window_start: int, window: int) -> Tuple[int, int]:
+        with self._lock:
+            count, previous = self._current(key, window_start, window)
+            self._counters[key] = (window_start, count + 1, previous)
+            self._counters.move_to_end(key)
+            while len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+            return count + 1, previous
+
+    def counts(self, key: str, window_start: int, window: int) -> Tuple[int, int]:
+        with self._lock:
+            return self._current(key, window_start, window)
+
+    def reset(self, key: str, window_start: int, window: int):
+        with self._lock:
+            self._counters.pop(key, None)
+
+    def purge(self) -> int:
+        return 0
+
+class DatabaseBackend:
+    """Counters in the rate_limit_counters table (shared by every process on the same database)"""
+
+    def __init__(self):
+        from database.db import engine
+        from database.models import RateLimitCounter
+        self.engine = engine
+        self.table = RateLimitCounter.__table__
+        self._last_purge = 0.0
+        self._purge_lock = threading.Lock()
+
+    def increment(self, key: str, window_start: int, window: int) -> Tuple[int, int]:
+        table = self.table
+        for _ in range(2):
+            try:
+                with self.engine.begin() as conn:
+                    updated = conn.execute(
+                        update(table).where(table.c.key == key, table.c.window_start == window_start)
+                        .values(count=table.c.count + 1)
+                    ).rowcount
+                    if updated == 0:
+                        conn.execute(table.insert().values(
+                            key=key, window_start=window_start, count=1, expires_at=window_start + 2 * window
+                        ))
+                break
+            except IntegrityError:
+                # อีก process สร้างแถวของช่วงเวลานี้ไปพร้อมกัน - UPDATE อีกครั้ง
+                continue
+        self._maybe_purge()
+        return self.counts(key, window_start, window)
+
+    def counts(self, key: str, window_start: int, window: int) -> Tuple[int, int]:
+        table = self.table
+        with self.engine.connect() as conn:
+            rows = dict(conn.execute(
+                select(table.c.window_start, table.c.count).where(
+                    table.c.key == key, table.c.window_start.in_([window_start, window_start - window])
+                )
+            ).all())
+        return rows.get(window_start, 0), rows.get(window_start - window, 0)
+
+    def reset(self, key: str, window_start: int, window: int):
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.key == key))
+
+    def purge(self) -> int:
+        with self.engine.begin() as conn:
+            return conn.execute(delete(self.table).where(self.table.c.expires_at < int(time.time()))).rowcount
+
+    def _maybe_purge(self):
+        with self._purge_lock:
+            now = time.monotonic()
+            if now - self._last_purge < PURGE_INTERVAL_SECONDS:
+                return
+            self._last_purge = now
+        purged = self.purge()
+        if purged:
+            logger.debug("Purged %s rate limit counters", purged)
+
+class RedisBackend:
+    """Counters in Redis (INCR + EXPIRE per window)"""
+
+    def __init__(self, url: str):
+        self.client = redis.Redis.from_url(url)
+
+    def _name(self, key: str, window_start: int) -> str:
+        return f"ratelimit:{key}:{window_start}"
+
+    def increment(self, key: str, window_start: int, window: int) -> Tuple[int, int]:
+        pipe = self.client.pipeline()
+        pipe.incr(self._name(key, window_start))
+        pipe.expire(self._name(key, window_start), 2 * window)
+        pipe.get(self._name(key, window_start - window))
+        count, _, previous = pipe.execute()
+        return int(count), int(previous or 0)
+
+    def counts(self, key: str, window_start: int, window: int) -> Tuple[int, int]:
+        count, previous = self.client.mget(self._name(key, window_start), self._name(key, window_start - window))
+        return int(count or 0), int(previous or 0)
+
+    def reset(self, key: str, window_start: int, window: int):
+        # มีแค่สองช่วงเวลาที่นับอยู่ - ลบตรงๆ ไม่ต้อง SCAN ทั้ง keyspace
+        self.client.delete(self._name(key, window_start), self._name(key, window_start - window))
+
+    def purge(self) -> int:
+        return 0  # Redis ลบเองตาม EXPIRE
+
+class RateLimiter:
+    """Sliding window counter limiter over a pluggable backend"""
+
+    def __init__(self, backend, fallback: Optional[MemoryBackend] = None):
+        self.backend = backend
+        self.fallback = fallback or MemoryBackend()
+
+    @staticmethod
+    def _estimate(count: int, previous: int, now: float, window_start: int, window: int) -> float:
+        overlap = 1.0 - (now - window_start) / window
+        return previous * overlap + count
+
+    def _call(self, method: str, *args):
+        try:
+            return getattr(self.backend, method)(*args)
+        except Exception as e:
+            logger.warning("Rate limit backend %s failed (%s) - using memory", type(self.backend).__name__, e)
+            return getattr(self.fallback, method)(*args)
+
+    def attempts(self, key: str, window: int) -> float:
+        """Estimated attempts for key in the last `window` seconds"""
+        now = time.time()
+        window_start = int(now // window * window)
+        count, previous = self._call('counts', f"{window}:{key}", window_start, window)
+        return self._estimate(count, previous, now, window_start, window)
+
+    def allow(self, key: str, limit: int, window: int) -> bool:
+        """True while fewer than `limit` attempts were recorded in the last `window` seconds"""
+        return self.attempts(key, window) < limit
+
+    def hit(self, key: str, window: int) -> float:
+        """Record one attempt; returns the new estimate"""
+        now = time.time()
+        window_start = int(now // window * window)
+        count, previous = self._call('increment', f"{window}:{key}", window_start, window)
+        return self._estimate(count, previous, now, window_start, window)
+
+    def reset(self, key: str, window: int):
+        """Forget the attempts of key"""
+        window_start = int(time.time() // window * window)
+        self._call('reset', f"{window}:{key}", window_start, window)
+
+def _create_limiter() -> RateLimiter:
+    backend_name = os.environ.get('RATE_LIMIT_BACKEND', 'database').lower()
+    if backend_name == 'redis':
+        if REDIS_AVAILABLE and os.environ.get('REDIS_URL'):
+            return RateLimiter(RedisBackend(os.environ['REDIS_URL']))
+        logger.warning("RATE_LIMIT_BACKEND=redis but redis/REDIS_URL is not available - using database")
+        backend_name = 'database'
+    if backend_name == 'database':
+        try:
+            return RateLimiter(DatabaseBackend())
+        except Exception as e:
+            logger.warning("Cannot use database rate limit backend: %s", e)
+    return RateLimiter(MemoryBackend())
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide limiter (backend from RATE_LIMIT_BACKEND)"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = _create_limiter()
+        return _limiter
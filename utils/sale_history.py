@@ -0,0 +1,82 @@
+"""
+Sale History - เรียกดูประวัติการขายแบบ keyset pagination บน (created_at, id)
+ใช้ร่วมกันระหว่างหน้ายกเลิกการขายและหน้าคืนสินค้า
+- หน้าถัดไปใช้ cursor ของแถวสุดท้าย แทน OFFSET (เร็วเท่ากันทุกหน้า)
+- โหลดรายการสินค้า/เมนู, ผู้ขาย และผู้ยกเลิกมาพร้อมกัน (ไม่มี query ต่อแถว)
+- ค้นหาด้วยเลขที่ใบเสร็จ (เช่น 000123) เป็น lookup ด้วย primary key
+"""
+
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, joinedload, selectinload
+from database.models import Sale, SaleItem
+
+# cursor = (created_at, id) ของแถวสุดท้ายในหน้าก่อนหน้า
+SaleCursor = Tuple[datetime, int]
+
+def _eager_options():
+    """Load items (with product/menu), creator and voider with the sales"""
+    return (
+        selectinload(Sale.sale_items).joinedload(SaleItem.product),
+        selectinload(Sale.sale_items).joinedload(SaleItem.menu),
+        joinedload(Sale.creator),
+        joinedload(Sale.voider)
+    )
+
+def parse_receipt_number(text: str) -> Optional[int]:
+    """Parse a receipt number as printed ("000123", "#000123", "123") into a sale id"""
+    if not text:
+        return None
+    digits = text.strip().lstrip('#').strip()
+    if not digits.isdigit():
+        return None
+    return int(digits)
+
+def get_sale_by_receipt(session: Session, receipt_number: str) -> Optional[Sale]:
+    """Fast path: load one sale (with items) by its receipt number"""
+    sale_id = parse_receipt_number(receipt_number)
+    if sale_id is None:
+        return None
+    return session.query(Sale).options(*_eager_options()).filter(Sale.id == sale_id).first()
+
+def _history_filter(query, start_date: Optional[datetime], end_date: Optional[datetime], include_void: bool):
+    if start_date is not None:
+        query = query.filter(Sale.created_at >= start_date)
+    if end_date is not None:
+        query = query.filter(Sale.created_at <= end_date)
+    if not include_void:
+        query = query.filter(Sale.is_void == False)
+    return query
+
+def get_sale_history_page(session: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                          include_void: bool = False, after: Optional[SaleCursor] = None,
+                          limit: int = 20) -> Tuple[List[Sale], Optional[SaleCursor]]:
+    """Get one page of sales, newest first
+
+    Args:
+        after: cursor returned for the previous page (None = first page)
+    Returns:
+        (sales, next_cursor) - next_cursor is None on the last page
+    """
+    query = _history_filter(session.query(Sale), start_date, end_date, include_void)
+    if after is not None:
+        created_at, sale_id = after
+        query = query.filter(or_(
+            Sale.created_at < created_at,
+            and_(Sale.created_at == created_at, Sale.id < sale_id)
+        ))
+
+    sales = query.options(*_eager_options()).order_by(
+        Sale.created_at.desc(), Sale.id.desc()
+    ).limit(limit + 1).all()
+
+    if len(sales) > limit:
+        sales = sales[:limit]
+        return sales, (sales[-1].created_at, sales[-1].id)
+    return sales, None
+
+def count_sale_history(session: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                       include_void: bool = False) -> int:
+    """Count sales in the same window as get_sale_history_page"""
+    return _history_filter(session.query(Sale.id), start_date, end_date, include_void).count()
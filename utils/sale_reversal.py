@@ -0,0 +1,265 @@
+"""
+Sale Reversal - คืนสต็อคและย้อนยอดสะสมเมื่อยกเลิกการขาย / คืนสินค้า / ยกเลิกออเดอร์ออนไลน์
+คำนวณการเคลื่อนไหวสต็อคของทั้งบิลในรอบเดียว (BOM ของทุกเมนูดึงด้วย query เดียว)
+แล้วอัปเดตสต็อคและบันทึก StockTransaction แบบ bulk ภายใน transaction เดียวกับการแก้ไขบิล
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import bindparam, func, insert, update
+from database.db import get_session
+from database.models import (
+    Sale, SaleItem, Product, Menu, MenuItem, StockTransaction, Membership, LoyaltyTransaction,
+    MonthlyTaxSummary
+)
+from utils.customer_lookup import invalidate_customer
+from utils.helpers import format_currency
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+def build_stock_movements(session, lines: List[Dict], sale_id: int, product_reason: str,
+                          menu_reason: str) -> List[Dict]:
+    """Expand sale lines into per-product stock movements
+
+    Args:
+        lines: [{'item_type': 'product'|'menu', 'product_id', 'menu_id', 'quantity'}]
+        product_reason: reason text for product lines, e.g. 'คืนสินค้า'
+        menu_reason: reason text for menu lines, formatted with {menu}, e.g. 'คืนเมนู {menu}'
+    Returns:
+        [{'product_id', 'quantity', 'reason', 'sale_id'}] - one row per product line / BOM ingredient
+    """
+    menu_ids = {line['menu_id'] for line in lines if line['item_type'] == 'menu' and line['menu_id']}
+    bom = defaultdict(list)
+    if menu_ids:
+        rows = session.query(MenuItem.menu_id, MenuItem.product_id, MenuItem.quantity, Menu.name).join(
+            Menu, Menu.id == MenuItem.menu_id
+        ).filter(MenuItem.menu_id.in_(menu_ids)).all()
+        for menu_id, product_id, quantity, menu_name in rows:
+            bom[menu_id].append((product_id, quantity, menu_name))
+
+    movements = []
+    for line in lines:
+        if line['item_type'] == 'product' and line['product_id']:
+            movements.append({
+                'product_id': line['product_id'],
+                'quantity': line['quantity'],
+                'reason': f"{product_reason} - Sale #{sale_id}",
+                'sale_id': sale_id
+            })
+        elif line['item_type'] == 'menu' and line['menu_id']:
+            for product_id, quantity, menu_name in bom.get(line['menu_id'], []):
+                movements.append({
+                    'product_id': product_id,
+                    'quantity': quantity * line['quantity'],
+                    'reason': f"{menu_reason.format(menu=menu_name)} - Sale #{sale_id}",
+                    'sale_id': sale_id
+                })
+    return movements
+
+def apply_stock_movements(session, movements: List[Dict], transaction_type: str, user_id: Optional[int]) -> Dict[int, float]:
+    """Apply movements with one bulk UPDATE and one bulk INSERT of StockTransaction rows
+
+    transaction_type 'in' adds to stock, 'out' subtracts (clamped at 0 like reduce_stock_for_sale).
+    Movements for products that no longer exist are skipped. Returns {product_id: total quantity}.
+    """
+    if not movements:
+        return {}
+
+    product_ids = {m['product_id'] for m in movements}
+    cost_prices = dict(session.query(Product.id, Product.cost_price).filter(Product.id.in_(product_ids)).all())
+    movements = [m for m in movements if m['product_id'] in cost_prices]
+
+    totals = defaultdict(float)
+    for m in movements:
+        totals[m['product_id']] += m['quantity']
+    if not totals:
+        return {}
+
+    products = Product.__table__
+    if transaction_type == 'in':
+        new_stock = products.c.stock_quantity + bindparam('delta')
+    else:
+        new_stock = products.c.stock_quantity - bindparam('delta')
+        new_stock = (new_stock + func.abs(new_stock)) / 2  # max(new_stock, 0) ใช้ได้ทุก database
+    session.execute(
+        update(products).where(products.c.id == bindparam('pid')).values(stock_quantity=new_stock),
+        [{'pid': product_id, 'delta': quantity} for product_id, quantity in totals.items()]
+    )
+
+    now = datetime.now()
+    session.execute(insert(StockTransaction), [
+        {
+            'product_id': m['product_id'],
+            'transaction_type': transaction_type,
+            'quantity': m['quantity'],
+            'unit_price': cost_prices[m['product_id']],
+            'total_cost': cost_prices[m['product_id']] * m['quantity'],
+            'reason': m['reason'],
+            'sale_id': m.get('sale_id'),
+            'created_by': user_id,
+            'created_at': now
+        }
+        for m in movements
+    ])
+    return dict(totals)
+
+def _stock_was_deducted(session, sale_id: int) -> bool:
+    """Whether reduce_stock_for_sale (or online ingestion) already took stock out for this sale"""
+    return session.query(StockTransaction.id).filter(
+        StockTransaction.sale_id == sale_id,
+        StockTransaction.transaction_type == 'out'
+    ).first() is not None
+
+def _invalidate_tax_month(session, sale_date: datetime):
+    """Drop the stored monthly tax summary of the sale's month (same transaction)"""
+    session.query(MonthlyTaxSummary).filter(
+        MonthlyTaxSummary.month == sale_date.strftime('%Y-%m')
+    ).delete(synchronize_session=False)
+
+def void_sale(sale_id: int, reason: str, user_id: Optional[int],
+              restore_stock: Optional[bool] = True) -> Tuple[bool, str]:
+    """Void a sale: restore stock, reverse membership totals and points, drop the tax rollup
+
+    Args:
+        restore_stock: True = always restore, False = never, None = only if stock was deducted
+    Returns:
+        (success, message)
+    """
+    session = get_session()
+    try:
+        sale = session.query(Sale).filter(Sale.id == sale_id).with_for_update().first()
+        if not sale:
+            return False, "ไม่พบการขาย"
+
+        if sale.is_void:
+            return False, "การขายนี้ถูกยกเลิกไปแล้ว"
+
+        if restore_stock is None:
+            restore_stock = _stock_was_deducted(session, sale_id)
+
+        if restore_stock:
+            # คืนเฉพาะส่วนที่ยังไม่ได้คืน (คืนสินค้าบางส่วนไปแล้วได้สต็อคคืนตอนนั้น)
+            lines = [
+                {'item_type': item_type, 'product_id': product_id, 'menu_id': menu_id,
+                 'quantity': quantity - (returned or 0.0)}
+                for item_type, product_id, menu_id, quantity, returned in session.query(
+                    SaleItem.item_type, SaleItem.product_id, SaleItem.menu_id, SaleItem.quantity,
+                    SaleItem.returned_quantity
+                ).filter(SaleItem.sale_id == sale_id)
+                if quantity - (returned or 0.0) > 0
+            ]
+            movements = build_stock_movements(session, lines, sale_id, 'ยกเลิกการขาย', 'ยกเลิกเมนู {menu}')
+            apply_stock_movements(session, movements, 'in', user_id)
+
+        # ย้อนยอดสะสมสมาชิก (ยอดซื้อ, จำนวนครั้ง, แต้มที่ได้/ใช้)
+        if sale.customer_id:
+            points_delta = (sale.points_used or 0.0) - (sale.points_earned or 0.0)
+            updated = session.query(Membership).filter(Membership.customer_id == sale.customer_id).update({
+                Membership.total_spent: Membership.total_spent - sale.final_amount,
+                Membership.total_visits: Membership.total_visits - 1,
+                Membership.points: Membership.points + points_delta
+            }, synchronize_session=False)
+            if updated and points_delta:
+                # 'adjust': แต้มบวก/ลบที่ย้อนจากบิลที่ถูกยกเลิก (ผลรวม points ยังเท่ากับแต้มคงเหลือ)
+                session.add(LoyaltyTransaction(
+                    customer_id=sale.customer_id,
+                    transaction_type='adjust',
+                    points=points_delta,
+                    sale_id=sale_id,
+                    description=f"ยกเลิกการขาย #{sale_id:06d}"
+                ))
+
+        sale.is_void = True
+        sale.void_reason = reason
+        sale.voided_by = user_id
+        sale.voided_at = datetime.now()
+
+        _invalidate_tax_month(session, sale.sale_date)
+        session.commit()
+        if sale.customer_id:
+            invalidate_customer(sale.customer_id)
+        logger.info("Voided sale", extra={'sale_id': sale_id, 'user_id': user_id, 'restore_stock': restore_stock})
+        return True, "ยกเลิกการขายสำเร็จ"
+    except Exception as e:
+        session.rollback()
+        logger.error("Error voiding sale %s: %s", sale_id, e)
+        return False, f"เกิดข้อผิดพลาด: {str(e)}"
+    finally:
+        session.close()
+
+def return_sale_items(sale_id: int, return_items: List[Dict], reason: str, user_id: Optional[int]) -> Tuple[bool, str]:
+    """Partial return: restore stock for the returned quantities and reduce the sale totals
+
+    Args:
+        return_items: [{'sale_item_id': int, 'quantity': float}]
+    Returns:
+        (success, message)
+    """
+    session = get_session()
+    try:
+        sale = session.query(Sale).filter(Sale.id == sale_id).with_for_update().first()
+        if not sale:
+            return False, "ไม่พบการขาย"
+
+        if sale.is_void:
+            return False, "ไม่สามารถคืนสินค้าจากการขายที่ถูกยกเลิกแล้ว"
+
+        requested = {item['sale_item_id']: item['quantity'] for item in return_items if item['quantity'] > 0}
+        sale_items = session.query(
+            SaleItem.id, SaleItem.item_type, SaleItem.product_id, SaleItem.menu_id, SaleItem.quantity,
+            SaleItem.returned_quantity, SaleItem.total_price
+        ).filter(SaleItem.sale_id == sale_id, SaleItem.id.in_(requested)).all() if requested else []
+
+        total_refund = 0.0
+        lines = []
+        for sale_item in sale_items:
+            return_quantity = requested[sale_item.id]
+            returnable = sale_item.quantity - (sale_item.returned_quantity or 0.0)
+            if return_quantity > returnable + 1e-9:
+                return False, (f"จำนวนที่คืนเกินจำนวนที่คืนได้ (ขาย {sale_item.quantity:.2f}, "
+                               f"คืนแล้ว {sale_item.returned_quantity or 0.0:.2f})")
+
+            total_refund += (sale_item.total_price / sale_item.quantity) * return_quantity
+            lines.append({
+                'item_type': sale_item.item_type,
+                'product_id': sale_item.product_id,
+                'menu_id': sale_item.menu_id,
+                'quantity': return_quantity
+            })
+
+        movements = build_stock_movements(session, lines, sale_id, 'คืนสินค้า', 'คืนเมนู {menu}')
+        apply_stock_movements(session, movements, 'in', user_id)
+        if sale_items:
+            sale_items_table = SaleItem.__table__
+            session.execute(
+                update(sale_items_table).where(sale_items_table.c.id == bindparam('b_id')).values(
+                    returned_quantity=func.coalesce(sale_items_table.c.returned_quantity, 0) + bindparam('b_quantity')
+                ),
+                [{'b_id': item.id, 'b_quantity': requested[item.id]} for item in sale_items]
+            )
+
+        # Update sale total (reduce)
+        sale.total_amount -= total_refund
+        sale.final_amount -= total_refund
+        if sale.final_amount < 0:
+            sale.final_amount = 0
+
+        if sale.customer_id and total_refund:
+            session.query(Membership).filter(Membership.customer_id == sale.customer_id).update({
+                Membership.total_spent: Membership.total_spent - total_refund
+            }, synchronize_session=False)
+
+        _invalidate_tax_month(session, sale.sale_date)
+        session.commit()
+        if sale.customer_id:
+            invalidate_customer(sale.customer_id)
+        logger.info("Returned sale items", extra={'sale_id': sale_id, 'user_id': user_id, 'items': len(lines), 'refund': total_refund})
+        return True, f"คืนสินค้าสำเร็จ จำนวนเงินคืน: {format_currency(total_refund)}"
+    except Exception as e:
+        session.rollback()
+        logger.error("Error returning items of sale %s: %s", sale_id, e)
+        return False, f"เกิดข้อผิดพลาด: {str(e)}"
+    finally:
+        session.close()
@@ -0,0 +1,431 @@
+"""
+Search - ค้นหาสินค้า เมนู และลูกค้าผ่าน API เดียว (แทน LIKE '%...%' ที่ต้องสแกนทั้งตาราง)
+- SQLite: ตาราง FTS5 แบบ trigram (search_fts) อัปเดตอัตโนมัติด้วย trigger
+- PostgreSQL: GIN index ของ pg_trgm บนข้อความที่ normalize แล้ว
+- database อื่น / ไม่มี FTS5 หรือ pg_trgm: n-gram index ในหน่วยความจำ (สร้างใหม่เมื่อข้อมูลเปลี่ยน)
+
+ภาษาไทยไม่มีช่องว่างระหว่างคำ จึงจับคู่ด้วย n-gram ของตัวอักษร (ค้น "ต้มยำ" เจอ "ก๋วยเตี๋ยวต้มยำกุ้ง")
+และ normalize การพิมพ์ที่พบบ่อย (เ+เ → แ, ํ+า → ำ, เลขไทย, zero-width space) ทั้งฝั่งข้อมูลและคำค้น
+ถ้าติดตั้ง pythainlp คำค้นภาษาไทยจะถูกตัดเป็นคำ ทำให้ลำดับคำไม่ต้องตรงกับชื่อ
+
+ใช้งาน:
+    from utils.search import search
+    hits = search("ต้มยำ", "menu", limit=20)   # [SearchHit(kind, id, label, score), ...] เรียงตามความเกี่ยวข้อง
+    hits = search("น้ำ", "product", limit=60, only='in_stock')  # กรองใน query ค้นหา ได้ครบ limit
+    hits = search("น้ำ", "product", limit=60, only='category', only_value=category_id)
+"""
+
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from sqlalchemy import text
+from database.db import engine, is_sqlite, is_postgresql
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Thai word segmentation (optional - without it Thai runs are matched as whole substrings)
+try:
+    from pythainlp.tokenize import word_tokenize
+    PYTHAINLP_AVAILABLE = True
+except ImportError:
+    PYTHAINLP_AVAILABLE = False
+
+# ข้อมูลที่ค้นหาได้: ตาราง, คอลัมน์ที่นำมาค้น, คอลัมน์ที่แสดงผล, รหัสใน rowid ของ search_fts
+# และเงื่อนไขที่เลือกใช้ได้ (search(only=...)) - SQL บนตารางนั้น กรองก่อนตัดผลตาม limit
+# (:only_value คือค่าที่ส่งมากับ search(only_value=...))
+SEARCH_KINDS = {
+    'product': {'table': 'products', 'columns': ('name', 'barcode'), 'label': 'name', 'code': 1,
+                'filters': {'in_stock': "stock_quantity > 0", 'category': "category_id = :only_value"}},
+    'menu': {'table': 'menus', 'columns': ('name', 'description'), 'label': 'name', 'code': 2,
+             'filters': {'active': "is_active IS TRUE"}},
+    'customer': {'table': 'customers', 'columns': ('name', 'phone', 'email'), 'label': 'name', 'code': 3,
+                 'filters': {'member': "is_member IS TRUE", 'non_member': "is_member IS FALSE"}},
+}
+ROWID_STRIDE = 4  # rowid ใน search_fts = id * 4 + code
+
+FTS_TABLE = "search_fts"
+TRIGRAM = 3
+CANDIDATE_FACTOR = 4  # ดึงผลมากกว่า limit เพื่อจัดลำดับใหม่
+MIN_CANDIDATES = 50
+MAX_CANDIDATES = 1000
+
+# การพิมพ์ภาษาไทยที่หน้าตาเหมือนกันแต่เป็นคนละตัวอักษร
+_REPLACEMENTS = [
+    ('​', ''), ('‌', ''), ('‍', ''), ('﻿', ''),
+    ('เเ', 'แ'),  # เ + เ → แ
+    ('ํา', 'ำ'),  # ํ + า → ำ
+] + [(chr(0x0e50 + digit), str(digit)) for digit in range(10)]  # ๐-๙ → 0-9
+
+_THAI_RUN = re.compile(r'[฀-๿]+|[^฀-๿]+')
+_PHONE_LIKE = re.compile(r'^\+?[\d\-]+$')
+
+_backend: Optional[str] = None
+_backend_lock = threading.Lock()
+_ngram_indexes: Dict[str, 'NgramIndex'] = {}
+_ngram_lock = threading.Lock()
+
+class SearchHit(NamedTuple):
+    kind: str
+    id: int
+    label: str
+    score: float
+
+def normalize_text(value: Optional[str]) -> str:
+    """Normalize text for matching (case, Thai typing variants, Thai digits, whitespace)"""
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFC', value).casefold()
+    for old, new in _REPLACEMENTS:
+        value = value.replace(old, new)
+    return ' '.join(value.split())
+
+def tokenize(query: str) -> List[str]:
+    """Split a search query into tokens
+
+    Thai and non-Thai runs are split apart ("น้ำcoke" → "น้ำ", "coke"); phone numbers lose their dashes;
+    with pythainlp, Thai runs are split into words (short words are joined to a neighbour so every
+    token stays long enough for the trigram index).
+    """
+    tokens = []
+    for chunk in normalize_text(query).split():
+        if _PHONE_LIKE.match(chunk):
+            tokens.append(chunk.replace('-', ''))
+            continue
+        for run in _THAI_RUN.findall(chunk):
+            if PYTHAINLP_AVAILABLE and '฀' <= run[0] <= '๿':
+                tokens.extend(_join_short_words(word_tokenize(run, keep_whitespace=False)))
+            else:
+                tokens.append(run)
+    # ตัดคำซ้ำและคำที่อยู่ในคำอื่นอยู่แล้ว
+    unique = []
+    for token in sorted(set(t for t in tokens if t), key=len, reverse=True):
+        if not any(token in kept for kept in unique):
+            unique.append(token)
+    return unique
+
+def _join_short_words(words: Iterable[str]) -> List[str]:
+    merged, buffer = [], ''
+    for word in words:
+        buffer += word.strip()
+        if len(buffer) >= TRIGRAM:
+            merged.append(buffer)
+            buffer = ''
+    if buffer:
+        if merged:
+            merged[-1] += buffer
+        else:
+            merged.append(buffer)
+    return merged
+
+def _ngrams(value: str, n: int = TRIGRAM) -> set:
+    if len(value) < n:
+        return set()
+    return {value[i:i + n] for i in range(len(value) - n + 1)}
+
+def _score(label: str, body: str, query: str, tokens: List[str], base: float) -> float:
+    """Rank a match: exact name > name prefix > name contains > whole-word field match > backend rank"""
+    label = normalize_text(label)
+    padded = f" {body} "
+    score = base
+    if label == query:
+        score += 100
+    elif label.startswith(query):
+        score += 50
+    elif query in label:
+        score += 25
+    for token in tokens:
+        if f" {token} " in padded:
+            score += 40  # เบอร์โทร / บาร์โค๊ด / อีเมลตรงทั้งคำ
+        if label.startswith(token) or f" {token}" in label:
+            score += 5
+        elif token in label:
+            score += 3
+    return score - len(label) / 1000.0
+
+def _rank(kind: str, rows: List, query: str, tokens: List[str], limit: int) -> List[SearchHit]:
+    """rows = [(id, label, body)] in backend order (best first)"""
+    total = len(rows) or 1
+    hits = [
+        SearchHit(kind, row_id, label or '', _score(label or '', body or '', query, tokens, 1.0 - index / total))
+        for index, (row_id, label, body) in enumerate(rows)
+    ]
+    hits.sort(key=lambda hit: hit.score, reverse=True)
+    return hits[:limit]
+
+# ---------------------------------------------------------------- SQL expressions
+
+def _sqlite_normalize(expression: str) -> str:
+    for old, new in _REPLACEMENTS:
+        expression = f"replace({expression}, '{old}', '{new}')"
+    return f"lower({expression})"
+
+def _document_sql(kind: str, prefix: str = '') -> str:
+    """SQL expression of the searchable text of one row (same on every backend)"""
+    parts = []
+    for column in SEARCH_KINDS[kind]['columns']:
+        part = f"coalesce({prefix}{column}, '')"
+        if column == 'phone':
+            part = f"replace(replace({part}, '-', ''), ' ', '')"
+        parts.append(part)
+    document = " || ' ' || ".join(parts)
+    if is_postgresql:
+        return f"pos_search_norm({document})"
+    return _sqlite_normalize(document)
+
+# ---------------------------------------------------------------- index setup
+
+def _create_sqlite_index(conn, rebuild: bool):
+    exists = conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+    ), {'name': FTS_TABLE}).first() is not None
+    if not exists:
+        conn.execute(text(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(label UNINDEXED, body, tokenize='trigram')"))
+        rebuild = True
+    else:
+        # trigger หายไปพร้อมตารางที่ถูก drop/restore - index อาจไม่ตรงกับข้อมูลแล้ว
+        triggers = conn.execute(text(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE :pattern"
+        ), {'pattern': f"{FTS_TABLE}_%"}).scalar()
+        if triggers < 3 * len(SEARCH_KINDS):
+            rebuild = True
+
+    for kind, spec in SEARCH_KINDS.items():
+        table, code = spec['table'], spec['code']
+        rowid = f"{{row}}.id * {ROWID_STRIDE} + {code}"
+        insert_new = (f"INSERT INTO {FTS_TABLE}(rowid, label, body) "
+                      f"VALUES ({rowid.format(row='new')}, new.{spec['label']}, {_document_sql(kind, 'new.')});")
+        delete_old = f"DELETE FROM {FTS_TABLE} WHERE rowid = {rowid.format(row='old')};"
+        if rebuild:
+            for suffix in ('ai', 'au', 'ad'):
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{table}_{suffix}"))
+        conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_{table}_ai AFTER INSERT ON {table} BEGIN {insert_new} END"))
+        conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_{table}_au AFTER UPDATE OF {', '.join(spec['columns'])} ON {table} "
+                          f"BEGIN {delete_old} {insert_new} END"))
+        conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_{table}_ad AFTER DELETE ON {table} BEGIN {delete_old} END"))
+
+    if rebuild:
+        conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+        for kind, spec in SEARCH_KINDS.items():
+            conn.execute(text(
+                f"INSERT INTO {FTS_TABLE}(rowid, label, body) "
+                f"SELECT id * {ROWID_STRIDE} + {spec['code']}, {spec['label']}, {_document_sql(kind)} FROM {spec['table']}"
+            ))
+        logger.info("Rebuilt search index")
+
+def _create_postgresql_index(conn):
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    removed = ''.join(old for old, new in _REPLACEMENTS if not new)
+    digits_from = ''.join(old for old, new in _REPLACEMENTS if len(old) == 1 and new.isdigit())
+    conn.execute(text(f"""
+        CREATE OR REPLACE FUNCTION pos_search_norm(value text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT lower(translate(replace(replace(value, 'เเ', 'แ'), 'ํา', 'ำ'),
+                                   '{digits_from}{removed}', '0123456789'))
+        $$
+    """))
+    for kind, spec in SEARCH_KINDS.items():
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS idx_{spec['table']}_search_trgm ON {spec['table']} "
+            f"USING gin (({_document_sql(kind)}) gin_trgm_ops)"
+        ))
+
+def ensure_search_index(rebuild: bool = False) -> str:
+    """Create the search index for the current database (called from init_db)
+
+    Args:
+        rebuild: SQLite only - recreate triggers and reindex every row
+    Returns:
+        backend in use: 'fts5', 'pg_trgm' or 'ngram'
+    """
+    global _backend
+    backend = 'ngram'
+    try:
+        if is_sqlite:
+            with engine.begin() as conn:
+                _create_sqlite_index(conn, rebuild)
+            backend = 'fts5'
+        elif is_postgresql:
+            with engine.begin() as conn:
+                _create_postgresql_index(conn)
+            backend = 'pg_trgm'
+    except Exception as e:
+        # SQLite ที่ไม่มี FTS5/trigram (< 3.34) หรือไม่มีสิทธิ์สร้าง extension บน PostgreSQL
+        logger.warning("Search index unavailable, using in-memory n-gram search: %s", e)
+    with _backend_lock:
+        _backend = backend
+    return backend
+
+def _detect_backend(conn) -> str:
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = 'ngram'
+            try:
+                if is_sqlite:
+                    if conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                                    {'name': FTS_TABLE}).first():
+                        _backend = 'fts5'
+                elif is_postgresql:
+                    if conn.execute(text("SELECT 1 FROM pg_proc WHERE proname = 'pos_search_norm'")).first():
+                        _backend = 'pg_trgm'
+            except Exception as e:
+                logger.warning("Cannot detect search index: %s", e)
+        return _backend
+
+# ---------------------------------------------------------------- backends
+
+def _name_order(label: str) -> str:
+    """ORDER BY terms that put exact and prefix name matches first (before the backend rank)"""
+    return f"lower({label}) = :query DESC, substr(lower({label}), 1, :query_length) = :query DESC"
+
+def _search_fts5(conn, kind: str, query: str, tokens: List[str], candidates: int,
+                 condition: Optional[str] = None, only_value=None) -> List:
+    code = SEARCH_KINDS[kind]['code']
+    long_tokens = [t for t in tokens if len(t) >= TRIGRAM]
+    short_tokens = [t for t in tokens if len(t) < TRIGRAM]
+    params = {'code': code, 'stride': ROWID_STRIDE, 'limit': candidates, 'query': query, 'query_length': len(query),
+              'only_value': only_value}
+    conditions = ["rowid % :stride = :code"]
+    for index, token in enumerate(short_tokens):
+        conditions.append(f"body LIKE :short{index}")
+        params[f'short{index}'] = f"%{token}%"
+    if condition:
+        conditions.append(f"rowid / :stride IN (SELECT id FROM {SEARCH_KINDS[kind]['table']} WHERE {condition})")
+
+    if long_tokens:
+        params['match'] = ' '.join('"' + token.replace('"', '""') + '"' for token in long_tokens)
+        sql = (f"SELECT rowid / :stride, label, body FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match AND "
+               f"{' AND '.join(conditions)} ORDER BY {_name_order('label')}, bm25({FTS_TABLE}) LIMIT :limit")
+    else:
+        # คำค้นสั้นกว่า 3 ตัวอักษรใช้ trigram ไม่ได้ - สแกนตาราง index (เล็กกว่าตารางจริง)
+        sql = (f"SELECT rowid / :stride, label, body FROM {FTS_TABLE} WHERE {' AND '.join(conditions)} "
+               f"ORDER BY {_name_order('label')} LIMIT :limit")
+    return conn.execute(text(sql), params).all()
+
+def _search_pg_trgm(conn, kind: str, query: str, tokens: List[str], candidates: int,
+                    condition: Optional[str] = None, only_value=None) -> List:
+    spec = SEARCH_KINDS[kind]
+    document = _document_sql(kind)
+    params = {'query': query, 'query_length': len(query), 'limit': candidates, 'only_value': only_value}
+    conditions = []
+    for index, token in enumerate(tokens):
+        conditions.append(f"{document} LIKE :token{index}")
+        params[f'token{index}'] = '%' + token.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    if condition:
+        conditions.append(f"({condition})")
+    sql = (f"SELECT id, {spec['label']}, {document} FROM {spec['table']} WHERE {' AND '.join(conditions)} "
+           f"ORDER BY {_name_order(spec['label'])}, word_similarity(:query, {document}) DESC LIMIT :limit")
+    return conn.execute(text(sql), params).all()
+
+class NgramIndex:
+    """In-memory trigram index of one kind (fallback when the database has no text index)"""
+
+    def __init__(self, signature, rows: List):
+        self.signature = signature
+        self.documents = {}
+        self.grams = defaultdict(set)
+        for row_id, label, body in rows:
+            self.documents[row_id] = (label, body, normalize_text(label))
+            for gram in _ngrams(body):
+                self.grams[gram].add(row_id)
+
+    def lookup(self, query: str, tokens: List[str], candidates: int, allowed: Optional[set] = None) -> List:
+        ids = allowed
+        for token in tokens:
+            for gram in _ngrams(token):
+                posting = self.grams.get(gram, set())
+                ids = set(posting) if ids is None else ids & posting
+                if not ids:
+                    return []
+        pool = self.documents.keys() if ids is None else ids
+        matches = []
+        for row_id in sorted(pool):
+            label, body, name = self.documents[row_id]
+            if all(token in body for token in tokens):
+                matches.append((name != query, not name.startswith(query), row_id, label, body))
+        matches.sort(key=lambda match: match[:2])
+        return [(row_id, label, body) for _, _, row_id, label, body in matches[:candidates]]
+
+def _search_ngram(conn, kind: str, query: str, tokens: List[str], candidates: int,
+                  condition: Optional[str] = None, only_value=None) -> List:
+    spec = SEARCH_KINDS[kind]
+    table = spec['table']
+    # ตรวจว่าข้อมูลเปลี่ยนหรือไม่ด้วย query เล็กๆ ก่อนใช้ index เดิม
+    signature = tuple(conn.execute(text(f"SELECT count(*), max(id), max(updated_at) FROM {table}")).first())
+    with _ngram_lock:
+        index = _ngram_indexes.get(kind)
+    if index is None or index.signature != signature:
+        columns = ', '.join(spec['columns'])
+        rows = []
+        for row in conn.execute(text(f"SELECT id, {spec['label']}, {columns} FROM {table}")):
+            values = [str(value) for value in row[2:] if value]
+            body = normalize_text(' '.join(values))
+            if 'phone' in spec['columns']:
+                phone = row[2 + spec['columns'].index('phone')]
+                if phone:
+                    body += ' ' + str(phone).replace('-', '').replace(' ', '')
+            rows.append((row[0], row[1], body))
+        index = NgramIndex(signature, rows)
+        with _ngram_lock:
+            _ngram_indexes[kind] = index
+        logger.debug("Built n-gram search index", extra={'kind': kind, 'rows': len(rows)})
+    allowed = None
+    if condition:
+        allowed = set(conn.execute(text(f"SELECT id FROM {table} WHERE {condition}"),
+                                   {'only_value': only_value} if ':only_value' in condition else {}).scalars())
+    return index.lookup(query, tokens, candidates, allowed)
+
+# ---------------------------------------------------------------- API
+
+def search(query: str, kind: str = 'product', limit: int = 20, only: Optional[str] = None,
+           only_value=None) -> List[SearchHit]:
+    """Search products, menus or customers, best match first
+
+    Args:
+        query: free text - name, barcode, phone, email (Thai or English, any case)
+        kind: 'product', 'menu' or 'customer'
+        limit: maximum number of hits
+        only: named filter of the kind applied inside the search query
+              ('in_stock'/'category' for products, 'active' for menus, 'member'/'non_member'
+              for customers) - up to `limit` hits that pass it
+        only_value: value of the filter's :only_value parameter (category id for 'category')
+    Returns:
+        [SearchHit(kind, id, label, score)] - load the rows with Model.id.in_(...)
+    """
+    if kind not in SEARCH_KINDS:
+        raise ValueError(f"Unknown search kind: {kind}")
+    condition = None
+    if only is not None:
+        condition = SEARCH_KINDS[kind]['filters'].get(only)
+        if condition is None:
+            raise ValueError(f"Unknown search filter for {kind}: {only}")
+        if ':only_value' in condition and only_value is None:
+            raise ValueError(f"Search filter {only} needs only_value")
+    normalized = normalize_text(query)
+    tokens = tokenize(query)
+    if not tokens or limit <= 0:
+        return []
+
+    candidates = min(max(limit * CANDIDATE_FACTOR, MIN_CANDIDATES), MAX_CANDIDATES)
+    with engine.connect() as conn:
+        backend = _detect_backend(conn)
+        try:
+            if backend == 'fts5':
+                rows = _search_fts5(conn, kind, normalized, tokens, candidates, condition, only_value)
+            elif backend == 'pg_trgm':
+                rows = _search_pg_trgm(conn, kind, normalized, tokens, candidates, condition, only_value)
+            else:
+                rows = _search_ngram(conn, kind, normalized, tokens, candidates, condition, only_value)
+        except Exception as e:
+            logger.warning("Search index query failed, using n-gram search: %s", e)
+            conn.rollback()
+            rows = _search_ngram(conn, kind, normalized, tokens, candidates, condition, only_value)
+    return _rank(kind, rows, normalized, tokens, limit)
+
+def rank_order(items: List, hits: List[SearchHit]) -> List:
+    """Sort model objects (loaded with Model.id.in_(hit ids)) in the order of the hits"""
+    positions = {hit.id: position for position, hit in enumerate(hits)}
+    return sorted(items, key=lambda item: positions.get(item.id, len(positions)))
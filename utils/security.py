@@ -2,43 +2,30 @@
 Security Functions for POS System
 """
 
-import time
-from typing import Dict, Optional, Tuple
+from typing import Optional, Tuple
 from datetime import datetime, timedelta
+from utils.rate_limiter import get_rate_limiter
 
-# Simple in-memory rate limiting (for production, use Redis or similar)
-_login_attempts: Dict[str, list] = {}
 _session_timeout_minutes = 60  # 1 hour
 
+def _login_key(username: str) -> str:
+    return f"login:{(username or '').strip().lower()}"
+
 def check_login_rate_limit(username: str, max_attempts: int = 5, window_seconds: int = 300) -> Tuple[bool, Optional[str]]:
-    """Check if login attempts exceed rate limit"""
-    now = time.time()
-    
-    if username not in _login_attempts:
-        _login_attempts[username] = []
-    
-    # Remove old attempts outside the window
-    _login_attempts[username] = [
-        attempt_time for attempt_time in _login_attempts[username]
-        if now - attempt_time < window_seconds
-    ]
-    
-    if len(_login_attempts[username]) >= max_attempts:
+    """Check if login attempts exceed rate limit (counted across processes - see utils.rate_limiter)"""
+    if not get_rate_limiter().allow(_login_key(username), max_attempts, window_seconds):
         return False, f"ลองเข้าสู่ระบบมากเกินไป กรุณารอ {window_seconds // 60} นาที"
-    
     return True, None
 
-def record_login_attempt(username: str, success: bool):
+def record_login_attempt(username: str, success: bool, window_seconds: int = 300):
     """Record login attempt"""
+    limiter = get_rate_limiter()
     if success:
         # Clear attempts on successful login
-        if username in _login_attempts:
-            _login_attempts[username] = []
+        limiter.reset(_login_key(username), window_seconds)
     else:
         # Record failed attempt
-        if username not in _login_attempts:
-            _login_attempts[username] = []
-        _login_attempts[username].append(time.time())
+        limiter.hit(_login_key(username), window_seconds)
 
 def check_session_timeout(last_activity: Optional[datetime]) -> bool:
     """Check if session has timed out"""
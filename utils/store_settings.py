@@ -7,6 +7,9 @@ from database.db import get_session, engine
 from database.models import StoreSetting
 from datetime import datetime
 import json
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 def ensure_store_settings_table():
     """
@@ -31,37 +34,37 @@ def ensure_store_settings_table():
                 
                 # Check if it's a table not found error
                 if 'does not exist' in error_msg or 'no such table' in error_msg or 'relation' in error_msg or 'undefinedtable' in error_msg:
-                    print(f"[INFO] Creating store_settings table...")
+                    logger.info("Creating store_settings table...")
                     try:
                         StoreSetting.__table__.create(bind=engine, checkfirst=True)
-                        print(f"[INFO] ✅ store_settings table created successfully")
+                        logger.info("✅ store_settings table created successfully")
                         # Initialize default settings
                         try:
                             init_default_settings()
-                            print(f"[INFO] ✅ Default settings initialized")
+                            logger.info("✅ Default settings initialized")
                         except Exception as e3:
-                            print(f"[WARNING] Failed to initialize default settings: {e3}")
+                            logger.warning("Failed to initialize default settings: %s", e3)
                         return True
                     except Exception as create_error:
-                        print(f"[ERROR] Failed to create table: {create_error}")
+                        logger.error("Failed to create table: %s", create_error)
                         return False
                 # Check if it's an SSL/connection error (retry)
                 elif 'ssl' in error_msg or 'connection' in error_msg or 'closed unexpectedly' in error_msg:
                     if attempt < max_retries - 1:
-                        print(f"[WARNING] Connection error (attempt {attempt + 1}/{max_retries}): {str(e)[:100]}")
-                        print(f"[INFO] Retrying in {retry_delay} seconds...")
+                        logger.warning("Connection error (attempt %s/%s): %s", attempt + 1, max_retries, str(e)[:100])
+                        logger.info("Retrying in %s seconds...", retry_delay)
                         time.sleep(retry_delay)
                         retry_delay *= 2  # Exponential backoff
                         continue
                     else:
-                        print(f"[ERROR] Connection failed after {max_retries} attempts: {e}")
+                        logger.error("Connection failed after %s attempts: %s", max_retries, e)
                         # Try to create table directly as fallback
                         try:
                             StoreSetting.__table__.create(bind=engine, checkfirst=True)
-                            print(f"[INFO] ✅ store_settings table created via fallback")
+                            logger.info("✅ store_settings table created via fallback")
                             return True
                         except Exception as e2:
-                            print(f"[ERROR] Fallback table creation also failed: {e2}")
+                            logger.error("Fallback table creation also failed: %s", e2)
                         return False
                 else:
                     # Other errors - don't retry
@@ -70,21 +73,19 @@ def ensure_store_settings_table():
             if attempt < max_retries - 1:
                 error_msg = str(e).lower()
                 if 'ssl' in error_msg or 'connection' in error_msg or 'closed unexpectedly' in error_msg:
-                    print(f"[WARNING] Connection error (attempt {attempt + 1}/{max_retries}): {str(e)[:100]}")
-                    print(f"[INFO] Retrying in {retry_delay} seconds...")
+                    logger.warning("Connection error (attempt %s/%s): %s", attempt + 1, max_retries, str(e)[:100])
+                    logger.info("Retrying in %s seconds...", retry_delay)
                     time.sleep(retry_delay)
                     retry_delay *= 2
                     continue
-            print(f"[ERROR] Failed to ensure store_settings table: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.error("Failed to ensure store_settings table: %s", e, exc_info=True)
             # Try to create table directly as final fallback
             try:
                 StoreSetting.__table__.create(bind=engine, checkfirst=True)
-                print(f"[INFO] ✅ store_settings table created via fallback")
+                logger.info("✅ store_settings table created via fallback")
                 return True
             except Exception as e2:
-                print(f"[ERROR] Fallback table creation also failed: {e2}")
+                logger.error("Fallback table creation also failed: %s", e2)
             return False
     
     return False
@@ -113,9 +114,9 @@ def get_setting(key: str, default: str = "") -> str:
         # If still error, return default
         error_msg = str(e).lower()
         if 'does not exist' in error_msg or 'no such table' in error_msg or 'relation' in error_msg or 'undefinedtable' in error_msg:
-            print(f"[WARNING] Table still not available, returning default for {key}")
+            logger.warning("Table still not available, returning default for %s", key)
         else:
-            print(f"[WARNING] Error reading setting {key}: {e}")
+            logger.warning("Error reading setting %s: %s", key, e)
         return default
     finally:
         session.close()
@@ -163,7 +164,7 @@ def set_setting(key: str, value: str, description: str = None, updated_by: int =
         return True
     except Exception as e:
         session.rollback()
-        print(f"[ERROR] Failed to save setting {key}: {e}")
+        logger.error("Failed to save setting %s: %s", key, e)
         return False
     finally:
         session.close()
@@ -183,7 +184,7 @@ def get_all_settings() -> dict:
         settings = session.query(StoreSetting).all()
         return {s.key: s.value or "" for s in settings}
     except Exception as e:
-        print(f"[WARNING] Error reading all settings: {e}")
+        logger.warning("Error reading all settings: %s", e)
         return {}
     finally:
         session.close()
@@ -228,7 +229,7 @@ def init_default_settings():
         session.commit()
     except Exception as e:
         session.rollback()
-        print(f"[ERROR] Failed to initialize default settings: {e}")
+        logger.error("Failed to initialize default settings: %s", e)
     finally:
         session.close()
 
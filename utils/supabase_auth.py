@@ -7,6 +7,9 @@ Supabase Authentication Integration
 import streamlit as st
 from typing import Optional, Dict, Any
 import os
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 try:
     from supabase import create_client, Client
@@ -48,7 +51,7 @@ def get_supabase_client() -> Optional[Client]:
         
         return None
     except Exception as e:
-        print(f"Error creating Supabase client: {e}")
+        logger.error("Error creating Supabase client: %s", e)
         return None
 
 def supabase_login(email: str, password: str) -> Optional[Dict[str, Any]]:
@@ -81,7 +84,7 @@ def supabase_login(email: str, password: str) -> Optional[Dict[str, Any]]:
             }
         return None
     except Exception as e:
-        print(f"Supabase login error: {e}")
+        logger.error("Supabase login error: %s", e)
         return None
 
 def supabase_signup(email: str, password: str, metadata: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
@@ -117,7 +120,7 @@ def supabase_signup(email: str, password: str, metadata: Optional[Dict] = None)
             }
         return None
     except Exception as e:
-        print(f"Supabase signup error: {e}")
+        logger.error("Supabase signup error: %s", e)
         return None
 
 def supabase_oauth_login(provider: str) -> str:
@@ -149,7 +152,7 @@ def supabase_oauth_login(provider: str) -> str:
         
         return response.url
     except Exception as e:
-        print(f"Supabase OAuth error: {e}")
+        logger.error("Supabase OAuth error: %s", e)
         return None
 
 def supabase_logout():
@@ -164,7 +167,7 @@ def supabase_logout():
         supabase.auth.sign_out()
         return True
     except Exception as e:
-        print(f"Supabase logout error: {e}")
+        logger.error("Supabase logout error: %s", e)
         return False
 
 def get_current_user() -> Optional[Dict[str, Any]]:
@@ -188,7 +191,7 @@ def get_current_user() -> Optional[Dict[str, Any]]:
             }
         return None
     except Exception as e:
-        print(f"Get current user error: {e}")
+        logger.error("Get current user error: %s", e)
         return None
 
 def require_supabase_auth(redirect_to_login: bool = True) -> bool:
@@ -0,0 +1,393 @@
+"""
+Synthetic Data Generator - สร้างข้อมูลจำลองปริมาณมากสำหรับทดสอบความเร็ว
+สร้างสินค้า, เมนู (พร้อม BOM), ลูกค้า/สมาชิก, คูปอง, ค่าใช้จ่าย และประวัติการขาย
+ย้อนหลัง K วันตามรูปแบบยอดขายรายชั่วโมงจริง (พีคมื้อเที่ยง/เย็น, วันหยุดขายดีกว่า)
+
+ข้อมูลถูกสร้างจาก seed เดียวกันจะได้ผลเหมือนเดิมทุกครั้ง และ insert แบบ Core เป็นชุดๆ
+จึงสร้างได้หลักล้านบิลทั้งบน SQLite และ PostgreSQL
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import func, insert, select, text, update
+from database.db import get_session
+from database.models import (
+    Category, Product, Menu, MenuItem, Customer, Membership, Coupon, CouponUsage, Promotion,
+    LoyaltyTransaction, ExpenseCategory, Expense, Sale, SaleItem, StockTransaction, User
+)
+from utils.tax import invalidate_monthly_tax_summary
+
+# สัดส่วนยอดขายแต่ละชั่วโมง (0-23) - ร้านอาหารตามสั่ง พีคเที่ยงและเย็น
+HOURLY_WEIGHTS = [
+    0, 0, 0, 0, 0, 0, 1, 3, 5, 4, 5, 12,
+    16, 10, 5, 4, 6, 11, 13, 9, 5, 3, 1, 0,
+]
+
+# ตัวคูณยอดขายตามวันในสัปดาห์ (datetime.weekday(): 0 = จันทร์)
+WEEKDAY_FACTORS = [0.9, 0.85, 0.9, 0.95, 1.1, 1.3, 1.2]
+
+PAYMENT_METHODS = ['cash', 'cash', 'cash', 'transfer', 'qr_code', 'credit_card']
+EXPENSE_CATEGORY_NAMES = ['วัตถุดิบ', 'ค่าแรง', 'ค่าน้ำค่าไฟ', 'ค่าเช่า', 'อื่นๆ']
+
+DEFAULT_CHUNK_SIZE = 20000
+
+def _next_id(session, model) -> int:
+    """First free id of a table - generated rows get explicit ids so children can reference them"""
+    return (session.query(func.max(model.id)).scalar() or 0) + 1
+
+def _insert_chunks(session, model, rows: List[Dict], chunk_size: int):
+    """Bulk insert rows in chunks via Core"""
+    for start in range(0, len(rows), chunk_size):
+        session.execute(insert(model), rows[start:start + chunk_size])
+
+def _sync_sequences(session, models):
+    """PostgreSQL: move id sequences past the explicit ids we inserted"""
+    if session.get_bind().dialect.name != 'postgresql':
+        return
+    for model in models:
+        table = model.__tablename__
+        session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        ))
+
+def _create_catalog(session, rng: random.Random, products: int, menus: int, chunk_size: int) -> Dict:
+    """Create categories, products and menus with BOM
+    Returns: {'product_prices': {id: price}, 'product_costs': {id: cost},
+              'menus': {id: (price, [(product_id, quantity), ...])}}
+    """
+    category_ids = []
+    for name in ["สินค้าทดสอบ", "วัตถุดิบทดสอบ"]:
+        category = session.query(Category).filter(Category.name == name).first()
+        if not category:
+            category = Category(name=name, description="ข้อมูลจำลองสำหรับทดสอบความเร็ว")
+            session.add(category)
+            session.flush()
+        category_ids.append(category.id)
+
+    product_id = _next_id(session, Product)
+    product_rows = []
+    product_costs = {}
+    for i in range(products):
+        cost = round(rng.uniform(5, 80), 2)
+        product_rows.append({
+            'id': product_id + i,
+            'name': f"สินค้าทดสอบ {product_id + i}",
+            'category_id': rng.choice(category_ids),
+            'unit': 'ชิ้น',
+            'cost_price': cost,
+            'selling_price': round(cost * rng.uniform(1.3, 2.0), 0),
+            'stock_quantity': 1000000.0,
+            'min_stock': 10.0,
+            'barcode': f"990{product_id + i:010d}"
+        })
+        product_costs[product_id + i] = cost
+    _insert_chunks(session, Product, product_rows, chunk_size)
+
+    menu_id = _next_id(session, Menu)
+    menu_rows, bom_rows = [], []
+    menu_recipes = {}
+    product_ids = list(product_costs)
+    for i in range(menus):
+        recipe = [
+            (pid, rng.choice([0.1, 0.2, 0.5, 1.0]))
+            for pid in rng.sample(product_ids, min(len(product_ids), rng.randint(2, 5)))
+        ]
+        cost = sum(product_costs[pid] * qty for pid, qty in recipe)
+        price = round(max(40, cost * rng.uniform(1.8, 3.0)), 0)
+        menu_rows.append({'id': menu_id + i, 'name': f"เมนูทดสอบ {menu_id + i}", 'price': price})
+        bom_rows.extend({'menu_id': menu_id + i, 'product_id': pid, 'quantity': qty} for pid, qty in recipe)
+        menu_recipes[menu_id + i] = (price, recipe)
+    _insert_chunks(session, Menu, menu_rows, chunk_size)
+    _insert_chunks(session, MenuItem, bom_rows, chunk_size)
+
+    return {
+        'product_prices': {row['id']: row['selling_price'] for row in product_rows},
+        'product_costs': product_costs,
+        'menus': menu_recipes
+    }
+
+def _create_customers(session, rng: random.Random, customers: int, start_date: datetime, chunk_size: int) -> List[int]:
+    """Create customers, half of them members. Returns member customer ids"""
+    customer_id = _next_id(session, Customer)
+    customer_rows, membership_rows, member_ids = [], [], []
+    for i in range(customers):
+        cid = customer_id + i
+        is_member = rng.random() < 0.5
+        customer_rows.append({
+            'id': cid,
+            'name': f"ลูกค้าทดสอบ {cid}",
+            'phone': f"09{cid:08d}",
+            'is_member': is_member,
+            'created_at': start_date
+        })
+        if is_member:
+            membership_rows.append({'customer_id': cid, 'member_code': f"MEM{cid:08d}", 'joined_date': start_date})
+            member_ids.append(cid)
+    _insert_chunks(session, Customer, customer_rows, chunk_size)
+    _insert_chunks(session, Membership, membership_rows, chunk_size)
+    return member_ids
+
+def _create_coupons(session, rng: random.Random, coupons: int, start_date: datetime, end_date: datetime) -> List[Dict]:
+    """Create coupons valid over the whole generated period"""
+    coupon_id = _next_id(session, Coupon)
+    rows = []
+    for i in range(coupons):
+        is_percent = rng.random() < 0.5
+        rows.append({
+            'id': coupon_id + i,
+            'code': f"LOAD{coupon_id + i:06d}",
+            'name': f"คูปองทดสอบ {coupon_id + i}",
+            'discount_type': 'percent' if is_percent else 'fixed',
+            'discount_value': rng.choice([5, 10, 15]) if is_percent else rng.choice([10, 20, 50]),
+            'min_purchase': 0.0,
+            'valid_from': start_date,
+            'valid_until': end_date + timedelta(days=365),
+            'used_count': 0
+        })
+    if rows:
+        session.execute(insert(Coupon), rows)
+    return rows
+
+def _create_promotions(session, rng: random.Random, promotions: int, start_date: datetime, end_date: datetime) -> int:
+    """Create a mix of discount, time-based, member-only and buy-x-get-y promotions"""
+    rows = []
+    for i in range(promotions):
+        promotion_type = ['discount', 'time_based', 'member_only', 'buy_x_get_y'][i % 4]
+        rows.append({
+            'name': f"โปรโมชั่นทดสอบ {i + 1}",
+            'promotion_type': promotion_type,
+            'discount_type': rng.choice(['percent', 'fixed']),
+            'discount_value': rng.choice([5, 10, 20]),
+            'min_purchase': rng.choice([0.0, 100.0, 300.0]),
+            'buy_quantity': 2 if promotion_type == 'buy_x_get_y' else None,
+            'get_quantity': 1 if promotion_type == 'buy_x_get_y' else None,
+            'time_start': '00:00' if promotion_type == 'time_based' else None,
+            'time_end': '23:59' if promotion_type == 'time_based' else None,
+            'valid_from': start_date,
+            'valid_until': end_date + timedelta(days=365),
+            'is_active': True
+        })
+    if rows:
+        session.execute(insert(Promotion), rows)
+    return len(rows)
+
+def _create_expenses(session, rng: random.Random, expenses_per_day: int, start_date: datetime, days: int,
+                     user_ids: List[Optional[int]], chunk_size: int) -> int:
+    """Create daily expenses. Returns number of rows"""
+    category_ids = []
+    for name in EXPENSE_CATEGORY_NAMES:
+        category = session.query(ExpenseCategory).filter(ExpenseCategory.name == name).first()
+        if not category:
+            category = ExpenseCategory(name=name)
+            session.add(category)
+            session.flush()
+        category_ids.append(category.id)
+
+    rows = []
+    for day in range(days):
+        date = start_date + timedelta(days=day)
+        for _ in range(expenses_per_day):
+            rows.append({
+                'category_id': rng.choice(category_ids),
+                'amount': round(rng.uniform(100, 3000), 2),
+                'description': "ค่าใช้จ่ายทดสอบ",
+                'expense_date': date + timedelta(hours=rng.randint(8, 20)),
+                'created_by': rng.choice(user_ids),
+                'created_at': date
+            })
+    _insert_chunks(session, Expense, rows, chunk_size)
+    return len(rows)
+
+def _update_running_totals(session, coupon_ids: List[int], member_ids: List[int]):
+    """Set coupon used_count and membership points/spend/visits from the generated history"""
+    if coupon_ids:
+        used = select(func.count(CouponUsage.id)).where(CouponUsage.coupon_id == Coupon.id).scalar_subquery()
+        session.execute(update(Coupon).where(Coupon.id.in_(coupon_ids)).values(used_count=used))
+
+    if member_ids:
+        member_sales = Sale.customer_id == Membership.customer_id
+        for start in range(0, len(member_ids), 500):
+            session.execute(update(Membership).where(
+                Membership.customer_id.in_(member_ids[start:start + 500])
+            ).values(
+                points=select(func.coalesce(func.sum(LoyaltyTransaction.points), 0)).where(
+                    LoyaltyTransaction.customer_id == Membership.customer_id
+                ).scalar_subquery(),
+                total_spent=select(func.coalesce(func.sum(Sale.final_amount), 0)).where(
+                    member_sales, Sale.is_void == False
+                ).scalar_subquery(),
+                total_visits=select(func.count(Sale.id)).where(
+                    member_sales, Sale.is_void == False
+                ).scalar_subquery(),
+                last_visit=select(func.max(Sale.sale_date)).where(member_sales).scalar_subquery()
+            ))
+
+def generate_synthetic_data(products: int = 200, menus: int = 50, days: int = 365, sales_per_day: int = 300,
+                            customers: int = 2000, coupons: int = 20, promotions: int = 8, expenses_per_day: int = 3,
+                            tax_rate: float = 7.0, void_rate: float = 0.01, stock_transactions: bool = True,
+                            seed: int = 42, end_date: Optional[datetime] = None,
+                            chunk_size: int = DEFAULT_CHUNK_SIZE,
+                            progress: Optional[Callable[[str], None]] = None) -> Dict:
+    """
+    Generate a reproducible sales history
+
+    Args:
+        products / menus: จำนวนสินค้า / เมนู (เมนูละ 2-5 วัตถุดิบ)
+        days: จำนวนวันย้อนหลัง, sales_per_day: จำนวนบิลเฉลี่ยต่อวัน (ปรับตามวันในสัปดาห์)
+        customers: จำนวนลูกค้า (ครึ่งหนึ่งเป็นสมาชิก), coupons / promotions: จำนวนคูปอง / โปรโมชั่น
+        stock_transactions: สร้าง StockTransaction 'out' ต่อรายการสินค้า/วัตถุดิบที่ขาย
+        seed: seed เดียวกันได้ข้อมูลเดิม, chunk_size: จำนวนแถวต่อการ insert หนึ่งครั้ง
+        progress: ฟังก์ชันรับข้อความความคืบหน้า (None = ไม่แสดง)
+
+    Returns:
+        Dict with counts of created rows
+    """
+    rng = random.Random(seed)
+    log = progress or (lambda message: None)
+    end_date = (end_date or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    start_date = end_date - timedelta(days=days)
+    counts = {'products': products, 'menus': menus, 'customers': customers, 'coupons': coupons,
+              'promotions': promotions,
+              'expenses': 0, 'sales': 0, 'sale_items': 0, 'stock_transactions': 0,
+              'loyalty_transactions': 0, 'coupon_usages': 0}
+
+    session = get_session()
+    try:
+        user_ids = [row.id for row in session.query(User.id).all()] or [None]
+
+        log("📦 สร้างสินค้าและเมนู...")
+        catalog = _create_catalog(session, rng, products, menus, chunk_size)
+        member_ids = _create_customers(session, rng, customers, start_date, chunk_size)
+        coupon_rows = _create_coupons(session, rng, coupons, start_date, end_date)
+        _create_promotions(session, rng, promotions, start_date, end_date)
+        counts['expenses'] = _create_expenses(session, rng, expenses_per_day, start_date, days, user_ids, chunk_size)
+        session.commit()
+
+        product_prices = catalog['product_prices']
+        product_costs = catalog['product_costs']
+        menu_recipes = catalog['menus']
+        product_ids = list(product_prices)
+        menu_ids = list(menu_recipes)
+        hours = list(range(24))
+
+        sale_id = _next_id(session, Sale)
+        buffers = {Sale: [], SaleItem: [], StockTransaction: [], LoyaltyTransaction: [], CouponUsage: []}
+
+        def flush_buffers():
+            for model in (Sale, SaleItem, StockTransaction, LoyaltyTransaction, CouponUsage):
+                _insert_chunks(session, model, buffers[model], chunk_size)
+                buffers[model].clear()
+            session.commit()
+
+        log(f"🧾 สร้างประวัติการขาย {days} วัน...")
+        for day in range(days):
+            date = start_date + timedelta(days=day)
+            # ยอดขายโตขึ้นเล็กน้อยตามเวลา + สุ่มรายวัน
+            trend = 0.85 + 0.3 * (day / max(days - 1, 1))
+            mean = sales_per_day * WEEKDAY_FACTORS[date.weekday()] * trend
+            day_sales = max(0, int(rng.gauss(mean, mean * 0.1)))
+            sale_hours = rng.choices(hours, weights=HOURLY_WEIGHTS, k=day_sales)
+
+            for hour in sorted(sale_hours):
+                sale_date = date + timedelta(hours=hour, seconds=rng.randint(0, 3599))
+                created_by = rng.choice(user_ids)
+
+                lines = []
+                for _ in range(rng.choices([1, 2, 3, 4], weights=[45, 30, 15, 10])[0]):
+                    quantity = float(rng.choices([1, 2, 3], weights=[80, 15, 5])[0])
+                    if menu_ids and (not product_ids or rng.random() < 0.6):
+                        menu_id = rng.choice(menu_ids)
+                        unit_price, recipe = menu_recipes[menu_id]
+                        lines.append({'sale_id': sale_id, 'item_type': 'menu', 'menu_id': menu_id, 'product_id': None,
+                                      'quantity': quantity, 'unit_price': unit_price, 'discount_amount': 0.0,
+                                      'total_price': unit_price * quantity})
+                        components = [(pid, qty * quantity) for pid, qty in recipe]
+                    else:
+                        product_id = rng.choice(product_ids)
+                        unit_price = product_prices[product_id]
+                        lines.append({'sale_id': sale_id, 'item_type': 'product', 'menu_id': None, 'product_id': product_id,
+                                      'quantity': quantity, 'unit_price': unit_price, 'discount_amount': 0.0,
+                                      'total_price': unit_price * quantity})
+                        components = [(product_id, quantity)]
+
+                    if stock_transactions:
+                        buffers[StockTransaction].extend({
+                            'product_id': pid, 'transaction_type': 'out', 'quantity': qty,
+                            'unit_price': product_costs[pid], 'total_cost': product_costs[pid] * qty,
+                            'reason': f'ขาย - Sale #{sale_id}', 'sale_id': sale_id,
+                            'created_by': created_by, 'created_at': sale_date
+                        } for pid, qty in components)
+
+                total_amount = sum(line['total_price'] for line in lines)
+
+                # คูปอง ~5% ของบิล
+                discount = 0.0
+                if coupon_rows and rng.random() < 0.05:
+                    coupon = rng.choice(coupon_rows)
+                    if coupon['discount_type'] == 'percent':
+                        discount = round(total_amount * coupon['discount_value'] / 100, 2)
+                    else:
+                        discount = min(total_amount, coupon['discount_value'])
+
+                # ลูกค้าสมาชิก ~30% ของบิล
+                customer_id = rng.choice(member_ids) if member_ids and rng.random() < 0.3 else None
+
+                subtotal = total_amount - discount
+                tax_amount = round(subtotal * tax_rate / 100, 2)
+                final_amount = subtotal + tax_amount
+                points_earned = round(final_amount * 0.01, 2) if customer_id else 0.0
+                is_void = rng.random() < void_rate
+
+                buffers[Sale].append({
+                    'id': sale_id, 'sale_date': sale_date, 'total_amount': total_amount,
+                    'discount_amount': discount, 'final_amount': final_amount,
+                    'payment_method': rng.choice(PAYMENT_METHODS), 'customer_id': customer_id,
+                    'points_earned': points_earned, 'points_used': 0.0, 'tax_rate': tax_rate,
+                    'tax_amount': tax_amount, 'subtotal': subtotal, 'is_void': is_void,
+                    'void_reason': "ทดสอบ" if is_void else None, 'voided_at': sale_date if is_void else None,
+                    'created_by': created_by, 'created_at': sale_date
+                })
+                buffers[SaleItem].extend(lines)
+                if discount:
+                    buffers[CouponUsage].append({'coupon_id': coupon['id'], 'sale_id': sale_id, 'customer_id': customer_id,
+                                                 'discount_amount': discount, 'used_at': sale_date})
+                if points_earned:
+                    buffers[LoyaltyTransaction].append({'customer_id': customer_id, 'transaction_type': 'earn',
+                                                        'points': points_earned, 'sale_id': sale_id,
+                                                        'description': f"แต้มจากการซื้อ #{sale_id}",
+                                                        'transaction_date': sale_date})
+
+                counts['sales'] += 1
+                counts['sale_items'] += len(lines)
+                sale_id += 1
+
+            if len(buffers[Sale]) >= chunk_size:
+                counts['stock_transactions'] += len(buffers[StockTransaction])
+                counts['loyalty_transactions'] += len(buffers[LoyaltyTransaction])
+                counts['coupon_usages'] += len(buffers[CouponUsage])
+                flush_buffers()
+                log(f"  ... {date.strftime('%Y-%m-%d')}  {counts['sales']:,} บิล")
+
+        counts['stock_transactions'] += len(buffers[StockTransaction])
+        counts['loyalty_transactions'] += len(buffers[LoyaltyTransaction])
+        counts['coupon_usages'] += len(buffers[CouponUsage])
+        flush_buffers()
+
+        _sync_sequences(session, [Product, Menu, Customer, Coupon, Sale])
+        _update_running_totals(session, [row['id'] for row in coupon_rows], member_ids)
+        session.commit()
+
+        # บิลย้อนหลังไม่ได้ผ่าน service การขาย - ล้างสรุป VAT รายเดือนที่เก็บไว้ของเดือนที่เขียนลงไป
+        month = start_date.replace(day=1)
+        while month < end_date:
+            invalidate_monthly_tax_summary(month)
+            month = (month + timedelta(days=32)).replace(day=1)
+        log(f"✅ สร้างข้อมูลเสร็จ: {counts['sales']:,} บิล, {counts['sale_items']:,} รายการ")
+        return counts
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
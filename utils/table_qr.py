@@ -0,0 +1,199 @@
+"""
+Table QR - QR Code สั่งอาหารของโต๊ะ เก็บเป็นไฟล์ PNG (ชื่อไฟล์คือ hash ของเนื้อหา)
+- คอลัมน์ tables.qr_code เก็บแค่ path ของไฟล์ รายการโต๊ะจึงไม่ต้องโหลดรูป base64 ทุกแถว
+- สร้างทุกโต๊ะในครั้งเดียว (render พร้อมกันใน thread pool, บันทึก path ด้วย UPDATE ครั้งเดียว)
+- แผ่นพิมพ์ PDF ของ QR ทุกโต๊ะ (A4, 3 x 4 ต่อหน้า)
+- ไฟล์หายได้เมื่อ storage ไม่ถาวร (เช่น redeploy บน Streamlit Cloud) - URL ของโต๊ะคำนวณได้เสมอ
+  table_qr_source() จึงสร้างไฟล์ที่หายใหม่เมื่อถูกเรียกแสดงผล
+"""
+
+import base64
+import binascii
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import bindparam, select
+from database.db import engine
+from database.models import Table
+from utils.logger import get_logger, log_timing
+from utils.thumbnails import content_hash
+
+logger = get_logger(__name__)
+
+TABLE_QR_DIR = os.path.join("data", "images", "tables")
+DEFAULT_BASE_URL = "https://pos-ez.streamlit.app"
+QR_WORKERS = 4
+
+_tables = Table.__table__
+
+def table_order_url(table_id: int, base_url: str) -> str:
+    """URL ที่ QR ของโต๊ะชี้ไป (หน้าสั่งอาหาร)"""
+    return f"{base_url.rstrip('/')}/?table_id={table_id}"
+
+def render_qr_png(data: str) -> bytes:
+    """PNG ของ QR Code"""
+    import qrcode
+    qr = qrcode.QRCode(
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    buf = BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buf, format="PNG")
+    return buf.getvalue()
+
+def store_qr_image(png: bytes) -> str:
+    """Save a QR PNG under its content hash (kept if it already exists); returns the path"""
+    path = os.path.join(TABLE_QR_DIR, f"{content_hash(png)}.png")
+    if not os.path.exists(path):
+        os.makedirs(TABLE_QR_DIR, exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(png)
+        os.replace(temp_path, path)
+    return path
+
+def make_table_qr(table_id: int, base_url: str) -> Tuple[str, str]:
+    """Render and store the QR of one table
+
+    Returns:
+        (image path, order URL)
+    """
+    url = table_order_url(table_id, base_url)
+    return store_qr_image(render_qr_png(url)), url
+
+def _save_paths(paths: Dict[int, str]):
+    """Write tables.qr_code for many tables in one executemany UPDATE"""
+    if not paths:
+        return
+    statement = _tables.update().where(_tables.c.id == bindparam('b_id')).values(qr_code=bindparam('b_path'))
+    with engine.begin() as conn:
+        conn.execute(statement, [{'b_id': table_id, 'b_path': path} for table_id, path in paths.items()])
+
+def generate_table_qr_codes(base_url: str = DEFAULT_BASE_URL, table_ids: Optional[Iterable[int]] = None,
+                            workers: int = QR_WORKERS) -> Dict[int, str]:
+    """Generate the QR of every table (or the given ones) in one batch
+
+    Returns:
+        {table_id: image path}
+    """
+    query = select(_tables.c.id).order_by(_tables.c.id)
+    if table_ids is not None:
+        query = query.where(_tables.c.id.in_(list(table_ids)))
+    with engine.connect() as conn:
+        ids = list(conn.execute(query).scalars())
+    if not ids:
+        return {}
+
+    with log_timing(logger, "Generated table QR codes", tables=len(ids)):
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(ids))), thread_name_prefix="table-qr") as pool:
+            results = pool.map(lambda table_id: make_table_qr(table_id, base_url)[0], ids)
+            paths = dict(zip(ids, results))
+        _save_paths(paths)
+    return paths
+
+def table_qr_source(qr_code: Optional[str], table_id: Optional[int] = None,
+                    base_url: str = DEFAULT_BASE_URL) -> Optional[str]:
+    """Value for st.image() of tables.qr_code: the file path, or a data URI for old base64 rows
+
+    A missing file (e.g. wiped by a redeploy) is rendered again from table_id/base_url
+    """
+    if not qr_code:
+        return None
+    if not qr_code.endswith('.png'):
+        return f"data:image/png;base64,{qr_code}"
+    if os.path.exists(qr_code):
+        return qr_code
+    if table_id is None or not base_url:
+        return None
+    try:
+        path, _ = make_table_qr(table_id, base_url)
+    except Exception as e:
+        logger.warning("Cannot regenerate QR code of table %s: %s", table_id, e)
+        return None
+    if path != qr_code:
+        _save_paths({table_id: path})
+    logger.info("Regenerated missing QR code of table %s", table_id)
+    return path
+
+def migrate_inline_table_qr() -> int:
+    """Move base64 QR images stored in tables.qr_code to files (called from init_db)
+
+    Returns:
+        number of tables migrated
+    """
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(_tables.c.id, _tables.c.qr_code).where(
+                _tables.c.qr_code.isnot(None), _tables.c.qr_code.notlike('%.png')
+            )
+        ).all()
+    paths = {}
+    for table_id, qr_code in rows:
+        try:
+            paths[table_id] = store_qr_image(base64.b64decode(qr_code, validate=True))
+        except (binascii.Error, ValueError) as e:
+            logger.warning("Cannot migrate QR code of table %s: %s", table_id, e)
+    _save_paths(paths)
+    if paths:
+        logger.info("Moved %s table QR codes to %s", len(paths), TABLE_QR_DIR)
+    return len(paths)
+
+def build_table_qr_sheet(base_url: str = DEFAULT_BASE_URL, output_path: Optional[str] = None,
+                         active_only: bool = True) -> bytes:
+    """Printable A4 PDF with the QR of every table
+    Every QR is rendered again for base_url so the sheet never mixes URLs (an unchanged QR has
+    the same content hash and reuses its file)
+
+    Args:
+        output_path: also save the PDF to this file
+    Returns:
+        PDF bytes
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    query = select(_tables.c.id, _tables.c.table_number, _tables.c.qr_code).order_by(_tables.c.table_number)
+    if active_only:
+        query = query.where(_tables.c.is_active == True)
+    with engine.connect() as conn:
+        rows = conn.execute(query).all()
+
+    generated = generate_table_qr_codes(base_url, [row.id for row in rows]) if rows else {}
+    tables: List[Tuple[str, str]] = [(row.table_number, generated[row.id]) for row in rows if row.id in generated]
+
+    columns, rows_per_page = 3, 4
+    page_width, page_height = A4
+    margin = 12 * mm
+    cell_width = (page_width - 2 * margin) / columns
+    cell_height = (page_height - 2 * margin) / rows_per_page
+    qr_size = min(cell_width, cell_height) - 16 * mm
+
+    buf = BytesIO()
+    pdf = canvas.Canvas(buf, pagesize=A4)
+    pdf.setTitle("Table QR codes")
+    with log_timing(logger, "Built table QR sheet", tables=len(tables)):
+        for index, (table_number, path) in enumerate(tables):
+            slot = index % (columns * rows_per_page)
+            if index and slot == 0:
+                pdf.showPage()
+            column, row = slot % columns, slot // columns
+            x = margin + column * cell_width
+            y = page_height - margin - (row + 1) * cell_height
+            pdf.drawImage(ImageReader(path), x + (cell_width - qr_size) / 2, y + 12 * mm, qr_size, qr_size)
+            pdf.setFont("Helvetica-Bold", 14)
+            pdf.drawCentredString(x + cell_width / 2, y + 5 * mm, f"Table {table_number}")
+        pdf.save()
+
+    data = buf.getvalue()
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(output_path, 'wb') as f:
+            f.write(data)
+    return data
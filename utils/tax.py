@@ -4,11 +4,15 @@ Tax Management Functions
 """
 
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Optional
 from database.db import get_session
-from database.models import Sale
-from sqlalchemy import func
+from database.models import Sale, MonthlyTaxSummary
+from sqlalchemy import func, case
+from sqlalchemy.exc import IntegrityError
 from utils.helpers import format_currency
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 def calculate_vat(amount: float, tax_rate: float = 7.0, include_tax: bool = False) -> Dict:
     """Calculate VAT
@@ -37,41 +41,167 @@ def calculate_vat(amount: float, tax_rate: float = 7.0, include_tax: bool = Fals
         'tax_rate': tax_rate
     }
 
+def _month_start(value: datetime) -> datetime:
+    """First moment of the month containing value"""
+    return datetime(value.year, value.month, 1)
+
+def _next_month(month_start: datetime) -> datetime:
+    """First moment of the following month"""
+    if month_start.month == 12:
+        return datetime(month_start.year + 1, 1, 1)
+    return datetime(month_start.year, month_start.month + 1, 1)
+
+def _aggregate_tax_by_rate(session, start_date: datetime, end_date: datetime) -> Dict[float, Dict]:
+    """Group non-void sales by tax rate in one query
+    Sales without subtotal use final_amount - tax_amount as subtotal
+    """
+    effective_subtotal = case((Sale.subtotal > 0, Sale.subtotal), else_=Sale.final_amount - Sale.tax_amount)
+    raw_subtotal = case((Sale.subtotal > 0, Sale.subtotal), else_=0.0)
+    
+    rows = session.query(
+        Sale.tax_rate,
+        func.coalesce(func.sum(effective_subtotal), 0).label('subtotal'),
+        func.coalesce(func.sum(raw_subtotal), 0).label('raw_subtotal'),
+        func.coalesce(func.sum(Sale.tax_amount), 0).label('tax'),
+        func.coalesce(func.sum(Sale.final_amount), 0).label('total'),
+        func.count(Sale.id).label('count')
+    ).filter(
+        Sale.sale_date >= start_date,
+        Sale.sale_date <= end_date,
+        Sale.is_void == False
+    ).group_by(
+        Sale.tax_rate
+    ).all()
+    
+    return {
+        float(row.tax_rate or 0.0): {
+            'subtotal': float(row.subtotal),
+            'raw_subtotal': float(row.raw_subtotal),
+            'tax': float(row.tax),
+            'total': float(row.total),
+            'count': int(row.count)
+        }
+        for row in rows
+    }
+
+def _get_month_tax_by_rate(session, month_start: datetime) -> Dict[float, Dict]:
+    """Get per-rate totals of a closed month from monthly_tax_summaries
+    Computes and stores the summary on first use. The stored summary only follows writes that
+    call invalidate_monthly_tax_summary (void, return, synthetic data) - a sale inserted or edited
+    in a closed month any other way stays out of the report until that month is invalidated
+    """
+    month_key = month_start.strftime('%Y-%m')
+    summaries = session.query(MonthlyTaxSummary).filter(MonthlyTaxSummary.month == month_key).all()
+    if summaries:
+        return {
+            s.tax_rate: {
+                'subtotal': s.subtotal,
+                'raw_subtotal': s.raw_subtotal,
+                'tax': s.tax_amount,
+                'total': s.total_amount,
+                'count': s.sales_count
+            }
+            for s in summaries
+        }
+    
+    by_rate = _aggregate_tax_by_rate(session, month_start, _next_month(month_start) - timedelta(microseconds=1))
+    try:
+        for rate, data in by_rate.items():
+            session.add(MonthlyTaxSummary(
+                month=month_key,
+                tax_rate=rate,
+                subtotal=data['subtotal'],
+                raw_subtotal=data['raw_subtotal'],
+                tax_amount=data['tax'],
+                total_amount=data['total'],
+                sales_count=data['count']
+            ))
+        session.commit()
+    except IntegrityError:
+        # Another session stored the same month first
+        session.rollback()
+    return by_rate
+
 def get_tax_report(start_date: datetime, end_date: datetime) -> Dict:
-    """Get tax report"""
+    """Get tax report
+    Whole months before the current month are read from monthly_tax_summaries,
+    partial months at the edges of the range are aggregated from sales
+    """
     session = get_session()
     try:
-        sales = session.query(Sale).filter(
-            Sale.sale_date >= start_date,
-            Sale.sale_date <= end_date,
-            Sale.is_void == False
-        ).all()
+        current_month = _month_start(datetime.now())
+        tax_by_rate = {}
         
-        total_sales = sum(s.final_amount for s in sales)
-        total_tax = sum(s.tax_amount for s in sales)
-        total_subtotal = sum(s.subtotal for s in sales if s.subtotal > 0) or total_sales - total_tax
+        cursor = start_date
+        while cursor <= end_date:
+            month_start = _month_start(cursor)
+            next_month = _next_month(month_start)
+            month_end = next_month - timedelta(microseconds=1)
+            
+            if cursor == month_start and month_end <= end_date and next_month <= current_month:
+                part = _get_month_tax_by_rate(session, month_start)
+            else:
+                part = _aggregate_tax_by_rate(session, cursor, min(end_date, month_end))
+            
+            for rate, data in part.items():
+                totals = tax_by_rate.setdefault(rate, {'subtotal': 0.0, 'raw_subtotal': 0.0, 'tax': 0.0, 'total': 0.0, 'count': 0})
+                for key in totals:
+                    totals[key] += data[key]
+            cursor = next_month
         
-        # Group by tax rate
-        tax_by_rate = {}
-        for sale in sales:
-            rate = sale.tax_rate or 0.0
-            if rate not in tax_by_rate:
-                tax_by_rate[rate] = {'subtotal': 0.0, 'tax': 0.0, 'total': 0.0, 'count': 0}
-            tax_by_rate[rate]['subtotal'] += sale.subtotal if sale.subtotal > 0 else sale.final_amount - sale.tax_amount
-            tax_by_rate[rate]['tax'] += sale.tax_amount
-            tax_by_rate[rate]['total'] += sale.final_amount
-            tax_by_rate[rate]['count'] += 1
+        total_sales = sum(data['total'] for data in tax_by_rate.values())
+        total_tax = sum(data['tax'] for data in tax_by_rate.values())
+        total_subtotal = sum(data.pop('raw_subtotal') for data in tax_by_rate.values()) or total_sales - total_tax
         
         return {
             'total_sales': total_sales,
             'total_subtotal': total_subtotal,
             'total_tax': total_tax,
-            'by_rate': tax_by_rate,
-            'sales_count': len(sales)
+            'by_rate': dict(sorted(tax_by_rate.items())),
+            'sales_count': sum(data['count'] for data in tax_by_rate.values())
         }
     finally:
         session.close()
 
+def get_monthly_vat_summary(year: int) -> List[Dict]:
+    """Get monthly output VAT summary (ภ.พ.30) for a year
+    Returns: List of {'month', 'subtotal', 'tax', 'total', 'count'} for months up to now
+    """
+    summary = []
+    month_start = datetime(year, 1, 1)
+    while month_start.year == year and month_start <= datetime.now():
+        next_month = _next_month(month_start)
+        report = get_tax_report(month_start, next_month - timedelta(microseconds=1))
+        summary.append({
+            'month': month_start.strftime('%Y-%m'),
+            'subtotal': report['total_subtotal'],
+            'tax': report['total_tax'],
+            'total': report['total_sales'],
+            'count': report['sales_count']
+        })
+        month_start = next_month
+    return summary
+
+def invalidate_monthly_tax_summary(sale_date: Optional[datetime] = None, year: Optional[int] = None):
+    """Drop stored monthly summaries so they are recomputed on next use
+    Call after a sale in a past month is added or changes (void, return, back-dated import),
+    or pass year to reset a whole year
+    """
+    session = get_session()
+    try:
+        query = session.query(MonthlyTaxSummary)
+        if year is not None:
+            query = query.filter(MonthlyTaxSummary.month.like(f"{year:04d}-%"))
+        else:
+            query = query.filter(MonthlyTaxSummary.month == sale_date.strftime('%Y-%m'))
+        query.delete(synchronize_session=False)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logger.error("Error in invalidate_monthly_tax_summary: %s", e)
+    finally:
+        session.close()
+
 def generate_tax_invoice(sale_id: int) -> str:
     """Generate tax invoice text"""
     session = get_session()
@@ -0,0 +1,212 @@
+"""
+Thumbnails - รูปย่อ WebP สำหรับ grid สินค้า/เมนู และ cache รูปจาก URL
+- รูปที่อัพโหลดถูกย่อเป็น 96px และ 256px ตั้งแต่ตอนบันทึก (รูปเก่าย่อครั้งแรกที่แสดง)
+- รูปจาก URL ดาวน์โหลดครั้งเดียวใน background แล้วใช้ไฟล์ในเครื่อง (ระหว่างรอ browser โหลดจาก URL เอง)
+- path ของรูปย่อที่หาแล้วเก็บในหน่วยความจำ หน้าเว็บจึงไม่ต้องเช็คไฟล์ทุก card ทุก rerun
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, Iterable, Optional
+from PIL import Image
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+THUMBNAIL_DIR = os.path.join("data", "images", "thumbs")
+REMOTE_CACHE_DIR = os.path.join("data", "images", "remote")
+
+THUMBNAIL_SMALL = 96
+THUMBNAIL_LARGE = 256
+THUMBNAIL_SIZES = (THUMBNAIL_SMALL, THUMBNAIL_LARGE)
+THUMBNAIL_QUALITY = 80
+
+REMOTE_TIMEOUT_SECONDS = 10
+REMOTE_MAX_BYTES = 10 * 1024 * 1024
+REMOTE_RETRY_SECONDS = 600  # URL ที่โหลดไม่ได้ ลองใหม่หลัง 10 นาที
+REMOTE_WORKERS = 4
+RESOLVED_CACHE_SIZE = 4096
+
+# ไฟล์ที่ตั้งชื่อด้วย hash ของเนื้อหา (save_uploaded_image)
+CONTENT_ADDRESSED_NAME = re.compile(r'^[0-9a-f]{32}\.jpg$')
+
+_resolved: 'OrderedDict[tuple, str]' = OrderedDict()
+_resolved_lock = threading.Lock()
+_remote_pending: Dict[str, float] = {}  # url -> เวลาที่เริ่มโหลด / เวลาที่โหลดไม่สำเร็จ
+_remote_lock = threading.Lock()
+_remote_executor: Optional[ThreadPoolExecutor] = None
+
+def is_remote(image_path: str) -> bool:
+    return image_path.startswith(('http://', 'https://'))
+
+def content_hash(data: bytes) -> str:
+    """Name of a stored image: first 32 hex chars of its SHA-256"""
+    return hashlib.sha256(data).hexdigest()[:32]
+
+def _source_key(image_path: str) -> Optional[str]:
+    """Key of the thumbnails of a local image (None if the file is missing)"""
+    name = os.path.basename(image_path)
+    if CONTENT_ADDRESSED_NAME.match(name):
+        return name[:-4]
+    try:
+        stat = os.stat(image_path)
+    except OSError:
+        return None
+    # รูปเก่าที่ตั้งชื่อตามเวลา: key เปลี่ยนเมื่อไฟล์ถูกแก้
+    return hashlib.sha256(f"{os.path.abspath(image_path)}:{stat.st_mtime_ns}:{stat.st_size}".encode()).hexdigest()[:32]
+
+def thumbnail_path(key: str, size: int) -> str:
+    return os.path.join(THUMBNAIL_DIR, f"{key}_{size}.webp")
+
+def generate_thumbnails(image, key: str, sizes: Iterable[int] = THUMBNAIL_SIZES) -> Dict[int, str]:
+    """Write WebP thumbnails of a PIL image (or image path) - existing ones are kept
+
+    Returns:
+        {size: path}
+    """
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    paths = {size: thumbnail_path(key, size) for size in sizes}
+    missing = [size for size, path in paths.items() if not os.path.exists(path)]
+    if not missing:
+        return paths
+
+    source = Image.open(image) if isinstance(image, (str, BytesIO)) else image
+    if source.mode not in ('RGB', 'RGBA'):
+        source = source.convert('RGBA' if 'A' in source.getbands() or source.mode == 'P' else 'RGB')
+    for size in sorted(missing, reverse=True):
+        thumbnail = source.copy()
+        thumbnail.thumbnail((size, size), Image.Resampling.LANCZOS)
+        # เขียนไฟล์ชั่วคราวก่อนแล้วค่อย rename - หน้าอื่นจะไม่เห็นไฟล์ครึ่งๆ กลางๆ
+        temp_path = f"{paths[size]}.{threading.get_ident()}.tmp"
+        thumbnail.save(temp_path, "WEBP", quality=THUMBNAIL_QUALITY, method=4)
+        os.replace(temp_path, paths[size])
+    logger.debug("Generated thumbnails", extra={'key': key, 'sizes': missing})
+    return paths
+
+def _remember(cache_key: tuple, path: str) -> str:
+    with _resolved_lock:
+        _resolved[cache_key] = path
+        _resolved.move_to_end(cache_key)
+        while len(_resolved) > RESOLVED_CACHE_SIZE:
+            _resolved.popitem(last=False)
+    return path
+
+def forget_image(image_path: str):
+    """Drop the remembered thumbnail paths of an image (after it is replaced or deleted)"""
+    with _resolved_lock:
+        for cache_key in [k for k in _resolved if k[0] == image_path]:
+            del _resolved[cache_key]
+
+def remove_thumbnails(image_path: str):
+    """Delete the thumbnail files of a local image"""
+    forget_image(image_path)
+    key = _source_key(image_path)
+    if not key:
+        return
+    for size in THUMBNAIL_SIZES:
+        try:
+            os.remove(thumbnail_path(key, size))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Cannot delete thumbnail of %s: %s", image_path, e)
+
+# ---------------------------------------------------------------- remote images
+
+def remote_cache_path(url: str) -> str:
+    return os.path.join(REMOTE_CACHE_DIR, hashlib.sha256(url.encode('utf-8')).hexdigest()[:32] + ".img")
+
+def fetch_remote_image(url: str) -> Optional[str]:
+    """Download a remote image into the local cache (blocking); returns the cached file path"""
+    path = remote_cache_path(url)
+    if os.path.exists(path):
+        return path
+    request = urllib.request.Request(url, headers={'User-Agent': 'POS-thumbnailer/1.0'})
+    with urllib.request.urlopen(request, timeout=REMOTE_TIMEOUT_SECONDS) as response:
+        content_type = response.headers.get('Content-Type', '')
+        if content_type and not content_type.startswith('image/'):
+            raise ValueError(f"not an image: {content_type}")
+        data = response.read(REMOTE_MAX_BYTES + 1)
+    if len(data) > REMOTE_MAX_BYTES:
+        raise ValueError("image too large")
+
+    image = Image.open(BytesIO(data))
+    image.load()
+    os.makedirs(REMOTE_CACHE_DIR, exist_ok=True)
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+    generate_thumbnails(image, os.path.basename(path)[:-4])
+    return path
+
+def _fetch_in_background(url: str):
+    try:
+        fetch_remote_image(url)
+        with _remote_lock:
+            _remote_pending.pop(url, None)
+        logger.debug("Cached remote image %s", url)
+    except Exception as e:
+        # เก็บเวลาที่ล้มเหลวไว้ - จะลองใหม่หลัง REMOTE_RETRY_SECONDS
+        with _remote_lock:
+            _remote_pending[url] = time.monotonic()
+        logger.warning("Cannot cache remote image %s: %s", url, e)
+
+def _schedule_remote(url: str):
+    global _remote_executor
+    now = time.monotonic()
+    with _remote_lock:
+        started = _remote_pending.get(url)
+        if started is not None and now - started < REMOTE_RETRY_SECONDS:
+            return
+        _remote_pending[url] = now
+        if _remote_executor is None:
+            _remote_executor = ThreadPoolExecutor(max_workers=REMOTE_WORKERS, thread_name_prefix="image-fetch")
+        _remote_executor.submit(_fetch_in_background, url)
+
+# ---------------------------------------------------------------- display
+
+def get_thumbnail(image_path: Optional[str], size: int = THUMBNAIL_LARGE) -> Optional[str]:
+    """Path (or URL) to show for an image at about `size` px
+
+    Local file → its WebP thumbnail (made on first use for old uploads);
+    URL → the local thumbnail once downloaded, the URL itself until then;
+    None if the local file does not exist (yet - uploads are processed in the background).
+    """
+    if not image_path:
+        return None
+    cache_key = (image_path, size)
+    with _resolved_lock:
+        path = _resolved.get(cache_key)
+    if path is not None:
+        return path
+
+    if is_remote(image_path):
+        key = os.path.basename(remote_cache_path(image_path))[:-4]
+        local = thumbnail_path(key, size)
+        if os.path.exists(local):
+            return _remember(cache_key, local)
+        _schedule_remote(image_path)
+        return image_path
+
+    key = _source_key(image_path)
+    if key is None:
+        return None
+    local = thumbnail_path(key, size)
+    if not os.path.exists(local):
+        if not os.path.exists(image_path):
+            # ยังอยู่ในคิวของ image_worker (หรือไฟล์หายไป) - ไม่จำผล ลองใหม่ rerun ถัดไป
+            return None
+        try:
+            local = generate_thumbnails(image_path, key, (size,))[size]
+        except Exception as e:
+            logger.warning("Cannot make thumbnail of %s: %s", image_path, e)
+            return _remember(cache_key, image_path)
+    return _remember(cache_key, local)
@@ -0,0 +1,42 @@
+"""
+Time Bucketing Expressions
+สร้าง SQL expression สำหรับจัดกลุ่มตามวัน/ชั่วโมง/วันในสัปดาห์ ให้ใช้ได้ทั้ง SQLite, PostgreSQL และ MySQL
+"""
+
+from sqlalchemy import func, cast, extract, Integer, Date
+from database.db import engine
+
+# ชื่อวันในสัปดาห์ ตามค่า weekday_of() (0 = อาทิตย์)
+WEEKDAY_NAMES = ['อาทิตย์', 'จันทร์', 'อังคาร', 'พุธ', 'พฤหัสบดี', 'ศุกร์', 'เสาร์']
+
+# หมายเหตุ: expression ต้องไม่มี bound parameter บน PostgreSQL เพราะ SELECT กับ GROUP BY
+# จะได้ placeholder คนละตัวและถูกมองว่าเป็น expression คนละตัว
+
+def _dialect() -> str:
+    """Name of the active database dialect (sqlite, postgresql, mysql)"""
+    return engine.dialect.name
+
+def day_of(column):
+    """Calendar date of a datetime column"""
+    if _dialect() == 'postgresql':
+        return cast(column, Date)
+    return func.date(column)
+
+def hour_of(column):
+    """Hour of day (0-23) of a datetime column as integer"""
+    dialect = _dialect()
+    if dialect == 'sqlite':
+        return cast(func.strftime('%H', column), Integer)
+    if dialect == 'mysql':
+        return func.hour(column)
+    return cast(extract('hour', column), Integer)
+
+def weekday_of(column):
+    """Day of week (0 = Sunday ... 6 = Saturday) of a datetime column as integer"""
+    dialect = _dialect()
+    if dialect == 'sqlite':
+        return cast(func.strftime('%w', column), Integer)
+    if dialect == 'mysql':
+        # DAYOFWEEK: 1 = Sunday
+        return func.dayofweek(column) - 1
+    return cast(extract('dow', column), Integer)